@@ -25,7 +25,7 @@ import { useQueryClient } from '@tanstack/react-query';
 
 // Types
 type GraphType = 'analog' | 'binary';
-type TimeRange = '10s' | '15s' | '20s' | '1m' | '2m';
+type TimeRange = '10s' | '15s' | '20s' | '1m' | '2m' | '1h' | '24h' | '7d';
 
 // Binary alarm interfaces
 interface BinaryAlarmSeries {
@@ -132,6 +132,12 @@ const getTimeIntervalConfig = (timeRange: TimeRange) => {
       return { interval: 15, total: 5 }; // 15 second intervals
     case '2m':
       return { interval: 30, total: 5 }; // 30 second intervals
+    case '1h':
+      return { interval: 900, total: 5 }; // 15 minute intervals
+    case '24h':
+      return { interval: 21600, total: 5 }; // 6 hour intervals
+    case '7d':
+      return { interval: 86400, total: 4 }; // Daily intervals
     default:
       return { interval: 5, total: 5 };
   }
@@ -1229,6 +1235,9 @@ export default function AnalyticsScreen() {
       { label: '20S', value: '20s' },
       { label: '1M', value: '1m' },
       { label: '2M', value: '2m' },
+      { label: '1H', value: '1h' },
+      { label: '24H', value: '24h' },
+      { label: '7D', value: '7d' },
     ];
 
     return (
@@ -115,27 +115,25 @@ export default function MeterReadingsHistoryScreen() {
     refetch
   } = useInfiniteQuery({
     queryKey: ['meter', 'history', hoursDiff, startTimeParam, authState.user?.organizationId],
-    queryFn: async ({ pageParam = 1 }) => {
+    queryFn: async ({ pageParam }) => {
       if (!authState.user?.organizationId) {
         throw new Error('Organization ID is required');
       }
       
       return await fetchMeterHistory(
         hoursDiff,
-        pageParam,
+        1,
         PAGE_SIZE,
         startTimeParam,
-        authState.user.organizationId
+        authState.user.organizationId,
+        pageParam
       );
     },
     getNextPageParam: (lastPage) => {
-      // If we have more pages, return the next page number
-      if (lastPage.pagination && lastPage.pagination.page < lastPage.pagination.pages) {
-        return lastPage.pagination.page + 1;
-      }
-      return undefined;
+      // Continue from the keyset cursor of the last page
+      return lastPage.pagination?.nextCursor ?? undefined;
     },
-    initialPageParam: 1,
+    initialPageParam: undefined as string | undefined,
     enabled: authState.isAuthenticated && !!authState.user?.organizationId,
   });
 
@@ -0,0 +1,167 @@
+import { getOrgHeaders } from './auth';
+import { apiConfig } from './config';
+
+type SnapshotListener = (snapshot: any) => void;
+type StatusListener = (connected: boolean) => void;
+
+interface StreamConnection {
+  snapshotListeners: Set<SnapshotListener>;
+  statusListeners: Set<StatusListener>;
+  xhr: XMLHttpRequest | null;
+  connected: boolean;
+  closed: boolean;
+  retryTimer: ReturnType<typeof setTimeout> | null;
+  retryDelay: number;
+}
+
+const MIN_RETRY_DELAY = 2000;
+const MAX_RETRY_DELAY = 60000;
+
+// responseText keeps growing for the life of the request, so start a fresh one after this much
+const MAX_RESPONSE_LENGTH = 1024 * 1024;
+
+// One connection per organization, shared by every hook that subscribes
+const connections = new Map<string, StreamConnection>();
+
+const setConnected = (connection: StreamConnection, connected: boolean) => {
+  if (connection.connected === connected) return;
+  connection.connected = connected;
+  connection.statusListeners.forEach(listener => listener(connected));
+};
+
+/**
+ * Parse complete SSE frames from the buffered response text. Returns the number of
+ * characters consumed; a trailing partial frame is left for the next progress event.
+ */
+const parseFrames = (text: string, onEvent: (event: string, data: string) => void): number => {
+  let consumed = 0;
+  let end = text.indexOf('\n\n', consumed);
+  while (end !== -1) {
+    const frame = text.slice(consumed, end);
+    consumed = end + 2;
+
+    let event = 'message';
+    const data: string[] = [];
+    for (const line of frame.split('\n')) {
+      if (line.startsWith('event:')) event = line.slice(6).trim();
+      else if (line.startsWith('data:')) data.push(line.slice(5).trimStart());
+    }
+    if (data.length > 0) onEvent(event, data.join('\n'));
+
+    end = text.indexOf('\n\n', consumed);
+  }
+  return consumed;
+};
+
+const scheduleRetry = (organizationId: string, connection: StreamConnection) => {
+  if (connection.closed) return;
+  setConnected(connection, false);
+  connection.retryTimer = setTimeout(() => {
+    connection.retryTimer = null;
+    void connect(organizationId, connection);
+  }, connection.retryDelay);
+  connection.retryDelay = Math.min(connection.retryDelay * 2, MAX_RETRY_DELAY);
+};
+
+const connect = async (organizationId: string, connection: StreamConnection) => {
+  if (connection.closed) return;
+
+  let headers: Record<string, string>;
+  try {
+    headers = await getOrgHeaders(organizationId);
+  } catch (error) {
+    // e.g. a failed token refresh; try again with the usual backoff
+    console.error('Alarm stream authentication failed:', error);
+    scheduleRetry(organizationId, connection);
+    return;
+  }
+  if (connection.closed) return;
+
+  // React Native's XMLHttpRequest delivers the body incrementally, which EventSource-less
+  // environments need to read a long-lived text/event-stream response
+  const xhr = new XMLHttpRequest();
+  connection.xhr = xhr;
+  let offset = 0;
+
+  const scheduleReconnect = () => {
+    if (connection.closed || connection.xhr !== xhr) return;
+    connection.xhr = null;
+    scheduleRetry(organizationId, connection);
+  };
+
+  xhr.open('GET', `${apiConfig.apiUrl}/api/scada/alarms/stream`);
+  Object.entries(headers).forEach(([key, value]) => xhr.setRequestHeader(key, value));
+  xhr.setRequestHeader('Accept', 'text/event-stream');
+
+  xhr.onprogress = () => {
+    if (xhr.status !== 200) return;
+    setConnected(connection, true);
+    connection.retryDelay = MIN_RETRY_DELAY;
+
+    const text = xhr.responseText;
+    offset += parseFrames(text.slice(offset), (event, data) => {
+      if (event !== 'alarms') return;
+      try {
+        const snapshot = JSON.parse(data);
+        connection.snapshotListeners.forEach(listener => listener(snapshot));
+      } catch (error) {
+        console.error('Invalid alarm stream snapshot:', error);
+      }
+    });
+
+    if (offset > MAX_RESPONSE_LENGTH && connection.xhr === xhr) {
+      connection.xhr = null;
+      xhr.abort();
+      void connect(organizationId, connection);
+    }
+  };
+  xhr.onerror = scheduleReconnect;
+  xhr.onload = scheduleReconnect; // The server closed the stream
+  xhr.send();
+};
+
+/**
+ * Subscribe to the organization's live alarm snapshots (GET /api/scada/alarms/stream).
+ * Reconnects with backoff; `onStatus` reports whether the stream is currently connected.
+ * Returns an unsubscribe function; the connection closes with its last subscriber.
+ */
+export const subscribeToAlarmStream = (
+  organizationId: string,
+  onSnapshot: SnapshotListener,
+  onStatus?: StatusListener
+): (() => void) => {
+  let connection = connections.get(organizationId);
+  if (!connection) {
+    connection = {
+      snapshotListeners: new Set(),
+      statusListeners: new Set(),
+      xhr: null,
+      connected: false,
+      closed: false,
+      retryTimer: null,
+      retryDelay: MIN_RETRY_DELAY
+    };
+    connections.set(organizationId, connection);
+    void connect(organizationId, connection);
+  }
+
+  const current = connection;
+  current.snapshotListeners.add(onSnapshot);
+  if (onStatus) {
+    current.statusListeners.add(onStatus);
+    onStatus(current.connected);
+  }
+
+  return () => {
+    current.snapshotListeners.delete(onSnapshot);
+    if (onStatus) current.statusListeners.delete(onStatus);
+    if (current.snapshotListeners.size > 0) return;
+
+    current.closed = true;
+    if (current.retryTimer) clearTimeout(current.retryTimer);
+    const xhr = current.xhr;
+    current.xhr = null;
+    xhr?.abort();
+    connections.delete(organizationId);
+  };
+};
@@ -16,10 +16,14 @@ interface MeterReading {
 
 // Pagination response interface
 interface PaginationInfo {
-  total: number;
+  // null when the count was skipped (follow-up cursor pages)
+  total: number | null;
   page: number;
   limit: number;
-  pages: number;
+  pages: number | null;
+  hasMore: boolean;
+  // Opaque keyset cursor for the next page, null on the last page
+  nextCursor: string | null;
 }
 
 // Paginated response interface
@@ -61,6 +65,22 @@ export interface MeterReport {
   metadata?: any;
 }
 
+// Background generation job returned (202) for large reports
+export interface MeterReportJob {
+  jobId: string;
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  progress: {
+    rowsWritten: number;
+    estimatedRows: number | null;
+    percent: number | null;
+  };
+  reportId?: string | null;
+  error?: string | null;
+}
+
+// How often a background report job is polled
+const REPORT_JOB_POLL_INTERVAL = 2000;
+
 /**
  * Fetch latest meter reading
  */
@@ -87,7 +107,8 @@ export const fetchMeterHistory = async (
   page: number = 1, 
   limit: number = 20, 
   startTime?: string,
-  organizationId?: string
+  organizationId?: string,
+  cursor?: string
 ): Promise<PaginatedMeterReadings> => {
   try {
     if (!organizationId) {
@@ -104,6 +125,9 @@ export const fetchMeterHistory = async (
     if (startTime) {
       queryParams += `&startTime=${encodeURIComponent(startTime)}`;
     }
+    if (cursor) {
+      queryParams += `&cursor=${encodeURIComponent(cursor)}`;
+    }
     
     const url = `${apiConfig.apiUrl}/api/meter/history?${queryParams}`;
     console.log('🔍 Making request to:', url);
@@ -163,22 +187,72 @@ export const updateMeterLimit = async (
 };
 
 /**
- * Generate a new meter readings report
+ * Get the status of a background report job
+ * @param jobId Job ID returned when generation was started
+ */
+export const getMeterReportJob = async (jobId: string, organizationId?: string): Promise<MeterReportJob> => {
+  try {
+    if (!organizationId) {
+      throw new Error('Organization ID is required for meter readings');
+    }
+
+    const headers = await getOrgHeaders(organizationId);
+    const { data } = await axios.get(
+      `${apiConfig.apiUrl}/api/meter/reports/jobs/${jobId}`,
+      { headers }
+    );
+    return data.data;
+  } catch (error) {
+    console.error('Error fetching meter report job:', error);
+    throw error;
+  }
+};
+
+/**
+ * Generate a new meter readings report. Large reports are generated in the background;
+ * the job is polled until it finishes and the stored report is returned.
  * @param params Report parameters
+ * @param onProgress Called with job progress while a background report is generated
  */
-export const generateMeterReport = async (params: MeterReportParams, organizationId?: string): Promise<MeterReport> => {
+export const generateMeterReport = async (
+  params: MeterReportParams,
+  organizationId?: string,
+  onProgress?: (progress: MeterReportJob['progress']) => void
+): Promise<MeterReport> => {
   try {
     if (!organizationId) {
       throw new Error('Organization ID is required for meter readings');
     }
     
     const headers = await getOrgHeaders(organizationId);
-    const { data } = await axios.post(
+    const { data, status } = await axios.post(
       `${apiConfig.apiUrl}/api/meter/reports`, 
       params, 
       { headers }
     );
-    return data.data;
+
+    if (status !== 202) {
+      return data.data;
+    }
+
+    let job: MeterReportJob = data.data;
+    while (job.status === 'queued' || job.status === 'running') {
+      onProgress?.(job.progress);
+      await new Promise(resolve => setTimeout(resolve, REPORT_JOB_POLL_INTERVAL));
+      job = await getMeterReportJob(job.jobId, organizationId);
+    }
+
+    if (job.status === 'failed' || !job.reportId) {
+      throw new Error(job.error || 'Report generation failed');
+    }
+
+    onProgress?.(job.progress);
+    const reports = await getMeterReports(organizationId);
+    const report = reports.find(item => item.id === job.reportId);
+    if (!report) {
+      throw new Error('Generated report not found');
+    }
+    return report;
   } catch (error) {
     console.error('Error generating meter report:', error);
     throw error;
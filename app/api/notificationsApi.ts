@@ -11,7 +11,8 @@ export const fetchNotifications = async (
   limit: number = 20,
   filter: 'all' | 'unread' = 'all',
   source?: string,
-  organizationId?: string
+  organizationId?: string,
+  cursor?: string
 ): Promise<NotificationResponse> => {
   try {
     const headers = await getOrgHeaders(organizationId);
@@ -22,6 +23,11 @@ export const fetchNotifications = async (
       url += `&source=${source}`;
     }
     
+    // Continue after the previous page instead of paging by offset
+    if (cursor) {
+      url += `&cursor=${encodeURIComponent(cursor)}`;
+    }
+    
     const response = await axios.get(url, { headers });
     return response.data;
   } catch (error) {
@@ -24,7 +24,7 @@ const NotificationBadge: React.FC<NotificationBadgeProps> = ({ size = 'medium' }
   
   // Update display count when either notificationCount or data changes
   useEffect(() => {
-    if (data?.pagination?.total !== undefined) {
+    if (data?.pagination?.total !== undefined && data.pagination.total !== null) {
       setDisplayCount(Math.max(data.pagination.total, notificationCount));
     } else if (!isLoading) {
       setDisplayCount(notificationCount);
@@ -16,6 +16,8 @@ export interface AlarmReportFilters {
 export interface AlarmData {
   id: number;
   created_timestamp: string;
+  // Evaluated on the server from the organization's setpoints
+  severity?: 'info' | 'warning' | 'critical';
   // Temperature-related fields
   hz1sv?: number;
   hz1pv?: number;
@@ -62,6 +64,8 @@ export interface AlarmData {
   tz2fanfail?: boolean;
   tz1fantrip?: boolean;
   tz2fantrip?: boolean;
+  // Other organizations report their own SCADA columns
+  [field: string]: string | number | boolean | null | undefined;
 }
 
 export interface AlarmReportResponse {
@@ -1,9 +1,11 @@
+import { useEffect, useState } from 'react';
 import { useQuery, useMutation, useQueryClient, useInfiniteQuery } from '@tanstack/react-query';
 import { Alarm, AlarmStatus } from '../types/alarm';
 import { useAlarmStore } from '../store/useAlarmStore';
 import axios from 'axios';
 import { getOrgHeaders } from '../api/auth';
 import { apiConfig, SCADA_INTERVAL } from '../api/config';
+import { subscribeToAlarmStream } from '../api/alarmStream';
 import { useAuth } from '../context/AuthContext';
 
 // Query keys
@@ -19,6 +21,8 @@ export const ALARM_KEYS = {
 };
 
 export interface ScadaAlarmResponse {
+  // Snapshot version (also sent as the ETag); unchanged while the alarms are unchanged
+  version?: string;
   analogAlarms: Alarm[];
   binaryAlarms: Alarm[];
   maintenanceMode?: boolean;
@@ -27,11 +31,99 @@ export interface ScadaAlarmResponse {
   fromCache?: boolean;
 }
 
+// Response to /api/scada/alarms?since=<version>: only alarms that changed, plus removed points
+interface ScadaAlarmDelta extends ScadaAlarmResponse {
+  delta: true;
+  since: string;
+  removed: string[];
+}
+
+// Alarm ids are `<point>-<scada row id>`; deltas are keyed by point
+const alarmPointKey = (alarm: Alarm) => {
+  const separator = alarm.id.lastIndexOf('-');
+  return separator > 0 ? alarm.id.slice(0, separator) : alarm.id;
+};
+
+const mergeAlarmList = (previous: Alarm[], changed: Alarm[], removed: Set<string>) => {
+  const updates = new Map(changed.map(alarm => [alarmPointKey(alarm), alarm]));
+  const merged = previous
+    .filter(alarm => !removed.has(alarmPointKey(alarm)))
+    .map(alarm => {
+      const key = alarmPointKey(alarm);
+      const update = updates.get(key);
+      updates.delete(key);
+      return update || alarm;
+    });
+  return [...merged, ...updates.values()];
+};
+
+// Apply a delta response to the snapshot it was requested against
+const applyAlarmDelta = (previous: ScadaAlarmResponse, delta: ScadaAlarmDelta): ScadaAlarmResponse => {
+  const removed = new Set(delta.removed || []);
+  return {
+    ...delta,
+    analogAlarms: mergeAlarmList(previous.analogAlarms, delta.analogAlarms || [], removed),
+    binaryAlarms: mergeAlarmList(previous.binaryAlarms, delta.binaryAlarms || [], removed)
+  };
+};
+
+// Mark alarm types and make sure both lists are arrays (shared by the HTTP query and the stream)
+const normalizeScadaResponse = (data: ScadaAlarmResponse): ScadaAlarmResponse => {
+  const analogAlarms = Array.isArray(data.analogAlarms) ? data.analogAlarms : [];
+  const binaryAlarms = Array.isArray(data.binaryAlarms) ? data.binaryAlarms : [];
+
+  return {
+    version: data.version,
+    analogAlarms: analogAlarms.map(alarm => ({ ...alarm, alarmType: 'analog' as const })),
+    binaryAlarms: binaryAlarms.map(alarm => ({ ...alarm, alarmType: 'binary' as const })),
+    maintenanceMode: data.maintenanceMode,
+    timestamp: data.timestamp,
+    lastUpdate: data.lastUpdate,
+    fromCache: data.fromCache
+  };
+};
+
+/**
+ * Keep the active alarms query up to date from the server's alarm stream
+ * (one evaluation per monitoring cycle is pushed to every open dashboard).
+ * Returns whether the stream is connected, so polling can stop while it is.
+ */
+export const useAlarmStream = (enabled = true) => {
+  const queryClient = useQueryClient();
+  const { setAlarms } = useAlarmStore();
+  const { organizationId, authState } = useAuth();
+  const [isConnected, setIsConnected] = useState(false);
+  const isEnabled = enabled && authState.isAuthenticated && !!organizationId;
+
+  useEffect(() => {
+    if (!isEnabled || !organizationId) {
+      setIsConnected(false);
+      return;
+    }
+
+    return subscribeToAlarmStream(
+      organizationId,
+      snapshot => {
+        const data = normalizeScadaResponse(snapshot);
+        queryClient.setQueryData(ALARM_KEYS.scada(false), data);
+        setAlarms([...data.analogAlarms, ...data.binaryAlarms]);
+      },
+      setIsConnected
+    );
+  }, [isEnabled, organizationId, queryClient, setAlarms]);
+
+  return isConnected;
+};
+
 // Hook for fetching active SCADA alarms
 export const useActiveAlarms = (initialForceRefresh = false) => {
+  const queryClient = useQueryClient();
   const { setAlarms, setLoading, setError } = useAlarmStore();
   const { organizationId, authState } = useAuth();
 
+  // Pushed snapshots replace polling; the interval below is only the fallback while disconnected
+  const isStreaming = useAlarmStream(!initialForceRefresh);
+
   // Get interval from environment variable or use default value (120000 ms = 2 minutes)
   const scadaInterval = SCADA_INTERVAL
     ? parseInt(SCADA_INTERVAL, 10)
@@ -58,38 +150,40 @@ export const useActiveAlarms = (initialForceRefresh = false) => {
         }
 
         const headers = await getOrgHeaders(organizationId ?? undefined);
-        const { data } = await axios.get<ScadaAlarmResponse>(
-          `${apiConfig.apiUrl}/api/scada/alarms${forceRefresh ? '?force=true' : ''}`,
-          { headers }
+
+        // Revalidate against the snapshot we already have: 304 when unchanged, otherwise a delta
+        const previous = queryClient.getQueryData<ScadaAlarmResponse>(queryKey);
+        const params = new URLSearchParams();
+        if (forceRefresh) params.append('force', 'true');
+        if (previous?.version) {
+          params.append('since', previous.version);
+          headers['If-None-Match'] = `W/"${previous.version}"`;
+        }
+
+        const query = params.toString();
+        const response = await axios.get<ScadaAlarmResponse | ScadaAlarmDelta>(
+          `${apiConfig.apiUrl}/api/scada/alarms${query ? `?${query}` : ''}`,
+          { headers, validateStatus: status => (status >= 200 && status < 300) || status === 304 }
         );
 
-        // Ensure both arrays exist and are arrays
-        const analogAlarms = Array.isArray(data.analogAlarms) ? data.analogAlarms : [];
-        const binaryAlarms = Array.isArray(data.binaryAlarms) ? data.binaryAlarms : [];
+        if (response.status === 304 && previous) {
+          setLoading(false);
+          return previous;
+        }
 
-        // Add type markers to distinguish alarms
-        const markedAnalogAlarms = analogAlarms.map(alarm => ({
-          ...alarm,
-          alarmType: 'analog' as const
-        }));
+        const data = response.data;
+        const isDelta = 'delta' in data && data.delta === true;
 
-        const markedBinaryAlarms = binaryAlarms.map(alarm => ({
-          ...alarm,
-          alarmType: 'binary' as const
-        }));
+        // Ensure both arrays exist and add type markers to distinguish alarms
+        const normalized = normalizeScadaResponse(isDelta && previous
+          ? applyAlarmDelta(previous, data as ScadaAlarmDelta)
+          : data);
 
         // Update global store with marked alarms
-        setAlarms([...markedAnalogAlarms, ...markedBinaryAlarms]);
+        setAlarms([...normalized.analogAlarms, ...normalized.binaryAlarms]);
         setLoading(false);
 
-        return {
-          analogAlarms: markedAnalogAlarms,
-          binaryAlarms: markedBinaryAlarms,
-          maintenanceMode: data.maintenanceMode,
-          timestamp: data.timestamp,
-          lastUpdate: data.lastUpdate,
-          fromCache: data.fromCache
-        };
+        return normalized;
       } catch (error) {
         const errorMessage = error instanceof Error ? error.message : 'Failed to fetch alarms';
         setError(errorMessage);
@@ -98,8 +192,8 @@ export const useActiveAlarms = (initialForceRefresh = false) => {
       }
     },
     enabled: authState.isAuthenticated && !!authState.user?.organizationId,
-    refetchInterval: 30000,
-    staleTime: 25000, // Ensure staleTime doesn't go negative
+    refetchInterval: isStreaming ? false : 30000,
+    staleTime: isStreaming ? Infinity : 25000, // Ensure staleTime doesn't go negative
     retry: 3,
     retryDelay: (attemptIndex) => Math.min(1000 * 2 ** attemptIndex, 30000),
   });
@@ -148,6 +242,8 @@ export interface AlarmHistoryParams {
   startTime?: string;
   endTime?: string;
   timeFilter?: string;
+  // Keyset cursor (pagination.nextCursor of the previous page); takes precedence over page
+  cursor?: string;
 }
 
 // Enhanced hook for fetching alarm history with pagination, filtering and sorting
@@ -160,9 +256,10 @@ export function useAlarmHistory({
   sortBy = 'timestamp',
   sortOrder = 'desc',
   type,
-  alarmId
+  alarmId,
+  cursor
 }: AlarmHistoryParams = {}) {
-  const params = { page, limit, status, hours, search, sortBy, sortOrder, type, alarmId };
+  const params = { page, limit, status, hours, search, sortBy, sortOrder, type, alarmId, cursor };
   const { organizationId } = useAuth();
 
   return useQuery({
@@ -180,6 +277,7 @@ export function useAlarmHistory({
         urlParams.append('sortOrder', sortOrder);
         if (type) urlParams.append('type', type);
         if (alarmId) urlParams.append('alarmId', alarmId);
+        if (cursor) urlParams.append('cursor', cursor);
 
         const headers = await getOrgHeaders(organizationId ?? undefined);
         const response = await axios.get(
@@ -210,13 +308,13 @@ export function useSpecificAlarmHistory(alarmId: string, params: Partial<AlarmHi
 
   return useInfiniteQuery({
     queryKey: ALARM_KEYS.alarmHistory({ alarmId, status, hours, startTime, endTime, timeFilter }),
-    queryFn: async ({ pageParam = 1 }) => {
+    queryFn: async ({ pageParam }) => {
       if (!alarmId) return null;
 
       try {
         const urlParams = new URLSearchParams();
-        urlParams.append('page', pageParam.toString());
         urlParams.append('limit', limit.toString());
+        if (pageParam) urlParams.append('cursor', pageParam);
         urlParams.append('alarmId', alarmId);
         urlParams.append('sortBy', 'timestamp');
         urlParams.append('sortOrder', 'desc');
@@ -245,14 +343,13 @@ export function useSpecificAlarmHistory(alarmId: string, params: Partial<AlarmHi
       }
     },
     getNextPageParam: (lastPage) => {
-      if (!lastPage?.pagination) return undefined;
-      const { page, pages } = lastPage.pagination;
-      return page < pages ? page + 1 : undefined;
+      // Keyset cursor of the last row; null on the last page
+      return lastPage?.pagination?.nextCursor ?? undefined;
     },
     enabled: !!alarmId,
     staleTime: 5 * 60 * 1000, // 5 minutes
     refetchOnWindowFocus: false,
-    initialPageParam: 1,
+    initialPageParam: undefined as string | undefined,
     retry: 3,
     retryDelay: (attemptIndex) => Math.min(1000 * 2 ** attemptIndex, 30000),
   });
@@ -293,7 +390,8 @@ export const useAnalyticsData = (timeFilter: string) => {
         throw error;
       }
     },
-    refetchInterval: 5000, // Refetch every 5 seconds for real-time updates
+    // Refetch every 5 seconds for real-time windows; hour / day windows move slowly
+    refetchInterval: /^\d+[sm]$/.test(timeFilter) ? 5000 : 60000,
     staleTime: 500, // Reduced from 3000 to 500ms for faster filter switching
     gcTime: 30000, // Keep cached data for 30 seconds (renamed from cacheTime)
     retry: 3,
@@ -8,7 +8,7 @@ import axios from 'axios';
 import { getOrgHeaders } from '../api/auth';
 import { apiConfig } from '../api/config';
 import { subDays, addHours, format as formatDate } from 'date-fns';
-import { ColumnGrouping, ExcelReportService } from '../services/ExcelReportService';
+import { ColumnGrouping } from '../services/ExcelReportService';
 import { useAuth } from '../context/AuthContext';
 
 export interface ReportTimeRange {
@@ -171,11 +171,6 @@ export function useFurnaceReports() {
           return `Furnace_Report_${startFormatted}_to_${endFormatted}`;
         })();
 
-        // Build a random filename with timestamp
-        const timestamp = new Date().toISOString().replace(/[:.-]/g, '_');
-        const randomSuffix = Math.floor(Math.random() * 10000).toString().padStart(4, '0');
-        const sanitizedTitle = reportTitle.replace(/\s+/g, '_');
-        
         // Use exact times from user selection (don't modify to full day)
         const startDate = new Date(timeRange.startDate);
         const endDate = new Date(timeRange.endDate);
@@ -186,270 +181,73 @@ export function useFurnaceReports() {
           durationHours: ((endDate.getTime() - startDate.getTime()) / (1000 * 60 * 60)).toFixed(2)
         });
 
-        // Memory safety checks  
-        const daysDifference = Math.ceil((endDate.getTime() - startDate.getTime()) / (1000 * 60 * 60 * 24));
-        
-        let filePath = '';
-        let fileContent = '';
-        let alarmData: any = null;
-        let processedRecordCount = 0;
-        
-        if (format === 'excel') {
-          // Fetch the data directly from API
-          const headers = await getOrgHeaders(organizationId);
-          
-          // Smart limit calculation for SCADA data (1 record/second = 86,400/day)
-          const timeDifferenceHours = (endDate.getTime() - startDate.getTime()) / (1000 * 60 * 60);
-          const actualRecordsPerHour = 3600; // SCADA records every second
-          const maxSafeRecords = 5000; // Much more conservative limit for Excel property limits
-          const maxRecommendedHours = 6; // Maximum 6 hours for SCADA data
-          
-          // Calculate safe limit based on actual time range in hours
-          const estimatedTotal = Math.ceil(timeDifferenceHours * actualRecordsPerHour);
-          const calculatedLimit = Math.min(estimatedTotal, maxSafeRecords);
-          
-          console.log('📊 Record calculation:', {
-            timeDifferenceHours: timeDifferenceHours.toFixed(2),
-            estimatedRecords: estimatedTotal,
-            calculatedLimit,
-            maxSafeRecords
-          });
-          
-          // Warning for large time ranges
-          if (timeDifferenceHours > maxRecommendedHours) {
-            throw new Error(`Time range too large for SCADA data. Maximum recommended: ${maxRecommendedHours} hours (current: ${timeDifferenceHours.toFixed(1)} hours). SCADA generates 3,600 records per hour.`);
-          }
-          
-          const params = new URLSearchParams({
-            startDate: startDate.toISOString(),
-            endDate: endDate.toISOString(),
-            limit: calculatedLimit.toString(),
-            orderBy: grouping === ColumnGrouping.OLDEST_FIRST ? 'asc' : 'desc'
-          });
-          
-          if (alarmTypes.length > 0) {
-            alarmTypes.forEach(type => params.append('alarmTypes', type));
-          }
-          if (severityLevels.length > 0) {
-            severityLevels.forEach(level => params.append('severityLevels', level));
-          }
-          if (zones.length > 0) {
-            zones.forEach(zone => params.append('zones', zone));
-          }
-          
-          // Debug: Log the API call parameters
-          console.log('🔍 Fetching alarm data with parameters:');
-          console.log('📅 Date Range:', {
-            originalStart: timeRange.startDate,
-            originalEnd: timeRange.endDate,
-            formattedStart: startDate.toISOString(),
-            formattedEnd: endDate.toISOString()
-          });
-          console.log('🔗 Full API URL:', `${apiConfig.apiUrl}/api/reports/alarm-data?${params.toString()}`);
-          
-          // Add memory and network error handling
-          let result;
-          try {
-            console.log('🔄 Making API request with params:', {
-              url: `${apiConfig.apiUrl}/api/reports/alarm-data`,
-              limit: calculatedLimit,
-              dateRange: `${startDate.toLocaleDateString()} to ${endDate.toLocaleDateString()}`,
-              estimatedDays: daysDifference
-            });
+        if (format !== 'excel' && format !== 'pdf') {
+          throw new Error(`Unsupported format: ${format}`);
+        }
 
-            const { data } = await axios.get(
-              `${apiConfig.apiUrl}/api/reports/alarm-data?${params.toString()}`,
-              { 
-                headers,
-                timeout: 60000, // 60 second timeout
-                maxContentLength: 50 * 1024 * 1024, // 50MB max response size
-                maxBodyLength: 50 * 1024 * 1024
-              }
-            );
-            result = data;
-          } catch (apiError: any) {
-            console.error('❌ API Error:', apiError);
-            
-            // Handle specific error types
-            if (apiError.code === 'ECONNABORTED') {
-              throw new Error('Request timeout. The server took too long to respond. Please try a smaller date range.');
-            }
-            
-            if (apiError.message?.includes('Network Error') || apiError.code === 'ERR_NETWORK') {
-              throw new Error('Network error. Please check your connection and try again.');
-            }
-            
-            // Handle memory-related errors from large responses
-            if (apiError.message?.includes('OutOfMemoryError') || 
-                apiError.message?.includes('allocation') ||
-                apiError.response?.status === 413) {
-              throw new Error(`Too much data for the selected time range. Please select a shorter time period (current: ${timeDifferenceHours.toFixed(1)} hours). For SCADA data, try 30 minutes to 2 hours maximum.`);
-            }
-            
-            // Handle server errors
-            if (apiError.response?.status >= 500) {
-              throw new Error('Server error. Please try again later or contact support.');
-            }
-            
-            // Handle client errors
-            if (apiError.response?.status >= 400) {
-              const errorMsg = apiError.response?.data?.message || 'Invalid request parameters.';
-              throw new Error(errorMsg);
-            }
-            
-            throw new Error(`Failed to fetch data: ${apiError.message || 'Unknown error'}`);
-          }
-          
-          // Debug: Log the result and analyze date distribution
-          const records = result?.data || [];
-          let dateAnalysis = null;
-          
-          if (records.length > 0) {
-            const timestamps = records.map((r: any) => new Date(r.created_timestamp)).sort();
-            const earliestRecord = timestamps[0];
-            const latestRecord = timestamps[timestamps.length - 1];
-            
-            // Check date distribution
-            const dateGroups = records.reduce((acc: Record<string, number>, record: any) => {
-              const date = new Date(record.created_timestamp).toDateString();
-              acc[date] = (acc[date] || 0) + 1;
-              return acc;
-            }, {});
-            
-            dateAnalysis = {
-              earliestRecord: earliestRecord.toISOString(),
-              latestRecord: latestRecord.toISOString(),
-              dateSpread: `${earliestRecord.toLocaleDateString()} to ${latestRecord.toLocaleDateString()}`,
-              recordsPerDay: dateGroups,
-              uniqueDays: Object.keys(dateGroups).length
-            };
-          }
-          
-          console.log('📊 API Response Analysis:', {
-            totalRecords: records.length,
-            hasData: records.length > 0,
-            sampleRecord: records[0] || null,
-            dateAnalysis
-          });
-          
-          // Check if backend is properly filtering by time
-          if (dateAnalysis) {
-            const expectedStartTime = startDate.toISOString();
-            const expectedEndTime = endDate.toISOString();
-            const actualStartTime = dateAnalysis.earliestRecord;
-            const actualEndTime = dateAnalysis.latestRecord;
-            
-            console.log('🔍 Time filtering analysis:', {
-              expected: `${startDate.toLocaleString()} to ${endDate.toLocaleString()}`,
-              actual: `${new Date(actualStartTime).toLocaleString()} to ${new Date(actualEndTime).toLocaleString()}`,
-              recordsReturned: records.length
-            });
-            
-            // Check if we're getting more data than expected for the time range
-            const actualTimeSpanHours = (new Date(actualEndTime).getTime() - new Date(actualStartTime).getTime()) / (1000 * 60 * 60);
-            if (actualTimeSpanHours > timeDifferenceHours * 2) {
-              console.warn('⚠️ WARNING: Backend returned data for longer time span than requested!');
-              console.warn('Expected hours:', timeDifferenceHours.toFixed(2));
-              console.warn('Actual hours:', actualTimeSpanHours.toFixed(2));
+        // The server queries the alarm data, builds the file and stores it;
+        // only the finished file comes back to the device
+        const headers = await getOrgHeaders(organizationId);
+        let generated: { id: string; fileName: string; recordCount: number };
+        try {
+          const { data } = await axios.post(
+            `${apiConfig.apiUrl}/api/reports/furnace/generate`,
+            {
+              title: reportTitle,
+              format,
+              startDate: startDate.toISOString(),
+              endDate: endDate.toISOString(),
+              grouping: grouping.toString(),
+              includeThresholds,
+              includeStatusFields,
+              alarmTypes,
+              severityLevels,
+              zones
+            },
+            {
+              headers,
+              timeout: 5 * 60 * 1000 // Large ranges are streamed server-side and can take a while
             }
-          }
+          );
+          generated = data;
+        } catch (apiError: any) {
+          console.error('❌ API Error:', apiError);
           
-          // Safeguard: Warn if we're getting excessive data
-          if (records.length > 50000) {
-            console.warn('⚠️ Large dataset detected:', records.length, 'records. This might impact performance.');
+          if (apiError.code === 'ECONNABORTED') {
+            throw new Error('Request timeout. The server took too long to respond. Please try a smaller date range.');
           }
           
-          // Success: Log when we get a good date distribution
-          if (dateAnalysis && dateAnalysis.uniqueDays > 1) {
-            console.log('✅ Good data distribution across', dateAnalysis.uniqueDays, 'days');
+          if (apiError.message?.includes('Network Error') || apiError.code === 'ERR_NETWORK') {
+            throw new Error('Network error. Please check your connection and try again.');
           }
           
-          if (!result || !result.data || result.data.length === 0) {
-            const errorMsg = `No data found for the selected date range (${startDate.toLocaleDateString()} to ${endDate.toLocaleDateString()}). Please check if data exists for this period.`;
-            console.warn('⚠️ No data found:', {
-              dateRange: `${startDate.toLocaleDateString()} to ${endDate.toLocaleDateString()}`,
-              filters: { alarmTypes, severityLevels, zones },
-              apiResponse: result
-            });
-            throw new Error(errorMsg);
+          if (apiError.response?.status >= 500) {
+            throw new Error('Server error. Please try again later or contact support.');
           }
           
-          alarmData = result;
-          processedRecordCount = alarmData?.data?.length || 0;
-          
-          // Additional safety check for Excel generation
-          if (processedRecordCount > 5000) {
-            throw new Error(`Dataset too large for Excel generation (${processedRecordCount} records). For SCADA data, please select a smaller time range (30 minutes to 2 hours recommended).`);
+          if (apiError.response?.status >= 400) {
+            throw new Error(apiError.response?.data?.error || 'Invalid request parameters.');
           }
           
-          console.log('✅ Record count safe for Excel generation:', processedRecordCount);
-          
-          // Use the passed grouping parameter directly
-          
-          // Use the ExcelReportService
-          filePath = await ExcelReportService.generateExcelReport({
-            alarmData: alarmData.data,
-            title: sanitizedTitle,
-            grouping,
-            includeThresholds,
-            includeStatusFields
-          });
-          
-          // Read the file content to save to database
-          fileContent = await FileSystem.readAsStringAsync(filePath, {
-            encoding: FileSystem.EncodingType.Base64,
+          throw new Error(`Failed to generate report: ${apiError.message || 'Unknown error'}`);
+        }
+
+        if (!generated.recordCount) {
+          console.warn('⚠️ No data found:', {
+            dateRange: `${startDate.toLocaleDateString()} to ${endDate.toLocaleDateString()}`,
+            filters: { alarmTypes, severityLevels, zones }
           });
-        } else {
-          throw new Error(`Unsupported format: ${format}`);
         }
-        
-        // Get file info
-        const fileInfo = await FileSystem.getInfoAsync(filePath);
-        const fileName = filePath.split('/').pop() || `${sanitizedTitle}.xlsx`;
-        const fileSize = fileInfo.exists && !fileInfo.isDirectory ? fileInfo.size : 0;
-        
-        // Save to database
-        const headers = await getOrgHeaders(organizationId);
-        console.log('Attempting to save report to database...');
-        console.log('Headers:', headers);
-        console.log('Report title:', reportTitle);
-        console.log('File size:', fileSize);
-        
-        try {
-          const savePayload = {
-            title: reportTitle,
-            format,
-            fileContent,
-            fileName,
-            fileSize,
-            startDate: startDate.toISOString(),
-            endDate: endDate.toISOString(),
-            grouping: grouping.toString(),
-            includeThresholds,
-            includeStatusFields,
-            alarmTypes,
-            severityLevels,
-            zones,
-            metadata: {
-              generatedAt: new Date().toISOString(),
-              recordCount: alarmData?.data?.length || 0,
-            }
-          };
-          
-          console.log('Save payload size:', JSON.stringify(savePayload).length);
-          
-          const { data: result } = await axios.post(
-            `${apiConfig.apiUrl}/api/reports/furnace`, 
-            savePayload,
-            { headers }
-          );
-          
-          console.log('Report saved successfully:', result);
-        } catch (saveError: any) {
-          console.error('Save response error:', saveError);
-          console.error('Error response:', saveError.response?.data);
-          console.error('Error status:', saveError.response?.status);
-          Alert.alert('Warning', 'Report generated but failed to save to database: ' + (saveError.response?.data?.error || saveError.message));
+
+        // Download the stored file once so it can be opened and shared locally
+        const filePath = `${FileSystem.documentDirectory}${generated.fileName}`;
+        const download = await FileSystem.downloadAsync(
+          `${apiConfig.apiUrl}/api/reports/furnace/${generated.id}`,
+          filePath,
+          { headers }
+        );
+        if (download.status !== 200) {
+          throw new Error(`Report generated but download failed (status ${download.status})`);
         }
         
         // Refresh the reports list after successful save
@@ -459,28 +257,6 @@ export function useFurnaceReports() {
       } catch (error: any) {
         console.error('Error generating furnace report:', error);
         
-        // Handle specific Excel property limit error
-        if (error.message?.includes('Property storage exceeds') || 
-            error.message?.includes('196607 properties')) {
-          error.handled = true;
-          Alert.alert(
-            'Too Much Data for Excel',
-            'Excel cannot handle this many records. For SCADA data (86,400 records/day), please select a much smaller time range:\n\n• Recommended: 2-6 hours maximum\n• SCADA generates 1 record per second\n• Large date ranges will exceed Excel limits'
-          );
-          throw error;
-        }
-        
-        // Handle general memory/data size errors
-        if (error.message?.includes('out of memory') || 
-            error.message?.includes('allocation')) {
-          error.handled = true;
-          Alert.alert(
-            'Data Size Too Large',
-            'The selected date range contains too much SCADA data for processing.\n\n• Recommended: 2-6 hours maximum\n• SCADA generates 86,400 records per day\n• Please select a smaller time range'
-          );
-          throw error;
-        }
-        
         error.handled = true;
         
         Alert.alert(
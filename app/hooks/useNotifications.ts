@@ -27,11 +27,12 @@ export const useNotifications = (
   const enabled = authState.isAuthenticated && !!authState.user;
   return useInfiniteQuery({
     queryKey: [NOTIFICATIONS_KEY, filter, limit, source],
-    queryFn: ({ pageParam = 1 }) => fetchNotifications(pageParam as number, limit, filter, source, organizationId ?? undefined),
-    initialPageParam: 1,
+    queryFn: ({ pageParam }) => fetchNotifications(1, limit, filter, source, organizationId ?? undefined, pageParam),
+    initialPageParam: undefined as string | undefined,
     getNextPageParam: (lastPage) => {
+      // Keyset cursor of the last row; absent on the last page
       if (lastPage.pagination.hasMore) {
-        return lastPage.pagination.page + 1;
+        return lastPage.pagination.nextCursor ?? undefined;
       }
       return undefined;
     },
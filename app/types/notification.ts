@@ -35,8 +35,11 @@ export interface NotificationResponse {
   pagination: {
     page: number;
     limit: number;
-    total: number;
-    totalPages: number;
+    // null when the count was skipped (follow-up cursor pages)
+    total: number | null;
+    totalPages: number | null;
     hasMore: boolean;
+    // Opaque keyset cursor for the next page, null on the last page
+    nextCursor: string | null;
   };
 } 
\ No newline at end of file
@@ -0,0 +1,27 @@
+-- CreateEnum
+CREATE TYPE "OutboxStatus" AS ENUM ('PENDING', 'PROCESSING', 'FAILED');
+
+-- CreateTable
+CREATE TABLE "NotificationOutbox" (
+    "id" TEXT NOT NULL,
+    "organizationId" TEXT NOT NULL,
+    "payload" JSONB NOT NULL,
+    "severity" TEXT NOT NULL DEFAULT 'INFO',
+    "status" "OutboxStatus" NOT NULL DEFAULT 'PENDING',
+    "attempts" INTEGER NOT NULL DEFAULT 0,
+    "availableAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "lockedAt" TIMESTAMP(3),
+    "lastError" TEXT,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "NotificationOutbox_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE INDEX "NotificationOutbox_status_availableAt_idx" ON "NotificationOutbox"("status", "availableAt");
+
+-- CreateIndex
+CREATE INDEX "NotificationOutbox_organizationId_idx" ON "NotificationOutbox"("organizationId");
+
+-- AddForeignKey
+ALTER TABLE "NotificationOutbox" ADD CONSTRAINT "NotificationOutbox_organizationId_fkey" FOREIGN KEY ("organizationId") REFERENCES "Organization"("id") ON DELETE CASCADE ON UPDATE CASCADE;
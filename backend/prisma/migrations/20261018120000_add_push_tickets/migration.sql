@@ -0,0 +1,15 @@
+-- CreateTable
+CREATE TABLE "PushTicket" (
+    "id" TEXT NOT NULL,
+    "organizationId" TEXT NOT NULL,
+    "pushToken" TEXT NOT NULL,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "PushTicket_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE INDEX "PushTicket_createdAt_idx" ON "PushTicket"("createdAt");
+
+-- AddForeignKey
+ALTER TABLE "PushTicket" ADD CONSTRAINT "PushTicket_organizationId_fkey" FOREIGN KEY ("organizationId") REFERENCES "Organization"("id") ON DELETE CASCADE ON UPDATE CASCADE;
@@ -0,0 +1,22 @@
+-- AlterEnum
+ALTER TYPE "AlarmType" ADD VALUE 'OTHER';
+
+-- AlterTable
+ALTER TABLE "Alarm" ADD COLUMN     "clearedAt" TIMESTAMP(3),
+ADD COLUMN     "pointKey" TEXT,
+ADD COLUMN     "scadaRowId" TEXT;
+
+-- CreateIndex
+CREATE INDEX "Alarm_organizationId_timestamp_idx" ON "Alarm"("organizationId", "timestamp");
+
+-- CreateIndex
+CREATE INDEX "Alarm_organizationId_status_timestamp_idx" ON "Alarm"("organizationId", "status", "timestamp");
+
+-- CreateIndex
+CREATE INDEX "Alarm_organizationId_pointKey_clearedAt_idx" ON "Alarm"("organizationId", "pointKey", "clearedAt");
+
+-- CreateIndex
+CREATE INDEX "AlarmHistory_organizationId_timestamp_idx" ON "AlarmHistory"("organizationId", "timestamp");
+
+-- CreateIndex
+CREATE INDEX "AlarmHistory_alarmId_timestamp_idx" ON "AlarmHistory"("alarmId", "timestamp");
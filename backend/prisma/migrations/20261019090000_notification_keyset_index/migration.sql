@@ -0,0 +1,2 @@
+-- CreateIndex
+CREATE INDEX "Notification_userId_organizationId_createdAt_id_idx" ON "Notification"("userId", "organizationId", "createdAt", "id");
@@ -0,0 +1,13 @@
+-- AlterTable
+ALTER TABLE "MeterReport" ADD COLUMN     "blobKey" TEXT,
+ALTER COLUMN "fileContent" DROP NOT NULL;
+
+-- AlterTable
+ALTER TABLE "FurnaceReport" ADD COLUMN     "blobKey" TEXT,
+ALTER COLUMN "fileContent" DROP NOT NULL;
+
+-- CreateIndex
+CREATE INDEX "MeterReport_blobKey_idx" ON "MeterReport"("blobKey");
+
+-- CreateIndex
+CREATE INDEX "FurnaceReport_blobKey_idx" ON "FurnaceReport"("blobKey");
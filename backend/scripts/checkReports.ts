@@ -0,0 +1,93 @@
+/**
+ * Offline checks of the furnace report query builder and PDF layout (no database needed).
+ *
+ *   npx ts-node scripts/checkReports.ts
+ *
+ * Exits non-zero when a check fails.
+ */
+import assert from 'assert';
+import { compileAlarmEvaluationPlan } from '../src/services/alarmEvaluationPlan';
+import { buildAlarmReportQuery } from '../src/services/alarmReportQuery';
+import { layoutPdfColumns } from '../src/services/furnaceReportEngine';
+
+// Column list of the default jk2 furnace table
+const JK2_COLUMNS = [
+  'hz1sv', 'hz1pv', 'hz2sv', 'hz2pv', 'cpsv', 'cppv', 'tz1sv', 'tz1pv', 'tz2sv', 'tz2pv', 'oilpv',
+  'oiltemphigh', 'oillevelhigh', 'oillevellow', 'hz1hfail', 'hz2hfail',
+  'hz1fanfail', 'hz2fanfail', 'tz1fanfail', 'tz2fanfail'
+];
+
+const jk2Plan = compileAlarmEvaluationPlan('check', { columns: JK2_COLUMNS, table: 'jk2' }, 'check', new Map());
+
+const reportWindow = { startDate: new Date('2025-01-01T00:00:00Z'), endDate: new Date('2025-01-02T00:00:00Z') };
+
+// Usable width of an A4 landscape page with the PDF writer's 30pt margins
+const A4_LANDSCAPE_WIDTH = 841.89 - 60;
+
+// A furnace with more analog points than the jk2 table
+const widePoints = (count: number) => ({
+  analog: Array.from({ length: count }, (_, index) =>
+    ({ ...jk2Plan.analog[index % jk2Plan.analog.length], name: `Zone ${index + 1}`, pvField: `z${index + 1}pv` })),
+  binary: jk2Plan.binary
+});
+
+const checkPdfLayout = (count: number) => {
+  const lines = layoutPdfColumns(widePoints(count), { ...reportWindow, format: 'pdf' }, A4_LANDSCAPE_WIDTH);
+  for (const line of lines) {
+    const width = line.reduce((sum, col) => sum + col.width, 0);
+    assert.ok(width <= A4_LANDSCAPE_WIDTH + 0.01, `line of ${width}pt overflows the page`);
+    assert.ok(line.every(col => col.width >= 55), 'column narrower than the minimum');
+    assert.strictEqual(line[0].header, 'Timestamp');
+  }
+  const headers = lines.flatMap(line => line.slice(1).map(col => col.header));
+  for (let index = 1; index <= count; index++) {
+    assert.strictEqual(headers.filter(header => header === `Zone ${index}`).length, 1, `Zone ${index} missing`);
+  }
+  assert.ok(headers.includes('Active Alarms'));
+  return lines;
+};
+
+const checks: [string, () => void | Promise<void>][] = [
+  ['legacy "oil" filter selects the oil points', () => {
+    const query = buildAlarmReportQuery(jk2Plan, { ...reportWindow, alarmTypes: ['oil'] });
+    assert.strictEqual(query.isEmpty, false);
+    for (const condition of ['oilpv IS NOT NULL', 'oiltemphigh = true', 'oillevelhigh = true', 'oillevellow = true']) {
+      assert.ok(query.sql.includes(condition), `missing ${condition}`);
+    }
+    assert.ok(!query.sql.includes('hz1pv IS NOT NULL'), 'hardening zone selected by the oil filter');
+  }],
+  ['plan type filter still selects by type', () => {
+    const query = buildAlarmReportQuery(jk2Plan, { ...reportWindow, alarmTypes: ['fan'] });
+    assert.ok(query.sql.includes('hz1fanfail = true'));
+    assert.ok(!query.sql.includes('oilpv IS NOT NULL'));
+  }],
+  ['PDF columns for 8 analog points fit one A4 landscape line', () => {
+    assert.strictEqual(checkPdfLayout(8).length, 1);
+  }],
+  ['PDF columns for 24 analog points wrap instead of overflowing', () => {
+    assert.ok(checkPdfLayout(24).length > 1);
+  }]
+];
+
+async function main() {
+  let failures = 0;
+  for (const [name, check] of checks) {
+    try {
+      await check();
+      console.log(`✅ ${name}`);
+    } catch (error) {
+      failures++;
+      console.error(`❌ ${name}:`, error instanceof Error ? error.message : error);
+    }
+  }
+
+  if (failures > 0) {
+    console.error(`❌ ${failures} report check(s) failed`);
+    process.exitCode = 1;
+  }
+}
+
+main().catch(error => {
+  console.error('❌ Report checks failed:', error);
+  process.exit(1);
+});
@@ -0,0 +1,124 @@
+/**
+ * Move report files out of the bytea `fileContent` columns into the blob store, and optionally
+ * delete blobs no report references any more.
+ *
+ *   npx ts-node scripts/migrateReportBlobs.ts [--dry-run] [--batch 50] [--gc]
+ *
+ * Rows are moved one at a time (only one file is held in memory) and the bytea is cleared in the
+ * same update that records the blob key, so the script can be stopped and re-run safely.
+ * Because the bytea is cleared, BLOB_STORE_DIR must point at persistent storage; the script
+ * refuses to move anything while the store location is defaulted.
+ */
+import 'dotenv/config';
+import prisma from '../src/config/db';
+import { getBlobStore, isBlobStoreConfigured } from '../src/services/blobStore';
+
+// Unreferenced blobs younger than this may belong to a report that is still being saved
+const GC_MIN_AGE_MS = 60 * 60 * 1000;
+
+const hasFlag = (name: string) => process.argv.includes(name);
+const getArgument = (name: string): string | undefined => {
+  const index = process.argv.indexOf(name);
+  return index >= 0 ? process.argv[index + 1] : undefined;
+};
+
+type ReportModel = 'meterReport' | 'furnaceReport';
+
+async function migrateModel(model: ReportModel, batchSize: number, dryRun: boolean) {
+  // Both delegates share the fields used here
+  const delegate = prisma[model] as any;
+  const store = getBlobStore();
+  let moved = 0;
+  let bytes = 0;
+  let lastId: string | undefined;
+
+  for (;;) {
+    const batch: { id: string }[] = await delegate.findMany({
+      where: {
+        blobKey: null,
+        fileContent: { not: null },
+        ...(lastId ? { id: { gt: lastId } } : {})
+      },
+      select: { id: true },
+      orderBy: { id: 'asc' },
+      take: batchSize
+    });
+    if (batch.length === 0) break;
+
+    for (const { id } of batch) {
+      const row = await delegate.findUnique({ where: { id }, select: { fileContent: true } });
+      if (!row?.fileContent) continue;
+
+      const content = Buffer.from(row.fileContent);
+      if (dryRun) {
+        console.log(`🔎 ${model} ${id}: ${content.byteLength} bytes would be moved`);
+      } else {
+        const blob = await store.put(content);
+        await delegate.update({
+          where: { id },
+          data: { blobKey: blob.key, fileSize: blob.size, fileContent: null }
+        });
+      }
+      moved++;
+      bytes += content.byteLength;
+    }
+
+    lastId = batch[batch.length - 1].id;
+    console.log(`📦 ${model}: ${moved} report(s), ${(bytes / 1024 / 1024).toFixed(1)} MB ${dryRun ? 'to move' : 'moved'}`);
+  }
+
+  return { moved, bytes };
+}
+
+async function collectGarbage(dryRun: boolean) {
+  const store = getBlobStore();
+  const [meterKeys, furnaceKeys] = await Promise.all([
+    prisma.meterReport.findMany({ where: { blobKey: { not: null } }, select: { blobKey: true }, distinct: ['blobKey'] }),
+    prisma.furnaceReport.findMany({ where: { blobKey: { not: null } }, select: { blobKey: true }, distinct: ['blobKey'] })
+  ]);
+  const referenced = new Set([...meterKeys, ...furnaceKeys].map(row => row.blobKey));
+
+  let deleted = 0;
+  for await (const key of store.list()) {
+    if (referenced.has(key)) continue;
+    const stat = await store.stat(key);
+    if (!stat || Date.now() - stat.modifiedAt.getTime() < GC_MIN_AGE_MS) continue;
+
+    console.log(`🗑️ Unreferenced blob ${key} (${stat.size} bytes)${dryRun ? '' : ' deleted'}`);
+    if (!dryRun) await store.delete(key);
+    deleted++;
+  }
+  return deleted;
+}
+
+async function main() {
+  const dryRun = hasFlag('--dry-run');
+  const batchSize = Math.max(1, parseInt(getArgument('--batch') || '50'));
+
+  if (!dryRun && !isBlobStoreConfigured()) {
+    throw new Error('BLOB_STORE_DIR is not set. Point it at persistent storage (e.g. a mounted volume) before moving report files out of the database');
+  }
+
+  const started = Date.now();
+  for (const model of ['meterReport', 'furnaceReport'] as ReportModel[]) {
+    const { moved, bytes } = await migrateModel(model, batchSize, dryRun);
+    console.log(`✅ ${model}: ${moved} report(s), ${bytes} bytes ${dryRun ? 'would be moved' : 'moved to the blob store'}`);
+  }
+
+  if (hasFlag('--gc')) {
+    const deleted = await collectGarbage(dryRun);
+    console.log(`✅ ${deleted} unreferenced blob(s) ${dryRun ? 'found' : 'deleted'}`);
+  }
+
+  console.log(`⏱️ Done in ${Date.now() - started}ms`);
+  if (!dryRun) {
+    console.log('ℹ️ Run VACUUM FULL "MeterReport", "FurnaceReport" to return the freed bytea space to the OS');
+  }
+}
+
+main()
+  .catch(error => {
+    console.error('❌ Report blob migration failed:', error);
+    process.exitCode = 1;
+  })
+  .finally(() => prisma.$disconnect());
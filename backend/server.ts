@@ -15,6 +15,9 @@ import authRoutes from './src/routes/authRoutes';
 import operatorRoutes from './src/routes/operatorRoutes';
 import meterRoutes from './src/routes/meterRoutes';
 import BackgroundMonitoringService from './src/services/backgroundMonitoringService';
+import { notificationOutboxWorker } from './src/services/notificationOutboxWorker';
+import PushReceiptService from './src/services/pushReceiptService';
+import ScadaRollupService from './src/services/scadaRollupService';
 
 // Load environment variables
 dotenv.config();
@@ -155,6 +158,15 @@ async function startServer() {
     console.log('🚀 Starting background monitoring service...');
     await BackgroundMonitoringService.start();
 
+    // Start the notification outbox worker
+    notificationOutboxWorker.start();
+
+    // Start periodic Expo push receipt checks
+    PushReceiptService.start();
+
+    // Start incremental SCADA / meter rollups
+    ScadaRollupService.start();
+
     // Start server
     app.listen(PORT, () => {
       console.log(`🚀 Server running on port ${PORT}`);
@@ -187,6 +199,11 @@ process.on('SIGTERM', async () => {
   
   // Stop background monitoring service
   BackgroundMonitoringService.stop();
+
+  // Let the outbox worker finish its current batch
+  await notificationOutboxWorker.stop();
+  PushReceiptService.stop();
+  ScadaRollupService.stop();
   
   // Disconnect Prisma client
   await prisma.$disconnect();
@@ -200,6 +217,11 @@ process.on('SIGINT', async () => {
   
   // Stop background monitoring service
   BackgroundMonitoringService.stop();
+
+  // Let the outbox worker finish its current batch
+  await notificationOutboxWorker.stop();
+  PushReceiptService.stop();
+  ScadaRollupService.stop();
   
   // Disconnect Prisma client
   await prisma.$disconnect();
@@ -1,24 +1,147 @@
+import { createHash } from 'crypto';
 import { Pool, PoolClient } from 'pg';
 import { backOff } from 'exponential-backoff';
 import { logError } from './../utils/logger';
 import prisma from './db';
+import { getOrgContext } from '../services/orgContextCache';
 
 const DEBUG = process.env.NODE_ENV === 'development';
 
+// Connections one organization's pool may grow to (the actual limit follows its load)
+const POOL_MAX_PER_ORG = Math.max(1, parseInt(process.env.SCADA_POOL_MAX_PER_ORG || '10'));
+
+// Connections every pool may use regardless of load
+const POOL_MIN_PER_ORG = Math.min(POOL_MAX_PER_ORG, Math.max(1, parseInt(process.env.SCADA_POOL_MIN_PER_ORG || '2')));
+
+// Open SCADA connections across all organizations
+const GLOBAL_CONNECTION_BUDGET = Math.max(1, parseInt(process.env.SCADA_POOL_GLOBAL_BUDGET || '100'));
+
+// A pool with no checkouts for this long is closed (default: 5 minutes)
+const POOL_IDLE_TTL = parseInt(process.env.SCADA_POOL_IDLE_TTL_MS || '300000');
+
+// Idle connections inside a pool are closed after this long. Longer than the monitoring
+// interval, so steady-state polls reuse a warm connection (default: 2 minutes)
+const CONNECTION_IDLE_TIMEOUT = parseInt(process.env.SCADA_CONNECTION_IDLE_TIMEOUT_MS || '120000');
+
+const CONNECTION_TIMEOUT = 5000;
+
+// How often pools are resized, idle pools evicted and idle connections validated
+const POOL_SWEEP_INTERVAL = 30000;
+
+// Consecutive failed checkouts (each after its retries) before an organization's circuit opens
+const CIRCUIT_FAILURE_THRESHOLD = Math.max(1, parseInt(process.env.SCADA_CIRCUIT_FAILURE_THRESHOLD || '3'));
+
+// First open period; doubles after every failed trial up to CIRCUIT_MAX_COOLDOWN
+const CIRCUIT_COOLDOWN = parseInt(process.env.SCADA_CIRCUIT_COOLDOWN_MS || '15000');
+const CIRCUIT_MAX_COOLDOWN = 5 * 60 * 1000;
+
 // Custom error interface with code property
 interface PostgresError extends Error {
   code?: string;
 }
 
-const poolCache = new Map<string, Pool>();
+/**
+ * A lazily created organization pool and the load it has seen
+ */
+interface ManagedPool {
+  orgId: string;
+  pool: Pool;
+  // Hash of the scadaDbConfig the pool was built from; a different hash rebuilds the pool
+  configHash: string;
+  inUse: number;
+  // Decaying peak of concurrent checkouts, used to size the pool
+  peakInUse: number;
+  lastUsedAt: number;
+}
 
-async function getOrgScadaConfig(orgId: string) {
-  const org = await prisma.organization.findUnique({ where: { id: orgId } });
-  if (!org) throw new Error('Organization not found');
-  return org.scadaDbConfig;
+const pools = new Map<string, ManagedPool>();
+
+// Concurrent first requests for an organization share one pool creation
+const pendingPools = new Map<string, Promise<ManagedPool>>();
+
+// Pools replaced or evicted while clients were still checked out; they count until fully closed
+const retiringPools = new Set<Pool>();
+
+// Checkouts waiting for the global budget
+const budgetWaiters: (() => void)[] = [];
+
+let sweepIntervalId: NodeJS.Timeout | null = null;
+
+/**
+ * Thrown without touching the database while an organization's circuit is open
+ */
+export class ScadaCircuitOpenError extends Error {
+  constructor(public readonly orgId: string, public readonly retryAt: Date) {
+    super(`SCADA database for org ${orgId} is unavailable (circuit open until ${retryAt.toISOString()})`);
+    this.name = 'ScadaCircuitOpenError';
+  }
 }
 
-function createPoolFromConfig(config: any): Pool {
+/**
+ * Thrown when no connection fits the global budget in time; not the organization's fault
+ */
+export class ScadaConnectionBudgetError extends Error {
+  constructor() {
+    super(`SCADA connection budget exhausted (${GLOBAL_CONNECTION_BUDGET} connections)`);
+    this.name = 'ScadaConnectionBudgetError';
+  }
+}
+
+// Per-organization circuit breaker: closed (no entry), open (openedAt set) or half-open (trial running)
+interface CircuitState {
+  failures: number;
+  openedAt: number | null;
+  cooldown: number;
+  trialInFlight: boolean;
+  lastError?: string;
+}
+
+const circuits = new Map<string, CircuitState>();
+
+/**
+ * Fail fast while the circuit is open; once the cooldown has passed let a single trial through
+ */
+const assertCircuitAllows = (orgId: string) => {
+  const circuit = circuits.get(orgId);
+  if (!circuit || circuit.openedAt === null) return;
+
+  const retryAt = circuit.openedAt + circuit.cooldown;
+  if (Date.now() < retryAt || circuit.trialInFlight) {
+    throw new ScadaCircuitOpenError(orgId, new Date(Math.max(retryAt, Date.now())));
+  }
+  circuit.trialInFlight = true;
+};
+
+const recordCheckoutSuccess = (orgId: string) => {
+  const circuit = circuits.get(orgId);
+  if (!circuit) return;
+  if (circuit.openedAt !== null) {
+    console.log(`✅ SCADA circuit closed for org ${orgId}`);
+  }
+  circuits.delete(orgId);
+};
+
+const recordCheckoutFailure = (orgId: string, error: unknown) => {
+  const circuit = circuits.get(orgId) || { failures: 0, openedAt: null, cooldown: CIRCUIT_COOLDOWN, trialInFlight: false };
+  circuits.set(orgId, circuit);
+  circuit.failures++;
+  circuit.lastError = error instanceof Error ? error.message : String(error);
+
+  if (circuit.trialInFlight) {
+    // Failed trial: stay open for longer
+    circuit.trialInFlight = false;
+    circuit.openedAt = Date.now();
+    circuit.cooldown = Math.min(circuit.cooldown * 2, CIRCUIT_MAX_COOLDOWN);
+    console.warn(`⚠️ SCADA circuit for org ${orgId} stays open for ${circuit.cooldown}ms: ${circuit.lastError}`);
+  } else if (circuit.openedAt === null && circuit.failures >= CIRCUIT_FAILURE_THRESHOLD) {
+    circuit.openedAt = Date.now();
+    console.warn(`⚠️ SCADA circuit opened for org ${orgId} after ${circuit.failures} failures: ${circuit.lastError}`);
+  }
+};
+
+const hashConfig = (config: any) => createHash('sha1').update(JSON.stringify(config ?? null)).digest('hex');
+
+function createPoolFromConfig(config: any, max = POOL_MIN_PER_ORG): Pool {
   // Validate required fields
   const requiredFields = ['host', 'port', 'user', 'password', 'database'];
   for (const field of requiredFields) {
@@ -41,6 +164,7 @@ function createPoolFromConfig(config: any): Pool {
     console.warn('⚠️ SCADA DB password is not a string, coercing to string.');
     password = password !== undefined && password !== null ? String(password) : '';
   }
+  // No standing minimum: connections are opened on demand and closed when idle
   return new Pool({
     user: config.user,
     password,
@@ -48,46 +172,289 @@ function createPoolFromConfig(config: any): Pool {
     port: parseInt(config.port || '5432'),
     database: config.database,
     ssl,
-    max: 20,
-    min: 4,
-    idleTimeoutMillis: 15000,
-    connectionTimeoutMillis: 5000,
+    max,
+    idleTimeoutMillis: CONNECTION_IDLE_TIMEOUT,
+    connectionTimeoutMillis: CONNECTION_TIMEOUT,
     maxUses: 5000,
     allowExitOnIdle: false,
     keepAlive: true
   });
 }
 
+// Physical connections currently open to SCADA databases
+const openConnectionCount = () => {
+  let total = 0;
+  for (const managed of pools.values()) total += managed.pool.totalCount;
+  for (const pool of retiringPools) total += pool.totalCount;
+  return total;
+};
+
+// pg-pool reads options.max on every checkout, so pools can be resized in place
+const setPoolMax = (pool: Pool, max: number) => {
+  (pool as any).options.max = max;
+};
+
+/**
+ * Size a pool from its recent peak concurrency, capped by its fair share of the global budget
+ */
+const resizePool = (managed: ManagedPool) => {
+  const demand = Math.ceil(managed.peakInUse * 1.5) + 1;
+  const fairShare = Math.max(POOL_MIN_PER_ORG, Math.floor(GLOBAL_CONNECTION_BUDGET / Math.max(1, pools.size)));
+  const max = Math.min(POOL_MAX_PER_ORG, fairShare, Math.max(POOL_MIN_PER_ORG, demand));
+  setPoolMax(managed.pool, max);
+};
+
+/**
+ * Close a pool without interrupting its checked-out clients
+ */
+const retirePool = (managed: ManagedPool, reason: string) => {
+  if (pools.get(managed.orgId) === managed) pools.delete(managed.orgId);
+  retiringPools.add(managed.pool);
+  if (DEBUG) console.log(`🧹 Closing SCADA pool for org ${managed.orgId} (${reason})`);
+
+  managed.pool.end()
+    .catch(error => console.error(`❌ Error closing SCADA pool for org ${managed.orgId}:`, error))
+    .finally(() => {
+      retiringPools.delete(managed.pool);
+      notifyBudgetWaiters();
+    });
+};
+
+const notifyBudgetWaiters = () => {
+  const waiters = budgetWaiters.splice(0);
+  waiters.forEach(resolve => resolve());
+};
+
+/**
+ * Resize pools to their load and close pools that have been idle for POOL_IDLE_TTL
+ */
+const sweepPools = () => {
+  const now = Date.now();
+  for (const managed of Array.from(pools.values())) {
+    if (managed.inUse === 0 && now - managed.lastUsedAt > POOL_IDLE_TTL) {
+      retirePool(managed, 'idle');
+      continue;
+    }
+    // Let the peak decay so a past burst does not keep the pool large forever
+    managed.peakInUse = Math.max(managed.inUse, managed.peakInUse * 0.8);
+    resizePool(managed);
+
+    if (managed.inUse === 0 && managed.pool.idleCount > 0 && now - managed.lastUsedAt >= POOL_SWEEP_INTERVAL) {
+      void validateIdleConnection(managed);
+    }
+  }
+};
+
+/**
+ * Probe an idle connection of a quiet pool in the background, so checkouts do not have to.
+ * A dead connection usually means the rest of the pool is dead too, so the pool is rebuilt.
+ */
+const validateIdleConnection = async (managed: ManagedPool) => {
+  let client: PoolClient | undefined;
+  try {
+    // Taken straight from the pool: validation is not load and must not keep the pool alive
+    client = await managed.pool.connect();
+    await client.query('SELECT 1');
+    client.release();
+  } catch (error) {
+    client?.release(error instanceof Error ? error : true);
+    console.warn(`⚠️ Idle SCADA connection for org ${managed.orgId} failed validation:`, error instanceof Error ? error.message : error);
+    if (pools.get(managed.orgId) === managed) {
+      retirePool(managed, 'failed idle validation');
+      recordCheckoutFailure(managed.orgId, error);
+    }
+  }
+};
+
+const ensureSweeper = () => {
+  if (sweepIntervalId) return;
+  sweepIntervalId = setInterval(sweepPools, POOL_SWEEP_INTERVAL);
+  sweepIntervalId.unref();
+};
+
+async function getManagedPool(orgId: string): Promise<ManagedPool> {
+  const org = await getOrgContext(orgId);
+  if (!org) throw new Error('Organization not found');
+
+  const configHash = hashConfig(org.scadaDbConfig);
+  const existing = pools.get(orgId);
+  if (existing && existing.configHash === configHash) return existing;
+
+  const pending = pendingPools.get(orgId);
+  if (pending) return pending;
+
+  const creation = (async () => {
+    if (existing) {
+      console.log(`🔄 SCADA DB config changed for org ${orgId}, rebuilding its pool`);
+      retirePool(existing, 'config changed');
+      // Failures against the old database say nothing about the new one
+      circuits.delete(orgId);
+    }
+
+    const managed: ManagedPool = {
+      orgId,
+      pool: createPoolFromConfig(org.scadaDbConfig),
+      configHash,
+      inUse: 0,
+      peakInUse: 0,
+      lastUsedAt: Date.now()
+    };
+    managed.pool.on('error', error => {
+      // Errors on idle clients; the pool drops the client itself
+      console.error(`🔴 Idle SCADA connection error for org ${orgId}:`, error.message);
+    });
+    pools.set(orgId, managed);
+    resizePool(managed);
+    ensureSweeper();
+    if (DEBUG) console.log(`🆕 Created SCADA pool for org ${orgId}`);
+    return managed;
+  })();
+
+  pendingPools.set(orgId, creation);
+  try {
+    return await creation;
+  } finally {
+    pendingPools.delete(orgId);
+  }
+}
+
+/**
+ * Wait until opening another connection fits the global budget. Idle pools of other
+ * organizations are closed first; otherwise waits for a release up to the connection timeout.
+ */
+async function reserveConnectionBudget(managed: ManagedPool): Promise<void> {
+  const deadline = Date.now() + CONNECTION_TIMEOUT;
+
+  // An idle client in this pool or a pool that is already full needs no new connection
+  while (
+    managed.pool.idleCount === 0 &&
+    managed.pool.totalCount < (managed.pool as any).options.max &&
+    openConnectionCount() >= GLOBAL_CONNECTION_BUDGET
+  ) {
+    const idlePools = Array.from(pools.values())
+      .filter(other => other !== managed && other.inUse === 0 && other.pool.totalCount > 0)
+      .sort((a, b) => a.lastUsedAt - b.lastUsedAt);
+    // Closing it frees its connections asynchronously; the wait below ends when it is closed
+    if (idlePools.length > 0) {
+      retirePool(idlePools[0], 'global connection budget');
+    }
+
+    const remaining = deadline - Date.now();
+    if (remaining <= 0) {
+      throw new ScadaConnectionBudgetError();
+    }
+    await new Promise<void>(resolve => {
+      const timer = setTimeout(resolve, remaining);
+      budgetWaiters.push(() => {
+        clearTimeout(timer);
+        resolve();
+      });
+    });
+  }
+}
+
+/**
+ * Check a client out of an organization's pool, tracking load for sizing and eviction
+ */
+async function checkoutClient(managed: ManagedPool): Promise<PoolClient> {
+  await reserveConnectionBudget(managed);
+  const client = await managed.pool.connect();
+
+  managed.inUse++;
+  managed.peakInUse = Math.max(managed.peakInUse, managed.inUse);
+  managed.lastUsedAt = Date.now();
+  if (managed.peakInUse >= ((managed.pool as any).options.max as number)) {
+    resizePool(managed);
+  }
+
+  const release = client.release.bind(client);
+  let released = false;
+  client.release = (err?: Error | boolean) => {
+    if (!released) {
+      released = true;
+      managed.inUse--;
+      managed.lastUsedAt = Date.now();
+    }
+    release(err);
+    notifyBudgetWaiters();
+  };
+  return client;
+}
+
 export async function getScadaPoolForOrg(orgId: string): Promise<Pool> {
-  if (poolCache.has(orgId)) return poolCache.get(orgId)!;
-  const config = await getOrgScadaConfig(orgId);
-  const pool = createPoolFromConfig(config);
-  poolCache.set(orgId, pool);
-  return pool;
+  return (await getManagedPool(orgId)).pool;
+}
+
+/**
+ * Close an organization's pool (e.g. after the organization is deleted)
+ */
+export function closeScadaPool(orgId: string): void {
+  const managed = pools.get(orgId);
+  if (managed) retirePool(managed, 'closed');
+}
+
+/**
+ * Pool sizes and usage per organization
+ */
+export function getScadaPoolStats() {
+  return {
+    globalBudget: GLOBAL_CONNECTION_BUDGET,
+    openConnections: openConnectionCount(),
+    pools: Array.from(pools.values()).map(managed => ({
+      orgId: managed.orgId,
+      max: (managed.pool as any).options.max as number,
+      totalCount: managed.pool.totalCount,
+      idleCount: managed.pool.idleCount,
+      waitingCount: managed.pool.waitingCount,
+      inUse: managed.inUse,
+      lastUsedAt: new Date(managed.lastUsedAt).toISOString()
+    })),
+    circuits: Array.from(circuits.keys()).map(getScadaCircuitStatus)
+  };
 }
 
+/**
+ * Circuit breaker state of an organization's SCADA database
+ */
+export function getScadaCircuitStatus(orgId: string) {
+  const circuit = circuits.get(orgId);
+  if (!circuit) return { orgId, state: 'closed' as const, failures: 0 };
+  const state = circuit.openedAt === null ? 'closed' as const : circuit.trialInFlight ? 'half-open' as const : 'open' as const;
+  return {
+    orgId,
+    state,
+    failures: circuit.failures,
+    lastError: circuit.lastError,
+    retryAt: circuit.openedAt !== null ? new Date(circuit.openedAt + circuit.cooldown).toISOString() : undefined
+  };
+}
+
+/**
+ * Check out a client for an organization's SCADA database, retrying failed connects with backoff.
+ * There is no per-checkout probe: pg-pool drops clients that errored, and quiet pools are validated
+ * in the background. Release with `client.release()`; only pass an error for a broken connection.
+ */
 export async function getClientWithRetry(orgId: string, retries = 3, delay = 500): Promise<PoolClient> {
+  assertCircuitAllows(orgId);
+
   try {
-    const pool = await getScadaPoolForOrg(orgId);
-    const client = await pool.connect();
-    try {
-      await client.query('SELECT 1');
-    } catch (testError) {
-      client.release(true);
-      if (retries > 0) {
-        await new Promise(resolve => setTimeout(resolve, delay));
-        return getClientWithRetry(orgId, retries - 1, delay * 2);
-      }
-      throw new Error('Connection test failed');
-    }
+    const client = await backOff(async () => checkoutClient(await getManagedPool(orgId)), {
+      numOfAttempts: retries + 1,
+      startingDelay: delay,
+      timeMultiple: 2,
+      retry: error => !(error instanceof ScadaConnectionBudgetError)
+    });
+    recordCheckoutSuccess(orgId);
     return client;
   } catch (error) {
-    if (retries > 0) {
-      await new Promise(resolve => setTimeout(resolve, delay));
-      return getClientWithRetry(orgId, retries - 1, delay * 2);
+    if (error instanceof ScadaConnectionBudgetError) {
+      // Release a half-open trial without blaming the organization
+      const circuit = circuits.get(orgId);
+      if (circuit) circuit.trialInFlight = false;
     } else {
-      throw error;
+      recordCheckoutFailure(orgId, error);
     }
+    throw error;
   }
 }
 
@@ -103,15 +470,12 @@ export async function checkScadaHealth(orgId: string) {
         details: {
           connected: true,
           databaseTime: result.rows[0].now,
-          poolStats: {
-            totalCount: getScadaPoolForOrg(orgId).then(p => p.totalCount),
-            idleCount: getScadaPoolForOrg(orgId).then(p => p.idleCount),
-            waitingCount: getScadaPoolForOrg(orgId).then(p => p.waitingCount),
-          }
+          poolStats: getScadaPoolStats().pools.find(stats => stats.orgId === orgId) || null,
+          circuit: getScadaCircuitStatus(orgId)
         }
       };
     } finally {
-      client.release(true); // Force release the client
+      client.release();
     }
   } catch (error) {
     return {
@@ -119,7 +483,8 @@ export async function checkScadaHealth(orgId: string) {
       timestamp: new Date().toISOString(),
       details: {
         error: error instanceof Error ? error.message : String(error),
-        connected: false
+        connected: false,
+        circuit: getScadaCircuitStatus(orgId)
       }
     };
   }
@@ -135,7 +500,7 @@ export async function testScadaConnection(orgId: string) {
       if (DEBUG) console.log('📊 Connection test result:', result.rows[0]);
       return true;
     } finally {
-      client.release(true); // Force release
+      client.release();
     }
   } catch (error) {
     console.error('🔴 Error connecting to SCADA database:', error);
@@ -146,10 +511,14 @@ export async function testScadaConnection(orgId: string) {
 // Close all database connections
 export async function closeScadaConnections() {
   try {
-    for (const pool of poolCache.values()) {
-      await pool.end();
+    if (sweepIntervalId) {
+      clearInterval(sweepIntervalId);
+      sweepIntervalId = null;
     }
-    poolCache.clear();
+    const allPools = [...Array.from(pools.values()).map(managed => managed.pool), ...retiringPools];
+    pools.clear();
+    retiringPools.clear();
+    await Promise.all(allPools.map(pool => pool.end()));
     if (DEBUG) console.log('✅ All SCADA database connections closed');
   } catch (error) {
     console.error('❌ Error closing SCADA database connections:', error);
@@ -157,24 +526,36 @@ export async function closeScadaConnections() {
   }
 }
 
-// Helper to test and log all org SCADA DB connections at startup
+// Helper to validate all org SCADA DB configs at startup. Pools are created lazily on first
+// use, so connections are only opened here when SCADA_TEST_CONNECTIONS_ON_STARTUP=true.
 export async function testAllOrgScadaConnections() {
-  const orgs = await prisma.organization.findMany();
+  const testConnections = process.env.SCADA_TEST_CONNECTIONS_ON_STARTUP === 'true';
+  const orgs = await prisma.organization.findMany({
+    select: { id: true, name: true, scadaDbConfig: true }
+  });
   for (const org of orgs) {
     const orgName = org.name || org.id;
-    if (!org.scadaDbConfig || Object.keys(org.scadaDbConfig).length === 0) {
+    const config: any = typeof org.scadaDbConfig === 'string' ? JSON.parse(org.scadaDbConfig) : org.scadaDbConfig;
+    if (!config || Object.keys(config).length === 0) {
       console.error(`❌ [${orgName}] Missing scadaDbConfig. Skipping organization.`);
       continue;
     }
     try {
-      // Validate config before attempting connection
-      createPoolFromConfig(org.scadaDbConfig);
+      // Validate config without opening a connection
+      const pool = createPoolFromConfig(config);
+      await pool.end();
+      if (!testConnections) {
+        if (DEBUG) console.log(`✅ [${orgName}] SCADA DB config valid (orgId: ${org.id})`);
+        continue;
+      }
       // Test connection
-      const pool = getScadaPoolForOrg(org.id);
-      await testScadaConnection(org.id);
-      console.log(`✅ [${orgName}] SCADA DB connected successfully (orgId: ${org.id})`);
+      if (await testScadaConnection(org.id)) {
+        console.log(`✅ [${orgName}] SCADA DB connected successfully (orgId: ${org.id})`);
+      } else {
+        console.error(`🔴 [${orgName}] Failed to connect to SCADA DB (orgId: ${org.id})`);
+      }
     } catch (err: any) {
-      console.error(`🔴 [${orgName}] Failed to connect to SCADA DB (orgId: ${org.id}):`, err.message || err);
+      console.error(`🔴 [${orgName}] Invalid SCADA DB config (orgId: ${org.id}):`, err.message || err);
     }
   }
 }
\ No newline at end of file
@@ -1,6 +1,7 @@
 import { Request, Response } from 'express';
 import prisma from '../config/db';
 import { getRequestOrgId } from '../middleware/authMiddleware';
+import { getOrgContext, invalidateOrgContext } from '../services/orgContextCache';
 
 export const getMaintenanceStatus = async (req: Request, res: Response) => {
   try {
@@ -57,6 +58,7 @@ export const toggleMaintenanceMode = async (req: Request, res: Response) => {
         enabledAt: newMaintenanceMode ? new Date() : null,
       },
     });
+    invalidateOrgContext(organizationId);
     // Log maintenance mode change
     console.log(`🔧 Maintenance mode ${newMaintenanceMode ? 'ENABLED' : 'DISABLED'} by user ${user.name} (${user.email}) for org ${organizationId}`);
     if (newMaintenanceMode) {
@@ -79,10 +81,9 @@ export const toggleMaintenanceMode = async (req: Request, res: Response) => {
 // Check if maintenance mode is currently active for an org
 export const isMaintenanceModeActive = async (organizationId: string): Promise<boolean> => {
   try {
-    const settings = await prisma.systemSettings.findUnique({
-      where: { organizationId: organizationId },
-    });
-    return settings?.maintenanceMode || false;
+    // Served from the org context cache; toggleMaintenanceMode invalidates it
+    const org = await getOrgContext(organizationId);
+    return org?.maintenanceMode || false;
   } catch (error) {
     console.error('Error checking maintenance mode:', error);
     return false;
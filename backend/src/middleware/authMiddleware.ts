@@ -2,6 +2,7 @@ import { Request, Response, NextFunction } from 'express';
 import jwt from 'jsonwebtoken';
 import { createError } from './errorHandler';
 import prisma from '../config/db';
+import { cachePrincipal, getAuthGeneration, getCachedPrincipal } from '../services/authPrincipalCache';
 
 // Extend Express Request to include user information
 declare global {
@@ -19,7 +20,9 @@ declare global {
 
 /**
  * Authentication middleware to protect routes
- * This will verify the JWT token and attach the user to the request object
+ * This will verify the JWT token and attach the user to the request object.
+ * Verified tokens are cached briefly (see authPrincipalCache), so polled requests skip
+ * the signature check and the user lookup.
  */
 export const authenticate = async (req: Request, res: Response, next: NextFunction) => {
   try {
@@ -41,14 +44,21 @@ export const authenticate = async (req: Request, res: Response, next: NextFuncti
       if (!process.env.JWT_SECRET) {
         throw createError('JWT_SECRET environment variable is required', 500);
       }
+
+      const cached = getCachedPrincipal(token);
+      if (cached) {
+        req.user = { ...cached };
+        return next();
+      }
       
       // Verify the token
       const decoded = jwt.verify(
         token, 
         process.env.JWT_SECRET
-      ) as { id: string; email: string; role: string };
+      ) as { id: string; email: string; role: string; exp?: number };
       
       // Look up user in DB to get organizationId
+      const lookupGeneration = getAuthGeneration();
       const dbUser = await prisma.user.findUnique({
         where: { id: decoded.id },
         select: { id: true, email: true, role: true, organizationId: true }
@@ -57,13 +67,16 @@ export const authenticate = async (req: Request, res: Response, next: NextFuncti
         throw createError('User not found', 401);
       }
       
-      // Attach user info to the request
-      req.user = {
+      const principal = {
         id: dbUser.id,
         email: dbUser.email,
         role: dbUser.role,
         organizationId: dbUser.organizationId ?? null,
       };
+      cachePrincipal(token, principal, decoded.exp ? decoded.exp * 1000 : undefined, lookupGeneration);
+
+      // Attach user info to the request
+      req.user = { ...principal };
       
       next();
     } catch (error) {
@@ -5,7 +5,13 @@ import { createError } from '../middleware/errorHandler';
 import { authenticate, authorize, getRequestOrgId } from '../middleware/authMiddleware';
 import { Router } from 'express';
 import BackgroundMonitoringService from '../services/backgroundMonitoringService';
-import { forceRefreshSchemaConfig } from '../services/scadaService';
+import { getAlarmStreamStats } from '../services/alarmStream';
+import { clearAlarmSnapshotHistory } from '../services/alarmSnapshotHistory';
+import { getOutboxStats } from '../services/notificationOutbox';
+import { forceRefreshSchemaConfig, getAllScadaDataFreshness, invalidateScadaDataCache } from '../services/scadaService';
+import { invalidateOrgContext } from '../services/orgContextCache';
+import { closeScadaPool, getScadaPoolStats } from '../config/scadaDb';
+import { invalidateOrganizationPrincipals, invalidateUserPrincipals } from '../services/authPrincipalCache';
 
 const router = Router();
 
@@ -171,6 +177,8 @@ router.put('/users/:id', async (req: Request, res: Response, next: NextFunction)
         updatedAt: true,
       },
     });
+    // Role / organization / email changes must apply to the user's next request
+    invalidateUserPrincipals(id);
     res.json(updatedUser);
   } catch (error) {
     next(error);
@@ -205,6 +213,7 @@ router.delete('/users/:id', async (req: Request, res: Response, next: NextFuncti
     // await prisma.notification.deleteMany({ where: { userId: id } });
     // Now delete the user
     await prisma.user.delete({ where: { id } });
+    invalidateUserPrincipals(id);
     res.status(204).send();
   } catch (error) {
     next(error);
@@ -220,8 +229,9 @@ router.get('/dashboard', async (req: Request, res: Response, next: NextFunction)
   try {
     // Get counts of alarms by status
     const alarmCounts = await prisma.$transaction([
-      prisma.alarm.count({ where: { status: 'ACTIVE' } }),
-      prisma.alarm.count({ where: { status: 'ACKNOWLEDGED' } }),
+      // Open alarms only: monitoring excursions that returned to normal have clearedAt set
+      prisma.alarm.count({ where: { status: 'ACTIVE', clearedAt: null } }),
+      prisma.alarm.count({ where: { status: 'ACKNOWLEDGED', clearedAt: null } }),
       prisma.alarm.count({ where: { status: 'RESOLVED' } }),
     ]);
     
@@ -286,6 +296,7 @@ router.post('/setpoints', async (req, res) => {
         organization: { connect: { id: organizationId } }
       }
     });
+    invalidateOrgContext(organizationId);
     res.json(setpoint);
   } catch (error) {
     console.error('Error creating setpoint:', error);
@@ -306,6 +317,7 @@ router.put('/setpoints/:id', async (req, res) => {
         highDeviation: parseFloat(highDeviation)
       }
     });
+    invalidateOrgContext(organizationId);
     res.json(setpoint);
   } catch (error) {
     console.error('Error updating setpoint:', error);
@@ -432,6 +444,12 @@ router.put('/organizations/:id', async (req: Request, res: Response, next: NextF
       where: { id },
       data: { name, scadaDbConfig, schemaConfig },
     });
+    invalidateOrgContext(id);
+    
+    // A changed SCADA connection means the cached latest row may come from the wrong database
+    if (scadaDbConfig) {
+      invalidateScadaDataCache(id);
+    }
     
     // If schema config was updated, refresh the SCADA service cache
     if (schemaConfig && currentOrg?.schemaConfig !== schemaConfig) {
@@ -472,6 +490,10 @@ router.patch('/organizations/:id/toggle-status', async (req: Request, res: Respo
       where: { id },
       data: { isEnabled },
     });
+    invalidateOrgContext(id);
+    
+    // Drop the cached SCADA snapshot so a re-enabled org never serves a row from before it was disabled
+    invalidateScadaDataCache(id);
     
     // Log the status change
     console.log(`🔄 Organization ${org.name} (${id}) ${isEnabled ? 'ENABLED' : 'DISABLED'} by SUPER_ADMIN ${req.user.email}`);
@@ -515,6 +537,11 @@ router.delete('/organizations/:id', async (req: Request, res: Response, next: Ne
       // Finally, delete the Organization
       prisma.organization.delete({ where: { id } })
     ]);
+    invalidateOrgContext(id);
+    invalidateScadaDataCache(id);
+    clearAlarmSnapshotHistory(id);
+    invalidateOrganizationPrincipals(id);
+    closeScadaPool(id);
     res.status(204).send();
   } catch (error) { next(error); }
 });
@@ -630,7 +657,11 @@ router.get('/monitoring/status', async (req: Request, res: Response, next: NextF
 
     res.json({
       health: healthStatus,
-      organizations: monitoringStatus
+      organizations: monitoringStatus,
+      alarmStreams: getAlarmStreamStats(),
+      scadaPools: getScadaPoolStats(),
+      scadaSnapshots: getAllScadaDataFreshness(),
+      notificationOutbox: getOutboxStats()
     });
   } catch (error) {
     next(error);
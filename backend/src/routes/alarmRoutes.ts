@@ -19,7 +19,8 @@ router.get('/', async (req: Request, res: Response, next: NextFunction) => {
   try {
     const organizationId = getRequestOrgId(req);
     const alarms = await prisma.alarm.findMany({
-      where: { organizationId },
+      // Cleared monitoring excursions are paged through /api/scada/alarms/events instead
+      where: { organizationId, OR: [{ pointKey: null }, { clearedAt: null }] },
       orderBy: { timestamp: 'desc' },
       include: {
         acknowledgedBy: { select: { id: true, name: true, email: true } },
@@ -42,6 +43,8 @@ router.get('/active', async (req: Request, res: Response, next: NextFunction) =>
       where: {
         status: 'ACTIVE',
         organizationId,
+        // Monitoring excursions that returned to normal are closed
+        clearedAt: null,
       },
       orderBy: {
         timestamp: 'desc',
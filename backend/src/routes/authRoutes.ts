@@ -4,6 +4,7 @@ import jwt, { SignOptions } from 'jsonwebtoken';
 import prisma from '../config/db';
 import { createError } from '../middleware/errorHandler';
 import { authenticate } from '../middleware/authMiddleware';
+import { invalidateUserPrincipals } from '../services/authPrincipalCache';
 import multer from 'multer';
 
 const router = express.Router();
@@ -431,6 +432,9 @@ router.put('/profile', async (req: Request, res: Response, next: NextFunction) =
       },
     });
 
+    // The cached principal carries the email
+    if (updateData.email) invalidateUserPrincipals(req.user.id);
+
     res.json({
       message: 'Profile updated successfully',
       user: updatedUser
@@ -2,11 +2,23 @@ import { Router, Request, Response, NextFunction } from 'express';
 import { getClientWithRetry } from '../config/scadaDb';
 import { logError } from '../utils/logger';
 import prisma from '../config/db';
-import { NotificationService } from '../services/notificationService';
+import { enqueueNotifications } from '../services/notificationOutbox';
+import { getOrgContext, invalidateOrgContext } from '../services/orgContextCache';
 import { authenticate, authorize } from '../middleware/authMiddleware';
 import { getRequestOrgId } from '../middleware/authMiddleware';
-import ExcelJS from 'exceljs';
-import { format as formatDate } from 'date-fns';
+import { decodeCursor, encodeCursor, estimateRowCount, parseCountMode } from '../utils/pagination';
+import { sendReportFile } from '../utils/blobDownload';
+import { downsampleScadaWindow } from '../services/scadaDownsampling';
+import { METER_ROLLUP_SOURCE, getRollupCoverage } from '../services/scadaRollup';
+import {
+  BACKGROUND_ROW_THRESHOLD,
+  MeterReportRequest,
+  buildMeterReportQuery,
+  createMeterReportJob,
+  generateMeterReport,
+  getMeterReportJob,
+  runMeterReportJob
+} from '../services/meterReportExport';
 
 const router = Router();
 
@@ -133,88 +145,107 @@ router.get('/latest', authenticate, asyncHandler(async (req: Request, res: Respo
  * @access  Private
  */
 router.get('/history', authenticate, asyncHandler(async (req: Request, res: Response) => {
-  const client = await getClientWithRetry(getRequestOrgId(req));
-  
   // Parse pagination parameters
   const page = parseInt(req.query.page as string) || 1;
   const limit = parseInt(req.query.limit as string) || 20;
-  const offset = (page - 1) * limit;
+  const cursor = (req.query.cursor as string) || undefined;
+  const position = decodeCursor(cursor);
+  const countMode = parseCountMode(req.query.count, !!cursor);
   
   const hours = parseInt(req.query.hours as string) || 1; // Default to 1 hour
   const startTime = req.query.startTime as string; // Optional specific start time
+
+  if (cursor && !position) {
+    return res.status(400).json({
+      success: false,
+      message: 'Invalid cursor'
+    });
+  }
+
+  const client = await getClientWithRetry(getRequestOrgId(req));
   
   try {
-    let query: string;
-    let countQuery: string;
-    let queryParams: any[] = [];
-    let countParams: any[] = [];
+    const conditions: string[] = [];
+    const params: any[] = [];
     
     if (startTime) {
       // If startTime is provided, use it as the reference point
-      query = `
-        SELECT meter_id, voltage, current, frequency, pf, energy, power, 
-        created_at AT TIME ZONE 'UTC' as created_at
-        FROM meter_readings
-        WHERE created_at >= $1 AND created_at <= NOW()
-        ORDER BY created_at DESC
-        LIMIT $2 OFFSET $3
-      `;
-      queryParams = [startTime, limit, offset];
-      
-      countQuery = `
-        SELECT COUNT(*) as total
-        FROM meter_readings
-        WHERE created_at >= $1 AND created_at <= NOW()
-      `;
-      countParams = [startTime];
+      params.push(startTime);
+      conditions.push(`created_at >= $${params.length} AND created_at <= NOW()`);
     } else {
       // Otherwise use the hours parameter
-      query = `
-        SELECT meter_id, voltage, current, frequency, pf, energy, power, 
-        created_at AT TIME ZONE 'UTC' as created_at
-        FROM meter_readings
-        WHERE created_at >= NOW() - INTERVAL '${hours} hours'
-        ORDER BY created_at DESC
-        LIMIT $1 OFFSET $2
-      `;
-      queryParams = [limit, offset];
-      
-      countQuery = `
-        SELECT COUNT(*) as total
-        FROM meter_readings
-        WHERE created_at >= NOW() - INTERVAL '${hours} hours'
-      `;
-      countParams = [];
+      params.push(hours);
+      conditions.push(`created_at >= NOW() - make_interval(hours => $${params.length})`);
+    }
+    
+    const whereClause = `WHERE ${conditions.join(' AND ')}`;
+    
+    // Keyset pagination on (created_at, meter_id) continues after the cursor row;
+    // page numbers without a cursor fall back to OFFSET
+    const pageConditions = [...conditions];
+    const pageParams = [...params];
+    if (position) {
+      pageParams.push(position.t, position.id);
+      pageConditions.push(`(created_at, meter_id) < ($${pageParams.length - 1}, $${pageParams.length})`);
+    }
+    pageParams.push(limit + 1);
+    let pagination = `LIMIT $${pageParams.length}`;
+    if (!position) {
+      pageParams.push((page - 1) * limit);
+      pagination += ` OFFSET $${pageParams.length}`;
     }
     
-    // Execute the query
-    let result = await client.query(query, queryParams);
+    const query = `
+      SELECT meter_id, voltage, current, frequency, pf, energy, power, 
+      created_at AT TIME ZONE 'UTC' as created_at, created_at::text as cursor_timestamp
+      FROM meter_readings
+      WHERE ${pageConditions.join(' AND ')}
+      ORDER BY meter_readings.created_at DESC, meter_id DESC
+      ${pagination}
+    `;
     
-    // Get total count for pagination
-    const countResult = await client.query(countQuery, countParams);
-    const total = parseInt(countResult.rows[0].total);
+    // Execute the query (one extra row tells whether more pages exist)
+    let result = await client.query(query, pageParams);
+    
+    // Get total count for pagination (skipped or estimated on request)
+    let total: number | null = null;
+    if (countMode === 'exact') {
+      const countResult = await client.query(`SELECT COUNT(*) as total FROM meter_readings ${whereClause}`, params);
+      total = parseInt(countResult.rows[0].total);
+    } else if (countMode === 'approximate') {
+      total = await estimateRowCount(client, `SELECT 1 FROM meter_readings ${whereClause}`, params);
+    }
     
     // If no data found in the requested time frame, get the most recent readings anyway
-    if (result.rows.length === 0 && page === 1) {
+    if (result.rows.length === 0 && page === 1 && !position) {
       result = await client.query(
         `SELECT meter_id, voltage, current, frequency, pf, energy, power, 
          created_at AT TIME ZONE 'UTC' as created_at
          FROM meter_readings
-         ORDER BY created_at DESC
+         ORDER BY meter_readings.created_at DESC
          LIMIT $1`,
         [limit]
       );
     }
     
+    const hasMore = result.rows.length > limit;
+    const readings = result.rows.slice(0, limit);
+    const lastReading = readings[readings.length - 1];
+    const nextCursor = hasMore && lastReading?.cursor_timestamp
+      ? encodeCursor(lastReading.cursor_timestamp, lastReading.meter_id)
+      : null;
+    
     return res.status(200).json({
       success: true,
       data: {
-        readings: result.rows,
+        readings: readings.map(({ cursor_timestamp, ...reading }) => reading),
         pagination: {
           total,
           page,
           limit,
-          pages: Math.ceil(total / limit)
+          pages: total !== null ? Math.ceil(total / limit) : null,
+          hasMore,
+          nextCursor
         }
       }
     });
@@ -229,6 +260,58 @@ router.get('/history', authenticate, asyncHandler(async (req: Request, res: Resp
   }
 }));
 
+/**
+ * @route   GET /api/meter/trend
+ * @desc    Downsampled meter readings (min/max/avg/last per bucket), served from rollups when available
+ * @access  Private
+ */
+router.get('/trend', authenticate, asyncHandler(async (req: Request, res: Response) => {
+  const hours = Math.min(24 * 365, parseInt(req.query.hours as string) || 24);
+  const points = parseInt(req.query.points as string) || 96;
+  const mode = req.query.mode === 'lttb' ? 'lttb' : 'bucket';
+  
+  const client = await getClientWithRetry(getRequestOrgId(req));
+  
+  try {
+    const endTime = new Date();
+    const startTime = new Date(endTime.getTime() - hours * 60 * 60 * 1000);
+    
+    const slots = await downsampleScadaWindow(client, {
+      table: METER_ROLLUP_SOURCE.table,
+      timeColumn: METER_ROLLUP_SOURCE.timeColumn,
+      analogColumns: METER_ROLLUP_SOURCE.analogColumns,
+      binaryColumns: [],
+      start: startTime,
+      end: endTime,
+      targetPoints: points,
+      mode,
+      rollups: await getRollupCoverage(client, METER_ROLLUP_SOURCE)
+    });
+    
+    return res.status(200).json({
+      success: true,
+      data: {
+        from: startTime,
+        to: endTime,
+        mode,
+        buckets: slots.map(slot => ({
+          time: slot.time,
+          samples: slot.samples,
+          ...slot.analog
+        }))
+      }
+    });
+  } catch (error) {
+    logError('Error fetching meter trend', error);
+    return res.status(500).json({
+      success: false,
+      message: 'Error fetching meter trend'
+    });
+  } finally {
+    client.release();
+  }
+}));
+
 /**
  * @route   GET /api/meter/limits
  * @desc    Get all meter parameter limits
@@ -302,6 +385,7 @@ router.put('/limits/:id', authenticate, authorize(['ADMIN']), asyncHandler(async
         updatedAt: new Date()
       }
     });
+    invalidateOrgContext(existingLimit.organizationId);
     
     return res.status(200).json({
       success: true,
@@ -334,11 +418,8 @@ async function checkThresholdViolations(readings: {
       return;
     }
     
-    // Check if organization is enabled
-    const org = await prisma.organization.findUnique({
-      where: { id: organizationId },
-      select: { isEnabled: true }
-    });
+    // Check if organization is enabled (org row and its meter limits come from the org context cache)
+    const org = await getOrgContext(organizationId);
     
     if (!org?.isEnabled) {
       console.log('🛑 Organization disabled - skipping threshold violation checks');
@@ -346,11 +427,7 @@ async function checkThresholdViolations(readings: {
     }
     
     // Get limits for the specific organization
-    const limits = await prisma.meterLimit.findMany({
-      where: {
-        organizationId: organizationId
-      }
-    });
+    const limits = org.meterLimits;
     
     // Map to track violations
     const violations = [];
@@ -382,9 +459,9 @@ async function checkThresholdViolations(readings: {
       }
     }
     
-    // Send notifications for violations
-    for (const violation of violations) {
-      await NotificationService.createNotification({
+    // Queue notifications for all violations in one batch
+    if (violations.length > 0) {
+      await enqueueNotifications(violations.map(violation => ({
         title: `Meter Alert: ${violation.description}`,
         body: `${violation.description} ${violation.type === 'high' ? 'exceeded' : 'fell below'} the ${violation.type} limit. Current value: ${violation.value}`,
         severity: 'WARNING',
@@ -396,7 +473,7 @@ async function checkThresholdViolations(readings: {
           type: violation.type
         },
         organizationId
-      });
+      })));
     }
     
     return;
@@ -408,11 +485,13 @@ async function checkThresholdViolations(readings: {
 
 /**
  * @route   POST /api/meter/reports
- * @desc    Generate a meter readings report and save it to the database
+ * @desc    Generate a meter readings report and save it to the database. The workbook is streamed
+ *          from a server-side cursor; large ranges (or `background: true`) return 202 with a job id
+ *          that can be polled at GET /api/meter/reports/jobs/:jobId
  * @access  Private
  */
 router.post('/reports', authenticate, asyncHandler(async (req: Request, res: Response) => {
-  const { startDate, endDate, parameters, title, sortOrder } = req.body;
+  const { startDate, endDate, parameters, title, sortOrder, background } = req.body;
   const userId = req.user?.id;
 
   if (!userId) {
@@ -439,19 +518,19 @@ router.post('/reports', authenticate, asyncHandler(async (req: Request, res: Res
       sortOrder
     });
 
-    // Get database client for SCADA DB
-    console.log('🔄 Attempting to get database client...');
-    const client = await getClientWithRetry(getRequestOrgId(req));
-    console.log('✅ Database client acquired successfully');
-    
+    const organizationId = getRequestOrgId(req);
+    const client = await getClientWithRetry(organizationId);
+    let released = false;
+    const releaseClient = () => {
+      if (!released) {
+        released = true;
+        client.release();
+        console.log('🟡 Database client released');
+      }
+    };
+
     try {
-      // Test database connection
-      console.log('🔍 Testing database connection...');
-      const testResult = await client.query('SELECT 1 as connection_test');
-      console.log(`✅ Database connection test: ${JSON.stringify(testResult.rows[0])}`);
-      
       // Check if meter_readings table exists
-      console.log('🔍 Checking if meter_readings table exists...');
       try {
         const tableCheckResult = await client.query(`
           SELECT EXISTS (
@@ -460,8 +539,7 @@ router.post('/reports', authenticate, asyncHandler(async (req: Request, res: Res
             AND table_name = 'meter_readings'
           ) as table_exists
         `);
-        console.log(`📊 meter_readings table exists: ${tableCheckResult.rows[0].table_exists}`);
-        
+
         if (!tableCheckResult.rows[0].table_exists) {
           return res.status(500).json({
             success: false,
@@ -471,350 +549,164 @@ router.post('/reports', authenticate, asyncHandler(async (req: Request, res: Res
       } catch (tableCheckError) {
         console.error('❌ Error checking table existence:', tableCheckError);
       }
-      
-      // Build query based on parameters
-      let query = `SELECT meter_id`;
-
-      // Only include requested parameters in the query
-      if (!parameters || parameters.includes('voltage')) query += `, voltage`;
-      if (!parameters || parameters.includes('current')) query += `, current`;
-      if (!parameters || parameters.includes('frequency')) query += `, frequency`;
-      if (!parameters || parameters.includes('pf')) query += `, pf`;
-      if (!parameters || parameters.includes('energy')) query += `, energy`;
-      if (!parameters || parameters.includes('power')) query += `, power`;
-
-      // Always include timestamp with proper timezone conversion
-      query += `, created_at AT TIME ZONE 'UTC' AT TIME ZONE 'Asia/Kolkata' AS created_at FROM meter_readings WHERE created_at BETWEEN $1 AND $2`;
-
-      // Add sort order
-      if (sortOrder === 'oldest_first') {
-        query += ` ORDER BY created_at ASC`;
-      } else {
-        query += ` ORDER BY created_at DESC`;
-      }
 
-      console.log(`📊 Full query: ${query.replace(/\s+/g, ' ')}`);
-      
-      try {
-        let result = await client.query(
-          query,
-          [new Date(startDate), new Date(endDate)]
+      const hasReadings = async (from: Date, to: Date): Promise<boolean> => {
+        const found = await client.query(
+          `SELECT EXISTS (SELECT 1 FROM meter_readings WHERE created_at BETWEEN $1 AND $2) AS found`,
+          [from, to]
         );
+        return found.rows[0].found;
+      };
+
+      let queryStart = new Date(startDate);
+      let queryEnd = new Date(endDate);
+
+      if (!(await hasReadings(queryStart, queryEnd))) {
+        // Try to get any readings to provide better error message
+        console.log('🔍 No readings found in date range, checking for any readings...');
+        const rangeResult = await client.query(`
+          SELECT 
+            MIN(created_at) as earliest,
+            MAX(created_at) as latest
+          FROM meter_readings
+        `);
+        const earliest = rangeResult.rows[0].earliest;
+        const latest = rangeResult.rows[0].latest;
 
-        console.log(`📊 Query returned ${result.rows.length} rows`);
-
-        if (result.rows.length === 0) {
-          // Try to get any readings to provide better error message
-          console.log('🔍 No readings found in date range, checking for any readings...');
-          const anyReadingsQuery = `SELECT COUNT(*) as count FROM meter_readings`;
-          const countResult = await client.query(anyReadingsQuery);
-          const totalReadings = parseInt(countResult.rows[0].count);
+        if (!earliest) {
+          console.log('❌ No meter readings found in the database at all');
           
-          console.log(`📊 Total readings in database: ${totalReadings}`);
-          
-          if (totalReadings === 0) {
-            console.log('❌ No meter readings found in the database at all');
+          // Try to insert some sample data for testing
+          console.log('🔄 Attempting to insert sample data for testing...');
+          try {
+            const now = new Date();
+            const yesterday = new Date(now);
+            yesterday.setDate(yesterday.getDate() - 1);
             
-            // Try to insert some sample data for testing
-            console.log('🔄 Attempting to insert sample data for testing...');
-            try {
-              const now = new Date();
-              const yesterday = new Date(now);
-              yesterday.setDate(yesterday.getDate() - 1);
-              
-              // Insert some sample readings
-              const sampleData = [
-                {
-                  voltage: 230.5,
-                  current: 5.2,
-                  frequency: 50.1,
-                  pf: 0.95,
-                  energy: 120.5,
-                  power: 1.2,
-                  created_at: yesterday
-                },
-                {
-                  voltage: 231.2,
-                  current: 5.3,
-                  frequency: 50.0,
-                  pf: 0.94,
-                  energy: 121.0,
-                  power: 1.25,
-                  created_at: now
-                }
-              ];
-              
-              for (const sample of sampleData) {
-                await client.query(
-                  `INSERT INTO meter_readings (voltage, current, frequency, pf, energy, power, created_at) 
-                   VALUES ($1, $2, $3, $4, $5, $6, $7)`,
-                  [sample.voltage, sample.current, sample.frequency, sample.pf, sample.energy, sample.power, sample.created_at]
-                );
+            // Insert some sample readings
+            const sampleData = [
+              {
+                voltage: 230.5,
+                current: 5.2,
+                frequency: 50.1,
+                pf: 0.95,
+                energy: 120.5,
+                power: 1.2,
+                created_at: yesterday
+              },
+              {
+                voltage: 231.2,
+                current: 5.3,
+                frequency: 50.0,
+                pf: 0.94,
+                energy: 121.0,
+                power: 1.25,
+                created_at: now
               }
-              
-              console.log('✅ Sample data inserted successfully');
-              
-              // Now try to run the original query again
-              console.log('🔄 Retrying original query with sample data...');
-              result = await client.query(
-                query,
-                [new Date(startDate), new Date(endDate)]
-              );
-              
-              if (result.rows.length > 0) {
-                console.log(`📊 Retry query returned ${result.rows.length} rows`);
-                // Continue with the report generation using retryResult
-                // Replace the original result with the retry result
-              } else {
-                // If still no data, return the original error
-                return res.status(404).json({
-                  success: false,
-                  message: 'No meter readings found in the database. Please ensure the meter is sending data.'
-                });
-              }
-            } catch (sampleDataError) {
-              console.error('❌ Error inserting sample data:', sampleDataError);
-              return res.status(404).json({
-                success: false,
-                message: 'No meter readings found in the database. Please ensure the meter is sending data.'
-              });
-            }
-          } else {
-            // Get date range of available readings
-            const rangeQuery = `
-              SELECT 
-                MIN(created_at) as earliest,
-                MAX(created_at) as latest
-              FROM meter_readings
-            `;
-            console.log('🔍 Checking available date range...');
-            const rangeResult = await client.query(rangeQuery);
-            const earliest = rangeResult.rows[0].earliest;
-            const latest = rangeResult.rows[0].latest;
-            
-            console.log(`📊 Available data range: ${new Date(earliest).toISOString()} to ${new Date(latest).toISOString()}`);
+            ];
             
-            // Check if the requested date range overlaps with available data
-            const requestedStart = new Date(startDate);
-            const requestedEnd = new Date(endDate);
-            const availableStart = new Date(earliest);
-            const availableEnd = new Date(latest);
-            
-            // If there's no overlap, suggest using the available range
-            if (requestedEnd < availableStart || requestedStart > availableEnd) {
-              return res.status(404).json({
-                success: false,
-                message: `No meter readings found in the specified date range. Available data ranges from ${new Date(earliest).toISOString()} to ${new Date(latest).toISOString()}.`,
-                availableRange: {
-                  earliest,
-                  latest
-                },
-                suggestedRange: {
-                  startDate: availableStart.toISOString(),
-                  endDate: availableEnd.toISOString()
-                }
-              });
+            for (const sample of sampleData) {
+              await client.query(
+                `INSERT INTO meter_readings (voltage, current, frequency, pf, energy, power, created_at) 
+                 VALUES ($1, $2, $3, $4, $5, $6, $7)`,
+                [sample.voltage, sample.current, sample.frequency, sample.pf, sample.energy, sample.power, sample.created_at]
+              );
             }
             
-            // If the requested range is partially outside the available range, suggest using the overlap
-            const overlapStart = requestedStart < availableStart ? availableStart : requestedStart;
-            const overlapEnd = requestedEnd > availableEnd ? availableEnd : requestedEnd;
-            
-            // Try to run the query with the overlapping date range
-            console.log(`🔄 Retrying query with adjusted date range: ${overlapStart.toISOString()} to ${overlapEnd.toISOString()}`);
-            result = await client.query(
-              query,
-              [overlapStart, overlapEnd]
-            );
-            
-            if (result.rows.length > 0) {
-              console.log(`📊 Retry query returned ${result.rows.length} rows`);
-              // Continue with the report generation using retryResult
-              // Replace the original result with the retry result
-            } else {
-              return res.status(404).json({
-                success: false,
-                message: `No meter readings found in the specified date range. Available data ranges from ${new Date(earliest).toISOString()} to ${new Date(latest).toISOString()}.`,
-                availableRange: {
-                  earliest,
-                  latest
-                },
-                suggestedRange: {
-                  startDate: availableStart.toISOString(),
-                  endDate: availableEnd.toISOString()
-                }
-              });
-            }
+            console.log('✅ Sample data inserted successfully');
+          } catch (sampleDataError) {
+            console.error('❌ Error inserting sample data:', sampleDataError);
           }
-        }
 
-        // Create Excel workbook
-        console.log('📊 Creating Excel workbook...');
-        const workbook = new ExcelJS.Workbook();
-        workbook.creator = 'Eagle Notifier';
-        workbook.lastModifiedBy = 'Eagle Notifier';
-        workbook.created = new Date();
-        workbook.modified = new Date();
-        
-        const worksheet = workbook.addWorksheet('Meter Readings');
-        
-        // Determine which columns to include based on parameters
-        const allColumns = [
-          { header: 'Meter ID', key: 'meter_id', width: 12 },
-          { header: 'Date & Time (IST)', key: 'timestamp', width: 22 },
-          { header: 'Voltage (V)', key: 'voltage', width: 12 },
-          { header: 'Current (A)', key: 'current', width: 12 },
-          { header: 'Frequency (Hz)', key: 'frequency', width: 15 },
-          { header: 'Power Factor', key: 'pf', width: 12 },
-          { header: 'Energy (kWh)', key: 'energy', width: 15 },
-          { header: 'Power (kW)', key: 'power', width: 12 }
-        ];
-        
-        // Filter columns based on parameters if provided
-        const columnsToInclude = parameters && parameters.length > 0
-          ? ['meter_id', 'timestamp', ...parameters]
-          : allColumns.map(col => col.key);
-        
-        console.log(`📊 Columns to include: ${columnsToInclude.join(', ')}`);
-        
-        const filteredColumns = allColumns.filter(col => 
-          columnsToInclude.includes(col.key)
-        );
-        
-        // Add columns to worksheet
-        worksheet.columns = filteredColumns;
-        
-        // Style header row
-        const headerRow = worksheet.getRow(1);
-        headerRow.font = { bold: true };
-        headerRow.fill = {
-          type: 'pattern',
-          pattern: 'solid',
-          fgColor: { argb: 'FFD3D3D3' }
-        };
-        
-        // Function to format date in IST timezone
-        const formatToIST = (date: Date): string => {
-          try {
-            // Since we're already getting the date in IST from the database
-            // just format it properly for display
-            const day = date.getDate().toString().padStart(2, '0');
-            const month = (date.getMonth() + 1).toString().padStart(2, '0');
-            const year = date.getFullYear();
-            
-            // Format the time components (12-hour format with AM/PM)
-            let hours = date.getHours();
-            const ampm = hours >= 12 ? 'PM' : 'AM';
-            hours = hours % 12;
-            hours = hours ? hours : 12; // Convert 0 to 12
-            
-            const minutes = date.getMinutes().toString().padStart(2, '0');
-            const seconds = date.getSeconds().toString().padStart(2, '0');
-            
-            return `${day}/${month}/${year} ${hours}:${minutes}:${seconds} ${ampm} IST`;
-          } catch (error) {
-            console.error('Error formatting date to IST:', error);
-            return date.toISOString();
-          }
-        };
-        
-        // Add data rows
-        console.log('📊 Adding data rows to worksheet...');
-        result.rows.forEach((reading, index) => {
-          if (index === 0) {
-            console.log(`📊 Sample row data: ${JSON.stringify(reading)}`);
-          }
-          
-          const timestamp = new Date(reading.created_at);
-          const rowData: any = {
-            meter_id: reading.meter_id,
-            timestamp: formatToIST(timestamp)
-          };
-          
-          // Only add columns that were requested
-          if (columnsToInclude.includes('voltage')) rowData.voltage = reading.voltage;
-          if (columnsToInclude.includes('current')) rowData.current = reading.current;
-          if (columnsToInclude.includes('frequency')) rowData.frequency = reading.frequency;
-          if (columnsToInclude.includes('pf')) rowData.pf = reading.pf;
-          if (columnsToInclude.includes('energy')) rowData.energy = reading.energy;
-          if (columnsToInclude.includes('power')) rowData.power = reading.power;
-          
-          worksheet.addRow(rowData);
-        });
-        
-        // Auto-fit columns
-        worksheet.columns.forEach(column => {
-          if (column && column.eachCell) {
-            let maxLength = column.header?.length || 10;
-            column.eachCell({ includeEmpty: true }, cell => {
-              const columnLength = cell.value ? cell.value.toString().length : 10;
-              if (columnLength > maxLength) {
-                maxLength = columnLength;
-              }
+          if (!(await hasReadings(queryStart, queryEnd))) {
+            return res.status(404).json({
+              success: false,
+              message: 'No meter readings found in the database. Please ensure the meter is sending data.'
             });
-            column.width = maxLength + 2;
           }
-        });
-
-        // Generate report buffer
-        console.log('📊 Generating Excel buffer...');
-        const buffer = await workbook.xlsx.writeBuffer();
-        console.log(`📊 Excel buffer generated, size: ${buffer.byteLength} bytes`);
-        
-        // Format filename
-        const reportTitle = title || 'Meter_Readings_Report';
-        const formattedStartDate = formatDate(new Date(startDate), 'yyyy-MM-dd');
-        const formattedEndDate = formatDate(new Date(endDate), 'yyyy-MM-dd');
-        const fileName = `${reportTitle}_${formattedStartDate}_to_${formattedEndDate}.xlsx`;
-        
-        // Save report to database
-        console.log('📊 Saving report to database...');
-        try {
-          const organizationId = getRequestOrgId(req);
-          const meterReport = await prisma.meterReport.create({
-            data: {
-              userId,
-              organizationId,
-              title: reportTitle,
-              format: 'excel',
-              fileContent: Buffer.from(buffer),
-              fileName,
-              fileSize: Buffer.from(buffer).byteLength,
-              startDate: new Date(startDate),
-              endDate: new Date(endDate),
-              parameters: parameters || ['voltage', 'current', 'frequency', 'pf', 'energy', 'power'],
-              metadata: {
-                rowCount: result.rows.length,
-                generatedAt: new Date().toISOString()
-              }
+        } else {
+          console.log(`📊 Available data range: ${new Date(earliest).toISOString()} to ${new Date(latest).toISOString()}`);
+          
+          const availableStart = new Date(earliest);
+          const availableEnd = new Date(latest);
+          const notFound = () => res.status(404).json({
+            success: false,
+            message: `No meter readings found in the specified date range. Available data ranges from ${availableStart.toISOString()} to ${availableEnd.toISOString()}.`,
+            availableRange: {
+              earliest,
+              latest
+            },
+            suggestedRange: {
+              startDate: availableStart.toISOString(),
+              endDate: availableEnd.toISOString()
             }
           });
           
-          console.log(`📊 Report generated successfully: ${meterReport.id}`);
+          // If there's no overlap, suggest using the available range
+          if (queryEnd < availableStart || queryStart > availableEnd) {
+            return notFound();
+          }
           
-          return res.status(201).json({
-            success: true,
-            message: 'Report generated successfully',
-            data: {
-              id: meterReport.id,
-              title: meterReport.title,
-              format: meterReport.format,
-              fileName: meterReport.fileName,
-              fileSize: meterReport.fileSize,
-              createdAt: meterReport.createdAt
-            }
-          });
-        } catch (dbError) {
-          console.error('❌ Error saving report to database:', dbError);
-          throw dbError;
+          // Otherwise narrow the query to the overlap
+          queryStart = queryStart < availableStart ? availableStart : queryStart;
+          queryEnd = queryEnd > availableEnd ? availableEnd : queryEnd;
+          console.log(`🔄 Using adjusted date range: ${queryStart.toISOString()} to ${queryEnd.toISOString()}`);
+          
+          if (!(await hasReadings(queryStart, queryEnd))) {
+            return notFound();
+          }
         }
-      } catch (queryError) {
-        console.error('❌ Error executing meter readings query:', queryError);
-        throw queryError;
       }
+
+      const reportRequest: MeterReportRequest = {
+        userId,
+        organizationId,
+        title,
+        startDate: new Date(startDate),
+        endDate: new Date(endDate),
+        query: { startDate: queryStart, endDate: queryEnd, parameters, sortOrder }
+      };
+
+      // Planner estimate decides whether the report is generated inline or as a job
+      const { sql, params } = buildMeterReportQuery(reportRequest.query);
+      const estimatedRows = await estimateRowCount(client, sql, params);
+      console.log(`📊 Estimated report rows: ${estimatedRows}`);
+
+      if (background === true || estimatedRows > BACKGROUND_ROW_THRESHOLD) {
+        releaseClient();
+        const job = createMeterReportJob(userId, organizationId, estimatedRows);
+        runMeterReportJob(job, reportRequest);
+        console.log(`📊 Meter report job ${job.id} queued (${estimatedRows} estimated rows)`);
+
+        res.setHeader('Location', `${req.baseUrl}/reports/jobs/${job.id}`);
+        return res.status(202).json({
+          success: true,
+          message: 'Report generation started',
+          data: {
+            jobId: job.id,
+            status: job.status,
+            progress: job.progress
+          }
+        });
+      }
+
+      const meterReport = await generateMeterReport(client, reportRequest);
+      console.log(`📊 Report generated successfully: ${meterReport.id}`);
+
+      return res.status(201).json({
+        success: true,
+        message: 'Report generated successfully',
+        data: {
+          id: meterReport.id,
+          title: meterReport.title,
+          format: meterReport.format,
+          fileName: meterReport.fileName,
+          fileSize: meterReport.fileSize,
+          createdAt: meterReport.createdAt
+        }
+      });
     } finally {
-      client.release();
-      console.log('🟡 Database client released');
+      releaseClient();
     }
   } catch (error) {
     const errorMessage = error instanceof Error ? error.message : 'Unknown error';
@@ -832,6 +724,43 @@ router.post('/reports', authenticate, asyncHandler(async (req: Request, res: Res
   }
 }));
 
+/**
+ * @route   GET /api/meter/reports/jobs/:jobId
+ * @desc    Status and progress of a background report job; `reportId` is set once completed
+ * @access  Private
+ */
+router.get('/reports/jobs/:jobId', authenticate, asyncHandler(async (req: Request, res: Response) => {
+  const userId = req.user?.id;
+
+  if (!userId) {
+    return res.status(401).json({
+      success: false,
+      message: 'User not authenticated'
+    });
+  }
+
+  const job = getMeterReportJob(req.params.jobId, userId, getRequestOrgId(req));
+  if (!job) {
+    return res.status(404).json({
+      success: false,
+      message: 'Report job not found'
+    });
+  }
+
+  return res.status(200).json({
+    success: true,
+    data: {
+      jobId: job.id,
+      status: job.status,
+      progress: job.progress,
+      reportId: job.reportId,
+      error: job.error,
+      createdAt: job.createdAt,
+      updatedAt: job.updatedAt
+    }
+  });
+}));
+
 /**
  * @route   GET /api/meter/reports
  * @desc    Get all meter reports for the current user
@@ -903,13 +832,13 @@ router.get('/reports/:id', authenticate, asyncHandler(async (req: Request, res:
 
   try {
     const organizationId = getRequestOrgId(req);
-    // Get the report including file content
     const report = await prisma.meterReport.findFirst({
       where: {
         id,
         userId, // Ensure the report belongs to the requesting user
         organizationId
-      }
+      },
+      select: { id: true, format: true, fileName: true, blobKey: true }
     });
 
     if (!report) {
@@ -929,14 +858,26 @@ router.get('/reports/:id', authenticate, asyncHandler(async (req: Request, res:
       contentType = 'application/octet-stream';
     }
 
-    // Set headers for file download
-    res.setHeader('Content-Type', contentType);
-    res.setHeader('Content-Disposition', `attachment; filename=${report.fileName}`);
-    res.setHeader('Content-Length', report.fileSize);
+    // Reports created before the blob store still carry their bytes in the row
+    const legacy = report.blobKey
+      ? null
+      : await prisma.meterReport.findUnique({ where: { id: report.id }, select: { fileContent: true } });
 
-    // Send the file content
-    return res.send(report.fileContent);
+    // Stream the file (supports Range requests)
+    const sent = await sendReportFile(req, res, { ...report, fileContent: legacy?.fileContent }, contentType);
+    if (!sent) {
+      return res.status(404).json({
+        success: false,
+        message: 'Report file not found'
+      });
+    }
   } catch (error) {
+    if (res.headersSent) {
+      // Failed mid-stream; the client sees a truncated download
+      logError('Error streaming meter report', error);
+      res.destroy();
+      return;
+    }
     logError('Error fetching meter report', error);
     return res.status(500).json({
       success: false,
@@ -1,9 +1,11 @@
 import { Router, Request, Response, NextFunction } from 'express';
-import { authenticate } from '../middleware/authMiddleware';
+import { authenticate, authorize } from '../middleware/authMiddleware';
 import { getRequestOrgId } from '../middleware/authMiddleware';
 import { Expo, ExpoPushMessage } from 'expo-server-sdk';
 import { NotificationService } from '../services/notificationService';
+import PushReceiptService from '../services/pushReceiptService';
 import prisma from '../config/db';
+import { decodeCursor, encodeCursor, estimateRowCount, parseCountMode } from '../utils/pagination';
 
 const router = Router();
 const expo = new Expo();
@@ -20,6 +22,25 @@ const asyncHandler = (fn: (req: Request, res: Response, next: NextFunction) => P
     }
   };
 
+// Planner estimate of the notifications matching the list filters (mirrors the Prisma where clause)
+const estimateNotificationCount = (userId: string, organizationId: string, filter: string, source?: string) => {
+  const conditions = ['"userId" = $1', '"organizationId" = $2'];
+  if (filter === 'unread') {
+    conditions.push('"isRead" = false');
+  }
+  if (source === 'Meter') {
+    conditions.push(`title LIKE '%Meter%'`);
+  } else if (source === 'Furnace') {
+    conditions.push(`title NOT LIKE '%Meter%'`);
+  }
+
+  return estimateRowCount(
+    { query: async (sql, params = []) => ({ rows: await prisma.$queryRawUnsafe<any[]>(sql, ...params) }) },
+    `SELECT 1 FROM "Notification" WHERE ${conditions.join(' AND ')}`,
+    [userId, organizationId]
+  );
+};
+
 // Get unread notifications count
 router.get('/unread-count', authenticate, asyncHandler(async (req, res) => {
   const userId = req.user?.id;
@@ -53,11 +74,19 @@ router.get('/', authenticate, asyncHandler(async (req, res) => {
   
   const page = parseInt(req.query.page as string) || 1;
   const limit = parseInt(req.query.limit as string) || 20;
-  const skip = (page - 1) * limit;
   const filter = req.query.filter as string || 'all';
   const source = req.query.source as string;
+  const cursor = (req.query.cursor as string) || undefined;
+  const position = decodeCursor(cursor);
+  const countMode = parseCountMode(req.query.count, !!cursor);
+  const organizationId = getRequestOrgId(req);
+  
+  if (cursor && !position) {
+    res.status(400).json({ message: 'Invalid cursor' });
+    return;
+  }
   
-  console.log(`🔍 Notifications request - Page: ${page}, Limit: ${limit}, Filter: ${filter}, Source: ${source}, UserId: ${userId}`);
+  console.log(`🔍 Notifications request - Page: ${page}, Limit: ${limit}, Filter: ${filter}, Source: ${source}, Cursor: ${cursor ? 'yes' : 'no'}, UserId: ${userId}`);
   
   // Debug query to check if there are any meter notifications for this user
   if (source === 'Meter') {
@@ -78,7 +107,7 @@ router.get('/', authenticate, asyncHandler(async (req, res) => {
   }
   
   // Build filter conditions
-  const where: any = { userId };
+  const where: any = { userId, organizationId };
   if (filter === 'unread') {
     where.isRead = false;
   }
@@ -94,23 +123,47 @@ router.get('/', authenticate, asyncHandler(async (req, res) => {
   
   console.log('🔍 Query where clause:', JSON.stringify(where));
   
-  // Get total count for pagination
-  const total = await prisma.notification.count({ where });
-  console.log(`📊 Total matching notifications: ${total}`);
-  
-  // Get notifications with pagination
-  const notifications = await prisma.notification.findMany({
-    where: { ...where, organizationId: getRequestOrgId(req) },
-    orderBy: { createdAt: 'desc' },
-    skip,
-    take: limit
+  // Get total count for pagination (skipped on follow-up pages unless requested)
+  let total: number | null = null;
+  if (countMode === 'exact') {
+    total = await prisma.notification.count({ where });
+  } else if (countMode === 'approximate') {
+    total = await estimateNotificationCount(userId, organizationId, filter, source);
+  }
+  console.log(`📊 Total matching notifications: ${total ?? 'not counted'}`);
+  
+  // Keyset pagination on (createdAt, id): continue after the cursor row instead of skipping
+  // over every earlier page; page numbers without a cursor fall back to skip
+  const pageWhere = position
+    ? {
+        AND: [
+          where,
+          {
+            OR: [
+              { createdAt: { lt: new Date(position.t) } },
+              { createdAt: new Date(position.t), id: { lt: String(position.id) } }
+            ]
+          }
+        ]
+      }
+    : where;
+  
+  // One extra row tells whether more pages exist
+  const rows = await prisma.notification.findMany({
+    where: pageWhere,
+    orderBy: [{ createdAt: 'desc' }, { id: 'desc' }],
+    ...(position ? {} : { skip: (page - 1) * limit }),
+    take: limit + 1
   });
   
-  console.log(`📬 Retrieved notifications: ${notifications.length}`);
+  const hasMore = rows.length > limit;
+  const notifications = rows.slice(0, limit);
+  const lastNotification = notifications[notifications.length - 1];
+  const nextCursor = hasMore && lastNotification
+    ? encodeCursor(lastNotification.createdAt, lastNotification.id)
+    : null;
   
-  // Calculate pagination info
-  const totalPages = Math.ceil(total / limit);
-  const hasMore = page < totalPages;
+  console.log(`📬 Retrieved notifications: ${notifications.length}`);
   
   res.status(200).json({
     notifications,
@@ -118,8 +171,9 @@ router.get('/', authenticate, asyncHandler(async (req, res) => {
       page,
       limit,
       total,
-      totalPages,
-      hasMore
+      totalPages: total !== null ? Math.ceil(total / limit) : null,
+      hasMore,
+      nextCursor
     }
   });
 }));
@@ -433,4 +487,15 @@ router.post('/send-test', authenticate, asyncHandler(async (req, res) => {
   }
 }));
 
+// Push delivery statistics for the current organization
+router.get('/delivery-stats', authenticate, authorize(['ADMIN', 'SUPER_ADMIN']), asyncHandler(async (req, res) => {
+  const organizationId = getRequestOrgId(req);
+  const pendingReceipts = await prisma.pushTicket.count({ where: { organizationId } });
+
+  res.status(200).json({
+    ...PushReceiptService.getDeliveryStats(organizationId),
+    pendingReceipts
+  });
+}));
+
 export default router; 
\ No newline at end of file
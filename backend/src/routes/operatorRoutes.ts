@@ -20,6 +20,8 @@ router.get('/dashboard', async (req: Request, res: Response, next: NextFunction)
     const activeAlarms = await prisma.alarm.findMany({
       where: {
         status: 'ACTIVE',
+        // Monitoring excursions that returned to normal are closed
+        clearedAt: null,
       },
       orderBy: {
         severity: 'desc',
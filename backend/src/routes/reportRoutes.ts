@@ -3,15 +3,37 @@ import { getClientWithRetry } from '../config/scadaDb';
 import { authenticate } from '../middleware/authMiddleware';
 import { getRequestOrgId } from '../middleware/authMiddleware';
 import prisma from '../config/db';
+import { FurnaceReportGrouping, generateFurnaceReport } from '../services/furnaceReportEngine';
+import { buildAlarmReportQuery } from '../services/alarmReportQuery';
+import { getOrgAlarmPlan } from '../services/scadaService';
+import { getBlobStore } from '../services/blobStore';
+import { sendReportFile } from '../utils/blobDownload';
+import { forEachCursorBatch } from '../utils/pgCursor';
+
+const DEBUG = process.env.NODE_ENV === 'development';
 
 const router: Router = express.Router();
 
+const NDJSON_CONTENT_TYPE = 'application/x-ndjson';
+
+// Rows pulled per FETCH while alarm data is streamed as NDJSON
+const NDJSON_FETCH_SIZE = Math.max(100, parseInt(process.env.ALARM_DATA_FETCH_SIZE || '1000'));
+
+const FURNACE_GROUPINGS: FurnaceReportGrouping[] = ['newest_first', 'oldest_first', 'by_type', 'by_zone'];
+
+// Repeated query parameters arrive as arrays, single ones as strings
+const toStringArray = (value: unknown): string[] =>
+  Array.isArray(value) ? value.map(String) : typeof value === 'string' && value ? [value] : [];
+
 // Apply authentication to all report routes
 router.use(authenticate);
 
 /**
  * @route   GET /api/reports/alarm-data
- * @desc    Get alarm data from jk2 table with filters
+ * @desc    Get alarm data from the organization's SCADA table with filters. Columns, thresholds and
+ *          severity come from the org's compiled alarm schema; type, zone and severity are filtered
+ *          in SQL. Send `Accept: application/x-ndjson` (or `?format=ndjson`) to stream every row of
+ *          a large range as newline-delimited JSON instead of a limited JSON page.
  * @access  Private
  */
 router.get('/alarm-data', function(req: Request, res: Response) {
@@ -22,7 +44,8 @@ router.get('/alarm-data', function(req: Request, res: Response) {
         endDate, 
         alarmTypes = [], 
         severityLevels = [], 
-        zones = [] 
+        zones = [],
+        orderBy
       } = req.query;
 
       // Validate date inputs
@@ -33,222 +56,79 @@ router.get('/alarm-data', function(req: Request, res: Response) {
         return res.status(400).json({ error: 'Invalid date format' });
       }
 
+      const organizationId = getRequestOrgId(req);
+      const plan = await getOrgAlarmPlan(organizationId);
+      const query = buildAlarmReportQuery(plan, {
+        startDate: parsedStartDate,
+        endDate: parsedEndDate,
+        alarmTypes: toStringArray(alarmTypes),
+        severityLevels: toStringArray(severityLevels),
+        zones: toStringArray(zones)
+      }, orderBy === 'asc' ? 'ASC' : 'DESC');
+
+      const streamNdjson = req.query.format === 'ndjson' || req.accepts(['application/json', NDJSON_CONTENT_TYPE]) === NDJSON_CONTENT_TYPE;
+
+      if (query.isEmpty) {
+        // The filters select no configured point
+        if (streamNdjson) {
+          res.setHeader('Content-Type', NDJSON_CONTENT_TYPE);
+          return res.end();
+        }
+        return res.json({ count: 0, data: [] });
+      }
+
       // Get a SCADA DB client
-      const client = await getClientWithRetry(getRequestOrgId(req));
+      const client = await getClientWithRetry(organizationId);
 
       try {
-        // Get setpoints to calculate thresholds
-        const setpoints = await prisma.setpoint.findMany();
-        const setpointMap = new Map<string, { lowDeviation: number; highDeviation: number }>();
-        
-        setpoints.forEach(sp => {
-          setpointMap.set(sp.scadaField, {
-            lowDeviation: sp.lowDeviation,
-            highDeviation: sp.highDeviation
-          });
-        });
+        if (streamNdjson) {
+          res.setHeader('Content-Type', NDJSON_CONTENT_TYPE);
+          res.setHeader('Cache-Control', 'no-store');
 
-        // Build the query to fetch all required fields
-        let query = `
-          SELECT 
-            id, 
-            created_timestamp,
-            -- Analog values (first 11 fields)
-            hz1sv, hz1pv,
-            hz2sv, hz2pv,
-            cpsv, cppv,
-            tz1sv, tz1pv,
-            tz2sv, tz2pv,
-            oilpv,
-            -- Binary status fields (fields 12-18+)
-            oiltemphigh, oillevelhigh, oillevellow,
-            hz1hfail, hz2hfail,
-            hardconfail, hardcontraip,
-            oilconfail, oilcontraip,
-            hz1fanfail, hz2fanfail,
-            hz1fantrip, hz2fantrip,
-            tempconfail, tempcontraip,
-            tz1fanfail, tz2fanfail,
-            tz1fantrip, tz2fantrip
-          FROM jk2
-          WHERE created_timestamp BETWEEN $1 AND $2
-        `;
-
-        const queryParams: (Date | number | string)[] = [parsedStartDate, parsedEndDate];
-        let paramIndex = 3;
-
-        // Add alarm type filters if provided
-        if (alarmTypes && Array.isArray(alarmTypes) && alarmTypes.length > 0) {
-          const alarmTypeConditions = [];
-          
-          for (const type of alarmTypes) {
-            switch(type) {
-              case 'temperature':
-                alarmTypeConditions.push(`
-                  (hz1pv IS NOT NULL OR hz2pv IS NOT NULL OR 
-                   tz1pv IS NOT NULL OR tz2pv IS NOT NULL)
-                `);
-                break;
-              case 'carbon':
-                alarmTypeConditions.push(`cppv IS NOT NULL`);
-                break;
-              case 'oil':
-                alarmTypeConditions.push(`
-                  (oilpv IS NOT NULL OR oiltemphigh = true OR 
-                   oillevelhigh = true OR oillevellow = true)
-                `);
-                break;
-              case 'fan':
-                alarmTypeConditions.push(`
-                  (hz1fanfail = true OR hz2fanfail = true OR 
-                   tz1fanfail = true OR tz2fanfail = true OR
-                   hz1fantrip = true OR hz2fantrip = true OR
-                   tz1fantrip = true OR tz2fantrip = true)
-                `);
-                break;
-              case 'conveyor':
-                alarmTypeConditions.push(`
-                  (hardconfail = true OR hardcontraip = true OR 
-                   oilconfail = true OR oilcontraip = true OR
-                   tempconfail = true OR tempcontraip = true)
-                `);
-                break;
-            }
-          }
-          
-          if (alarmTypeConditions.length > 0) {
-            query += ` AND (${alarmTypeConditions.join(' OR ')})`;
-          }
-        }
-        
-        // Add zone filters if provided
-        if (zones && Array.isArray(zones) && zones.length > 0) {
-          const zoneConditions = [];
-          
-          for (const zone of zones) {
-            switch(zone) {
-              case 'zone1':
-                zoneConditions.push(`
-                  (hz1pv IS NOT NULL OR hz1sv IS NOT NULL OR 
-                   tz1pv IS NOT NULL OR tz1sv IS NOT NULL OR
-                   hz1fanfail = true OR hz1fantrip = true OR
-                   tz1fanfail = true OR tz1fantrip = true)
-                `);
-                break;
-              case 'zone2':
-                zoneConditions.push(`
-                  (hz2pv IS NOT NULL OR hz2sv IS NOT NULL OR 
-                   tz2pv IS NOT NULL OR tz2sv IS NOT NULL OR
-                   hz2fanfail = true OR hz2fantrip = true OR
-                   tz2fanfail = true OR tz2fantrip = true)
-                `);
-                break;
-            }
-          }
-          
-          if (zoneConditions.length > 0) {
-            query += ` AND (${zoneConditions.join(' OR ')})`;
-          }
-        }
+          let closed = false;
+          res.on('close', () => { closed = true; });
 
-        // Add severity filters (we'll determine severity based on thresholds for analog values)
-        if (severityLevels && Array.isArray(severityLevels) && severityLevels.length > 0) {
-          const severityConditions = [];
-          
-          for (const severity of severityLevels) {
-            switch(severity) {
-              case 'critical':
-                severityConditions.push(`
-                  (hz1pv > hz1ht OR hz1pv < hz1lt OR
-                   hz2pv > hz2ht OR hz2pv < hz2lt OR
-                   tz1pv > tz1ht OR tz1pv < tz1lt OR
-                   tz2pv > tz2ht OR tz2pv < tz2lt OR
-                   cppv > cph OR cppv < cpl OR
-                   oiltemphigh = true OR
-                   hardconfail = true OR oilconfail = true OR tempconfail = true OR
-                   hz1fanfail = true OR hz2fanfail = true OR
-                   tz1fanfail = true OR tz2fanfail = true)
-                `);
-                break;
-              case 'warning':
-                // For warning, use thresholds closer to setpoints
-                severityConditions.push(`
-                  ((hz1pv > (hz1sv + (hz1ht - hz1sv) * 0.5) AND hz1pv <= hz1ht) OR
-                   (hz1pv < (hz1sv - (hz1sv - hz1lt) * 0.5) AND hz1pv >= hz1lt) OR
-                   (hz2pv > (hz2sv + (hz2ht - hz2sv) * 0.5) AND hz2pv <= hz2ht) OR
-                   (hz2pv < (hz2sv - (hz2sv - hz2lt) * 0.5) AND hz2pv >= hz2lt) OR
-                   (tz1pv > (tz1sv + (tz1ht - tz1sv) * 0.5) AND tz1pv <= tz1ht) OR
-                   (tz1pv < (tz1sv - (tz1sv - tz1lt) * 0.5) AND tz1pv >= tz1lt) OR
-                   (tz2pv > (tz2sv + (tz2ht - tz2sv) * 0.5) AND tz2pv <= tz2ht) OR
-                   (tz2pv < (tz2sv - (tz2sv - tz2lt) * 0.5) AND tz2pv >= tz2lt) OR
-                   (cppv > (cpsv + (cph - cpsv) * 0.5) AND cppv <= cph) OR
-                   (cppv < (cpsv - (cpsv - cpl) * 0.5) AND cppv >= cpl) OR
-                   oillevelhigh = true OR oillevellow = true OR
-                   hardcontraip = true OR oilcontraip = true OR tempcontraip = true OR
-                   hz1fantrip = true OR hz2fantrip = true OR
-                   tz1fantrip = true OR tz2fantrip = true)
-                `);
-                break;
+          const rowCount = await forEachCursorBatch(client, query.sql, query.params, NDJSON_FETCH_SIZE, async rows => {
+            // Stop reading from the database once the client has gone away
+            if (closed) throw new Error('Client closed the alarm data stream');
+            const chunk = rows.map(row => JSON.stringify(row)).join('\n') + '\n';
+            if (!res.write(chunk)) {
+              await new Promise<void>(resolve => {
+                res.once('drain', resolve);
+                res.once('close', resolve);
+              });
             }
-          }
-          
-          if (severityConditions.length > 0) {
-            query += ` AND (${severityConditions.join(' OR ')})`;
-          }
+          });
+          if (DEBUG) console.log(`📊 Streamed ${rowCount} alarm data rows as NDJSON`);
+          return res.end();
         }
-        
-        // Order by timestamp
-        query += ' ORDER BY created_timestamp DESC';
-        
+
+        let sql = query.sql;
+        const queryParams = [...query.params];
+
         // Add limit if needed
         const limit = req.query.limit ? parseInt(req.query.limit as string) : 1000;
         if (!isNaN(limit) && limit > 0) {
-          query += ` LIMIT $${paramIndex}`;
+          sql += ` LIMIT $${queryParams.length + 1}`;
           queryParams.push(limit);
         }
         
         // Execute the query
-        const result = await client.query(query, queryParams);
-        
-        // Add calculated threshold values to each row
-        const enrichedData = result.rows.map(row => {
-          const enrichedRow = { ...row };
-          
-          // Calculate thresholds for analog values based on setpoints
-          const addThresholds = (setValueField: string, presentValueField: string) => {
-            const setpoint = setpointMap.get(setValueField);
-            if (setpoint && row[setValueField] !== null && row[setValueField] !== undefined) {
-              const setValue = row[setValueField];
-              enrichedRow[`${presentValueField.replace('pv', 'ht')}`] = setValue + setpoint.highDeviation;
-              enrichedRow[`${presentValueField.replace('pv', 'lt')}`] = setValue + setpoint.lowDeviation;
-            }
-          };
-          
-          // Add thresholds for each analog field
-          addThresholds('hz1sv', 'hz1pv');
-          addThresholds('hz2sv', 'hz2pv');
-          const cpSetpoint = setpointMap.get('cpsv');
-          if (cpSetpoint && row.cpsv !== null && row.cpsv !== undefined) {
-            const cpSetValue = row.cpsv;
-            enrichedRow['cph'] = cpSetValue + cpSetpoint.highDeviation;
-            enrichedRow['cpl'] = cpSetValue + cpSetpoint.lowDeviation;
-          }
-          addThresholds('tz1sv', 'tz1pv');
-          addThresholds('tz2sv', 'tz2pv');
-          addThresholds('oilpv', 'oilpv'); // Special case for oil temperature
-          
-          return enrichedRow;
-        });
+        const result = await client.query(sql, queryParams);
         
         return res.json({
-          count: enrichedData.length,
-          data: enrichedData
+          count: result.rows.length,
+          data: result.rows
         });
       } finally {
         client.release();
       }
     } catch (error) {
       console.error('Error fetching alarm report data:', error);
+      if (res.headersSent) {
+        // Mid-stream failure: the client sees a truncated body instead of a JSON error
+        return res.destroy();
+      }
       return res.status(500).json({ error: 'Failed to retrieve alarm data' });
     }
   })();
@@ -326,9 +206,98 @@ router.get('/furnace', function(req: Request, res: Response) {
   })();
 });
 
+/**
+ * @route   POST /api/reports/furnace/generate
+ * @desc    Generate a furnace report (XLSX or PDF) on the server from the report filters and save it.
+ *          Alarm data is streamed from the SCADA database, so nothing passes through the device.
+ * @access  Private
+ */
+router.post('/furnace/generate', function(req: Request, res: Response) {
+  (async () => {
+    try {
+      const userId = (req as any).user?.id;
+      if (!userId) {
+        return res.status(401).json({ error: 'User not authenticated' });
+      }
+
+      const {
+        startDate,
+        endDate,
+        format = 'excel',
+        grouping = 'newest_first',
+        title,
+        includeThresholds,
+        includeStatusFields,
+        alarmTypes,
+        severityLevels,
+        zones
+      } = req.body;
+
+      const parsedStartDate = new Date(startDate);
+      const parsedEndDate = new Date(endDate);
+      if (!startDate || !endDate || isNaN(parsedStartDate.getTime()) || isNaN(parsedEndDate.getTime())) {
+        return res.status(400).json({ error: 'Valid startDate and endDate are required' });
+      }
+      if (parsedEndDate < parsedStartDate) {
+        return res.status(400).json({ error: 'End date must be after start date' });
+      }
+      if (format !== 'excel' && format !== 'pdf') {
+        return res.status(400).json({ error: `Unsupported format: ${format}` });
+      }
+      if (!FURNACE_GROUPINGS.includes(grouping)) {
+        return res.status(400).json({ error: `Unsupported grouping: ${grouping}` });
+      }
+
+      const organizationId = getRequestOrgId(req);
+      const plan = await getOrgAlarmPlan(organizationId);
+      const client = await getClientWithRetry(organizationId);
+
+      try {
+        const report = await generateFurnaceReport(client, userId, organizationId, plan, {
+          startDate: parsedStartDate,
+          endDate: parsedEndDate,
+          format,
+          grouping,
+          title,
+          includeThresholds: includeThresholds ?? true,
+          includeStatusFields: includeStatusFields ?? true,
+          alarmTypes: toStringArray(alarmTypes),
+          severityLevels: toStringArray(severityLevels),
+          zones: toStringArray(zones)
+        });
+
+        const recordCount = (report.metadata as any)?.recordCount ?? 0;
+        if (recordCount === 0) {
+          console.warn(`⚠️ Furnace report ${report.id} generated without data`);
+        }
+
+        return res.status(201).json({
+          id: report.id,
+          title: report.title,
+          format: report.format,
+          fileName: report.fileName,
+          fileSize: report.fileSize,
+          recordCount,
+          createdAt: report.createdAt,
+          message: 'Furnace report generated successfully'
+        });
+      } finally {
+        client.release();
+      }
+    } catch (error: any) {
+      console.error('Error generating furnace report:', error);
+      return res.status(500).json({
+        error: 'Failed to generate furnace report',
+        details: error.message
+      });
+    }
+  })();
+});
+
 /**
  * @route   POST /api/reports/furnace
- * @desc    Save a new furnace report
+ * @desc    Save a furnace report built on the device (base64 upload). Kept for older app
+ *          versions; new clients use POST /api/reports/furnace/generate
  * @access  Private
  */
 router.post('/furnace', function(req: Request, res: Response) {
@@ -364,9 +333,10 @@ router.post('/furnace', function(req: Request, res: Response) {
       console.log('File size:', fileSize);
       console.log('File content length:', fileContent?.length);
 
-      // Convert base64 to buffer
+      // Convert base64 to buffer and store it in the blob store
       const buffer = Buffer.from(fileContent, 'base64');
       console.log('Buffer size:', buffer.length);
+      const blob = await getBlobStore().put(buffer);
 
       console.log('Creating furnace report in database...');
       const organizationId = getRequestOrgId(req);
@@ -376,9 +346,9 @@ router.post('/furnace', function(req: Request, res: Response) {
           organizationId,
           title,
           format,
-          fileContent: buffer,
+          blobKey: blob.key,
           fileName,
-          fileSize,
+          fileSize: blob.size,
           startDate: new Date(startDate),
           endDate: new Date(endDate),
           grouping,
@@ -426,24 +396,38 @@ router.get('/furnace/:id', function(req: Request, res: Response) {
           id: reportId,
           userId,
           organizationId
-        }
+        },
+        select: { id: true, format: true, fileName: true, blobKey: true }
       });
 
       if (!report) {
         return res.status(404).json({ error: 'Report not found' });
       }
 
-      // Set appropriate headers for file download
-      res.setHeader('Content-Type', 
+      // Reports created before the blob store still carry their bytes in the row
+      const legacy = report.blobKey
+        ? null
+        : await prisma.furnaceReport.findUnique({ where: { id: report.id }, select: { fileContent: true } });
+
+      // Stream the file (supports Range requests)
+      const sent = await sendReportFile(
+        req,
+        res,
+        { ...report, fileContent: legacy?.fileContent },
         report.format === 'pdf' 
           ? 'application/pdf' 
           : 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
       );
-      res.setHeader('Content-Disposition', `attachment; filename="${report.fileName}"`);
-      res.setHeader('Content-Length', report.fileContent.length);
-
-      return res.send(report.fileContent);
+      if (!sent) {
+        return res.status(404).json({ error: 'Report file not found' });
+      }
     } catch (error) {
+      if (res.headersSent) {
+        // Failed mid-stream; the client sees a truncated download
+        console.error('Error streaming furnace report:', error);
+        res.destroy();
+        return;
+      }
       console.error('Error retrieving furnace report:', error);
       return res.status(500).json({ error: 'Failed to retrieve report' });
     }
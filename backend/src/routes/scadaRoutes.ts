@@ -1,12 +1,25 @@
 import { Router } from 'express';
-import { processAndFormatAlarms, getScadaAlarmHistory, getScadaAnalyticsData, SCADA_POLLING_INTERVAL, getLatestScadaData, getOrganizationSchemaConfig, getDynamicAlarmConfigs } from '../services/scadaService';
+import { processAndFormatAlarms, getScadaAlarmHistory, getScadaAnalyticsData, SCADA_POLLING_INTERVAL, getLatestScadaData, getOrganizationSchemaConfig, getOrgAlarmPlan, getScadaDataFreshness } from '../services/scadaService';
 import { authenticate, getRequestOrgId } from '../middleware/authMiddleware';
 import { checkScadaHealth } from '../config/scadaDb';
+import { getAlarmEventFilterError, getAlarmEvents } from '../services/alarmEventStore';
+import { sendAlarmSnapshot, subscribeToAlarmStream } from '../services/alarmStream';
+import { diffAlarmSnapshot } from '../services/alarmSnapshotHistory';
+import { decodeCursor, parseCountMode } from '../utils/pagination';
+import { MAX_ANALYTICS_WINDOW, parseAnalyticsWindow } from '../services/scadaDownsampling';
 
 const DEBUG = process.env.NODE_ENV === 'development';
 const router = Router();
 
-// Get latest SCADA alarms with improved error handling
+// Weak: cached and fresh responses of one version differ in bookkeeping fields (fromCache)
+const snapshotEtag = (version: string) => `W/"${version}"`;
+
+const matchesIfNoneMatch = (header: string | undefined, etag: string) =>
+  !!header && header.split(',').some(value => value.trim() === etag || value.trim() === '*');
+
+// Get latest SCADA alarms with improved error handling.
+// Responses carry the snapshot version as ETag (If-None-Match -> 304). With ?since=<version>
+// only the alarms that changed since that version are returned (plus removed point keys).
 router.get('/alarms', authenticate, async (req, res) => {
   try {
     if (DEBUG) console.log('📡 Fetching SCADA alarms...');
@@ -29,6 +42,29 @@ router.get('/alarms', authenticate, async (req, res) => {
       console.log(`SCADA polling interval: ${SCADA_POLLING_INTERVAL}ms`);
     }
 
+    // Disabled organizations get an empty, unversioned list
+    if (Array.isArray(alarms) || !alarms.version) {
+      res.json(alarms);
+      return;
+    }
+
+    const etag = snapshotEtag(alarms.version);
+    res.setHeader('ETag', etag);
+    res.setHeader('Cache-Control', 'private, no-cache');
+
+    if (matchesIfNoneMatch(req.headers['if-none-match'], etag)) {
+      res.status(304).end();
+      return;
+    }
+
+    const since = typeof req.query.since === 'string' ? req.query.since : undefined;
+    const delta = since ? diffAlarmSnapshot(getRequestOrgId(req), since, alarms) : null;
+    if (delta) {
+      const { analogAlarms: _analog, binaryAlarms: _binary, ...snapshotFields } = alarms;
+      res.json({ ...snapshotFields, ...delta, since, delta: true });
+      return;
+    }
+
     res.json(alarms);
   } catch (error) {
     console.error('🔴 Error fetching SCADA alarms:', error);
@@ -42,6 +78,24 @@ router.get('/alarms', authenticate, async (req, res) => {
   }
 });
 
+// Stream alarm snapshots as Server-Sent Events. Snapshots are pushed once per evaluation
+// (monitoring cycle), so open dashboards do not need to poll /alarms.
+router.get('/alarms/stream', authenticate, async (req, res) => {
+  const orgId = getRequestOrgId(req);
+  subscribeToAlarmStream(orgId, res);
+
+  try {
+    // Current state, so the client does not wait a full cycle for its first snapshot
+    const alarms = await processAndFormatAlarms(orgId);
+    if (!res.writableEnded && !Array.isArray(alarms)) {
+      sendAlarmSnapshot(orgId, res, alarms);
+    }
+  } catch (error) {
+    // The next monitoring cycle will publish a snapshot
+    console.error('🔴 Error sending initial alarm snapshot:', error);
+  }
+});
+
 // Get historical SCADA alarms with pagination, filtering, and sorting
 router.get('/history', authenticate, async (req, res) => {
   try {
@@ -57,6 +111,14 @@ router.get('/history', authenticate, async (req, res) => {
     const alarmId = (req.query.alarmId as string) || undefined;
     const startTime = req.query.startTime as string;
     const endTime = req.query.endTime as string;
+    const zone = (req.query.zone as string) || undefined;
+    const cursor = (req.query.cursor as string) || undefined;
+    const countMode = parseCountMode(req.query.count, !!cursor);
+
+    if (cursor && !decodeCursor(cursor)) {
+      res.status(400).json({ error: 'Invalid cursor' });
+      return;
+    }
     
     if (DEBUG) {
       console.log('📜 Fetching SCADA alarm history...');
@@ -79,7 +141,7 @@ router.get('/history', authenticate, async (req, res) => {
     }
     
     // Get historical alarms
-    const alarmHistory = await getScadaAlarmHistory(getRequestOrgId(req), page, limit, statusFilter, timeFilter, searchQuery, sortBy, sortOrder, alarmType, alarmId, startTime, endTime);
+    const alarmHistory = await getScadaAlarmHistory(getRequestOrgId(req), page, limit, statusFilter, timeFilter, searchQuery, sortBy, sortOrder, alarmType, alarmId, startTime, endTime, zone, cursor, countMode);
     
     if (DEBUG) {
       console.log('📊 History Response Stats:');
@@ -103,6 +165,46 @@ router.get('/history', authenticate, async (req, res) => {
   }
 });
 
+// Get alarm events materialized by the monitoring loop (one indexed query with count)
+router.get('/alarms/events', authenticate, async (req, res) => {
+  try {
+    const filters = {
+      status: (req.query.status as string) || undefined,
+      type: (req.query.type as string) || undefined,
+      zone: (req.query.zone as string) || undefined,
+      severity: (req.query.severity as string) || undefined,
+      from: req.query.startTime ? new Date(req.query.startTime as string) : undefined,
+      to: req.query.endTime ? new Date(req.query.endTime as string) : undefined
+    };
+
+    const filterError = getAlarmEventFilterError(filters) ||
+      ((filters.from && isNaN(filters.from.getTime())) || (filters.to && isNaN(filters.to.getTime()))
+        ? 'Invalid startTime or endTime'
+        : null);
+    if (filterError) {
+      res.status(400).json({ error: filterError });
+      return;
+    }
+
+    const events = await getAlarmEvents(getRequestOrgId(req), {
+      page: parseInt(req.query.page as string) || 1,
+      limit: parseInt(req.query.limit as string) || 20,
+      ...filters
+    });
+
+    res.json(events);
+  } catch (error) {
+    console.error('🔴 Error fetching alarm events:', error);
+    res.status(500).json({
+      error: 'Failed to fetch alarm events',
+      details: process.env.NODE_ENV === 'development' ? 
+        (error instanceof Error ? error.message : 'Unknown error') : undefined,
+      timestamp: new Date().toISOString(),
+      code: error instanceof Error ? error.name : 'UnknownError'
+    });
+  }
+});
+
 // Get SCADA analytics data for charts
 router.get('/analytics', authenticate, async (req, res) => {
   try {
@@ -110,14 +212,23 @@ router.get('/analytics', authenticate, async (req, res) => {
     
     // Parse query parameters
     const timeFilter = (req.query.timeFilter as string) || '20s'; // Default to 20 seconds
+    const mode = req.query.mode === 'lttb' ? 'lttb' : 'bucket'; // 'lttb' keeps peaks between chart points
+    const points = req.query.points ? parseInt(req.query.points as string) || undefined : undefined;
+
+    if (parseAnalyticsWindow(timeFilter) === null) {
+      res.status(400).json({
+        error: `Invalid timeFilter: ${timeFilter} (expected e.g. 20s, 2m, 24h or 7d, at most ${MAX_ANALYTICS_WINDOW / 1000}s)`
+      });
+      return;
+    }
     
     if (DEBUG) {
       console.log('🔍 Analytics Query Parameters:');
-      console.log(`Time Filter: ${timeFilter}`);
+      console.log(`Time Filter: ${timeFilter}, Mode: ${mode}, Points: ${points || 'default'}`);
     }
     
     // Get analytics data
-    const analyticsData = await getScadaAnalyticsData(getRequestOrgId(req), timeFilter);
+    const analyticsData = await getScadaAnalyticsData(getRequestOrgId(req), timeFilter, { mode, points });
     
     if (DEBUG) {
       console.log('📊 Analytics Response Stats:');
@@ -141,10 +252,12 @@ router.get('/analytics', authenticate, async (req, res) => {
 // Add health check endpoint with detailed diagnostics
 router.get('/health', authenticate, async (req, res) => {
   if (DEBUG) console.log('🏥 Checking SCADA health...');
-  const health = await checkScadaHealth(getRequestOrgId(req));
+  const orgId = getRequestOrgId(req);
+  const health = await checkScadaHealth(orgId);
   res.status(health.status === 'healthy' ? 200 : 503).json({
     ...health,
-    pollingInterval: SCADA_POLLING_INTERVAL
+    pollingInterval: SCADA_POLLING_INTERVAL,
+    snapshot: getScadaDataFreshness(orgId)
   });
 });
 
@@ -169,12 +282,12 @@ router.get('/config', authenticate, async (req, res) => {
       return;
     }
     
-    // Get dynamic alarm configurations
-    const { analogConfigs, binaryConfigs } = getDynamicAlarmConfigs(scadaData, schemaConfig);
+    // Get compiled alarm configurations
+    const plan = await getOrgAlarmPlan(orgId, schemaConfig);
     
     // Extract alarm descriptions for frontend use
     const alarmConfigs = {
-      analog: analogConfigs.map((config: any) => ({
+      analog: plan.analog.map(config => ({
         name: config.name,
         type: config.type,
         zone: config.zone,
@@ -182,7 +295,7 @@ router.get('/config', authenticate, async (req, res) => {
         pvField: config.pvField,
         svField: config.svField
       })),
-      binary: binaryConfigs.map((config: any) => ({
+      binary: plan.binary.map(config => ({
         name: config.name,
         type: config.type,
         zone: config.zone,
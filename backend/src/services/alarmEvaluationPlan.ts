@@ -0,0 +1,316 @@
+import { OrgSetpoint, setpointKey } from './orgContextCache';
+
+const DEBUG = process.env.NODE_ENV === 'development';
+
+// Column configuration as stored in Organization.schemaConfig.columnConfigs
+export interface ColumnConfig {
+  name: string;
+  type: string;
+  zone?: string;
+  unit?: string;
+  isAnalog?: boolean;
+  isBinary?: boolean;
+}
+
+export interface AlarmSchemaConfig {
+  columns: string[];
+  table?: string;
+  columnConfigs?: {
+    [columnName: string]: ColumnConfig;
+  };
+}
+
+export interface AnalogAlarmConfig {
+  name: string;
+  type: string;
+  zone?: string;
+  pvField: string;
+  svField: string; // Empty string when the point has no SV field (like oilpv)
+  unit?: string;
+}
+
+export interface BinaryAlarmConfig {
+  field: string;
+  name: string;
+  type: string;
+  zone?: string;
+}
+
+/**
+ * Analog alarm with its setpoint match and deviations resolved at compile time
+ */
+export interface AnalogPlanEntry extends AnalogAlarmConfig {
+  setpoint: OrgSetpoint | null;
+  lowDeviation: number;
+  highDeviation: number;
+}
+
+/**
+ * Immutable evaluation plan compiled from an organization's schema config and setpoints
+ */
+export interface AlarmEvaluationPlan {
+  orgId: string;
+  schemaHash: string;
+  table: string;
+  columns: readonly string[];
+  analog: readonly AnalogPlanEntry[];
+  binary: readonly BinaryAlarmConfig[];
+  compiledAt: number;
+}
+
+interface PlanCacheEntry {
+  plan: AlarmEvaluationPlan;
+  // Setpoint index the plan was compiled against; a reloaded org context yields a new index
+  setpointIndex: ReadonlyMap<string, OrgSetpoint>;
+}
+
+const planCache = new Map<string, PlanCacheEntry>();
+
+// Fallback patterns for organizations without columnConfigs (backward compatibility)
+const ANALOG_FALLBACK_PATTERNS = [
+  { pattern: /^hz1(sv|pv)$/, name: 'HARDENING ZONE 1 TEMPERATURE', type: 'temperature', zone: 'zone1', unit: '°C' },
+  { pattern: /^hz2(sv|pv)$/, name: 'HARDENING ZONE 2 TEMPERATURE', type: 'temperature', zone: 'zone2', unit: '°C' },
+  { pattern: /^cp(sv|pv)$/, name: 'CARBON POTENTIAL', type: 'carbon', zone: undefined, unit: '%' },
+  { pattern: /^tz1(sv|pv)$/, name: 'TEMPERING ZONE1 TEMPERATURE', type: 'temperature', zone: 'zone1', unit: '°C' },
+  { pattern: /^tz2(sv|pv)$/, name: 'TEMPERING ZONE2 TEMPERATURE', type: 'temperature', zone: 'zone2', unit: '°C' },
+  { pattern: /^oilpv$/, name: 'OIL TEMPERATURE', type: 'temperature', zone: undefined, unit: '°C' }
+];
+
+const BINARY_FALLBACK_PATTERNS = [
+  { pattern: 'oiltemphigh', name: 'OIL TEMPERATURE HIGH', type: 'temperature' },
+  { pattern: 'oillevelhigh', name: 'OIL LEVEL HIGH', type: 'level' },
+  { pattern: 'oillevellow', name: 'OIL LEVEL LOW', type: 'level' },
+  { pattern: 'hz1hfail', name: 'HARDENING ZONE 1 HEATER FAILURE', type: 'heater', zone: 'zone1' },
+  { pattern: 'hz2hfail', name: 'HARDENING ZONE 2 HEATER FAILURE', type: 'heater', zone: 'zone2' },
+  { pattern: 'hz1fanfail', name: 'HARDENING ZONE 1 FAN FAILURE', type: 'fan', zone: 'zone1' },
+  { pattern: 'hz2fanfail', name: 'HARDENING ZONE 2 FAN FAILURE', type: 'fan', zone: 'zone2' },
+  { pattern: 'tz1fanfail', name: 'TEMPERING ZONE 1 FAN FAILURE', type: 'fan', zone: 'zone1' },
+  { pattern: 'tz2fanfail', name: 'TEMPERING ZONE 2 FAN FAILURE', type: 'fan', zone: 'zone2' }
+];
+
+/**
+ * Default deviation for an analog alarm without a configured setpoint
+ */
+export const getDefaultDeviation = (type: string, name: string, isHigh: boolean = false): number => {
+  switch (type.toLowerCase()) {
+    case 'carbon':
+      return isHigh ? 0.05 : -0.05;
+    case 'temperature':
+      if (name.toLowerCase().includes('oil')) {
+        return isHigh ? 20 : 0; // Oil temperature specific defaults
+      }
+      return isHigh ? 10 : -10;
+    default:
+      return isHigh ? 10 : -10;
+  }
+};
+
+/**
+ * Derive analog (PV/SV pairs) and binary alarm configurations from a schema config.
+ * Pure function of the schema: every schema column is selected by the SCADA queries,
+ * so binary fields only need to be present in the column list.
+ */
+export const deriveAlarmConfigs = (schemaConfig: AlarmSchemaConfig) => {
+  const availableColumns = schemaConfig.columns;
+  const analogConfigs: AnalogAlarmConfig[] = [];
+  const binaryConfigs: BinaryAlarmConfig[] = [];
+
+  // If columnConfigs are provided, use them for dynamic configuration
+  if (schemaConfig.columnConfigs) {
+    for (const [columnName, config] of Object.entries(schemaConfig.columnConfigs)) {
+      if (!availableColumns.includes(columnName)) {
+        if (DEBUG) console.log(`  ⚠️ Column ${columnName} not found in available columns, skipping`);
+        continue;
+      }
+
+      if (config.isAnalog) {
+        // For analog fields, we need to find the corresponding SV/PV pair
+        const isPV = columnName.endsWith('pv');
+        const isSV = columnName.endsWith('sv');
+
+        if (isPV) {
+          // Find corresponding SV field
+          const svField = availableColumns.find(col =>
+            col.endsWith('sv') &&
+            col.replace('pv', 'sv') === columnName.replace('pv', 'sv')
+          );
+
+          analogConfigs.push({
+            name: config.name,
+            type: config.type,
+            zone: config.zone,
+            pvField: columnName,
+            svField: svField || '', // Empty string if no SV field
+            unit: config.unit
+          });
+        } else if (isSV) {
+          // Find corresponding PV field
+          const pvField = availableColumns.find(col =>
+            col.endsWith('pv') &&
+            col.replace('sv', 'pv') === columnName.replace('sv', 'pv')
+          );
+
+          if (pvField) {
+            analogConfigs.push({
+              name: config.name,
+              type: config.type,
+              zone: config.zone,
+              pvField,
+              svField: columnName,
+              unit: config.unit
+            });
+          } else if (DEBUG) {
+            console.log(`  ⚠️ No PV field found for SV column ${columnName}`);
+          }
+        } else {
+          // Single field analog (like oilpv)
+          analogConfigs.push({
+            name: config.name,
+            type: config.type,
+            zone: config.zone,
+            pvField: columnName,
+            svField: '', // No SV field
+            unit: config.unit
+          });
+        }
+      } else if (config.isBinary) {
+        binaryConfigs.push({
+          field: columnName,
+          name: config.name,
+          type: config.type,
+          zone: config.zone
+        });
+      } else if (DEBUG) {
+        console.log(`  ⚠️ Column ${columnName} is neither analog nor binary`);
+      }
+    }
+  } else {
+    if (DEBUG) console.log('⚠️ No columnConfigs found, using fallback patterns');
+
+    // Find matching analog fields
+    for (const pattern of ANALOG_FALLBACK_PATTERNS) {
+      const svField = availableColumns.find(col => pattern.pattern.test(col) && col.endsWith('sv'));
+      const pvField = availableColumns.find(col => pattern.pattern.test(col) && col.endsWith('pv'));
+
+      // For oilpv, we only have PV field, no SV field
+      if (pattern.name === 'OIL TEMPERATURE') {
+        if (pvField) {
+          analogConfigs.push({
+            name: pattern.name,
+            type: pattern.type,
+            zone: pattern.zone,
+            pvField,
+            svField: '', // Empty string to indicate no SV field
+            unit: pattern.unit
+          });
+        }
+      } else if (svField && pvField) {
+        // For other fields, require both SV and PV
+        analogConfigs.push({
+          name: pattern.name,
+          type: pattern.type,
+          zone: pattern.zone,
+          pvField,
+          svField,
+          unit: pattern.unit
+        });
+      }
+    }
+
+    // Find matching binary fields
+    for (const pattern of BINARY_FALLBACK_PATTERNS) {
+      if (availableColumns.includes(pattern.pattern)) {
+        binaryConfigs.push({
+          field: pattern.pattern,
+          name: pattern.name,
+          type: pattern.type,
+          zone: pattern.zone
+        });
+      }
+    }
+  }
+
+  return { analogConfigs, binaryConfigs };
+};
+
+// Find the configured setpoint for an analog alarm by name, type and zone
+const matchSetpoint = (config: AnalogAlarmConfig, setpointIndex: ReadonlyMap<string, OrgSetpoint>): OrgSetpoint | null => {
+  return setpointIndex.get(setpointKey(config.name, config.type, config.zone)) || null;
+};
+
+/**
+ * Compile a schema config and setpoint index into an evaluation plan
+ */
+export const compileAlarmEvaluationPlan = (
+  orgId: string,
+  schemaConfig: AlarmSchemaConfig,
+  schemaHash: string,
+  setpointIndex: ReadonlyMap<string, OrgSetpoint>
+): AlarmEvaluationPlan => {
+  const { analogConfigs, binaryConfigs } = deriveAlarmConfigs(schemaConfig);
+
+  const analog = analogConfigs.map(config => {
+    const setpoint = matchSetpoint(config, setpointIndex);
+    return Object.freeze({
+      ...config,
+      setpoint,
+      // Use setpoint config if available, otherwise use type-specific defaults
+      lowDeviation: setpoint?.lowDeviation ?? getDefaultDeviation(config.type, config.name),
+      highDeviation: setpoint?.highDeviation ?? getDefaultDeviation(config.type, config.name, true)
+    });
+  });
+
+  const plan: AlarmEvaluationPlan = Object.freeze({
+    orgId,
+    schemaHash,
+    table: schemaConfig.table || 'jk2',
+    columns: Object.freeze([...schemaConfig.columns]),
+    analog: Object.freeze(analog),
+    binary: Object.freeze(binaryConfigs.map(config => Object.freeze(config))),
+    compiledAt: Date.now()
+  });
+
+  if (DEBUG) {
+    console.log(`🧩 Compiled alarm evaluation plan for org ${orgId}: ${plan.analog.length} analog, ${plan.binary.length} binary`);
+    plan.analog.forEach(entry => {
+      console.log(`    - ${entry.name} (${entry.pvField}${entry.svField ? '/' + entry.svField : ''}) ` +
+        `deviations ${entry.lowDeviation}/+${entry.highDeviation}${entry.setpoint ? '' : ' (defaults)'}`);
+    });
+    plan.binary.forEach(entry => {
+      console.log(`    - ${entry.name} (${entry.field})`);
+    });
+  }
+
+  return plan;
+};
+
+/**
+ * Get the cached evaluation plan for an organization, recompiling only when the
+ * schema hash or the organization's setpoints have changed
+ */
+export const getAlarmEvaluationPlan = (
+  orgId: string,
+  schemaConfig: AlarmSchemaConfig,
+  schemaHash: string,
+  setpointIndex: ReadonlyMap<string, OrgSetpoint>
+): AlarmEvaluationPlan => {
+  const cached = planCache.get(orgId);
+  if (cached && cached.plan.schemaHash === schemaHash && cached.setpointIndex === setpointIndex) {
+    return cached.plan;
+  }
+
+  const plan = compileAlarmEvaluationPlan(orgId, schemaConfig, schemaHash, setpointIndex);
+  planCache.set(orgId, { plan, setpointIndex });
+  return plan;
+};
+
+/**
+ * Drop the compiled plan for one organization, or for all organizations when no ID is given
+ */
+export const invalidateAlarmEvaluationPlan = (orgId?: string): void => {
+  if (orgId) {
+    planCache.delete(orgId);
+  } else {
+    planCache.clear();
+  }
+};
@@ -0,0 +1,312 @@
+import prisma from '../config/db';
+import { AlarmSeverity, AlarmStatus, AlarmType, Zone } from '../generated/prisma-client';
+import { AlarmSeverityLevel } from './alarmStateMachine';
+
+const DEBUG = process.env.NODE_ENV === 'development';
+
+const ALARM_TYPES = new Set<string>(Object.values(AlarmType));
+const ALARM_STATUSES = new Set<string>(Object.values(AlarmStatus));
+const ALARM_SEVERITIES = new Set<string>(Object.values(AlarmSeverity));
+const ZONES = new Set<string>(Object.values(Zone));
+
+/**
+ * A state machine transition to be materialized into the Alarm / AlarmHistory tables
+ */
+export interface AlarmTransitionEvent {
+  pointKey: string;
+  transition: 'raised' | 'escalated' | 'deescalated' | 'cleared';
+  severity: AlarmSeverityLevel;
+  description: string;
+  type: string;
+  zone?: string;
+  value: string;
+  setPoint: string;
+  unit?: string;
+  lowLimit?: number | null;
+  highLimit?: number | null;
+  scadaRowId: string;
+  timestamp: Date;
+}
+
+/**
+ * Whether a state machine transition is recorded in the alarm tables ('persisted' and reminders are not)
+ */
+export const isMaterializedTransition = (
+  transition: string | null | undefined
+): transition is AlarmTransitionEvent['transition'] =>
+  transition === 'raised' || transition === 'escalated' || transition === 'deescalated' || transition === 'cleared';
+
+// Schema config types are free-form strings; anything the enum does not know is stored as OTHER
+const toAlarmType = (type: string): AlarmType => {
+  const normalized = type.toUpperCase();
+  return (ALARM_TYPES.has(normalized) ? normalized : 'OTHER') as AlarmType;
+};
+
+const toZone = (zone?: string): Zone | null => {
+  switch (zone?.toLowerCase()) {
+    case 'zone1':
+      return 'ZONE1';
+    case 'zone2':
+      return 'ZONE2';
+    default:
+      return null;
+  }
+};
+
+const toAlarmSeverity = (severity: AlarmSeverityLevel): AlarmSeverity => severity.toUpperCase() as AlarmSeverity;
+
+/**
+ * Materialize one cycle's transitions. A raise opens an Alarm row (id `${pointKey}-${scadaRowId}`,
+ * matching the id shown for that SCADA row), escalations update it and a clear closes it by
+ * setting clearedAt (status / resolvedAt stay with operators); every transition appends an
+ * AlarmHistory entry. Runs as a single transaction.
+ */
+export const recordAlarmTransitions = async (orgId: string, events: AlarmTransitionEvent[]): Promise<void> => {
+  if (events.length === 0) return;
+
+  const pointKeys = Array.from(new Set(events.map(event => event.pointKey)));
+  const openAlarms = await prisma.alarm.findMany({
+    where: { organizationId: orgId, pointKey: { in: pointKeys }, clearedAt: null },
+    select: { id: true, pointKey: true, status: true }
+  });
+  const openByPoint = new Map<string, { id: string; status: AlarmStatus }>(
+    openAlarms.map(alarm => [alarm.pointKey!, { id: alarm.id, status: alarm.status }])
+  );
+
+  const alarmRows: any[] = [];
+  const historyRows: any[] = [];
+  const updates = [];
+
+  for (const event of events) {
+    const open = openByPoint.get(event.pointKey);
+    const type = toAlarmType(event.type);
+    const severity = toAlarmSeverity(event.severity);
+
+    if (!open) {
+      // Nothing to close if the raise predates materialization
+      if (event.transition === 'cleared') continue;
+
+      const id = `${event.pointKey}-${event.scadaRowId}`;
+      alarmRows.push({
+        id,
+        description: event.description,
+        type,
+        zone: toZone(event.zone),
+        severity,
+        status: 'ACTIVE',
+        value: event.value,
+        setPoint: event.setPoint,
+        unit: event.unit ?? null,
+        lowLimit: event.lowLimit ?? null,
+        highLimit: event.highLimit ?? null,
+        timestamp: event.timestamp,
+        organizationId: orgId,
+        pointKey: event.pointKey,
+        scadaRowId: event.scadaRowId
+      });
+      historyRows.push({
+        alarmId: id,
+        description: event.description,
+        type,
+        severity,
+        status: 'ACTIVE',
+        value: event.value,
+        setPoint: event.setPoint,
+        timestamp: event.timestamp,
+        organizationId: orgId
+      });
+      openByPoint.set(event.pointKey, { id, status: 'ACTIVE' });
+      continue;
+    }
+
+    const cleared = event.transition === 'cleared';
+    updates.push(prisma.alarm.update({
+      where: { id: open.id },
+      data: cleared
+        ? { clearedAt: event.timestamp, value: event.value }
+        : {
+            severity,
+            value: event.value,
+            setPoint: event.setPoint,
+            lowLimit: event.lowLimit ?? null,
+            highLimit: event.highLimit ?? null
+          }
+    }));
+    historyRows.push({
+      alarmId: open.id,
+      description: event.description,
+      type,
+      severity,
+      status: open.status,
+      value: event.value,
+      setPoint: event.setPoint,
+      timestamp: event.timestamp,
+      organizationId: orgId
+    });
+    if (cleared) {
+      openByPoint.delete(event.pointKey);
+    }
+  }
+
+  await prisma.$transaction([
+    ...(alarmRows.length > 0 ? [prisma.alarm.createMany({ data: alarmRows, skipDuplicates: true })] : []),
+    ...updates,
+    ...(historyRows.length > 0 ? [prisma.alarmHistory.createMany({ data: historyRows })] : [])
+  ]);
+
+  if (DEBUG) {
+    console.log(`🗃️ Materialized ${events.length} alarm transition(s) for org ${orgId}: ${alarmRows.length} opened, ${updates.length} updated`);
+  }
+};
+
+/**
+ * Open (uncleared) monitoring alarms of an organization, used to restore state machine points
+ */
+export const loadOpenAlarmSeeds = async (orgId: string) => {
+  const openAlarms = await prisma.alarm.findMany({
+    where: { organizationId: orgId, pointKey: { not: null }, clearedAt: null },
+    select: { pointKey: true, severity: true, timestamp: true }
+  });
+
+  return openAlarms.map(alarm => ({
+    pointKey: alarm.pointKey!,
+    severity: alarm.severity.toLowerCase() as AlarmSeverityLevel,
+    raisedAt: alarm.timestamp.getTime()
+  }));
+};
+
+/**
+ * Load the alarms that give status to a page of SCADA history rows: materialized excursions
+ * overlapping the page's time range, plus legacy alarms stored under an exact row alarm id.
+ * Returns a resolver from (alarm id, point, row time) to the alarm record.
+ */
+export const getAlarmStatusResolver = async (
+  orgId: string,
+  alarmIds: string[],
+  from: Date,
+  to: Date
+) => {
+  const alarms = await prisma.alarm.findMany({
+    where: {
+      organizationId: orgId,
+      OR: [
+        { id: { in: alarmIds } },
+        {
+          pointKey: { not: null },
+          timestamp: { lte: to },
+          OR: [{ clearedAt: null }, { clearedAt: { gt: from } }]
+        }
+      ]
+    },
+    include: {
+      acknowledgedBy: {
+        select: { id: true, name: true, email: true }
+      },
+      resolvedBy: {
+        select: { id: true, name: true, email: true }
+      }
+    },
+    orderBy: { timestamp: 'asc' }
+  });
+
+  type AlarmRecord = (typeof alarms)[number];
+  const byId = new Map<string, AlarmRecord>(alarms.map(alarm => [alarm.id, alarm]));
+  const byPoint = new Map<string, AlarmRecord[]>();
+  for (const alarm of alarms) {
+    if (!alarm.pointKey) continue;
+    const list = byPoint.get(alarm.pointKey) || [];
+    list.push(alarm);
+    byPoint.set(alarm.pointKey, list);
+  }
+
+  return (alarmId: string, pointKey: string, rowTime: Date): AlarmRecord | undefined => {
+    const exact = byId.get(alarmId);
+    if (exact) return exact;
+
+    const time = rowTime.getTime();
+    return byPoint.get(pointKey)?.find(alarm =>
+      alarm.timestamp.getTime() <= time && (!alarm.clearedAt || time < alarm.clearedAt.getTime())
+    );
+  };
+};
+
+export type AlarmStatusRecord = NonNullable<ReturnType<Awaited<ReturnType<typeof getAlarmStatusResolver>>>>;
+
+/**
+ * Why alarm event filters cannot be applied (unknown status / zone / severity), or null when valid.
+ * Types are not checked: unknown types are stored as OTHER, so they filter as OTHER too.
+ */
+export const getAlarmEventFilterError = (filters: {
+  status?: string;
+  zone?: string;
+  severity?: string;
+}): string | null => {
+  if (filters.status && filters.status !== 'all' && !ALARM_STATUSES.has(filters.status.toUpperCase())) {
+    return `Invalid status: ${filters.status}`;
+  }
+  if (filters.zone && !ZONES.has(filters.zone.toUpperCase())) {
+    return `Invalid zone: ${filters.zone}`;
+  }
+  if (filters.severity && !ALARM_SEVERITIES.has(filters.severity.toUpperCase())) {
+    return `Invalid severity: ${filters.severity}`;
+  }
+  return null;
+};
+
+/**
+ * Page through materialized alarm events with status / type / zone / severity / time filters.
+ * Rows and count come from the (organizationId, status, timestamp) indexes in one transaction
+ * (two queries). Filters must pass getAlarmEventFilterError.
+ */
+export const getAlarmEvents = async (
+  orgId: string,
+  options: {
+    page?: number;
+    limit?: number;
+    status?: string;
+    type?: string;
+    zone?: string;
+    severity?: string;
+    from?: Date;
+    to?: Date;
+  } = {}
+) => {
+  const page = Math.max(1, options.page || 1);
+  const limit = Math.min(200, Math.max(1, options.limit || 20));
+
+  const where: any = { organizationId: orgId, pointKey: { not: null } };
+  if (options.status && options.status !== 'all') where.status = options.status.toUpperCase();
+  if (options.type) where.type = toAlarmType(options.type);
+  if (options.zone) where.zone = options.zone.toUpperCase();
+  if (options.severity) where.severity = options.severity.toUpperCase();
+  if (options.from || options.to) {
+    where.timestamp = {
+      ...(options.from && { gte: options.from }),
+      ...(options.to && { lte: options.to })
+    };
+  }
+
+  const [events, total] = await prisma.$transaction([
+    prisma.alarm.findMany({
+      where,
+      orderBy: [{ timestamp: 'desc' }, { id: 'desc' }],
+      skip: (page - 1) * limit,
+      take: limit,
+      include: {
+        acknowledgedBy: { select: { id: true, name: true, email: true } },
+        resolvedBy: { select: { id: true, name: true, email: true } }
+      }
+    }),
+    prisma.alarm.count({ where })
+  ]);
+
+  return {
+    events,
+    pagination: {
+      total,
+      page,
+      limit,
+      pages: Math.ceil(total / limit)
+    }
+  };
+};
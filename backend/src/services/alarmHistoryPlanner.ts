@@ -0,0 +1,219 @@
+import prisma from '../config/db';
+import { AlarmStatus } from '../generated/prisma-client';
+import { AlarmEvaluationPlan } from './alarmEvaluationPlan';
+import { searchAlarmPoints } from './alarmSearchIndex';
+
+const DEBUG = process.env.NODE_ENV === 'development';
+
+// SCADA column names are interpolated into SQL, so only plain identifiers are accepted
+const IDENTIFIER_PATTERN = /^[a-z_][a-z0-9_]*$/i;
+
+/**
+ * Alarm-level filters accepted by the SCADA history endpoint
+ */
+export interface AlarmHistoryFilters {
+  status?: string;
+  alarmType?: string;
+  zone?: string;
+  alarmId?: string;
+  search?: string;
+  from?: Date;
+  to?: Date;
+}
+
+/**
+ * Row-level SQL predicates for the organization's SCADA table
+ */
+export interface AlarmHistoryQueryPlan {
+  // True when no row can match (e.g. the type filter matches no configured point)
+  isEmpty: boolean;
+  conditions: string[];
+  params: any[];
+  // Point keys whose alarms survive the filters
+  pointKeys: string[];
+}
+
+interface PlannedPoint {
+  key: string;
+  type: string;
+  zone?: string;
+}
+
+export const isSafeIdentifier = (name: string): boolean => IDENTIFIER_PATTERN.test(name);
+
+// Resolve the points selected by type / zone / alarm id filters, plus an optional single row id
+const selectPoints = (plan: AlarmEvaluationPlan, filters: AlarmHistoryFilters) => {
+  let points: PlannedPoint[] = [
+    ...plan.analog.map(config => ({ key: config.pvField, type: config.type, zone: config.zone })),
+    ...plan.binary.map(config => ({ key: config.field, type: config.type, zone: config.zone }))
+  ].filter(point => isSafeIdentifier(point.key));
+
+  if (filters.alarmType) {
+    points = points.filter(point => point.type === filters.alarmType);
+  }
+  if (filters.zone) {
+    points = points.filter(point => point.zone === filters.zone);
+  }
+
+  let rowId: string | undefined;
+  if (filters.alarmId) {
+    const alarmId = filters.alarmId;
+    // Alarm ids are `${field}-${rowId}`; the detail screen passes just the field
+    const exact = points.filter(point => point.key === alarmId);
+    const withRow = points.filter(point => alarmId.startsWith(`${point.key}-`));
+    if (exact.length > 0) {
+      points = exact;
+    } else if (withRow.length > 0) {
+      points = withRow;
+      rowId = alarmId.slice(withRow[0].key.length + 1);
+    } else {
+      points = points.filter(point => `${point.key}-`.includes(alarmId) || point.key.includes(alarmId));
+    }
+  }
+
+  return { points, rowId };
+};
+
+/**
+ * Turn alarm-level filters into SQL predicates on the SCADA table so that every selected row
+ * yields at least one alarm and pages come back full.
+ *
+ * Status lives in the main database, so it is resolved first, with the same precedence as
+ * getAlarmStatusResolver: an alarm record stored under the exact row alarm id wins, otherwise the
+ * materialized excursion covering the row, otherwise ACTIVE. Exact records become per-point row
+ * id arrays and excursions per-point time ranges passed as timestamp arrays, so the rows selected
+ * here are exactly the rows whose resolved status matches.
+ *
+ * Search is resolved against the compiled schema (names, types, zones, fields) and narrows the
+ * selected points; a numeric query becomes an equality predicate on analog value columns.
+ */
+export const planAlarmHistoryQuery = async (
+  orgId: string,
+  plan: AlarmEvaluationPlan,
+  filters: AlarmHistoryFilters,
+  firstParamIndex: number
+): Promise<AlarmHistoryQueryPlan> => {
+  const selection = selectPoints(plan, filters);
+  let points = selection.points;
+  if (points.length === 0) {
+    return { isEmpty: true, conditions: [], params: [], pointKeys: [] };
+  }
+
+  const conditions: string[] = [];
+  const params: any[] = [];
+  const nextParam = (value: any) => {
+    params.push(value);
+    return `$${firstParamIndex + params.length - 1}`;
+  };
+
+  if (selection.rowId !== undefined) {
+    conditions.push(`id::text = ${nextParam(selection.rowId)}`);
+  }
+
+  if (filters.search?.trim()) {
+    const match = searchAlarmPoints(plan, filters.search, new Set(points.map(point => point.key)));
+    const valueColumns = match.valueColumns.filter(isSafeIdentifier);
+
+    if (match.pointKeys.length > 0) {
+      const matchedKeys = new Set(match.pointKeys);
+      points = points.filter(point => matchedKeys.has(point.key));
+    } else if (match.numericValue !== null && valueColumns.length > 0) {
+      const value = nextParam(match.numericValue);
+      conditions.push(`(${valueColumns.map(column => `${column} = ${value}::numeric`).join(' OR ')})`);
+    } else {
+      return { isEmpty: true, conditions: [], params: [], pointKeys: [] };
+    }
+
+    if (DEBUG) console.log(`🔎 History search "${filters.search}": ${match.pointKeys.length} point(s), value ${match.numericValue ?? 'n/a'}`);
+  }
+
+  const status = filters.status && filters.status !== 'all'
+    ? filters.status.toUpperCase() as AlarmStatus
+    : undefined;
+
+  // Excursions that give a point a non-default status, limited to the query's time window
+  const rangesByPoint = new Map<string, { starts: Date[]; ends: (Date | string)[] }>();
+  // Rows with an alarm record under their exact id (`${point}-${rowId}`): all of them, and those with the status
+  const recordedByPoint = new Map<string, { all: string[]; matching: string[] }>();
+  if (status) {
+    const keys = new Set(points.map(point => point.key));
+    const recorded = await prisma.alarm.findMany({
+      where: {
+        organizationId: orgId,
+        OR: points.map(point => ({ id: { startsWith: `${point.key}-` } }))
+      },
+      select: { id: true, status: true }
+    });
+
+    for (const record of recorded) {
+      const separator = record.id.lastIndexOf('-');
+      const key = record.id.slice(0, separator);
+      if (separator <= 0 || !keys.has(key)) continue;
+      const rows = recordedByPoint.get(key) || { all: [], matching: [] };
+      const rowId = record.id.slice(separator + 1);
+      rows.all.push(rowId);
+      if (record.status === status) rows.matching.push(rowId);
+      recordedByPoint.set(key, rows);
+    }
+
+    const excursions = await prisma.alarm.findMany({
+      where: {
+        organizationId: orgId,
+        pointKey: { in: points.map(point => point.key) },
+        status: status === 'ACTIVE' ? { not: 'ACTIVE' } : status,
+        ...(filters.to && { timestamp: { lte: filters.to } }),
+        ...(filters.from && { OR: [{ clearedAt: null }, { clearedAt: { gt: filters.from } }] })
+      },
+      select: { pointKey: true, timestamp: true, clearedAt: true }
+    });
+
+    for (const excursion of excursions) {
+      const ranges = rangesByPoint.get(excursion.pointKey!) || { starts: [], ends: [] };
+      ranges.starts.push(excursion.timestamp);
+      // Open excursions have no end yet
+      ranges.ends.push(excursion.clearedAt || 'infinity');
+      rangesByPoint.set(excursion.pointKey!, ranges);
+    }
+
+    if (DEBUG) console.log(`🧭 History planner: ${excursions.length} excursion(s) for status ${status}`);
+  }
+
+  const pointConditions: string[] = [];
+  for (const point of points) {
+    const hasValue = `${point.key} IS NOT NULL`;
+
+    if (!status) {
+      pointConditions.push(hasValue);
+      continue;
+    }
+
+    const ranges = rangesByPoint.get(point.key);
+    const inRanges = ranges
+      ? `EXISTS (SELECT 1 FROM unnest(${nextParam(ranges.starts)}::timestamp[], ${nextParam(ranges.ends)}::timestamp[]) AS r(starts_at, ends_at) ` +
+        `WHERE created_timestamp >= r.starts_at AND created_timestamp < r.ends_at)`
+      : null;
+
+    const recorded = recordedByPoint.get(point.key);
+    const inRows = (rowIds: string[]) => `id::text = ANY(${nextParam(rowIds)}::text[])`;
+    const isRecorded = recorded ? inRows(recorded.all) : null;
+    const isRecordedMatching = recorded && recorded.matching.length > 0 ? inRows(recorded.matching) : null;
+
+    // Status from excursions (or the ACTIVE default) only applies to rows without an exact record
+    const fromExcursions = status === 'ACTIVE'
+      ? [isRecorded && `NOT (${isRecorded})`, inRanges && `NOT ${inRanges}`].filter(Boolean).join(' AND ') || 'TRUE'
+      : inRanges && [isRecorded && `NOT (${isRecorded})`, inRanges].filter(Boolean).join(' AND ');
+
+    const matches = [isRecordedMatching, fromExcursions && `(${fromExcursions})`].filter(Boolean);
+    if (matches.length > 0) {
+      pointConditions.push(`(${hasValue} AND (${matches.join(' OR ')}))`);
+    }
+  }
+
+  if (pointConditions.length === 0) {
+    return { isEmpty: true, conditions: [], params: [], pointKeys: [] };
+  }
+
+  conditions.push(`(${pointConditions.join(' OR ')})`);
+
+  return { isEmpty: false, conditions, params, pointKeys: points.map(point => point.key) };
+};
@@ -0,0 +1,155 @@
+import { AlarmEvaluationPlan, AnalogPlanEntry, BinaryAlarmConfig } from './alarmEvaluationPlan';
+import { isSafeIdentifier } from './alarmHistoryPlanner';
+import { AlarmSeverityLevel, CRITICAL_OFFSET } from './alarmStateMachine';
+
+/**
+ * Filters accepted by the alarm report data endpoint and the furnace report engine
+ */
+export interface AlarmReportFilters {
+  startDate: Date;
+  endDate: Date;
+  alarmTypes?: string[];
+  severityLevels?: string[];
+  zones?: string[];
+}
+
+export interface AlarmReportQuery {
+  // True when the filters select no configured point
+  isEmpty: boolean;
+  sql: string;
+  params: any[];
+  // Every point of the schema; rows carry all of their columns
+  analog: readonly AnalogPlanEntry[];
+  binary: readonly BinaryAlarmConfig[];
+}
+
+const SEVERITY_LEVELS: AlarmSeverityLevel[] = ['info', 'warning', 'critical'];
+
+// Carbon potential thresholds keep the names of the jk2 columns they replaced
+const LEGACY_THRESHOLD_FIELDS: Record<string, { high: string; low: string }> = {
+  cppv: { high: 'cph', low: 'cpl' }
+};
+
+/**
+ * Names of the calculated high / low threshold fields of an analog point (hz1pv -> hz1ht / hz1lt)
+ */
+export const thresholdFields = (pvField: string): { high: string; low: string } => {
+  if (LEGACY_THRESHOLD_FIELDS[pvField]) return LEGACY_THRESHOLD_FIELDS[pvField];
+  const base = pvField.replace(/pv$/, '');
+  return { high: `${base}ht`, low: `${base}lt` };
+};
+
+/**
+ * Whether a point matches a report type filter: by its type, or by a word of its name. The app's
+ * legacy filters ('oil', 'conveyor') name equipment rather than a plan type, e.g. 'oil' selects
+ * OIL TEMPERATURE (a temperature point) and the OIL LEVEL switches.
+ */
+export const matchesAlarmTypeFilter = (config: { type: string; name: string }, filter: string): boolean => {
+  const value = filter.toLowerCase();
+  return config.type.toLowerCase() === value || config.name.toLowerCase().split(/[^a-z0-9]+/).includes(value);
+};
+
+/**
+ * Build the report data query for an organization's SCADA table from its compiled alarm plan.
+ *
+ * - Type / zone filters keep rows where a selected point has a value (analog) or is set (binary).
+ * - Thresholds are calculated in SQL from the org's setpoint deviations (SV falls back to PV, as in
+ *   live processing).
+ * - Severity is evaluated in SQL with the same bands as calculateAnalogSeverity over the selected
+ *   points, returned as a `severity` column and filtered on directly.
+ */
+export function buildAlarmReportQuery(
+  plan: AlarmEvaluationPlan,
+  filters: AlarmReportFilters,
+  direction: 'ASC' | 'DESC' = 'DESC'
+): AlarmReportQuery {
+  if (!isSafeIdentifier(plan.table)) {
+    throw new Error(`Invalid SCADA table name: ${plan.table}`);
+  }
+
+  const analog = plan.analog.filter(config =>
+    isSafeIdentifier(config.pvField) && (!config.svField || isSafeIdentifier(config.svField))
+  );
+  const binary = plan.binary.filter(config => isSafeIdentifier(config.field));
+
+  const { alarmTypes = [], zones = [] } = filters;
+  const severityLevels = (filters.severityLevels || [])
+    .filter((level): level is AlarmSeverityLevel => SEVERITY_LEVELS.includes(level as AlarmSeverityLevel));
+
+  const isSelected = (config: { type: string; name: string; zone?: string }) =>
+    (alarmTypes.length === 0 || alarmTypes.some(filter => matchesAlarmTypeFilter(config, filter))) &&
+    (zones.length === 0 || (!!config.zone && zones.includes(config.zone)));
+  const selectedAnalog = analog.filter(isSelected);
+  const selectedBinary = binary.filter(isSelected);
+
+  const params: any[] = [filters.startDate, filters.endDate];
+  const nextParam = (value: any) => {
+    params.push(value);
+    return `$${params.length}`;
+  };
+
+  if (selectedAnalog.length + selectedBinary.length === 0) {
+    return { isEmpty: true, sql: '', params, analog, binary };
+  }
+
+  // Threshold expressions per analog point, shared by the select list and the severity rank
+  const limits = new Map(analog.map(config => {
+    const setValue = config.svField ? `COALESCE(${config.svField}, ${config.pvField})` : config.pvField;
+    return [config.pvField, {
+      low: `(${setValue} + ${nextParam(config.lowDeviation)}::float8)`,
+      high: `(${setValue} + ${nextParam(config.highDeviation)}::float8)`
+    }];
+  }));
+
+  const criticalOffset = nextParam(CRITICAL_OFFSET);
+  const ranks = [
+    ...selectedAnalog.map(config => {
+      const { low, high } = limits.get(config.pvField)!;
+      const pv = config.pvField;
+      return `CASE WHEN ${pv} IS NULL THEN NULL ` +
+        `WHEN ${pv} < ${low} - ${criticalOffset}::float8 OR ${pv} > ${high} + ${criticalOffset}::float8 THEN 2 ` +
+        `WHEN ${pv} < ${low} OR ${pv} > ${high} THEN 1 ELSE 0 END`;
+    }),
+    ...selectedBinary.map(config => `CASE WHEN ${config.field} THEN 2 ELSE 0 END`)
+  ];
+
+  const columns = [
+    'id',
+    'created_timestamp',
+    ...analog.flatMap(config => {
+      const { low, high } = limits.get(config.pvField)!;
+      const names = thresholdFields(config.pvField);
+      return [
+        ...(config.svField ? [config.svField] : []),
+        config.pvField,
+        `${high}::float8 AS ${names.high}`,
+        `${low}::float8 AS ${names.low}`
+      ];
+    }),
+    ...binary.map(config => config.field),
+    `CASE GREATEST(${ranks.join(', ')}) WHEN 2 THEN 'critical' WHEN 1 THEN 'warning' ELSE 'info' END AS severity`
+  ];
+
+  const conditions = ['created_timestamp BETWEEN $1 AND $2'];
+  if (alarmTypes.length > 0 || zones.length > 0) {
+    const presence = [
+      ...selectedAnalog.map(config => `${config.pvField} IS NOT NULL`),
+      ...selectedBinary.map(config => `${config.field} = true`)
+    ];
+    conditions.push(`(${presence.join(' OR ')})`);
+  }
+
+  let sql = `
+    SELECT * FROM (
+      SELECT ${columns.join(',\n             ')}
+        FROM ${plan.table}
+       WHERE ${conditions.join(' AND ')}
+    ) report
+  `;
+  if (severityLevels.length > 0) {
+    sql += ` WHERE severity = ANY(${nextParam(severityLevels)}::text[])`;
+  }
+  sql += ` ORDER BY created_timestamp ${direction}`;
+
+  return { isEmpty: false, sql, params, analog, binary };
+}
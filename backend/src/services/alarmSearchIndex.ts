@@ -0,0 +1,103 @@
+import { AlarmEvaluationPlan } from './alarmEvaluationPlan';
+
+const DEBUG = process.env.NODE_ENV === 'development';
+
+/**
+ * Searchable alarm point from a compiled evaluation plan
+ */
+export interface SearchablePoint {
+  key: string;
+  name: string;
+  type: string;
+  zone?: string;
+  // Numeric value columns (PV and SV) of analog points
+  valueColumns: string[];
+  // Lowercased name, type, zone and field names
+  text: string;
+}
+
+/**
+ * Result of resolving a free-text history search against an organization's alarm points
+ */
+export interface AlarmSearchMatch {
+  // Points whose name / type / zone / field matches every search term
+  pointKeys: string[];
+  // Set when the query is a number and no point matched by text: match rows by value instead
+  numericValue: number | null;
+  valueColumns: string[];
+}
+
+// Index built once per compiled plan; plans are replaced (not mutated) when config changes
+const indexCache = new WeakMap<AlarmEvaluationPlan, SearchablePoint[]>();
+
+const buildSearchIndex = (plan: AlarmEvaluationPlan): SearchablePoint[] => {
+  const describe = (parts: (string | undefined)[]) => parts
+    .filter(Boolean)
+    .join(' ')
+    .toLowerCase()
+    // "zone1" is also searchable as "zone 1"
+    .replace(/zone(\d)/g, 'zone$1 zone $1');
+
+  const points: SearchablePoint[] = [
+    ...plan.analog.map(config => ({
+      key: config.pvField,
+      name: config.name,
+      type: config.type,
+      zone: config.zone,
+      valueColumns: [config.pvField, config.svField].filter(Boolean),
+      text: describe([config.name, config.type, config.zone, config.pvField, config.svField])
+    })),
+    ...plan.binary.map(config => ({
+      key: config.field,
+      name: config.name,
+      type: config.type,
+      zone: config.zone,
+      valueColumns: [],
+      text: describe([config.name, config.type, config.zone, config.field])
+    }))
+  ];
+
+  if (DEBUG) console.log(`🔎 Built alarm search index for org ${plan.orgId}: ${points.length} point(s)`);
+
+  return points;
+};
+
+/**
+ * Searchable points of a plan (cached for the lifetime of the plan)
+ */
+export const getSearchIndex = (plan: AlarmEvaluationPlan): SearchablePoint[] => {
+  let index = indexCache.get(plan);
+  if (!index) {
+    index = buildSearchIndex(plan);
+    indexCache.set(plan, index);
+  }
+  return index;
+};
+
+/**
+ * Resolve a history search against the compiled schema instead of scanning every column of
+ * every row: text matches select alarm points, numeric queries match analog values exactly.
+ * `scope` limits the search to points already selected by other filters.
+ */
+export const searchAlarmPoints = (
+  plan: AlarmEvaluationPlan,
+  query: string,
+  scope?: ReadonlySet<string>
+): AlarmSearchMatch => {
+  const index = scope
+    ? getSearchIndex(plan).filter(point => scope.has(point.key))
+    : getSearchIndex(plan);
+  const terms = query.toLowerCase().trim().split(/\s+/).filter(Boolean);
+
+  const matched = index.filter(point => terms.every(term => point.text.includes(term)));
+  if (matched.length > 0) {
+    return { pointKeys: matched.map(point => point.key), numericValue: null, valueColumns: [] };
+  }
+
+  const numericValue = terms.length === 1 && /^-?\d+(\.\d+)?$/.test(terms[0]) ? Number(terms[0]) : null;
+  return {
+    pointKeys: [],
+    numericValue,
+    valueColumns: numericValue !== null ? index.flatMap(point => point.valueColumns) : []
+  };
+};
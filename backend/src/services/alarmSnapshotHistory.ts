@@ -0,0 +1,127 @@
+import { createHash } from 'crypto';
+
+// Snapshot versions remembered per organization for `?since=` deltas
+const SNAPSHOT_HISTORY = Math.max(1, parseInt(process.env.ALARM_SNAPSHOT_HISTORY || '20'));
+
+// Maximum number of organizations whose snapshot history is kept in memory
+const MAX_HISTORY_ORGS = parseInt(process.env.ALARM_STATE_MAX_ORGS || '500');
+
+interface AlarmLike {
+  id: string;
+  timestamp?: string;
+  [key: string]: any;
+}
+
+export interface VersionedAlarmSnapshot {
+  version: string;
+  analogAlarms: AlarmLike[];
+  binaryAlarms: AlarmLike[];
+  [key: string]: any;
+}
+
+export interface AlarmSnapshotDelta {
+  analogAlarms: AlarmLike[];
+  binaryAlarms: AlarmLike[];
+  // Point keys that are no longer part of the snapshot
+  removed: string[];
+}
+
+interface SnapshotFingerprint {
+  version: string;
+  points: Map<string, string>;
+}
+
+// Map iteration order doubles as LRU order: the first key is the least recently used
+const histories = new Map<string, SnapshotFingerprint[]>();
+
+/**
+ * Stable key of an alarm point: the alarm id without its `-<scada row id>` suffix
+ */
+export const alarmPointKey = (alarm: AlarmLike): string => {
+  const separator = alarm.id.lastIndexOf('-');
+  return separator > 0 ? alarm.id.slice(0, separator) : alarm.id;
+};
+
+// Everything a client displays except the per-row id and timestamp
+const fingerprintAlarm = (alarm: AlarmLike): string => {
+  const { id: _id, timestamp: _timestamp, ...rest } = alarm;
+  return JSON.stringify(rest);
+};
+
+const fingerprintSnapshot = (snapshot: VersionedAlarmSnapshot): SnapshotFingerprint => {
+  const points = new Map<string, string>();
+  for (const alarm of [...snapshot.analogAlarms, ...snapshot.binaryAlarms]) {
+    points.set(alarmPointKey(alarm), fingerprintAlarm(alarm));
+  }
+  return { version: snapshot.version, points };
+};
+
+/**
+ * Version of an evaluated snapshot: the SCADA row it came from plus a hash of the schema and the
+ * evaluated content (setpoint edits and maintenance mode change alarms without a new row).
+ * Identical evaluations always get the same version.
+ */
+export const createSnapshotVersion = (
+  scadaRowId: string | number,
+  schemaHash: string,
+  snapshot: { analogAlarms: AlarmLike[]; binaryAlarms: AlarmLike[]; maintenanceMode?: boolean }
+): string => {
+  const hash = createHash('sha1')
+    .update(schemaHash)
+    .update(JSON.stringify([snapshot.analogAlarms, snapshot.binaryAlarms, !!snapshot.maintenanceMode]))
+    .digest('hex')
+    .slice(0, 12);
+  return `${scadaRowId}-${hash}`;
+};
+
+/**
+ * Remember a snapshot so later requests can ask for the changes since its version
+ */
+export const recordAlarmSnapshot = (orgId: string, snapshot: VersionedAlarmSnapshot): void => {
+  const history = histories.get(orgId) || [];
+  histories.delete(orgId);
+  histories.set(orgId, history);
+
+  if (history[history.length - 1]?.version === snapshot.version) return;
+
+  history.push(fingerprintSnapshot(snapshot));
+  if (history.length > SNAPSHOT_HISTORY) history.shift();
+
+  while (histories.size > MAX_HISTORY_ORGS) {
+    histories.delete(histories.keys().next().value as string);
+  }
+};
+
+/**
+ * Alarms that changed between a previously served version and the current snapshot, keyed by point.
+ * Unchanged points are left out even though their ids carry the new row id.
+ * Returns null when the version is unknown (too old or from before a restart); send the full snapshot then.
+ */
+export const diffAlarmSnapshot = (
+  orgId: string,
+  since: string,
+  snapshot: VersionedAlarmSnapshot
+): AlarmSnapshotDelta | null => {
+  const previous = histories.get(orgId)?.find(entry => entry.version === since);
+  if (!previous) return null;
+
+  const changed = (alarm: AlarmLike) => previous.points.get(alarmPointKey(alarm)) !== fingerprintAlarm(alarm);
+  const current = new Set([...snapshot.analogAlarms, ...snapshot.binaryAlarms].map(alarmPointKey));
+
+  return {
+    analogAlarms: snapshot.analogAlarms.filter(changed),
+    binaryAlarms: snapshot.binaryAlarms.filter(changed),
+    removed: Array.from(previous.points.keys()).filter(key => !current.has(key))
+  };
+};
+
+/**
+ * Forget snapshot history for one organization, or for all organizations when no ID is given
+ */
+export const clearAlarmSnapshotHistory = (orgId?: string): void => {
+  if (orgId) {
+    histories.delete(orgId);
+  } else {
+    histories.clear();
+  }
+};
@@ -0,0 +1,237 @@
+const DEBUG = process.env.NODE_ENV === 'development';
+
+// Consecutive new SCADA samples required before raising or escalating an alarm
+const RAISE_DEBOUNCE_SAMPLES = Math.max(1, parseInt(process.env.ALARM_RAISE_DEBOUNCE_SAMPLES || '1'));
+
+// Consecutive new SCADA samples required before clearing or de-escalating an alarm
+const CLEAR_DEBOUNCE_SAMPLES = Math.max(1, parseInt(process.env.ALARM_CLEAR_DEBOUNCE_SAMPLES || '2'));
+
+// Fraction of the deviation band an analog value must move back inside before its severity drops
+const HYSTERESIS_RATIO = Math.min(0.45, Math.max(0, parseFloat(process.env.ALARM_HYSTERESIS_RATIO || '0.1')));
+
+// Re-notify for alarms that stay active this long (0 disables reminders)
+const RENOTIFY_INTERVAL = parseInt(process.env.ALARM_RENOTIFY_INTERVAL_MS || '0');
+
+// Send a notification when an alarm returns to normal
+const NOTIFY_ON_CLEAR = process.env.ALARM_NOTIFY_ON_CLEAR !== 'false';
+
+export type AlarmSeverityLevel = 'critical' | 'warning' | 'info';
+
+export type AlarmTransition = 'raised' | 'escalated' | 'deescalated' | 'cleared' | 'persisted' | 'reminder';
+
+// Distance beyond the deviation band at which an analog warning becomes critical
+export const CRITICAL_OFFSET = 10;
+
+const SEVERITY_RANK: Record<AlarmSeverityLevel, number> = {
+  info: 0,
+  warning: 1,
+  critical: 2
+};
+
+/**
+ * State of a single alarm point (an analog PV field or a binary field) in one organization
+ */
+export interface AlarmPointState {
+  severity: AlarmSeverityLevel;
+  // Severity waiting to be confirmed by the debounce
+  candidate: AlarmSeverityLevel;
+  candidateCount: number;
+  raisedAt: number | null;
+  changedAt: number;
+  lastNotifiedAt: number | null;
+}
+
+export interface AlarmStepResult {
+  severity: AlarmSeverityLevel;
+  previousSeverity: AlarmSeverityLevel;
+  transition: AlarmTransition | null;
+  notify: boolean;
+  raisedAt: number | null;
+}
+
+const orgPoints = new Map<string, Map<string, AlarmPointState>>();
+
+// Calculate severity for analog values
+export const calculateAnalogSeverity = (value: number, setpoint: number, lowDeviation: number, highDeviation: number): AlarmSeverityLevel => {
+  const lowLimit = setpoint + lowDeviation; // lowDeviation is already negative
+  const highLimit = setpoint + highDeviation;
+  const warningOffset = CRITICAL_OFFSET;
+
+  // Critical: Beyond deviation band by >10 units
+  if (value < lowLimit - warningOffset || value > highLimit + warningOffset) {
+      return 'critical';
+  }
+
+  // Warning: Outside deviation band but within 10 units
+  // (setpoint + lowDeviation - 10) <= value < setpoint + lowDeviation
+  // OR
+  // setpoint + highDeviation < value <= (setpoint + highDeviation + 10)
+  if (value < lowLimit || value > highLimit) {
+      return 'warning';
+  }
+
+  // Info: Within deviation band
+  return 'info';
+};
+
+// Calculate severity for binary values
+export const calculateBinarySeverity = (isFailure: boolean): AlarmSeverityLevel => {
+  return isFailure ? 'critical' : 'info';
+};
+
+/**
+ * Analog severity with hysteresis: raising uses the configured band, but dropping below the
+ * current severity requires the value to be inside a band narrowed by HYSTERESIS_RATIO
+ */
+export const calculateAnalogSeverityWithHysteresis = (
+  current: AlarmSeverityLevel,
+  value: number,
+  setpoint: number,
+  lowDeviation: number,
+  highDeviation: number
+): AlarmSeverityLevel => {
+  const raw = calculateAnalogSeverity(value, setpoint, lowDeviation, highDeviation);
+  if (SEVERITY_RANK[raw] >= SEVERITY_RANK[current] || HYSTERESIS_RATIO === 0) {
+    return raw;
+  }
+
+  const margin = HYSTERESIS_RATIO * Math.abs(highDeviation - lowDeviation);
+  const held = calculateAnalogSeverity(value, setpoint, lowDeviation + margin, highDeviation - margin);
+  return SEVERITY_RANK[held] < SEVERITY_RANK[current] ? held : current;
+};
+
+/**
+ * Current confirmed severity of a point ('info' if it has never been seen)
+ */
+export const getAlarmPointSeverity = (orgId: string, pointKey: string): AlarmSeverityLevel => {
+  return orgPoints.get(orgId)?.get(pointKey)?.severity ?? 'info';
+};
+
+/**
+ * Feed one new sample's severity into a point's state machine.
+ * Only call once per new SCADA timestamp so the debounce counts samples, not refreshes.
+ */
+export const stepAlarmPoint = (
+  orgId: string,
+  pointKey: string,
+  observed: AlarmSeverityLevel,
+  now: number = Date.now()
+): AlarmStepResult => {
+  let points = orgPoints.get(orgId);
+  if (!points) {
+    points = new Map();
+    orgPoints.set(orgId, points);
+  }
+
+  let state = points.get(pointKey);
+  if (!state) {
+    state = { severity: 'info', candidate: 'info', candidateCount: 0, raisedAt: null, changedAt: now, lastNotifiedAt: null };
+    points.set(pointKey, state);
+  }
+
+  const previousSeverity = state.severity;
+  let transition: AlarmTransition | null = null;
+
+  if (observed === state.severity) {
+    state.candidate = observed;
+    state.candidateCount = 0;
+    if (state.severity !== 'info') {
+      const isReminderDue = RENOTIFY_INTERVAL > 0 && state.lastNotifiedAt !== null &&
+        now - state.lastNotifiedAt >= RENOTIFY_INTERVAL;
+      transition = isReminderDue ? 'reminder' : 'persisted';
+    }
+  } else {
+    if (observed === state.candidate) {
+      state.candidateCount++;
+    } else {
+      state.candidate = observed;
+      state.candidateCount = 1;
+    }
+
+    const isRising = SEVERITY_RANK[observed] > SEVERITY_RANK[state.severity];
+    const required = isRising ? RAISE_DEBOUNCE_SAMPLES : CLEAR_DEBOUNCE_SAMPLES;
+
+    if (state.candidateCount >= required) {
+      if (previousSeverity === 'info') {
+        transition = 'raised';
+        state.raisedAt = now;
+      } else if (observed === 'info') {
+        transition = 'cleared';
+        state.raisedAt = null;
+      } else {
+        transition = isRising ? 'escalated' : 'deescalated';
+      }
+
+      state.severity = observed;
+      state.candidateCount = 0;
+      state.changedAt = now;
+    } else if (state.severity !== 'info') {
+      transition = 'persisted';
+    }
+  }
+
+  const notify = transition === 'raised' || transition === 'escalated' || transition === 'reminder' ||
+    (transition === 'cleared' && NOTIFY_ON_CLEAR);
+  if (notify) {
+    state.lastNotifiedAt = now;
+  }
+
+  if (DEBUG && transition && transition !== 'persisted') {
+    console.log(`🚦 Alarm ${pointKey} (org ${orgId}): ${transition} ${previousSeverity} -> ${state.severity}`);
+  }
+
+  return { severity: state.severity, previousSeverity, transition, notify, raisedAt: state.raisedAt };
+};
+
+/**
+ * Whether an organization's point states are loaded (seeded or stepped at least once)
+ */
+export const hasAlarmPoints = (orgId: string): boolean => orgPoints.has(orgId);
+
+/**
+ * Restore point states for alarms that are still open, e.g. after a restart,
+ * so ongoing excursions are neither raised nor notified again
+ */
+export const seedAlarmPoints = (
+  orgId: string,
+  seeds: { pointKey: string; severity: AlarmSeverityLevel; raisedAt: number }[]
+): void => {
+  const points = new Map<string, AlarmPointState>();
+  for (const seed of seeds) {
+    points.set(seed.pointKey, {
+      severity: seed.severity,
+      candidate: seed.severity,
+      candidateCount: 0,
+      raisedAt: seed.raisedAt,
+      changedAt: seed.raisedAt,
+      lastNotifiedAt: seed.raisedAt
+    });
+  }
+  orgPoints.set(orgId, points);
+};
+
+/**
+ * Forget points that are no longer part of an organization's alarm plan
+ */
+export const pruneAlarmPoints = (orgId: string, activePointKeys: Iterable<string>): void => {
+  const points = orgPoints.get(orgId);
+  if (!points) return;
+
+  const keep = new Set(activePointKeys);
+  for (const pointKey of Array.from(points.keys())) {
+    if (!keep.has(pointKey)) {
+      points.delete(pointKey);
+    }
+  }
+};
+
+/**
+ * Reset alarm point states for one organization, or for all organizations when no ID is given
+ */
+export const clearAlarmPoints = (orgId?: string): void => {
+  if (orgId) {
+    orgPoints.delete(orgId);
+  } else {
+    orgPoints.clear();
+  }
+};
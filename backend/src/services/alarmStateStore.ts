@@ -0,0 +1,70 @@
+const DEBUG = process.env.NODE_ENV === 'development';
+
+// Maximum number of organizations whose processed alarm state is kept in memory
+const MAX_ALARM_STATE_ENTRIES = parseInt(process.env.ALARM_STATE_MAX_ORGS || '500');
+
+/**
+ * Last alarm processing result for a single organization
+ */
+export interface OrgAlarmState {
+  orgId: string;
+  lastProcessedTimestamp: string | null;
+  schemaHash: string | null;
+  schemaColumnCount: number;
+  schemaColumnConfigCount: number;
+  result: any | null;
+  updatedAt: number;
+}
+
+// Map iteration order doubles as LRU order: the first key is the least recently used
+const alarmStates = new Map<string, OrgAlarmState>();
+
+/**
+ * Get the processed alarm state for an organization and mark it as recently used
+ */
+export const getOrgAlarmState = (orgId: string): OrgAlarmState | undefined => {
+  const state = alarmStates.get(orgId);
+  if (state) {
+    alarmStates.delete(orgId);
+    alarmStates.set(orgId, state);
+  }
+  return state;
+};
+
+/**
+ * Save the processed alarm state for an organization, evicting the least recently used
+ * organizations once the store is full
+ */
+export const saveOrgAlarmState = (
+  orgId: string,
+  state: Omit<OrgAlarmState, 'orgId' | 'updatedAt'>
+): OrgAlarmState => {
+  const entry: OrgAlarmState = { ...state, orgId, updatedAt: Date.now() };
+
+  alarmStates.delete(orgId);
+  alarmStates.set(orgId, entry);
+
+  while (alarmStates.size > MAX_ALARM_STATE_ENTRIES) {
+    const oldestOrgId = alarmStates.keys().next().value as string;
+    alarmStates.delete(oldestOrgId);
+    if (DEBUG) console.log(`🧹 Evicted alarm state for org ${oldestOrgId} (limit ${MAX_ALARM_STATE_ENTRIES})`);
+  }
+
+  return entry;
+};
+
+/**
+ * Forget the processed alarm state for one organization, or for all organizations when no ID is given
+ */
+export const clearOrgAlarmState = (orgId?: string): void => {
+  if (orgId) {
+    alarmStates.delete(orgId);
+  } else {
+    alarmStates.clear();
+  }
+};
+
+/**
+ * Number of organizations currently tracked (used for diagnostics)
+ */
+export const getAlarmStateSize = (): number => alarmStates.size;
@@ -0,0 +1,145 @@
+import { Response } from 'express';
+
+const DEBUG = process.env.NODE_ENV === 'development';
+
+// Comment frames keep idle connections open through proxies and load balancers (default: 25 seconds)
+const HEARTBEAT_INTERVAL = parseInt(process.env.ALARM_STREAM_HEARTBEAT_MS || '25000');
+
+// Reconnect delay suggested to EventSource-style clients
+const RECONNECT_DELAY = 5000;
+
+interface AlarmStreamSubscriber {
+  orgId: string;
+  res: Response;
+  connectedAt: number;
+}
+
+// Subscribers per organization
+const subscribers = new Map<string, Set<AlarmStreamSubscriber>>();
+
+// Incrementing event id per organization (sent as the SSE `id:` field)
+const eventIds = new Map<string, number>();
+
+let heartbeatId: NodeJS.Timeout | null = null;
+
+const countSubscribers = () => {
+  let total = 0;
+  for (const set of subscribers.values()) total += set.size;
+  return total;
+};
+
+const stopHeartbeatIfIdle = () => {
+  if (heartbeatId && countSubscribers() === 0) {
+    clearInterval(heartbeatId);
+    heartbeatId = null;
+  }
+};
+
+const removeSubscriber = (subscriber: AlarmStreamSubscriber) => {
+  const current = subscribers.get(subscriber.orgId);
+  if (!current || !current.delete(subscriber)) return;
+  if (current.size === 0) subscribers.delete(subscriber.orgId);
+  stopHeartbeatIfIdle();
+  if (DEBUG) console.log(`📡 Alarm stream subscriber removed for org ${subscriber.orgId}`);
+};
+
+// Write to a stream that may already be gone: a finished or destroyed response is skipped,
+// and a write that throws drops the subscriber instead of breaking the broadcast loop
+const safeWrite = (res: Response, chunk: string, subscriber?: AlarmStreamSubscriber): boolean => {
+  if (res.writableEnded || res.destroyed) {
+    if (subscriber) removeSubscriber(subscriber);
+    return false;
+  }
+  try {
+    res.write(chunk);
+    return true;
+  } catch (error) {
+    if (DEBUG) console.log('📡 Alarm stream write failed:', error instanceof Error ? error.message : error);
+    if (subscriber) removeSubscriber(subscriber);
+    return false;
+  }
+};
+
+const writeEvent = (res: Response, event: string, data: unknown, id?: number) => {
+  safeWrite(res, `${id !== undefined ? `id: ${id}\n` : ''}event: ${event}\ndata: ${JSON.stringify(data)}\n\n`);
+};
+
+const startHeartbeat = () => {
+  if (heartbeatId) return;
+  heartbeatId = setInterval(() => {
+    for (const set of subscribers.values()) {
+      // Copy: a failed write removes the subscriber from the set being iterated
+      for (const subscriber of [...set]) safeWrite(subscriber.res, ': ping\n\n', subscriber);
+    }
+  }, HEARTBEAT_INTERVAL);
+  // Never keep the process alive just for heartbeats
+  heartbeatId.unref();
+};
+
+/**
+ * Turn a response into a Server-Sent Events stream of an organization's alarm snapshots.
+ * The subscriber is removed when the client disconnects or the response errors.
+ */
+export function subscribeToAlarmStream(orgId: string, res: Response): void {
+  res.status(200);
+  res.setHeader('Content-Type', 'text/event-stream');
+  res.setHeader('Cache-Control', 'no-cache, no-transform');
+  res.setHeader('Connection', 'keep-alive');
+  // Disable response buffering in nginx
+  res.setHeader('X-Accel-Buffering', 'no');
+  res.flushHeaders();
+  safeWrite(res, `retry: ${RECONNECT_DELAY}\n\n`);
+
+  const subscriber: AlarmStreamSubscriber = { orgId, res, connectedAt: Date.now() };
+  let set = subscribers.get(orgId);
+  if (!set) {
+    set = new Set();
+    subscribers.set(orgId, set);
+  }
+  set.add(subscriber);
+  startHeartbeat();
+
+  if (DEBUG) console.log(`📡 Alarm stream subscriber added for org ${orgId} (${set.size} connected)`);
+
+  res.on('close', () => removeSubscriber(subscriber));
+  // Without a listener a socket error (e.g. EPIPE on a half-closed connection) would be thrown
+  res.on('error', (error) => {
+    if (DEBUG) console.log(`📡 Alarm stream error for org ${orgId}:`, error.message);
+    removeSubscriber(subscriber);
+  });
+}
+
+/**
+ * Send a snapshot to a single subscriber (used for the initial state on connect)
+ */
+export function sendAlarmSnapshot(orgId: string, res: Response, snapshot: unknown): void {
+  writeEvent(res, 'alarms', snapshot, eventIds.get(orgId));
+}
+
+/**
+ * Broadcast a freshly evaluated alarm snapshot to every subscriber of the organization.
+ * Cheap when nobody is listening.
+ */
+export function publishAlarmSnapshot(orgId: string, snapshot: unknown): void {
+  const set = subscribers.get(orgId);
+  const id = (eventIds.get(orgId) || 0) + 1;
+  eventIds.set(orgId, id);
+  if (!set || set.size === 0) return;
+
+  // Serialize once for all subscribers
+  const frame = `id: ${id}\nevent: alarms\ndata: ${JSON.stringify(snapshot)}\n\n`;
+  for (const subscriber of [...set]) {
+    safeWrite(subscriber.res, frame, subscriber);
+  }
+
+  if (DEBUG) console.log(`📡 Published alarm snapshot ${id} for org ${orgId} to ${set.size} subscriber(s)`);
+}
+
+/**
+ * Number of connected alarm stream clients, per organization
+ */
+export function getAlarmStreamStats(): { total: number; organizations: Record<string, number> } {
+  const organizations: Record<string, number> = {};
+  for (const [orgId, set] of subscribers) organizations[orgId] = set.size;
+  return { total: countSubscribers(), organizations };
+}
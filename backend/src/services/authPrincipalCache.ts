@@ -0,0 +1,94 @@
+const DEBUG = process.env.NODE_ENV === 'development';
+
+// How long a verified token -> principal mapping is trusted (default: 30 seconds).
+// Admin user changes invalidate explicitly; the TTL bounds staleness from out-of-band edits.
+const AUTH_CACHE_TTL = parseInt(process.env.AUTH_CACHE_TTL_MS || '30000');
+
+// Maximum number of cached tokens
+const AUTH_CACHE_MAX_ENTRIES = parseInt(process.env.AUTH_CACHE_MAX_ENTRIES || '10000');
+
+/**
+ * The user attached to authenticated requests
+ */
+export interface AuthPrincipal {
+  id: string;
+  email: string;
+  role: string;
+  organizationId: string | null;
+}
+
+interface CachedPrincipal {
+  principal: AuthPrincipal;
+  expiresAt: number;
+}
+
+// Map iteration order doubles as LRU order: the first key is the least recently used
+const principals = new Map<string, CachedPrincipal>();
+
+// Bumped on every invalidation so a lookup that started before a write never repopulates the cache
+let generation = 0;
+
+export const getAuthGeneration = (): number => generation;
+
+/**
+ * Get the cached principal for a verified token and mark it as recently used
+ */
+export const getCachedPrincipal = (token: string): AuthPrincipal | undefined => {
+  const entry = principals.get(token);
+  if (!entry) return undefined;
+
+  principals.delete(token);
+  if (entry.expiresAt <= Date.now()) return undefined;
+
+  principals.set(token, entry);
+  return entry.principal;
+};
+
+/**
+ * Cache the principal of a verified token. The entry never outlives the token itself.
+ * @param tokenExpiresAt - The token's `exp` claim in milliseconds, if any
+ * @param lookupGeneration - getAuthGeneration() taken before the user was loaded
+ */
+export const cachePrincipal = (
+  token: string,
+  principal: AuthPrincipal,
+  tokenExpiresAt: number | undefined,
+  lookupGeneration: number
+): void => {
+  if (AUTH_CACHE_TTL <= 0 || lookupGeneration !== generation) return;
+
+  const expiresAt = Math.min(Date.now() + AUTH_CACHE_TTL, tokenExpiresAt ?? Infinity);
+  principals.delete(token);
+  principals.set(token, { principal, expiresAt });
+
+  while (principals.size > AUTH_CACHE_MAX_ENTRIES) {
+    principals.delete(principals.keys().next().value as string);
+  }
+};
+
+/**
+ * Forget every cached token of a user (after an update, role change or delete)
+ */
+export const invalidateUserPrincipals = (userId: string): void => {
+  generation++;
+  let removed = 0;
+  for (const [token, entry] of principals) {
+    if (entry.principal.id === userId) {
+      principals.delete(token);
+      removed++;
+    }
+  }
+  if (DEBUG && removed > 0) console.log(`🔐 Invalidated ${removed} cached token(s) for user ${userId}`);
+};
+
+/**
+ * Forget every cached token of an organization's users (after the organization is deleted)
+ */
+export const invalidateOrganizationPrincipals = (organizationId: string): void => {
+  generation++;
+  for (const [token, entry] of principals) {
+    if (entry.principal.organizationId === organizationId) {
+      principals.delete(token);
+    }
+  }
+};
@@ -1,12 +1,25 @@
-import { processAndFormatAlarms } from './scadaService';
+import { processAndFormatAlarms, SCADA_POLLING_INTERVAL } from './scadaService';
+import { getOrgContext } from './orgContextCache';
 import prisma from '../config/db';
 import { isMaintenanceModeActive } from '../controllers/maintenanceController';
+import { mapWithConcurrency } from '../utils/concurrency';
 
 const DEBUG = process.env.NODE_ENV === 'development';
 
-// Monitoring interval in milliseconds (default: 30 seconds)
+// Default monitoring interval in milliseconds (default: 30 seconds).
+// An organization can override it with `monitoringInterval` (ms) in its schemaConfig. Intervals
+// below SCADA_POLL_INTERVAL are raised to it: until then cycles would re-read the cached SCADA row.
 const MONITORING_INTERVAL = parseInt(process.env.SCADA_MONITORING_INTERVAL || '30000');
 
+// Lower bound for per-organization intervals
+const MIN_MONITORING_INTERVAL = Math.max(5000, SCADA_POLLING_INTERVAL);
+
+// Organizations monitored in parallel
+const MONITORING_CONCURRENCY = Math.max(1, parseInt(process.env.SCADA_MONITORING_CONCURRENCY || '5'));
+
+// How often the organization list (and per-org intervals) is reloaded (default: 1 minute)
+const ORG_SYNC_INTERVAL = parseInt(process.env.SCADA_MONITORING_ORG_SYNC_INTERVAL || '60000');
+
 // Track monitoring status for each organization
 interface MonitoringStatus {
   orgId: string;
@@ -15,17 +28,49 @@ interface MonitoringStatus {
   isActive: boolean;
   errorCount: number;
   lastError?: string;
+  // Cycles dropped because the previous one overran the interval
+  skippedCycles?: number;
+}
+
+// Scheduler state for one organization
+interface OrgSchedule {
+  orgId: string;
+  orgName: string;
+  intervalMs: number;
+  // Slot the next cycle is due in; slots stay on a fixed phase so orgs remain spread out
+  nextRunAt: number;
+  timer: NodeJS.Timeout | null;
+  // Set while a cycle is queued or running, so cycles of one org never overlap
+  inFlight: Promise<void> | null;
 }
 
 const monitoringStatus = new Map<string, MonitoringStatus>();
 
+const schedules = new Map<string, OrgSchedule>();
+
+// Monitoring interval of an organization from its (cached, already parsed) schemaConfig
+const getOrgInterval = async (orgId: string): Promise<number> => {
+  const context = await getOrgContext(orgId);
+  const interval = Number(context?.schemaConfig?.monitoringInterval);
+  return Math.max(MIN_MONITORING_INTERVAL, Number.isFinite(interval) && interval > 0 ? interval : MONITORING_INTERVAL);
+};
+
 /**
  * Background monitoring service for all organizations
- * This service runs continuously and monitors SCADA data for all organizations
+ * This service runs continuously and monitors SCADA data for all organizations.
+ *
+ * Each organization is scheduled on its own interval, starting at a random offset within
+ * that interval so tenants do not all hit their SCADA pools at the same instant. At most
+ * MONITORING_CONCURRENCY cycles run at once, an organization never has two cycles in flight,
+ * and a cycle that overruns skips the slots it missed instead of queueing them up.
  */
 export class BackgroundMonitoringService {
   private static isRunning = false;
-  private static intervalId: NodeJS.Timeout | null = null;
+  private static syncIntervalId: NodeJS.Timeout | null = null;
+
+  // Concurrency gate shared by scheduled and forced cycles
+  private static activeCycles = 0;
+  private static waitingCycles: (() => void)[] = [];
 
   /**
    * Start the background monitoring service
@@ -39,19 +84,22 @@ export class BackgroundMonitoringService {
     console.log('🚀 Starting background monitoring service for all organizations...');
     this.isRunning = true;
 
-    // Initial monitoring cycle
-    await this.monitorAllOrganizations();
+    // Schedule every organization, then keep the list in sync
+    try {
+      await this.syncOrganizations();
+    } catch (error) {
+      console.error('🔴 Error loading organizations to monitor:', error);
+    }
 
-    // Set up continuous monitoring
-    this.intervalId = setInterval(async () => {
+    this.syncIntervalId = setInterval(async () => {
       try {
-        await this.monitorAllOrganizations();
+        await this.syncOrganizations();
       } catch (error) {
-        console.error('🔴 Error in background monitoring cycle:', error);
+        console.error('🔴 Error syncing monitored organizations:', error);
       }
-    }, MONITORING_INTERVAL);
+    }, ORG_SYNC_INTERVAL);
 
-    console.log(`✅ Background monitoring service started (interval: ${MONITORING_INTERVAL}ms)`);
+    console.log(`✅ Background monitoring service started (interval: ${MONITORING_INTERVAL}ms, concurrency: ${MONITORING_CONCURRENCY})`);
   }
 
   /**
@@ -66,10 +114,15 @@ export class BackgroundMonitoringService {
     console.log('🛑 Stopping background monitoring service...');
     this.isRunning = false;
 
-    if (this.intervalId) {
-      clearInterval(this.intervalId);
-      this.intervalId = null;
+    if (this.syncIntervalId) {
+      clearInterval(this.syncIntervalId);
+      this.syncIntervalId = null;
+    }
+
+    for (const schedule of schedules.values()) {
+      if (schedule.timer) clearTimeout(schedule.timer);
     }
+    schedules.clear();
 
     console.log('✅ Background monitoring service stopped');
   }
@@ -82,32 +135,163 @@ export class BackgroundMonitoringService {
   }
 
   /**
-   * Monitor all organizations
+   * Add newly created organizations to the schedule, drop deleted ones and pick up
+   * interval changes
+   */
+  private static async syncOrganizations(): Promise<void> {
+    const organizations = await prisma.organization.findMany({
+      select: {
+        id: true,
+        name: true
+      }
+    });
+
+    // Intervals come from the org context cache, which org updates invalidate
+    const intervals = await mapWithConcurrency(organizations, MONITORING_CONCURRENCY, org => getOrgInterval(org.id));
+
+    if (!this.isRunning) return;
+
+    const now = Date.now();
+    const seen = new Set<string>();
+
+    for (const [index, org] of organizations.entries()) {
+      seen.add(org.id);
+      const result = intervals[index];
+      const existing = schedules.get(org.id);
+      // Keep the current interval if the context could not be loaded this time
+      const intervalMs = result.status === 'fulfilled' ? result.value : existing?.intervalMs ?? MONITORING_INTERVAL;
+
+      if (!existing) {
+        const schedule: OrgSchedule = {
+          orgId: org.id,
+          orgName: org.name,
+          intervalMs,
+          // Jittered first run somewhere within the first interval
+          nextRunAt: now + Math.floor(Math.random() * intervalMs),
+          timer: null,
+          inFlight: null
+        };
+        schedules.set(org.id, schedule);
+        this.scheduleNext(schedule);
+        continue;
+      }
+
+      existing.orgName = org.name;
+      if (existing.intervalMs !== intervalMs) {
+        if (DEBUG) {
+          console.log(`⏱️ ${org.name}: monitoring interval ${existing.intervalMs}ms -> ${intervalMs}ms`);
+        }
+        existing.intervalMs = intervalMs;
+        // Re-jitter a pending slot into the new interval; a running cycle picks it up when it finishes
+        if (existing.timer) {
+          existing.nextRunAt = now + Math.floor(Math.random() * intervalMs);
+          this.scheduleNext(existing);
+        }
+      }
+    }
+
+    for (const [orgId, schedule] of schedules) {
+      if (!seen.has(orgId)) {
+        if (schedule.timer) clearTimeout(schedule.timer);
+        schedules.delete(orgId);
+        monitoringStatus.delete(orgId);
+      }
+    }
+
+    if (DEBUG) {
+      console.log(`📊 Monitoring ${schedules.size} organizations`);
+    }
+  }
+
+  /**
+   * Arm the timer for an organization's next slot
+   */
+  private static scheduleNext(schedule: OrgSchedule): void {
+    if (schedule.timer) clearTimeout(schedule.timer);
+    schedule.timer = setTimeout(() => {
+      schedule.timer = null;
+      void this.runScheduledCycle(schedule);
+    }, Math.max(0, schedule.nextRunAt - Date.now()));
+  }
+
+  /**
+   * Run one scheduled cycle and move the organization to its next free slot
+   */
+  private static async runScheduledCycle(schedule: OrgSchedule): Promise<void> {
+    await this.runCycle(schedule);
+
+    // The organization may have been removed or the service stopped meanwhile
+    if (!this.isRunning || schedules.get(schedule.orgId) !== schedule) return;
+
+    const now = Date.now();
+    let nextRunAt = schedule.nextRunAt + schedule.intervalMs;
+    if (nextRunAt <= now) {
+      // Overran: skip the missed slots instead of running them back to back
+      const missed = Math.floor((now - nextRunAt) / schedule.intervalMs) + 1;
+      nextRunAt += missed * schedule.intervalMs;
+
+      const status = monitoringStatus.get(schedule.orgId);
+      if (status) status.skippedCycles = (status.skippedCycles || 0) + missed;
+      console.warn(`⚠️ Monitoring cycle for ${schedule.orgName} overran its ${schedule.intervalMs}ms interval, skipped ${missed} cycle(s)`);
+    }
+    schedule.nextRunAt = nextRunAt;
+    this.scheduleNext(schedule);
+  }
+
+  /**
+   * Run a monitoring cycle for an organization through the concurrency gate.
+   * If a cycle is already queued or running, callers share it instead of starting another.
+   */
+  private static runCycle(schedule: Pick<OrgSchedule, 'orgId' | 'orgName' | 'inFlight'>): Promise<void> {
+    if (schedule.inFlight) return schedule.inFlight;
+
+    schedule.inFlight = (async () => {
+      await this.acquireCycleSlot();
+      try {
+        await this.monitorOrganization(schedule.orgId, schedule.orgName);
+      } finally {
+        this.releaseCycleSlot();
+        schedule.inFlight = null;
+      }
+    })();
+    return schedule.inFlight;
+  }
+
+  private static async acquireCycleSlot(): Promise<void> {
+    if (this.activeCycles < MONITORING_CONCURRENCY) {
+      this.activeCycles++;
+      return;
+    }
+    // The releasing cycle hands its slot over directly
+    await new Promise<void>(resolve => this.waitingCycles.push(resolve));
+  }
+
+  private static releaseCycleSlot(): void {
+    const next = this.waitingCycles.shift();
+    if (next) {
+      next();
+    } else {
+      this.activeCycles--;
+    }
+  }
+
+  /**
+   * Monitor all organizations once, respecting the concurrency limit
    */
   private static async monitorAllOrganizations(): Promise<void> {
     try {
-      // Get all active organizations
       const organizations = await prisma.organization.findMany({
-        select: {
-          id: true,
-          name: true,
-          scadaDbConfig: true,
-          schemaConfig: true
-        }
+        select: { id: true, name: true }
       });
 
       if (DEBUG) {
         console.log(`📊 Monitoring ${organizations.length} organizations`);
       }
 
-      // Monitor each organization
-      const monitoringPromises = organizations.map(org => 
-        this.monitorOrganization(org.id, org.name)
+      await mapWithConcurrency(organizations, MONITORING_CONCURRENCY, org =>
+        this.runCycle(schedules.get(org.id) || { orgId: org.id, orgName: org.name, inFlight: null })
       );
 
-      // Wait for all monitoring to complete
-      await Promise.allSettled(monitoringPromises);
-
       if (DEBUG) {
         console.log(`✅ Completed monitoring cycle for ${organizations.length} organizations`);
       }
@@ -193,6 +377,9 @@ export class BackgroundMonitoringService {
   static getHealthStatus(): {
     isRunning: boolean;
     monitoringInterval: number;
+    maxConcurrency: number;
+    runningCycles: number;
+    queuedCycles: number;
     totalOrganizations: number;
     activeOrganizations: number;
     errorOrganizations: number;
@@ -208,6 +395,9 @@ export class BackgroundMonitoringService {
     return {
       isRunning: this.isRunning,
       monitoringInterval: MONITORING_INTERVAL,
+      maxConcurrency: MONITORING_CONCURRENCY,
+      runningCycles: this.activeCycles,
+      queuedCycles: this.waitingCycles.length,
       totalOrganizations: statuses.length,
       activeOrganizations: activeCount,
       errorOrganizations: errorCount,
@@ -242,22 +432,9 @@ export class BackgroundMonitoringService {
     }
 
     console.log(`🔄 Forcing monitoring for organization: ${org.name}`);
-    await this.monitorOrganization(org.id, org.name);
+    await this.runCycle(schedules.get(org.id) || { orgId: org.id, orgName: org.name, inFlight: null });
     console.log(`✅ Forced monitoring completed for: ${org.name}`);
   }
 }
 
-// Graceful shutdown handling
-process.on('SIGINT', () => {
-  console.log('\n🛑 Received SIGINT, shutting down background monitoring service...');
-  BackgroundMonitoringService.stop();
-  process.exit(0);
-});
-
-process.on('SIGTERM', () => {
-  console.log('\n🛑 Received SIGTERM, shutting down background monitoring service...');
-  BackgroundMonitoringService.stop();
-  process.exit(0);
-});
-
 export default BackgroundMonitoringService; 
\ No newline at end of file
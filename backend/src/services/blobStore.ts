@@ -0,0 +1,163 @@
+import { createHash, randomUUID } from 'crypto';
+import { createReadStream, promises as fs } from 'fs';
+import path from 'path';
+import { Readable } from 'stream';
+
+// Which BlobStore implementation to use; only 'local' ships today
+const BLOB_STORE_DRIVER = process.env.BLOB_STORE_DRIVER || 'local';
+
+// Root directory of the local blob store. The default lives inside the working directory, which
+// does not survive a container redeploy; production needs a persistent path (a mounted volume).
+const BLOB_STORE_DIR = path.resolve(process.env.BLOB_STORE_DIR || path.join(process.cwd(), 'storage', 'blobs'));
+
+/**
+ * Whether the blob store location was configured explicitly (BLOB_STORE_DIR) rather than defaulted
+ */
+export const isBlobStoreConfigured = (): boolean => !!process.env.BLOB_STORE_DIR;
+
+export interface StoredBlob {
+  // sha256 of the content, hex encoded; identical files share one blob
+  key: string;
+  size: number;
+}
+
+export interface ByteRange {
+  start: number;
+  // Inclusive
+  end: number;
+}
+
+/**
+ * Content-addressed storage for report files. Blobs are immutable and keyed by their hash,
+ * so writing the same content twice stores it once.
+ */
+export interface BlobStore {
+  put(content: Buffer): Promise<StoredBlob>;
+  // Move a finished temp file into the store without reading it into memory
+  putFile(filePath: string): Promise<StoredBlob>;
+  stat(key: string): Promise<{ size: number; modifiedAt: Date } | null>;
+  createReadStream(key: string, range?: ByteRange): Readable;
+  delete(key: string): Promise<void>;
+  // Keys of every stored blob (used by the maintenance script)
+  list(): AsyncIterable<string>;
+}
+
+const isBlobKey = (key: string) => /^[0-9a-f]{64}$/.test(key);
+
+/**
+ * Stores blobs on the local filesystem under <root>/<aa>/<bb>/<sha256>
+ */
+export class LocalBlobStore implements BlobStore {
+  constructor(private readonly root: string) {}
+
+  private pathFor(key: string): string {
+    if (!isBlobKey(key)) {
+      throw new Error(`Invalid blob key: ${key}`);
+    }
+    return path.join(this.root, key.slice(0, 2), key.slice(2, 4), key);
+  }
+
+  // Refresh the mtime of an existing blob on a dedup hit, so garbage collection (which spares
+  // recently modified blobs) does not delete a blob that was just referenced again.
+  // Returns false when the blob does not exist.
+  private async touch(key: string): Promise<boolean> {
+    const now = new Date();
+    try {
+      await fs.utimes(this.pathFor(key), now, now);
+      return true;
+    } catch (error: any) {
+      if (error.code === 'ENOENT') return false;
+      throw error;
+    }
+  }
+
+  private async commit(tempPath: string, key: string, size: number): Promise<StoredBlob> {
+    const target = this.pathFor(key);
+    if (await this.touch(key)) {
+      // Already stored; the new copy is a duplicate
+      await fs.unlink(tempPath).catch(() => undefined);
+      return { key, size };
+    }
+    await fs.mkdir(path.dirname(target), { recursive: true });
+    try {
+      await fs.rename(tempPath, target);
+    } catch (error: any) {
+      // Temp files may live on another device (os.tmpdir); fall back to a copy
+      if (error.code !== 'EXDEV') throw error;
+      await fs.copyFile(tempPath, `${target}.partial`);
+      await fs.rename(`${target}.partial`, target);
+      await fs.unlink(tempPath).catch(() => undefined);
+    }
+    return { key, size };
+  }
+
+  async put(content: Buffer): Promise<StoredBlob> {
+    const key = createHash('sha256').update(content).digest('hex');
+    if (await this.touch(key)) {
+      return { key, size: content.byteLength };
+    }
+    const tempPath = path.join(this.root, `.tmp-${randomUUID()}`);
+    await fs.mkdir(this.root, { recursive: true });
+    await fs.writeFile(tempPath, content);
+    return this.commit(tempPath, key, content.byteLength);
+  }
+
+  async putFile(filePath: string): Promise<StoredBlob> {
+    const hash = createHash('sha256');
+    for await (const chunk of createReadStream(filePath)) {
+      hash.update(chunk);
+    }
+    const { size } = await fs.stat(filePath);
+    return this.commit(filePath, hash.digest('hex'), size);
+  }
+
+  async stat(key: string): Promise<{ size: number; modifiedAt: Date } | null> {
+    try {
+      const stats = await fs.stat(this.pathFor(key));
+      return { size: stats.size, modifiedAt: stats.mtime };
+    } catch (error: any) {
+      if (error.code === 'ENOENT') return null;
+      throw error;
+    }
+  }
+
+  createReadStream(key: string, range?: ByteRange): Readable {
+    return createReadStream(this.pathFor(key), range ? { start: range.start, end: range.end } : undefined);
+  }
+
+  async delete(key: string): Promise<void> {
+    await fs.unlink(this.pathFor(key)).catch((error: any) => {
+      if (error.code !== 'ENOENT') throw error;
+    });
+  }
+
+  async *list(): AsyncIterable<string> {
+    const readDir = async (dir: string) => fs.readdir(dir).catch(() => [] as string[]);
+    for (const first of await readDir(this.root)) {
+      for (const second of await readDir(path.join(this.root, first))) {
+        for (const name of await readDir(path.join(this.root, first, second))) {
+          if (isBlobKey(name)) yield name;
+        }
+      }
+    }
+  }
+}
+
+let blobStore: BlobStore | null = null;
+
+export function getBlobStore(): BlobStore {
+  if (!blobStore) {
+    switch (BLOB_STORE_DRIVER) {
+      case 'local':
+        blobStore = new LocalBlobStore(BLOB_STORE_DIR);
+        console.log(`🗄️ Report blob store: ${BLOB_STORE_DIR}`);
+        if (!isBlobStoreConfigured() && process.env.NODE_ENV === 'production') {
+          console.warn('⚠️ BLOB_STORE_DIR is not set; report files are stored in the working directory and are lost on redeploy');
+        }
+        break;
+      default:
+        throw new Error(`Unknown BLOB_STORE_DRIVER: ${BLOB_STORE_DRIVER}`);
+    }
+  }
+  return blobStore;
+}
@@ -0,0 +1,384 @@
+import { randomUUID } from 'crypto';
+import { createWriteStream, promises as fs } from 'fs';
+import os from 'os';
+import path from 'path';
+import ExcelJS from 'exceljs';
+import PDFDocument from 'pdfkit';
+import { PoolClient } from 'pg';
+import { format as formatDate } from 'date-fns';
+import prisma from '../config/db';
+import { forEachCursorBatch } from '../utils/pgCursor';
+import { AlarmEvaluationPlan } from './alarmEvaluationPlan';
+import { AlarmReportFilters, AlarmReportQuery, buildAlarmReportQuery, thresholdFields } from './alarmReportQuery';
+import { StoredBlob, getBlobStore } from './blobStore';
+
+const DEBUG = process.env.NODE_ENV === 'development';
+
+// Rows pulled per FETCH while a report is generated
+const FETCH_SIZE = Math.max(100, parseInt(process.env.FURNACE_REPORT_FETCH_SIZE || '2000'));
+
+export type FurnaceReportFormat = 'excel' | 'pdf';
+
+export type FurnaceReportGrouping = 'newest_first' | 'oldest_first' | 'by_type' | 'by_zone';
+
+export interface FurnaceReportOptions extends AlarmReportFilters {
+  format: FurnaceReportFormat;
+  grouping?: FurnaceReportGrouping;
+  title?: string;
+  includeThresholds?: boolean;
+  includeStatusFields?: boolean;
+}
+
+interface ReportColumn {
+  header: string;
+  width: number;
+  value: (row: any) => any;
+}
+
+// ---------------------------------------------------------------------------
+// Report layouts, built from the organization's compiled alarm schema
+// ---------------------------------------------------------------------------
+
+type ReportPoints = Pick<AlarmReportQuery, 'analog' | 'binary'>;
+
+const field = (key: string) => (row: any) => row[key];
+const trueFalse = (key: string) => (row: any) => row[key] ? 'True' : 'False';
+const yes = (key: string) => (row: any) => row[key] ? 'Yes' : '';
+const column = (header: string, value: (row: any) => any, width = Math.max(header.length, 12)): ReportColumn =>
+  ({ header, value, width });
+const label = (text: string) => text.trim().replace(/\s+/g, '_');
+const capitalize = (text: string) => text.charAt(0).toUpperCase() + text.slice(1);
+
+const timestampColumns = (): ReportColumn[] => [
+  column('Timestamp', row => formatDate(new Date(row.created_timestamp), 'yyyy-MM-dd HH:mm:ss'), 20),
+  column('ID', field('id'), 10)
+];
+
+const severityColumn = () => column('Severity', row => capitalize(row.severity || ''), 10);
+
+// Stable sort of points by a key, keeping schema order inside each group
+function groupPoints<T extends { type: string; zone?: string }>(points: readonly T[], key: (point: T) => string): T[] {
+  const order: string[] = [];
+  points.forEach(point => {
+    if (!order.includes(key(point))) order.push(key(point));
+  });
+  return [...points].sort((a, b) => order.indexOf(key(a)) - order.indexOf(key(b)));
+}
+
+function chronologicalColumns(points: ReportPoints, includeThresholds: boolean, includeStatusFields: boolean): ReportColumn[] {
+  return [
+    ...timestampColumns(),
+    severityColumn(),
+    ...points.analog.flatMap(config => {
+      const thresholds = thresholdFields(config.pvField);
+      return [
+        ...(config.svField ? [column(`${config.name} Set Value`, field(config.svField))] : []),
+        column(`${config.name} Present Value`, field(config.pvField)),
+        ...(includeThresholds
+          ? [
+            column(`${config.name} High Threshold`, field(thresholds.high)),
+            column(`${config.name} Low Threshold`, field(thresholds.low))
+          ]
+          : [])
+      ];
+    }),
+    ...(includeStatusFields ? points.binary.map(config => column(config.name, trueFalse(config.field))) : [])
+  ];
+}
+
+function groupedColumns(
+  points: ReportPoints,
+  groupKey: (point: { type: string; zone?: string }) => string,
+  includeThresholds: boolean,
+  includeStatusFields: boolean
+): ReportColumn[] {
+  return [
+    ...timestampColumns(),
+    severityColumn(),
+    ...groupPoints(points.analog, groupKey).flatMap(config => {
+      const prefix = `${label(capitalize(groupKey(config)))}_${label(config.name)}`;
+      const thresholds = thresholdFields(config.pvField);
+      return [
+        column(`${prefix}_PV`, field(config.pvField)),
+        ...(config.svField ? [column(`${prefix}_SP`, field(config.svField))] : []),
+        ...(includeThresholds
+          ? [column(`${prefix}_HT`, field(thresholds.high)), column(`${prefix}_LT`, field(thresholds.low))]
+          : [])
+      ];
+    }),
+    ...(includeStatusFields
+      ? groupPoints(points.binary, groupKey).map(config =>
+        column(`Status_${label(capitalize(groupKey(config)))}_${label(config.name)}`, yes(config.field)))
+      : [])
+  ];
+}
+
+function getReportColumns(points: ReportPoints, options: FurnaceReportOptions): ReportColumn[] {
+  const includeThresholds = options.includeThresholds ?? true;
+  const includeStatusFields = options.includeStatusFields ?? true;
+  switch (options.grouping) {
+    case 'by_type':
+      return groupedColumns(points, point => point.type, includeThresholds, includeStatusFields);
+    case 'by_zone':
+      return groupedColumns(points, point => point.zone || 'general', includeThresholds, includeStatusFields);
+    default:
+      return chronologicalColumns(points, includeThresholds, includeStatusFields);
+  }
+}
+
+/**
+ * A landscape page cannot fit the spreadsheet layout, so the PDF shows present values
+ * (with the threshold band) and a summary of active status alarms
+ */
+function pdfColumns(points: ReportPoints, options: FurnaceReportOptions): ReportColumn[] {
+  const includeThresholds = options.includeThresholds ?? true;
+  const formatValue = (value: any) =>
+    value === null || value === undefined ? '-' : Number(value).toFixed(2).replace(/\.?0+$/, '');
+  const analog = (header: string, pv: string) => {
+    const { high, low } = thresholdFields(pv);
+    return column(header, row => includeThresholds && row[high] !== undefined && row[high] !== null
+      ? `${formatValue(row[pv])} [${formatValue(row[low])}-${formatValue(row[high])}]`
+      : formatValue(row[pv]), includeThresholds ? 95 : 60);
+  };
+
+  return [
+    column('Timestamp', row => formatDate(new Date(row.created_timestamp), 'yyyy-MM-dd HH:mm:ss'), 100),
+    column('Severity', row => capitalize(row.severity || ''), 45),
+    ...points.analog.map(config => analog(config.name, config.pvField)),
+    ...((options.includeStatusFields ?? true)
+      ? [column('Active Alarms', row =>
+        points.binary.filter(config => row[config.field]).map(config => config.name).join(', ') || '-', 0)]
+      : [])
+  ];
+}
+
+// Narrowest PDF cell, and the width the trailing Active Alarms column asks for
+const MIN_PDF_COLUMN_WIDTH = 55;
+const PDF_FLEX_COLUMN_WIDTH = 60;
+
+// Fit preferred widths into the page: shrink proportionally, but never below the minimum
+function fitWidths(preferred: number[], available: number): number[] {
+  const widths = [...preferred];
+  let shrinkable = widths.map((_, index) => index);
+  for (;;) {
+    const pinned = widths.reduce((sum, width, index) => shrinkable.includes(index) ? sum : sum + width, 0);
+    const wanted = shrinkable.reduce((sum, index) => sum + preferred[index], 0);
+    const scale = (available - pinned) / wanted;
+    const tooNarrow = shrinkable.filter(index => preferred[index] * scale < MIN_PDF_COLUMN_WIDTH);
+    if (tooNarrow.length === 0) {
+      shrinkable.forEach(index => { widths[index] = preferred[index] * scale; });
+      return widths;
+    }
+    tooNarrow.forEach(index => { widths[index] = MIN_PDF_COLUMN_WIDTH; });
+    shrinkable = shrinkable.filter(index => !tooNarrow.includes(index));
+  }
+}
+
+/**
+ * Lay the PDF columns out for a page of the given usable width.
+ * Columns that fit keep their widths (the zero-width last column takes the rest); otherwise they are
+ * shrunk to fit, and when even the minimum width does not fit, each record wraps onto extra lines
+ * that repeat the timestamp.
+ */
+export function layoutPdfColumns(points: ReportPoints, options: FurnaceReportOptions, usableWidth: number): ReportColumn[][] {
+  const [key, ...rest] = pdfColumns(points, options);
+  const perLine = Math.max(1, Math.floor((usableWidth - key.width) / MIN_PDF_COLUMN_WIDTH));
+  const lines: ReportColumn[][] = [];
+  for (let start = 0; start < rest.length; start += perLine) {
+    lines.push(rest.slice(start, start + perLine));
+  }
+  if (lines.length === 0) lines.push([]);
+
+  return lines.map(line => {
+    const fixedWidth = key.width + line.reduce((sum, col) => sum + col.width, 0);
+    const preferred = line.map(col => col.width || Math.max(PDF_FLEX_COLUMN_WIDTH, usableWidth - fixedWidth));
+    const widths = key.width + preferred.reduce((sum, width) => sum + width, 0) > usableWidth
+      ? fitWidths(preferred, usableWidth - key.width)
+      : preferred;
+    return [key, ...line.map((col, index) => ({ ...col, width: widths[index] }))];
+  });
+}
+
+// ---------------------------------------------------------------------------
+// Writers
+// ---------------------------------------------------------------------------
+
+interface ReportWriter {
+  extension: string;
+  writeRows(rows: any[]): void;
+  finish(): Promise<void>;
+}
+
+function createExcelWriter(filename: string, points: ReportPoints, options: FurnaceReportOptions): ReportWriter {
+  const columns = getReportColumns(points, options);
+  const workbook = new ExcelJS.stream.xlsx.WorkbookWriter({ filename, useStyles: true, useSharedStrings: false });
+  workbook.creator = 'Eagle Notifier';
+  workbook.created = new Date();
+
+  const worksheet = workbook.addWorksheet('Alarm Data');
+  worksheet.columns = columns.map((col, index) => ({ header: col.header, key: String(index), width: col.width }));
+
+  const headerRow = worksheet.getRow(1);
+  headerRow.font = { bold: true, name: 'Calibri', size: 11 };
+  headerRow.fill = { type: 'pattern', pattern: 'solid', fgColor: { argb: 'FFE7E6E6' } };
+  headerRow.commit();
+
+  return {
+    extension: 'xlsx',
+    writeRows(rows) {
+      for (const row of rows) {
+        worksheet.addRow(columns.map(col => col.value(row) ?? null)).commit();
+      }
+    },
+    async finish() {
+      worksheet.commit();
+      await workbook.commit();
+    }
+  };
+}
+
+function createPdfWriter(filename: string, points: ReportPoints, options: FurnaceReportOptions): ReportWriter {
+  const doc = new PDFDocument({ size: 'A4', layout: 'landscape', margin: 30 });
+  const output = createWriteStream(filename);
+  const finished = new Promise<void>((resolve, reject) => {
+    output.on('finish', () => resolve());
+    output.on('error', reject);
+  });
+  doc.pipe(output);
+
+  const left = doc.page.margins.left;
+  const usableWidth = doc.page.width - doc.page.margins.left - doc.page.margins.right;
+  const lines = layoutPdfColumns(points, options, usableWidth);
+  const rowHeight = 14;
+  const bottom = () => doc.page.height - doc.page.margins.bottom;
+
+  // One record (or the header) spans one row per layout line and never breaks across pages
+  const drawRow = (cell: (col: ReportColumn) => string, bold = false) => {
+    if (doc.y + rowHeight * lines.length > bottom()) {
+      doc.addPage();
+      drawRow(col => col.header, true);
+    }
+    const y = doc.y;
+    doc.font(bold ? 'Helvetica-Bold' : 'Helvetica').fontSize(7);
+    lines.forEach((line, lineIndex) => {
+      let x = left;
+      line.forEach(col => {
+        doc.text(cell(col), x + 2, y + lineIndex * rowHeight + 3, { width: col.width - 4, height: rowHeight - 2, lineBreak: false, ellipsis: true });
+        x += col.width;
+      });
+    });
+    const end = y + rowHeight * lines.length;
+    doc.moveTo(left, end).lineTo(left + usableWidth, end).lineWidth(0.3).strokeColor('#CCCCCC').stroke();
+    doc.x = left;
+    doc.y = end;
+  };
+
+  doc.font('Helvetica-Bold').fontSize(14).text(options.title || 'Furnace Report', left, doc.y);
+  doc.font('Helvetica').fontSize(9).text(
+    `${formatDate(options.startDate, 'PPP p')} - ${formatDate(options.endDate, 'PPP p')}`
+  );
+  const filterSummary = [
+    options.alarmTypes?.length ? `Types: ${options.alarmTypes.join(', ')}` : null,
+    options.severityLevels?.length ? `Severity: ${options.severityLevels.join(', ')}` : null,
+    options.zones?.length ? `Zones: ${options.zones.join(', ')}` : null
+  ].filter(Boolean).join('  |  ');
+  if (filterSummary) doc.text(filterSummary);
+  doc.moveDown();
+  drawRow(col => col.header, true);
+
+  return {
+    extension: 'pdf',
+    writeRows(rows) {
+      for (const row of rows) {
+        drawRow(col => String(col.value(row) ?? ''));
+      }
+    },
+    async finish() {
+      doc.end();
+      await finished;
+    }
+  };
+}
+
+// ---------------------------------------------------------------------------
+// Engine
+// ---------------------------------------------------------------------------
+
+/**
+ * Stream the filtered alarm data straight from the organization's SCADA table into an XLSX or PDF file
+ */
+export async function renderFurnaceReport(
+  client: PoolClient,
+  plan: AlarmEvaluationPlan,
+  options: FurnaceReportOptions,
+  onProgress?: (rowsWritten: number) => void
+): Promise<{ blob: StoredBlob; rowCount: number; extension: string }> {
+  const direction = options.grouping === 'oldest_first' ? 'ASC' : 'DESC';
+  const query = buildAlarmReportQuery(plan, options, direction);
+
+  const filename = path.join(os.tmpdir(), `furnace-report-${randomUUID()}.${options.format === 'pdf' ? 'pdf' : 'xlsx'}`);
+  const writer = options.format === 'pdf'
+    ? createPdfWriter(filename, query, options)
+    : createExcelWriter(filename, query, options);
+
+  try {
+    let rowsWritten = 0;
+    // Filters that select no configured point produce an empty report
+    const rowCount = query.isEmpty ? 0 : await forEachCursorBatch(client, query.sql, query.params, FETCH_SIZE, rows => {
+      writer.writeRows(rows);
+      rowsWritten += rows.length;
+      onProgress?.(rowsWritten);
+      if (DEBUG) console.log(`📊 Furnace report: ${rowsWritten} rows written`);
+    });
+    await writer.finish();
+
+    // The blob store takes ownership of the temp file
+    return { blob: await getBlobStore().putFile(filename), rowCount, extension: writer.extension };
+  } finally {
+    await fs.unlink(filename).catch(() => undefined);
+  }
+}
+
+/**
+ * Generate a furnace report on the server and store it as a FurnaceReport
+ */
+export async function generateFurnaceReport(
+  client: PoolClient,
+  userId: string,
+  organizationId: string,
+  plan: AlarmEvaluationPlan,
+  options: FurnaceReportOptions
+) {
+  const started = Date.now();
+  const { blob, rowCount, extension } = await renderFurnaceReport(client, plan, options);
+  console.log(`📊 Furnace ${options.format} report: ${rowCount} rows, ${blob.size} bytes in ${Date.now() - started}ms`);
+
+  const title = options.title
+    || `Furnace_Report_${formatDate(options.startDate, 'yyyy-MM-dd')}_to_${formatDate(options.endDate, 'yyyy-MM-dd')}`;
+  const fileName = `${title.replace(/\s+/g, '_')}_${formatDate(new Date(), 'yyyyMMdd_HHmmss')}.${extension}`;
+
+  return prisma.furnaceReport.create({
+    data: {
+      userId,
+      organizationId,
+      title,
+      format: options.format,
+      blobKey: blob.key,
+      fileName,
+      fileSize: blob.size,
+      startDate: options.startDate,
+      endDate: options.endDate,
+      grouping: options.grouping || 'newest_first',
+      includeThresholds: options.includeThresholds ?? true,
+      includeStatusFields: options.includeStatusFields ?? true,
+      alarmTypes: options.alarmTypes || [],
+      severityLevels: options.severityLevels || [],
+      zones: options.zones || [],
+      metadata: {
+        generatedAt: new Date().toISOString(),
+        recordCount: rowCount,
+        generatedBy: 'server'
+      }
+    }
+  });
+}
@@ -0,0 +1,306 @@
+import { randomUUID } from 'crypto';
+import { promises as fs } from 'fs';
+import os from 'os';
+import path from 'path';
+import ExcelJS from 'exceljs';
+import { PoolClient } from 'pg';
+import { format as formatDate } from 'date-fns';
+import prisma from '../config/db';
+import { getClientWithRetry } from '../config/scadaDb';
+import { forEachCursorBatch } from '../utils/pgCursor';
+import { StoredBlob, getBlobStore } from './blobStore';
+
+const DEBUG = process.env.NODE_ENV === 'development';
+
+// Rows pulled per FETCH from the server-side cursor
+const FETCH_SIZE = Math.max(100, parseInt(process.env.METER_REPORT_FETCH_SIZE || '2000'));
+
+// Reports estimated above this many rows run as a background job (202 + status endpoint)
+export const BACKGROUND_ROW_THRESHOLD = parseInt(process.env.METER_REPORT_BACKGROUND_ROWS || '50000');
+
+// Finished jobs are kept this long so clients can pick up the result
+const JOB_TTL_MS = parseInt(process.env.METER_REPORT_JOB_TTL || String(60 * 60 * 1000));
+
+export const METER_REPORT_PARAMETERS = ['voltage', 'current', 'frequency', 'pf', 'energy', 'power'];
+
+const ALL_COLUMNS: Array<{ header: string; key: string; width: number }> = [
+  { header: 'Meter ID', key: 'meter_id', width: 12 },
+  { header: 'Date & Time (IST)', key: 'timestamp', width: 30 },
+  { header: 'Voltage (V)', key: 'voltage', width: 12 },
+  { header: 'Current (A)', key: 'current', width: 12 },
+  { header: 'Frequency (Hz)', key: 'frequency', width: 15 },
+  { header: 'Power Factor', key: 'pf', width: 14 },
+  { header: 'Energy (kWh)', key: 'energy', width: 15 },
+  { header: 'Power (kW)', key: 'power', width: 12 }
+];
+
+export interface MeterReportOptions {
+  startDate: Date;
+  endDate: Date;
+  parameters?: string[];
+  sortOrder?: string;
+}
+
+export interface MeterReportRequest {
+  userId: string;
+  organizationId: string;
+  title?: string;
+  // Range the user asked for (file name and stored metadata)
+  startDate: Date;
+  endDate: Date;
+  // Range actually queried; narrower when only part of the request has data
+  query: MeterReportOptions;
+}
+
+export interface MeterReportProgress {
+  rowsWritten: number;
+  // Planner estimate; null until known
+  estimatedRows: number | null;
+  percent: number | null;
+}
+
+export type MeterReportJobStatus = 'queued' | 'running' | 'completed' | 'failed';
+
+export interface MeterReportJob {
+  id: string;
+  userId: string;
+  organizationId: string;
+  status: MeterReportJobStatus;
+  progress: MeterReportProgress;
+  reportId: string | null;
+  error: string | null;
+  createdAt: Date;
+  updatedAt: Date;
+}
+
+/**
+ * Only whitelisted parameters reach the SELECT list
+ */
+export const resolveReportParameters = (parameters?: string[]): string[] =>
+  parameters && parameters.length > 0
+    ? METER_REPORT_PARAMETERS.filter(parameter => parameters.includes(parameter))
+    : METER_REPORT_PARAMETERS;
+
+export const buildMeterReportQuery = (options: MeterReportOptions) => {
+  const columns = resolveReportParameters(options.parameters);
+  const direction = options.sortOrder === 'oldest_first' ? 'ASC' : 'DESC';
+  return {
+    columns,
+    sql: `SELECT meter_id, ${columns.join(', ')}, created_at AT TIME ZONE 'UTC' AT TIME ZONE 'Asia/Kolkata' AS created_at
+            FROM meter_readings
+           WHERE created_at BETWEEN $1 AND $2
+           ORDER BY created_at ${direction}`,
+    params: [options.startDate, options.endDate]
+  };
+};
+
+// Readings are already converted to IST by the query; just format them for display
+export const formatToIST = (date: Date): string => {
+  try {
+    const day = date.getDate().toString().padStart(2, '0');
+    const month = (date.getMonth() + 1).toString().padStart(2, '0');
+    const year = date.getFullYear();
+
+    let hours = date.getHours();
+    const ampm = hours >= 12 ? 'PM' : 'AM';
+    hours = hours % 12;
+    hours = hours ? hours : 12; // Convert 0 to 12
+
+    const minutes = date.getMinutes().toString().padStart(2, '0');
+    const seconds = date.getSeconds().toString().padStart(2, '0');
+
+    return `${day}/${month}/${year} ${hours}:${minutes}:${seconds} ${ampm} IST`;
+  } catch (error) {
+    console.error('Error formatting date to IST:', error);
+    return date.toISOString();
+  }
+};
+
+/**
+ * Stream meter readings into an .xlsx file without holding the result set or the workbook in memory.
+ *
+ * Rows are read through a server-side cursor and committed one by one to an ExcelJS WorkbookWriter
+ * backed by a temp file, so heap usage depends on FETCH_SIZE rather than on the date range.
+ */
+export async function streamMeterReportToExcel(
+  client: PoolClient,
+  options: MeterReportOptions,
+  onProgress?: (rowsWritten: number) => void
+): Promise<{ blob: StoredBlob; rowCount: number }> {
+  const { columns, sql, params } = buildMeterReportQuery(options);
+  const filename = path.join(os.tmpdir(), `meter-report-${randomUUID()}.xlsx`);
+
+  const workbook = new ExcelJS.stream.xlsx.WorkbookWriter({
+    filename,
+    useStyles: true,
+    useSharedStrings: false
+  });
+  workbook.creator = 'Eagle Notifier';
+  workbook.lastModifiedBy = 'Eagle Notifier';
+  workbook.created = new Date();
+  workbook.modified = new Date();
+
+  const worksheet = workbook.addWorksheet('Meter Readings');
+  // Streamed sheets cannot be auto-fitted after the fact, so widths are fixed up front
+  worksheet.columns = ALL_COLUMNS.filter(column =>
+    column.key === 'meter_id' || column.key === 'timestamp' || columns.includes(column.key)
+  );
+
+  const headerRow = worksheet.getRow(1);
+  headerRow.font = { bold: true };
+  headerRow.fill = {
+    type: 'pattern',
+    pattern: 'solid',
+    fgColor: { argb: 'FFD3D3D3' }
+  };
+  headerRow.commit();
+
+  let rowsWritten = 0;
+  try {
+    const rowCount = await forEachCursorBatch(client, sql, params, FETCH_SIZE, rows => {
+      for (const reading of rows) {
+        const rowData: Record<string, any> = {
+          meter_id: reading.meter_id,
+          timestamp: formatToIST(new Date(reading.created_at))
+        };
+        for (const column of columns) {
+          rowData[column] = reading[column];
+        }
+        worksheet.addRow(rowData).commit();
+      }
+
+      rowsWritten += rows.length;
+      onProgress?.(rowsWritten);
+      if (DEBUG) console.log(`📊 Meter report: ${rowsWritten} rows written`);
+    });
+
+    worksheet.commit();
+    await workbook.commit();
+
+    // The blob store takes ownership of the temp file
+    return { blob: await getBlobStore().putFile(filename), rowCount };
+  } finally {
+    await fs.unlink(filename).catch(() => undefined);
+  }
+}
+
+/**
+ * Stream the report and store it as a MeterReport
+ */
+export async function generateMeterReport(
+  client: PoolClient,
+  request: MeterReportRequest,
+  onProgress?: (rowsWritten: number) => void
+) {
+  const started = Date.now();
+  const { blob, rowCount } = await streamMeterReportToExcel(client, request.query, onProgress);
+  console.log(`📊 Excel report streamed: ${rowCount} rows, ${blob.size} bytes in ${Date.now() - started}ms`);
+
+  const reportTitle = request.title || 'Meter_Readings_Report';
+  const fileName = `${reportTitle}_${formatDate(request.startDate, 'yyyy-MM-dd')}_to_${formatDate(request.endDate, 'yyyy-MM-dd')}.xlsx`;
+
+  return prisma.meterReport.create({
+    data: {
+      userId: request.userId,
+      organizationId: request.organizationId,
+      title: reportTitle,
+      format: 'excel',
+      blobKey: blob.key,
+      fileName,
+      fileSize: blob.size,
+      startDate: request.startDate,
+      endDate: request.endDate,
+      parameters: resolveReportParameters(request.query.parameters),
+      metadata: {
+        rowCount,
+        generatedAt: new Date().toISOString()
+      }
+    }
+  });
+}
+
+// ---------------------------------------------------------------------------
+// Background jobs
+// ---------------------------------------------------------------------------
+
+const jobs = new Map<string, MeterReportJob>();
+
+const pruneJobs = () => {
+  const cutoff = Date.now() - JOB_TTL_MS;
+  for (const [id, job] of jobs) {
+    if ((job.status === 'completed' || job.status === 'failed') && job.updatedAt.getTime() < cutoff) {
+      jobs.delete(id);
+    }
+  }
+};
+
+export const createMeterReportJob = (userId: string, organizationId: string, estimatedRows: number | null): MeterReportJob => {
+  pruneJobs();
+  const now = new Date();
+  const job: MeterReportJob = {
+    id: randomUUID(),
+    userId,
+    organizationId,
+    status: 'queued',
+    progress: { rowsWritten: 0, estimatedRows, percent: estimatedRows ? 0 : null },
+    reportId: null,
+    error: null,
+    createdAt: now,
+    updatedAt: now
+  };
+  jobs.set(job.id, job);
+  return job;
+};
+
+export const getMeterReportJob = (id: string, userId: string, organizationId: string): MeterReportJob | null => {
+  const job = jobs.get(id);
+  return job && job.userId === userId && job.organizationId === organizationId ? job : null;
+};
+
+export const updateMeterReportJob = (job: MeterReportJob, changes: Partial<Omit<MeterReportJob, 'id'>>) => {
+  Object.assign(job, changes, { updatedAt: new Date() });
+};
+
+/**
+ * Progress callback for a job; the percentage is capped below 100 because the estimate can be low
+ */
+export const trackJobProgress = (job: MeterReportJob) => (rowsWritten: number) => {
+  const { estimatedRows } = job.progress;
+  updateMeterReportJob(job, {
+    status: 'running',
+    progress: {
+      rowsWritten,
+      estimatedRows,
+      percent: estimatedRows ? Math.min(99, Math.round((rowsWritten / estimatedRows) * 100)) : null
+    }
+  });
+};
+
+/**
+ * Generate a report in the background on its own SCADA connection, recording progress on the job
+ */
+export function runMeterReportJob(job: MeterReportJob, request: MeterReportRequest): void {
+  const run = async () => {
+    updateMeterReportJob(job, { status: 'running' });
+    const client = await getClientWithRetry(job.organizationId);
+    try {
+      const report = await generateMeterReport(client, request, trackJobProgress(job));
+      updateMeterReportJob(job, {
+        status: 'completed',
+        reportId: report.id,
+        progress: { ...job.progress, percent: 100 }
+      });
+      console.log(`✅ Meter report job ${job.id} completed: ${report.id}`);
+    } finally {
+      client.release();
+    }
+  };
+
+  run().catch(error => {
+    console.error(`❌ Meter report job ${job.id} failed:`, error);
+    updateMeterReportJob(job, {
+      status: 'failed',
+      error: error instanceof Error ? error.message : 'Unknown error'
+    });
+  });
+}
@@ -0,0 +1,171 @@
+import { EventEmitter } from 'events';
+import prisma from '../config/db';
+import { CreateNotificationParams } from './notificationService';
+
+const DEBUG = process.env.NODE_ENV === 'development';
+
+// Above this many pending intents, non-critical notifications are dropped at enqueue time
+const OUTBOX_MAX_PENDING = parseInt(process.env.NOTIFICATION_OUTBOX_MAX_PENDING || '10000');
+
+/**
+ * A notification intent claimed from the outbox
+ */
+export interface OutboxEntry {
+  id: string;
+  organizationId: string;
+  payload: CreateNotificationParams;
+  attempts: number;
+}
+
+// Emits 'enqueued' so an in-process worker can drain without waiting for its next poll
+export const outboxEvents = new EventEmitter();
+
+// Pending depth last observed by the worker; used for producer-side backpressure
+let observedDepth = 0;
+
+// Non-critical intents dropped by backpressure since startup
+let droppedCount = 0;
+
+/**
+ * Queue notification intents for delivery by the outbox worker.
+ * A single INSERT per call, so the monitoring loop never waits on recipients or Expo.
+ * Returns the number of intents queued.
+ */
+export const enqueueNotifications = async (batch: CreateNotificationParams[]): Promise<number> => {
+  let entries = batch.filter(data => {
+    if (!data.organizationId) {
+      console.error('❌ Organization ID is required for notifications');
+      return false;
+    }
+    return true;
+  });
+
+  if (observedDepth >= OUTBOX_MAX_PENDING) {
+    const critical = entries.filter(data => data.severity === 'CRITICAL');
+    const dropped = entries.length - critical.length;
+    if (dropped > 0) {
+      droppedCount += dropped;
+      console.warn(`⚠️ Notification outbox backlog at ${observedDepth}, dropping ${dropped} non-critical notification(s) (${droppedCount} dropped since startup)`);
+    }
+    entries = critical;
+  }
+
+  if (entries.length === 0) return 0;
+
+  const result = await prisma.notificationOutbox.createMany({
+    data: entries.map(data => ({
+      organizationId: data.organizationId!,
+      payload: data as any,
+      severity: data.severity || 'INFO'
+    }))
+  });
+
+  observedDepth += result.count;
+  if (DEBUG) console.log(`📮 Queued ${result.count} notification(s) in outbox`);
+  outboxEvents.emit('enqueued', result.count);
+
+  return result.count;
+};
+
+/**
+ * Claim up to `limit` due intents, critical first. Rows locked by a worker that died
+ * more than `lockTimeoutMs` ago are reclaimed. SKIP LOCKED lets several workers share the table.
+ */
+export const claimOutboxBatch = async (limit: number, lockTimeoutMs: number): Promise<OutboxEntry[]> => {
+  const now = new Date();
+  const staleLockCutoff = new Date(now.getTime() - lockTimeoutMs);
+
+  return prisma.$queryRaw<OutboxEntry[]>`
+    UPDATE "NotificationOutbox"
+    SET "status" = 'PROCESSING', "lockedAt" = ${now}, "attempts" = "attempts" + 1
+    WHERE "id" IN (
+      SELECT "id" FROM "NotificationOutbox"
+      WHERE ("status" = 'PENDING' AND "availableAt" <= ${now})
+         OR ("status" = 'PROCESSING' AND "lockedAt" < ${staleLockCutoff})
+      ORDER BY ("severity" = 'CRITICAL') DESC, "availableAt" ASC
+      LIMIT ${limit}
+      FOR UPDATE SKIP LOCKED
+    )
+    RETURNING "id", "organizationId", "payload", "attempts"
+  `;
+};
+
+/**
+ * Remove delivered intents
+ */
+export const completeOutboxEntries = async (ids: string[]): Promise<void> => {
+  if (ids.length === 0) return;
+  await prisma.notificationOutbox.deleteMany({ where: { id: { in: ids } } });
+};
+
+/**
+ * Return failed intents to the queue with exponential backoff, or mark them FAILED
+ * once they have used up their attempts
+ */
+export const retryOutboxEntries = async (
+  entries: OutboxEntry[],
+  error: unknown,
+  maxAttempts: number,
+  baseDelayMs: number
+): Promise<void> => {
+  const lastError = error instanceof Error ? error.message : String(error);
+  const exhausted = entries.filter(entry => entry.attempts >= maxAttempts);
+  const retryable = entries.filter(entry => entry.attempts < maxAttempts);
+
+  if (exhausted.length > 0) {
+    await prisma.notificationOutbox.updateMany({
+      where: { id: { in: exhausted.map(entry => entry.id) } },
+      data: { status: 'FAILED', lockedAt: null, lastError }
+    });
+    console.error(`❌ ${exhausted.length} notification(s) failed after ${maxAttempts} attempts: ${lastError}`);
+  }
+
+  // Entries of one group share an attempt count in practice; group by it to keep updates batched
+  const byAttempts = new Map<number, string[]>();
+  for (const entry of retryable) {
+    const ids = byAttempts.get(entry.attempts) || [];
+    ids.push(entry.id);
+    byAttempts.set(entry.attempts, ids);
+  }
+
+  for (const [attempts, ids] of byAttempts) {
+    const delay = Math.min(baseDelayMs * Math.pow(2, attempts - 1), 5 * 60 * 1000);
+    await prisma.notificationOutbox.updateMany({
+      where: { id: { in: ids } },
+      data: { status: 'PENDING', lockedAt: null, lastError, availableAt: new Date(Date.now() + delay) }
+    });
+  }
+};
+
+/**
+ * Count intents waiting for delivery and remember it for backpressure
+ */
+export const refreshOutboxDepth = async (): Promise<number> => {
+  observedDepth = await prisma.notificationOutbox.count({
+    where: { status: { in: ['PENDING', 'PROCESSING'] } }
+  });
+  return observedDepth;
+};
+
+export const getObservedOutboxDepth = (): number => observedDepth;
+
+/**
+ * Delete FAILED intents created more than `retentionMs` ago. Delivered intents are deleted
+ * on completion, so FAILED rows are the only ones that accumulate. Returns the number deleted.
+ */
+export const pruneOutboxEntries = async (retentionMs: number): Promise<number> => {
+  const result = await prisma.notificationOutbox.deleteMany({
+    where: { status: 'FAILED', createdAt: { lt: new Date(Date.now() - retentionMs) } }
+  });
+  if (result.count > 0) console.log(`🧹 Pruned ${result.count} failed notification(s) from the outbox`);
+  return result.count;
+};
+
+/**
+ * Outbox backpressure figures for monitoring
+ */
+export const getOutboxStats = () => ({
+  depth: observedDepth,
+  maxPending: OUTBOX_MAX_PENDING,
+  dropped: droppedCount
+});
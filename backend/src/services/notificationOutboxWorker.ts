@@ -0,0 +1,182 @@
+import { NotificationService, PushClient } from './notificationService';
+import {
+  OutboxEntry,
+  claimOutboxBatch,
+  completeOutboxEntries,
+  outboxEvents,
+  pruneOutboxEntries,
+  refreshOutboxDepth,
+  retryOutboxEntries
+} from './notificationOutbox';
+import { mapWithConcurrency } from '../utils/concurrency';
+
+const DEBUG = process.env.NODE_ENV === 'development';
+
+// How often FAILED intents past their retention are pruned
+const PRUNE_INTERVAL = 60 * 60 * 1000;
+
+export interface NotificationOutboxWorkerOptions {
+  // Push client used for delivery (defaults to the shared Expo client)
+  pushClient?: PushClient;
+  // Maximum intents claimed per drain
+  batchSize?: number;
+  // Maximum organizations delivered in parallel
+  concurrency?: number;
+  // Idle poll interval in milliseconds
+  pollInterval?: number;
+  // Attempts before an intent is marked FAILED
+  maxAttempts?: number;
+  // Base retry delay in milliseconds (doubled per attempt)
+  retryDelay?: number;
+  // Time after which a PROCESSING row is considered abandoned
+  lockTimeout?: number;
+  // How long FAILED intents are kept before they are pruned
+  retention?: number;
+}
+
+/**
+ * Drains the notification outbox in batches, grouped by organization, with bounded
+ * parallelism and per-batch retries. Runs independently of the monitoring loop.
+ */
+export class NotificationOutboxWorker {
+  private readonly pushClient?: PushClient;
+  private readonly batchSize: number;
+  private readonly concurrency: number;
+  private readonly pollInterval: number;
+  private readonly maxAttempts: number;
+  private readonly retryDelay: number;
+  private readonly lockTimeout: number;
+  private readonly retention: number;
+
+  private isRunning = false;
+  private lastPrunedAt = 0;
+  private timer: NodeJS.Timeout | null = null;
+  private loopPromise: Promise<void> | null = null;
+  private wakeRequested = false;
+  private readonly onEnqueued = () => this.wake();
+
+  constructor(options: NotificationOutboxWorkerOptions = {}) {
+    this.pushClient = options.pushClient;
+    this.batchSize = options.batchSize ?? parseInt(process.env.NOTIFICATION_OUTBOX_BATCH_SIZE || '200');
+    this.concurrency = options.concurrency ?? parseInt(process.env.NOTIFICATION_OUTBOX_CONCURRENCY || '4');
+    this.pollInterval = options.pollInterval ?? parseInt(process.env.NOTIFICATION_OUTBOX_POLL_INTERVAL || '2000');
+    this.maxAttempts = options.maxAttempts ?? 5;
+    this.retryDelay = options.retryDelay ?? 5000;
+    this.lockTimeout = options.lockTimeout ?? 5 * 60 * 1000;
+    this.retention = options.retention ?? parseInt(process.env.NOTIFICATION_OUTBOX_RETENTION_MS || String(7 * 24 * 60 * 60 * 1000));
+  }
+
+  /**
+   * Start draining the outbox
+   */
+  start(): void {
+    if (this.isRunning) return;
+    this.isRunning = true;
+    outboxEvents.on('enqueued', this.onEnqueued);
+    console.log(`📮 Notification outbox worker started (batch: ${this.batchSize}, concurrency: ${this.concurrency})`);
+    this.wake();
+  }
+
+  /**
+   * Stop the worker, waiting for the batch in progress to finish
+   */
+  async stop(): Promise<void> {
+    this.isRunning = false;
+    outboxEvents.off('enqueued', this.onEnqueued);
+    if (this.timer) {
+      clearTimeout(this.timer);
+      this.timer = null;
+    }
+    if (this.loopPromise) {
+      await this.loopPromise;
+    }
+    console.log('🛑 Notification outbox worker stopped');
+  }
+
+  /**
+   * Drain immediately instead of waiting for the next poll
+   */
+  wake(): void {
+    if (!this.isRunning) return;
+    if (this.loopPromise) {
+      // Intents arrived mid-drain; run another pass as soon as this one ends
+      this.wakeRequested = true;
+      return;
+    }
+    if (this.timer) {
+      clearTimeout(this.timer);
+      this.timer = null;
+    }
+    this.loopPromise = this.runLoop().finally(() => {
+      this.loopPromise = null;
+      if (this.wakeRequested) {
+        this.wakeRequested = false;
+        this.wake();
+      } else {
+        this.scheduleNextPoll();
+      }
+    });
+  }
+
+  /**
+   * Claim and deliver one batch. Returns the number of intents claimed.
+   */
+  async drainOnce(): Promise<number> {
+    const entries = await claimOutboxBatch(this.batchSize, this.lockTimeout);
+    if (entries.length === 0) return 0;
+
+    const byOrg = new Map<string, OutboxEntry[]>();
+    for (const entry of entries) {
+      const group = byOrg.get(entry.organizationId) || [];
+      group.push(entry);
+      byOrg.set(entry.organizationId, group);
+    }
+
+    await mapWithConcurrency(Array.from(byOrg), this.concurrency, async ([organizationId, group]) => {
+      try {
+        await NotificationService.deliverToOrganization(
+          organizationId,
+          group.map(entry => entry.payload),
+          this.pushClient
+        );
+        await completeOutboxEntries(group.map(entry => entry.id));
+      } catch (error) {
+        console.error(`❌ Outbox delivery failed for organization ${organizationId}:`, error);
+        await retryOutboxEntries(group, error, this.maxAttempts, this.retryDelay);
+      }
+    });
+
+    if (DEBUG) console.log(`📮 Outbox drained ${entries.length} intent(s) for ${byOrg.size} organization(s)`);
+    return entries.length;
+  }
+
+  // Keep draining while batches come back full, then fall back to polling
+  private async runLoop(): Promise<void> {
+    try {
+      while (this.isRunning) {
+        const claimed = await this.drainOnce();
+        if (claimed < this.batchSize) break;
+      }
+      await refreshOutboxDepth();
+
+      if (Date.now() - this.lastPrunedAt >= PRUNE_INTERVAL) {
+        this.lastPrunedAt = Date.now();
+        await pruneOutboxEntries(this.retention);
+      }
+    } catch (error) {
+      console.error('🔴 Error draining notification outbox:', error);
+    }
+  }
+
+  private scheduleNextPoll(): void {
+    if (!this.isRunning || this.timer) return;
+    this.timer = setTimeout(() => {
+      this.timer = null;
+      this.wake();
+    }, this.pollInterval);
+  }
+}
+
+export const notificationOutboxWorker = new NotificationOutboxWorker();
+
+export default notificationOutboxWorker;
@@ -1,8 +1,25 @@
+import { randomUUID } from 'crypto';
 import { Expo, ExpoPushMessage } from 'expo-server-sdk';
 import prisma from '../config/db';
+import { getOrgContext } from './orgContextCache';
+import { recordPushTickets } from './pushReceiptService';
+import { chunkArray, mapWithConcurrency } from '../utils/concurrency';
 
 const expo = new Expo();
 
+/**
+ * The part of the Expo SDK used for sending pushes (stubbed in tests and by the outbox worker)
+ */
+export type PushClient = Pick<Expo, 'chunkPushNotifications' | 'sendPushNotificationsAsync'>;
+
+const DEBUG = process.env.NODE_ENV === 'development';
+
+// Maximum number of Expo push chunks in flight at once
+const PUSH_SEND_CONCURRENCY = parseInt(process.env.PUSH_SEND_CONCURRENCY || '4');
+
+// Maximum rows per notification INSERT statement
+const NOTIFICATION_INSERT_CHUNK_SIZE = 1000;
+
 // Define NotificationPriority type to match what Prisma expects
 type NotificationPriority = 'HIGH' | 'MEDIUM' | 'LOW';
 
@@ -25,7 +42,7 @@ type UserWithSettings = {
   } | null;
 };
 
-interface CreateNotificationParams {
+export interface CreateNotificationParams {
   title: string;
   body: string;
   severity?: 'CRITICAL' | 'WARNING' | 'INFO';
@@ -34,6 +51,17 @@ interface CreateNotificationParams {
   organizationId?: string;
 }
 
+// Row shape written by the bulk notification insert
+type NotificationRow = {
+  id: string;
+  userId: string;
+  title: string;
+  body: string;
+  type: NonNullable<CreateNotificationParams['type']>;
+  priority: NotificationPriority;
+  organizationId: string;
+};
+
 // Helper function for database operations with retry
 async function withRetry<T>(operation: () => Promise<T>, maxRetries = 3): Promise<T> {
   let lastError: unknown;
@@ -61,6 +89,60 @@ async function withRetry<T>(operation: () => Promise<T>, maxRetries = 3): Promis
   throw lastError;
 }
 
+// Users with a push token in an organization, with their settings for that organization
+type Recipient = {
+  id: string;
+  role: string;
+  pushToken: string | null;
+  settings: UserWithSettings['notificationSettings'];
+};
+
+/**
+ * Decide whether a recipient should receive a notification of the given severity
+ */
+const isRecipientEligible = (
+  recipient: Recipient,
+  severity: CreateNotificationParams['severity'],
+  currentHour: number
+): boolean => {
+  // Exclude SUPER_ADMIN users from all notifications
+  if (recipient.role === 'SUPER_ADMIN') {
+    if (DEBUG) console.log(`🚫 Skipping SUPER_ADMIN user ${recipient.id} for notifications`);
+    return false;
+  }
+
+  const settings = recipient.settings;
+  if (!settings) {
+    // Use default settings - user will receive notifications
+    return true;
+  }
+
+  if (!settings.pushEnabled) {
+    if (DEBUG) console.log(`🔕 User ${recipient.id} has disabled push notifications`);
+    return false;
+  }
+
+  if (settings.criticalOnly && severity !== 'CRITICAL') {
+    if (DEBUG) console.log(`⚡ User ${recipient.id} only wants critical notifications`);
+    return false;
+  }
+
+  // Check mute hours
+  if (settings.muteFrom !== null && settings.muteTo !== null) {
+    const muteFrom = settings.muteFrom;
+    const muteTo = settings.muteTo;
+    const isMuted = muteFrom < muteTo
+      ? currentHour >= muteFrom && currentHour < muteTo
+      : currentHour >= muteFrom || currentHour < muteTo;
+    if (isMuted) {
+      if (DEBUG) console.log(`🌙 User ${recipient.id} has muted notifications for current hour`);
+      return false;
+    }
+  }
+
+  return true;
+};
+
 /**
  * Service for handling notifications
  */
@@ -69,165 +151,195 @@ export class NotificationService {
    * Create and send notifications to all eligible users
    */
   static async createNotification(data: CreateNotificationParams): Promise<void> {
-    try {
-      console.log('🔔 Creating notification:', {
-        title: data.title,
-        body: data.body,
-        severity: data.severity || 'INFO',
-        type: data.type || 'INFO',
-        metadata: data.metadata,
-        organizationId: data.organizationId
-      });
-      
+    console.log('🔔 Creating notification:', {
+      title: data.title,
+      severity: data.severity || 'INFO',
+      type: data.type || 'INFO',
+      organizationId: data.organizationId
+    });
+
+    await this.createNotifications([data]);
+  }
+
+  /**
+   * Create and send a batch of notifications (e.g. every alarm raised in one monitoring cycle).
+   * Recipients are resolved once per organization, rows are written with bulk inserts and
+   * push chunks are sent concurrently.
+   */
+  static async createNotifications(
+    batch: CreateNotificationParams[],
+    pushClient: PushClient = expo
+  ): Promise<void> {
+    // Group by organization so each organization's recipients are loaded once
+    const byOrg = new Map<string, CreateNotificationParams[]>();
+    for (const data of batch) {
       // Validate that organizationId is provided
       if (!data.organizationId) {
         console.error('❌ Organization ID is required for notifications');
-        return;
+        continue;
       }
-      
-      // Check if organization is enabled
-      const org = await prisma.organization.findUnique({
-        where: { id: data.organizationId },
-        select: { isEnabled: true }
-      });
-      
-      if (!org?.isEnabled) {
-        console.log('🛑 Organization disabled - skipping notification creation');
-        return;
+      const group = byOrg.get(data.organizationId);
+      if (group) {
+        group.push(data);
+      } else {
+        byOrg.set(data.organizationId, [data]);
       }
-      
-      // Get users from the specific organization with notification settings and push tokens
-      const users = await withRetry(() => prisma.user.findMany({
-        where: {
-          pushToken: { not: null }, // Only get users with push tokens
-          organizationId: data.organizationId // CRITICAL: Filter by organization
-        },
-        include: {
-          notificationSettings: true
-        }
-      }));
-      
-      console.log(`📱 Found ${users.length} users with push tokens in organization ${data.organizationId}`);
-      
-      // Filter users who should receive this notification
-      const eligibleUsers = users.filter((user: any) => {
-        // Exclude SUPER_ADMIN users from all notifications
-        if (user.role === 'SUPER_ADMIN') {
-          console.log(`🚫 Skipping SUPER_ADMIN user ${user.id} for notifications`);
-          return false;
-        }
-        
-        // Find notification settings for the correct organization
-        let settings = null;
-        if (Array.isArray(user.notificationSettings)) {
-          settings = user.notificationSettings.find((ns: any) => ns.organizationId === data.organizationId);
-        } else if (user.notificationSettings) {
-          settings = user.notificationSettings;
-        }
-        
-        if (!settings) {
-          console.log(`ℹ️ User ${user.id} has no notification settings for org ${data.organizationId}, using defaults`);
-          // Use default settings - user will receive notifications
-          return true;
-        }
-        
-        if (!settings.pushEnabled) {
-          console.log(`🔕 User ${user.id} has disabled push notifications`);
-          return false;
-        }
-        
-        if (settings.criticalOnly && data.severity !== 'CRITICAL') {
-          console.log(`⚡ User ${user.id} only wants critical notifications`);
-          return false;
-        }
-        
-        // Check mute hours
-        if (settings.muteFrom !== null && settings.muteTo !== null) {
-          const currentHour = new Date().getHours();
-          const muteFrom = settings.muteFrom;
-          const muteTo = settings.muteTo;
-          if (muteFrom < muteTo) {
-            if (currentHour >= muteFrom && currentHour < muteTo) {
-              console.log(`🌙 User ${user.id} has muted notifications for current hour`);
-              return false;
-            }
-          } else {
-            if (currentHour >= muteFrom || currentHour < muteTo) {
-              console.log(`🌙 User ${user.id} has muted notifications for current hour`);
-              return false;
-            }
-          }
+    }
+
+    for (const [organizationId, notifications] of byOrg) {
+      try {
+        await this.deliverToOrganization(organizationId, notifications, pushClient);
+      } catch (error) {
+        console.error(`❌ Error creating notifications for organization ${organizationId}:`, error);
+      }
+    }
+  }
+
+  /**
+   * Resolve the push recipients of an organization
+   */
+  private static async getRecipients(organizationId: string): Promise<Recipient[]> {
+    // Get users from the specific organization with notification settings and push tokens
+    const users = await withRetry(() => prisma.user.findMany({
+      where: {
+        pushToken: { not: null }, // Only get users with push tokens
+        organizationId // CRITICAL: Filter by organization
+      },
+      select: {
+        id: true,
+        role: true,
+        pushToken: true,
+        notificationSettings: {
+          where: { organizationId },
+          select: { pushEnabled: true, criticalOnly: true, muteFrom: true, muteTo: true }
         }
-        
-        return true;
-      });
-      
-      console.log(`✅ Found ${eligibleUsers.length} eligible users for notification in organization ${data.organizationId}`);
-      
-      // Prepare messages for batch sending
-      const messages: ExpoPushMessage[] = [];
-      
-      // For each eligible user, create a notification and prepare push message
-      for (const user of eligibleUsers) {
-        try {
-          // Create notification in database with retry logic
-          const notification = await withRetry(() => prisma.notification.create({
+      }
+    }));
+
+    return users.map(user => ({
+      id: user.id,
+      role: user.role,
+      pushToken: user.pushToken,
+      settings: user.notificationSettings[0] || null
+    }));
+  }
+
+  /**
+   * Write and push a batch of notifications for one organization.
+   * Throws if recipients cannot be loaded or rows cannot be written, so callers may retry;
+   * push failures are logged only, since the rows already exist.
+   */
+  static async deliverToOrganization(
+    organizationId: string,
+    notifications: CreateNotificationParams[],
+    pushClient: PushClient = expo
+  ): Promise<void> {
+    // Check if organization is enabled
+    const org = await getOrgContext(organizationId);
+
+    if (!org?.isEnabled) {
+      console.log('🛑 Organization disabled - skipping notification creation');
+      return;
+    }
+
+    const recipients = await this.getRecipients(organizationId);
+    console.log(`📱 Found ${recipients.length} users with push tokens in organization ${organizationId}`);
+
+    const currentHour = new Date().getHours();
+    const rows: NotificationRow[] = [];
+    const messages: ExpoPushMessage[] = [];
+
+    for (const data of notifications) {
+      for (const recipient of recipients) {
+        if (!isRecipientEligible(recipient, data.severity, currentHour)) continue;
+
+        // IDs are generated here so push payloads can reference rows written by createMany
+        const notificationId = randomUUID();
+        rows.push({
+          id: notificationId,
+          userId: recipient.id,
+          title: data.title,
+          body: data.body,
+          type: data.type || 'INFO',
+          priority: PRIORITY_MAP[data.severity || 'INFO'],
+          organizationId
+        });
+
+        // Add push message to batch if token exists and is valid
+        if (recipient.pushToken && Expo.isExpoPushToken(recipient.pushToken)) {
+          messages.push({
+            to: recipient.pushToken,
+            sound: data.severity === 'CRITICAL' ? 'critical.wav' : 'default',
+            title: data.title,
+            body: data.body,
             data: {
-              userId: user.id,
-              title: data.title,
-              body: data.body,
-              type: data.type || 'INFO',
-              priority: PRIORITY_MAP[data.severity || 'INFO'],
-              organizationId: data.organizationId!, // We've already validated this exists
-            }
-          }));
-          
-          console.log(`📝 Created notification in database for user ${user.id} in organization ${data.organizationId}`);
-          
-          // Add push message to batch if token exists and is valid
-          if (user.pushToken && Expo.isExpoPushToken(user.pushToken)) {
-            messages.push({
-              to: user.pushToken,
-              sound: data.severity === 'CRITICAL' ? 'critical.wav' : 'default',
-              title: data.title,
-              body: data.body,
-              data: { 
-                notificationId: notification.id,
-                type: data.type,
-                severity: data.severity,
-                organizationId: data.organizationId // Include organizationId in push data
-              },
-              priority: data.severity === 'CRITICAL' ? 'high' : 'normal',
-              badge: 1
-            });
-            console.log(`📬 Prepared push message for user ${user.id} in organization ${data.organizationId}`);
-          }
-        } catch (error) {
-          console.error(`❌ Error creating notification for user ${user.id}:`, error);
+              notificationId,
+              type: data.type,
+              severity: data.severity,
+              organizationId // Include organizationId in push data
+            },
+            priority: data.severity === 'CRITICAL' ? 'high' : 'normal',
+            badge: 1
+          });
         }
       }
-      
-      // Send push notifications in batches
-      if (messages.length > 0) {
-        try {
-          console.log(`🚀 Sending ${messages.length} push notifications for organization ${data.organizationId}...`);
-          const chunks = expo.chunkPushNotifications(messages);
-          
-          for (const chunk of chunks) {
-            const ticketChunk = await expo.sendPushNotificationsAsync(chunk);
-            console.log('📨 Push notification result:', ticketChunk);
-          }
-          
-          console.log(`✅ Successfully sent all push notifications for organization ${data.organizationId}`);
-        } catch (error) {
-          console.error('❌ Error sending push notifications:', error);
-        }
-      } else {
-        console.log(`ℹ️ No push notifications to send for organization ${data.organizationId}`);
+    }
+
+    if (rows.length === 0) {
+      console.log(`ℹ️ No eligible users for ${notifications.length} notification(s) in organization ${organizationId}`);
+      return;
+    }
+
+    // Bulk insert, bounded per statement to keep parameter counts reasonable.
+    // All chunks commit together so a retried batch never leaves duplicate rows behind.
+    const results = await withRetry(() => prisma.$transaction(
+      chunkArray(rows, NOTIFICATION_INSERT_CHUNK_SIZE).map(chunk => prisma.notification.createMany({ data: chunk }))
+    ));
+    const created = results.reduce((total, result) => total + result.count, 0);
+
+    console.log(`📝 Created ${created} notifications for ${notifications.length} event(s) in organization ${organizationId}`);
+
+    await this.sendPushMessages(messages, organizationId, pushClient);
+  }
+
+  /**
+   * Send push messages in Expo-sized chunks with bounded parallelism
+   */
+  private static async sendPushMessages(
+    messages: ExpoPushMessage[],
+    organizationId: string,
+    pushClient: PushClient
+  ): Promise<void> {
+    if (messages.length === 0) {
+      console.log(`ℹ️ No push notifications to send for organization ${organizationId}`);
+      return;
+    }
+
+    console.log(`🚀 Sending ${messages.length} push notifications for organization ${organizationId}...`);
+    const chunks = pushClient.chunkPushNotifications(messages);
+
+    const results = await mapWithConcurrency(chunks, PUSH_SEND_CONCURRENCY, async chunk => {
+      const startedAt = Date.now();
+      const tickets = await pushClient.sendPushNotificationsAsync(chunk);
+      // Keep tickets for the receipt job instead of dropping them
+      await recordPushTickets(organizationId, chunk, tickets, Date.now() - startedAt);
+      return tickets;
+    });
+
+    let failedChunks = 0;
+    results.forEach(result => {
+      if (result.status === 'rejected') {
+        failedChunks++;
+        console.error('❌ Error sending push notifications:', result.reason);
+      } else if (DEBUG) {
+        console.log('📨 Push notification result:', result.value);
       }
-      
-    } catch (error) {
-      console.error('❌ Error in createNotification:', error);
+    });
+
+    if (failedChunks === 0) {
+      console.log(`✅ Successfully sent all push notifications for organization ${organizationId}`);
+    } else {
+      console.warn(`⚠️ ${failedChunks}/${chunks.length} push chunks failed for organization ${organizationId}`);
     }
   }
   
@@ -0,0 +1,180 @@
+import prisma from '../config/db';
+
+const DEBUG = process.env.NODE_ENV === 'development';
+
+// Safety-net TTL for cached organization context (default: 5 minutes).
+// Write routes invalidate explicitly; the TTL only bounds staleness from out-of-band edits.
+const ORG_CONTEXT_TTL = parseInt(process.env.ORG_CONTEXT_TTL_MS || '300000');
+
+export interface OrgSetpoint {
+  id: string;
+  name: string;
+  type: string;
+  zone: string | null;
+  scadaField: string;
+  lowDeviation: number;
+  highDeviation: number;
+}
+
+export interface OrgMeterLimit {
+  id: string;
+  parameter: string;
+  description: string;
+  unit: string;
+  highLimit: number;
+  lowLimit: number | null;
+}
+
+/**
+ * Normalized lookup key for a setpoint: trimmed, case-insensitive name and type, exact zone
+ */
+export const setpointKey = (name: string, type: string, zone?: string | null): string => {
+  return `${name.trim().toLowerCase()}|${type.toLowerCase()}|${zone || ''}`;
+};
+
+// Build the (name, type, zone) index; the first setpoint wins if keys collide
+const buildSetpointIndex = (setpoints: OrgSetpoint[]): Map<string, OrgSetpoint> => {
+  const index = new Map<string, OrgSetpoint>();
+  for (const setpoint of setpoints) {
+    const key = setpointKey(setpoint.name, setpoint.type, setpoint.zone);
+    if (!index.has(key)) {
+      index.set(key, setpoint);
+    }
+  }
+  return index;
+};
+
+/**
+ * Everything the hot paths need to know about an organization, loaded in one query
+ */
+export interface OrgContext {
+  orgId: string;
+  name: string;
+  isEnabled: boolean;
+  schemaConfig: any;
+  scadaDbConfig: any;
+  maintenanceMode: boolean;
+  setpoints: OrgSetpoint[];
+  setpointIndex: ReadonlyMap<string, OrgSetpoint>;
+  meterLimits: OrgMeterLimit[];
+  loadedAt: number;
+}
+
+const contexts = new Map<string, OrgContext>();
+
+// Concurrent callers share a single in-flight load per organization
+const pendingLoads = new Map<string, Promise<OrgContext | null>>();
+
+// Bumped on every invalidation so a load that started before a write never repopulates the cache
+const generations = new Map<string, number>();
+let globalGeneration = 0;
+
+const getGeneration = (orgId: string) => `${globalGeneration}:${generations.get(orgId) || 0}`;
+
+// Json columns may hold either objects or serialized JSON strings
+const parseJsonColumn = (value: any) => {
+  if (typeof value === 'string') {
+    try {
+      return JSON.parse(value);
+    } catch {
+      return {};
+    }
+  }
+  return value || {};
+};
+
+async function loadOrgContext(orgId: string): Promise<OrgContext | null> {
+  const org = await prisma.organization.findUnique({
+    where: { id: orgId },
+    include: {
+      systemSettings: { select: { maintenanceMode: true } },
+      setpoints: {
+        select: {
+          id: true,
+          name: true,
+          type: true,
+          zone: true,
+          scadaField: true,
+          lowDeviation: true,
+          highDeviation: true
+        }
+      },
+      meterLimits: {
+        select: {
+          id: true,
+          parameter: true,
+          description: true,
+          unit: true,
+          highLimit: true,
+          lowLimit: true
+        },
+        orderBy: { parameter: 'asc' }
+      }
+    }
+  });
+
+  if (!org) return null;
+
+  return {
+    orgId: org.id,
+    name: org.name,
+    isEnabled: org.isEnabled,
+    schemaConfig: parseJsonColumn(org.schemaConfig),
+    scadaDbConfig: parseJsonColumn(org.scadaDbConfig),
+    maintenanceMode: org.systemSettings.some(settings => settings.maintenanceMode),
+    setpoints: org.setpoints,
+    setpointIndex: buildSetpointIndex(org.setpoints),
+    meterLimits: org.meterLimits,
+    loadedAt: Date.now()
+  };
+}
+
+/**
+ * Get the cached context for an organization, loading it from the main database when missing or expired.
+ * Returns null if the organization does not exist.
+ */
+export async function getOrgContext(orgId: string): Promise<OrgContext | null> {
+  const cached = contexts.get(orgId);
+  if (cached && Date.now() - cached.loadedAt < ORG_CONTEXT_TTL) {
+    return cached;
+  }
+
+  const pending = pendingLoads.get(orgId);
+  if (pending) return pending;
+
+  const generation = getGeneration(orgId);
+  const load = loadOrgContext(orgId)
+    .then(context => {
+      if (context && getGeneration(orgId) === generation) {
+        contexts.set(orgId, context);
+        if (DEBUG) console.log(`📦 Loaded org context for ${context.name} (${orgId})`);
+      }
+      return context;
+    })
+    .finally(() => {
+      if (pendingLoads.get(orgId) === load) {
+        pendingLoads.delete(orgId);
+      }
+    });
+
+  pendingLoads.set(orgId, load);
+  return load;
+}
+
+/**
+ * Drop cached context for one organization, or for all organizations when no ID is given.
+ * Call after any write to the organization, its system settings, setpoints or meter limits.
+ */
+export function invalidateOrgContext(orgId?: string): void {
+  if (orgId) {
+    contexts.delete(orgId);
+    pendingLoads.delete(orgId);
+    generations.set(orgId, (generations.get(orgId) || 0) + 1);
+    if (DEBUG) console.log(`🧹 Org context invalidated for ${orgId}`);
+  } else {
+    contexts.clear();
+    pendingLoads.clear();
+    globalGeneration++;
+    if (DEBUG) console.log('🧹 All org contexts invalidated');
+  }
+}
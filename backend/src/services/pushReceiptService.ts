@@ -0,0 +1,258 @@
+import { Expo, ExpoPushMessage, ExpoPushTicket } from 'expo-server-sdk';
+import prisma from '../config/db';
+import { mapWithConcurrency } from '../utils/concurrency';
+
+const DEBUG = process.env.NODE_ENV === 'development';
+
+const expo = new Expo();
+
+// How often receipts are checked (default: 15 minutes)
+const RECEIPT_CHECK_INTERVAL = parseInt(process.env.PUSH_RECEIPT_CHECK_INTERVAL || '900000');
+
+// Expo recommends waiting before fetching receipts; younger tickets are left for the next run
+const RECEIPT_MIN_AGE = parseInt(process.env.PUSH_RECEIPT_MIN_AGE_MS || '900000');
+
+// Expo keeps receipts for about a day; tickets older than this are dropped unresolved
+const RECEIPT_MAX_AGE = 24 * 60 * 60 * 1000;
+
+// Maximum tickets checked per run
+const RECEIPT_BATCH_SIZE = 5000;
+
+/**
+ * The part of the Expo SDK used for receipt checks (stubbed in tests)
+ */
+export type ReceiptClient = Pick<Expo, 'chunkPushNotificationReceiptIds' | 'getPushNotificationReceiptsAsync'>;
+
+/**
+ * Push delivery statistics for one organization since the server started
+ */
+export interface PushDeliveryStats {
+  organizationId: string;
+  ticketsIssued: number;
+  ticketErrors: number;
+  delivered: number;
+  failed: number;
+  expired: number;
+  deviceNotRegistered: number;
+  tokensCleared: number;
+  avgSendLatencyMs: number;
+  avgReceiptAgeMs: number;
+  lastSentAt?: Date;
+  lastCheckedAt?: Date;
+}
+
+const deliveryStats = new Map<string, PushDeliveryStats>();
+
+const getStats = (organizationId: string): PushDeliveryStats => {
+  let stats = deliveryStats.get(organizationId);
+  if (!stats) {
+    stats = {
+      organizationId,
+      ticketsIssued: 0,
+      ticketErrors: 0,
+      delivered: 0,
+      failed: 0,
+      expired: 0,
+      deviceNotRegistered: 0,
+      tokensCleared: 0,
+      avgSendLatencyMs: 0,
+      avgReceiptAgeMs: 0
+    };
+    deliveryStats.set(organizationId, stats);
+  }
+  return stats;
+};
+
+// Exponential moving average so the latency figures follow recent behaviour
+const movingAverage = (current: number, sample: number) => (current === 0 ? sample : current * 0.9 + sample * 0.1);
+
+/**
+ * Clear push tokens Expo reported as no longer registered.
+ * Returns the number of users updated.
+ */
+const clearInvalidTokens = async (tokens: string[]): Promise<number> => {
+  if (tokens.length === 0) return 0;
+
+  const result = await prisma.user.updateMany({
+    where: { pushToken: { in: tokens } },
+    data: { pushToken: null }
+  });
+
+  console.log(`🧹 Cleared ${result.count} unregistered push token(s)`);
+  return result.count;
+};
+
+/**
+ * Store the tickets of a sent chunk for a later receipt check. Tickets are in the same order
+ * as the chunk's messages; tokens rejected outright as DeviceNotRegistered are cleared now.
+ */
+export const recordPushTickets = async (
+  organizationId: string,
+  messages: ExpoPushMessage[],
+  tickets: ExpoPushTicket[],
+  sendLatencyMs: number
+): Promise<void> => {
+  const stats = getStats(organizationId);
+  const rows: { id: string; organizationId: string; pushToken: string }[] = [];
+  const unregisteredTokens: string[] = [];
+
+  tickets.forEach((ticket, index) => {
+    const pushToken = messages[index]?.to as string;
+    if (ticket.status === 'ok') {
+      rows.push({ id: ticket.id, organizationId, pushToken });
+    } else {
+      stats.ticketErrors++;
+      if (ticket.details?.error === 'DeviceNotRegistered' && pushToken) {
+        stats.deviceNotRegistered++;
+        unregisteredTokens.push(pushToken);
+      } else if (DEBUG) {
+        console.log(`⚠️ Push ticket error for org ${organizationId}: ${ticket.message}`);
+      }
+    }
+  });
+
+  stats.ticketsIssued += rows.length;
+  stats.avgSendLatencyMs = movingAverage(stats.avgSendLatencyMs, sendLatencyMs);
+  stats.lastSentAt = new Date();
+
+  try {
+    if (rows.length > 0) {
+      await prisma.pushTicket.createMany({ data: rows, skipDuplicates: true });
+    }
+    stats.tokensCleared += await clearInvalidTokens(unregisteredTokens);
+  } catch (error) {
+    console.error(`❌ Error recording push tickets for organization ${organizationId}:`, error);
+  }
+};
+
+/**
+ * Background job that fetches Expo push receipts, clears unregistered tokens
+ * and keeps per-organization delivery statistics
+ */
+export class PushReceiptService {
+  private static intervalId: NodeJS.Timeout | null = null;
+  private static isChecking = false;
+
+  /**
+   * Start periodic receipt checks
+   */
+  static start(client: ReceiptClient = expo): void {
+    if (this.intervalId) return;
+
+    this.intervalId = setInterval(async () => {
+      try {
+        await this.checkReceipts(client);
+      } catch (error) {
+        console.error('🔴 Error checking push receipts:', error);
+      }
+    }, RECEIPT_CHECK_INTERVAL);
+
+    console.log(`✅ Push receipt checks started (interval: ${RECEIPT_CHECK_INTERVAL}ms)`);
+  }
+
+  /**
+   * Stop periodic receipt checks
+   */
+  static stop(): void {
+    if (this.intervalId) {
+      clearInterval(this.intervalId);
+      this.intervalId = null;
+    }
+  }
+
+  /**
+   * Fetch receipts for tickets old enough to have them, in Expo-sized batches.
+   * Tickets are deleted once resolved; tickets whose receipt request failed are retried next run.
+   */
+  static async checkReceipts(client: ReceiptClient = expo) {
+    const summary = { checked: 0, delivered: 0, failed: 0, expired: 0, tokensCleared: 0 };
+    if (this.isChecking) return summary;
+    this.isChecking = true;
+
+    try {
+      const now = Date.now();
+      const tickets = await prisma.pushTicket.findMany({
+        where: { createdAt: { lte: new Date(now - RECEIPT_MIN_AGE) } },
+        orderBy: { createdAt: 'asc' },
+        take: RECEIPT_BATCH_SIZE
+      });
+
+      if (tickets.length === 0) return summary;
+
+      const ticketsById = new Map(tickets.map(ticket => [ticket.id, ticket]));
+      const resolvedIds = new Set<string>();
+      const unregisteredTokens = new Set<string>();
+
+      const chunks = client.chunkPushNotificationReceiptIds(tickets.map(ticket => ticket.id));
+      const results = await mapWithConcurrency(chunks, 2, ids => client.getPushNotificationReceiptsAsync(ids));
+
+      for (const result of results) {
+        if (result.status === 'rejected') {
+          console.error('❌ Error fetching push receipts:', result.reason);
+          continue;
+        }
+
+        for (const [ticketId, receipt] of Object.entries(result.value)) {
+          const ticket = ticketsById.get(ticketId);
+          if (!ticket) continue;
+
+          const stats = getStats(ticket.organizationId);
+          stats.avgReceiptAgeMs = movingAverage(stats.avgReceiptAgeMs, now - ticket.createdAt.getTime());
+          stats.lastCheckedAt = new Date(now);
+          resolvedIds.add(ticketId);
+
+          if (receipt.status === 'ok') {
+            stats.delivered++;
+            summary.delivered++;
+          } else {
+            stats.failed++;
+            summary.failed++;
+            if (receipt.details?.error === 'DeviceNotRegistered') {
+              stats.deviceNotRegistered++;
+              unregisteredTokens.add(ticket.pushToken);
+            } else if (DEBUG) {
+              console.log(`⚠️ Push receipt error for ticket ${ticketId}: ${receipt.message}`);
+            }
+          }
+        }
+      }
+
+      // Receipts are no longer available for old tickets
+      for (const ticket of tickets) {
+        if (!resolvedIds.has(ticket.id) && now - ticket.createdAt.getTime() > RECEIPT_MAX_AGE) {
+          getStats(ticket.organizationId).expired++;
+          summary.expired++;
+          resolvedIds.add(ticket.id);
+        }
+      }
+
+      if (resolvedIds.size > 0) {
+        await prisma.pushTicket.deleteMany({ where: { id: { in: Array.from(resolvedIds) } } });
+      }
+
+      // Attribute cleared tokens to the organizations that owned them
+      if (unregisteredTokens.size > 0) {
+        const tokenOrgs = new Map(tickets.map(ticket => [ticket.pushToken, ticket.organizationId]));
+        summary.tokensCleared = await clearInvalidTokens(Array.from(unregisteredTokens));
+        for (const token of unregisteredTokens) {
+          getStats(tokenOrgs.get(token)!).tokensCleared++;
+        }
+      }
+
+      summary.checked = resolvedIds.size;
+      console.log(`📬 Push receipts: ${summary.delivered} delivered, ${summary.failed} failed, ${summary.expired} expired, ${summary.tokensCleared} token(s) cleared`);
+      return summary;
+    } finally {
+      this.isChecking = false;
+    }
+  }
+
+  /**
+   * Delivery statistics for an organization
+   */
+  static getDeliveryStats(organizationId: string): PushDeliveryStats {
+    return { ...getStats(organizationId) };
+  }
+}
+
+export default PushReceiptService;
@@ -0,0 +1,357 @@
+import { isSafeIdentifier } from './alarmHistoryPlanner';
+import { ROLLUP_RESOLUTIONS, RollupCoverage, pickRollupResolution, rollupTableName } from './scadaRollup';
+
+const DEBUG = process.env.NODE_ENV === 'development';
+
+// Upper bound on chart points regardless of what the client asks for
+export const MAX_ANALYTICS_POINTS = 500;
+
+// Sub-buckets per chart point scanned by the LTTB option
+const LTTB_OVERSAMPLE = 4;
+
+export type DownsampleMode = 'bucket' | 'lttb';
+
+/**
+ * Per-slot aggregate of one analog column
+ */
+export interface ColumnAggregate {
+  min: number | null;
+  max: number | null;
+  avg: number | null;
+  last: number | null;
+  // Representative value drawn on the chart (avg for 'bucket', the LTTB pick for 'lttb')
+  value: number | null;
+}
+
+/**
+ * One chart point: a time slot with aggregates for every requested column
+ */
+export interface DownsampledSlot {
+  time: Date;
+  samples: number;
+  analog: Record<string, ColumnAggregate>;
+  // 1 if the binary field was set at any sample in the slot
+  binary: Record<string, number | null>;
+}
+
+// Longest analytics window, the longest range the app offers (default: 7 days)
+export const MAX_ANALYTICS_WINDOW = parseInt(process.env.SCADA_ANALYTICS_MAX_WINDOW_MS || String(7 * 24 * 60 * 60 * 1000));
+
+/**
+ * Window length of an analytics time filter such as '20s', '2m', '24h' or '7d'.
+ * Returns null for malformed, zero or over-long (> MAX_ANALYTICS_WINDOW) filters.
+ */
+export const parseAnalyticsWindow = (timeFilter: string): number | null => {
+  const match = /^(\d+)(s|m|h|d)$/.exec(timeFilter);
+  if (!match) return null;
+
+  const unitMs = { s: 1000, m: 60 * 1000, h: 60 * 60 * 1000, d: 24 * 60 * 60 * 1000 }[match[2] as 's' | 'm' | 'h' | 'd'];
+  const durationMs = parseInt(match[1]) * unitMs;
+  return durationMs > 0 && durationMs <= MAX_ANALYTICS_WINDOW ? durationMs : null;
+};
+
+/**
+ * Default number of chart points for a time filter (short windows keep their original density)
+ */
+export const getTargetPoints = (timeFilter: string, durationMs: number): number => {
+  switch (timeFilter) {
+    case '10s':
+      return 10;
+    case '15s':
+      return 15;
+    case '20s':
+    case '1m':
+      return 20;
+    case '2m':
+      return 24;
+    default:
+      return durationMs <= 60 * 60 * 1000 ? 60 : durationMs <= 24 * 60 * 60 * 1000 ? 96 : 168;
+  }
+};
+
+const toNumber = (value: any): number | null => {
+  if (value === null || value === undefined) return null;
+  const parsed = typeof value === 'number' ? value : parseFloat(value);
+  return isNaN(parsed) ? null : parsed;
+};
+
+/**
+ * Fine-grained buckets aggregated in SQL with date_bin: min / max / avg / last per analog
+ * column and "any set" per binary column. Only the aggregates leave the database.
+ *
+ * With a rollup table, complete rollup buckets before its high-water mark ($4) are combined
+ * with raw rows after it, so the open tail of the window stays exact. The partial rollup bucket
+ * at the head of the window (from $1 to the first bucket boundary) is read from raw rows too.
+ */
+const buildBucketQuery = (
+  table: string,
+  timeColumn: string,
+  analogColumns: string[],
+  binaryColumns: string[],
+  rollup?: { table: string; bucketType: string; unit: string }
+): string => {
+  // First rollup bucket boundary at or after the window start
+  const headEnd = rollup
+    ? `date_trunc('${rollup.unit}', $1::${rollup.bucketType} + interval '1 ${rollup.unit}' - interval '1 microsecond')`
+    : '';
+
+  const rawBranch = `
+        SELECT ${[
+          `${timeColumn} AS ts`,
+          '1 AS samples',
+          ...analogColumns.flatMap(column => [`min`, `max`, `avg`, `last`].map(part => `${column}::float8 AS "${column}__${part}"`)),
+          ...binaryColumns.map(column => `CASE WHEN (${column})::int <> 0 THEN 1 ELSE 0 END AS "${column}__true"`)
+        ].join(', ')}
+        FROM ${table}
+        WHERE ${rollup
+          ? `((${timeColumn} >= $1 AND ${timeColumn} < LEAST(${headEnd}, $4::${rollup.bucketType})) OR ${timeColumn} >= GREATEST($1, $4::${rollup.bucketType}))`
+          : `${timeColumn} >= $1`} AND ${timeColumn} <= $2`;
+
+  const rollupBranch = rollup ? `
+        SELECT ${[
+          'bucket AS ts',
+          'samples',
+          ...analogColumns.flatMap(column => [`min`, `max`, `avg`, `last`].map(part => `${column}_${part} AS "${column}__${part}"`)),
+          ...binaryColumns.map(column => `${column}_true AS "${column}__true"`)
+        ].join(', ')}
+        FROM ${rollup.table}
+        WHERE bucket >= ${headEnd} AND bucket < LEAST($2, $4::${rollup.bucketType})
+        UNION ALL` : '';
+
+  const select = [
+    `date_bin(make_interval(secs => $3), ts, $1) AS bucket`,
+    'SUM(samples)::int AS samples',
+    ...analogColumns.flatMap(column => [
+      `MIN("${column}__min") AS "${column}__min"`,
+      `MAX("${column}__max") AS "${column}__max"`,
+      `SUM("${column}__avg" * samples) / NULLIF(SUM(samples) FILTER (WHERE "${column}__avg" IS NOT NULL), 0) AS "${column}__avg"`,
+      `(ARRAY_AGG("${column}__last" ORDER BY ts DESC) FILTER (WHERE "${column}__last" IS NOT NULL))[1] AS "${column}__last"`
+    ]),
+    ...binaryColumns.map(column => `MAX(CASE WHEN "${column}__true" > 0 THEN 1 ELSE 0 END) AS "${column}__any"`)
+  ];
+
+  return `
+      WITH source AS (${rollupBranch}${rawBranch}
+      )
+      SELECT ${select.join(',\n        ')}
+      FROM source
+      GROUP BY 1
+      ORDER BY 1 ASC
+  `;
+};
+
+interface FineBucket {
+  time: number;
+  samples: number;
+  row: any;
+}
+
+// Twice the area of the triangle (a, b, c); only the relative size matters
+const triangleArea = (a: { x: number; y: number }, b: { x: number; y: number }, c: { x: number; y: number }) =>
+  Math.abs((a.x - c.x) * (b.y - a.y) - (a.x - b.x) * (c.y - a.y));
+
+/**
+ * Largest-Triangle-Three-Buckets over pre-grouped buckets: from each group pick the candidate
+ * (a sub-bucket's min or max) forming the largest triangle with the previous pick and the
+ * average of the next group, so peaks and troughs survive downsampling.
+ */
+export const largestTriangleThreeBuckets = (
+  groups: { x: number; y: number }[][]
+): (number | null)[] => {
+  const picks: (number | null)[] = new Array(groups.length).fill(null);
+  let previous: { x: number; y: number } | null = null;
+
+  for (let i = 0; i < groups.length; i++) {
+    const candidates = groups[i];
+    if (candidates.length === 0) continue;
+
+    // Anchor the series on its first and last samples
+    if (previous === null || i === groups.length - 1) {
+      const anchor = previous === null ? candidates[0] : candidates[candidates.length - 1];
+      picks[i] = anchor.y;
+      previous = anchor;
+      continue;
+    }
+
+    const next = groups.slice(i + 1).find(group => group.length > 0);
+    const target = next
+      ? {
+          x: next.reduce((sum, point) => sum + point.x, 0) / next.length,
+          y: next.reduce((sum, point) => sum + point.y, 0) / next.length
+        }
+      : candidates[candidates.length - 1];
+
+    let best = candidates[0];
+    let bestArea = -1;
+    for (const candidate of candidates) {
+      const area = triangleArea(previous, candidate, target);
+      if (area > bestArea) {
+        bestArea = area;
+        best = candidate;
+      }
+    }
+
+    picks[i] = best.y;
+    previous = best;
+  }
+
+  return picks;
+};
+
+/**
+ * Downsample a time window of an organization's SCADA table into `targetPoints` slots.
+ * 'bucket' draws the per-slot average; 'lttb' scans LTTB_OVERSAMPLE sub-buckets per slot and
+ * keeps the most significant extreme. When rollups cover the window, the coarsest one that
+ * fits a sub-bucket is read instead of raw rows.
+ */
+export const downsampleScadaWindow = async (
+  client: { query: (sql: string, params?: any[]) => Promise<{ rows: any[] }> },
+  options: {
+    table: string;
+    timeColumn?: string;
+    analogColumns: string[];
+    binaryColumns: string[];
+    start: Date;
+    end: Date;
+    targetPoints: number;
+    mode: DownsampleMode;
+    rollups?: RollupCoverage | null;
+  }
+): Promise<DownsampledSlot[]> => {
+  const timeColumn = options.timeColumn || 'created_timestamp';
+  const analogColumns = Array.from(new Set(options.analogColumns.filter(isSafeIdentifier)));
+  const binaryColumns = Array.from(new Set(options.binaryColumns.filter(isSafeIdentifier)));
+  const targetPoints = Math.max(1, Math.min(MAX_ANALYTICS_POINTS, options.targetPoints));
+  const oversample = options.mode === 'lttb' ? LTTB_OVERSAMPLE : 1;
+
+  const durationMs = Math.max(1000, options.end.getTime() - options.start.getTime());
+  const slotMs = Math.max(1000, Math.ceil(durationMs / targetPoints));
+  const bucketMs = slotMs / oversample;
+
+  const resolution = pickRollupResolution(bucketMs, options.rollups ?? null);
+  const highWater = resolution ? options.rollups!.highWater[resolution]! : null;
+  const rollup = resolution
+    ? {
+        table: rollupTableName(options.table, resolution),
+        bucketType: options.rollups!.bucketType,
+        unit: ROLLUP_RESOLUTIONS.find(level => level.resolution === resolution)!.unit
+      }
+    : undefined;
+
+  const result = await client.query(
+    buildBucketQuery(options.table, timeColumn, analogColumns, binaryColumns, rollup),
+    highWater !== null
+      ? [options.start, options.end, bucketMs / 1000, highWater]
+      : [options.start, options.end, bucketMs / 1000]
+  );
+
+  const fine: FineBucket[] = result.rows.map(row => ({
+    time: new Date(row.bucket).getTime(),
+    samples: row.samples,
+    row
+  }));
+
+  // Group sub-buckets into chart slots
+  const slots = new Map<number, FineBucket[]>();
+  for (const bucket of fine) {
+    const slot = Math.floor((bucket.time - options.start.getTime()) / slotMs);
+    const list = slots.get(slot) || [];
+    list.push(bucket);
+    slots.set(slot, list);
+  }
+  const slotKeys = Array.from(slots.keys()).sort((a, b) => a - b);
+  const grouped = slotKeys.map(key => slots.get(key)!);
+
+  const lttbPicks = new Map<string, (number | null)[]>();
+  if (options.mode === 'lttb') {
+    for (const column of analogColumns) {
+      lttbPicks.set(column, largestTriangleThreeBuckets(grouped.map(buckets =>
+        buckets.flatMap(bucket => {
+          const x = bucket.time + bucketMs / 2;
+          const min = toNumber(bucket.row[`${column}__min`]);
+          const max = toNumber(bucket.row[`${column}__max`]);
+          if (min === null || max === null) return [];
+          return min === max ? [{ x, y: min }] : [{ x, y: min }, { x, y: max }];
+        })
+      )));
+    }
+  }
+
+  const downsampled = grouped.map((buckets, index): DownsampledSlot => {
+    const samples = buckets.reduce((sum, bucket) => sum + bucket.samples, 0);
+    const analog: Record<string, ColumnAggregate> = {};
+
+    for (const column of analogColumns) {
+      let min: number | null = null;
+      let max: number | null = null;
+      let weightedSum = 0;
+      let weight = 0;
+      let last: number | null = null;
+
+      for (const bucket of buckets) {
+        const bucketMin = toNumber(bucket.row[`${column}__min`]);
+        const bucketMax = toNumber(bucket.row[`${column}__max`]);
+        const bucketAvg = toNumber(bucket.row[`${column}__avg`]);
+        const bucketLast = toNumber(bucket.row[`${column}__last`]);
+
+        if (bucketMin !== null) min = min === null ? bucketMin : Math.min(min, bucketMin);
+        if (bucketMax !== null) max = max === null ? bucketMax : Math.max(max, bucketMax);
+        if (bucketAvg !== null) {
+          weightedSum += bucketAvg * bucket.samples;
+          weight += bucket.samples;
+        }
+        if (bucketLast !== null) last = bucketLast;
+      }
+
+      const avg = weight > 0 ? weightedSum / weight : null;
+      analog[column] = {
+        min,
+        max,
+        avg,
+        last,
+        value: options.mode === 'lttb' ? lttbPicks.get(column)![index] ?? avg : avg
+      };
+    }
+
+    const binary: Record<string, number | null> = {};
+    for (const column of binaryColumns) {
+      const values = buckets.map(bucket => bucket.row[`${column}__any`]).filter(value => value !== null && value !== undefined);
+      binary[column] = values.length > 0 ? Math.max(...values.map(Number)) : null;
+    }
+
+    return {
+      time: new Date(options.start.getTime() + slotKeys[index] * slotMs),
+      samples,
+      analog,
+      binary
+    };
+  });
+
+  if (DEBUG) {
+    console.log(`📉 Downsampled ${options.table} (${options.mode}, ${resolution ? `rollup ${resolution}` : 'raw'}): ${fine.length} bucket(s) of ${bucketMs}ms -> ${downsampled.length} point(s)`);
+  }
+
+  return downsampled;
+};
+
+/**
+ * Treat raw rows as single-sample slots (used when the window is empty and the latest rows are shown)
+ */
+export const rowsToSlots = (
+  rows: any[],
+  analogColumns: string[],
+  binaryColumns: string[],
+  timeColumn = 'created_timestamp'
+): DownsampledSlot[] =>
+  rows.map(row => ({
+    time: new Date(row[timeColumn]),
+    samples: 1,
+    analog: Object.fromEntries(analogColumns.map(column => {
+      const value = toNumber(row[column]);
+      return [column, { min: value, max: value, avg: value, last: value, value }];
+    })),
+    binary: Object.fromEntries(binaryColumns.map(column => [
+      column,
+      row[column] === null || row[column] === undefined ? null : (row[column] ? 1 : 0)
+    ]))
+  }));
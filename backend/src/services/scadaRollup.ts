@@ -0,0 +1,308 @@
+import crypto from 'crypto';
+import { isSafeIdentifier } from './alarmHistoryPlanner';
+import { AlarmEvaluationPlan } from './alarmEvaluationPlan';
+
+const DEBUG = process.env.NODE_ENV === 'development';
+
+// Bookkeeping table kept next to the rollups in each SCADA database
+const STATE_TABLE = 'scada_rollup_state';
+
+type QueryClient = { query: (sql: string, params?: any[]) => Promise<{ rows: any[] }> };
+
+export type RollupResolution = '1m' | '1h' | '1d';
+
+interface ResolutionDefinition {
+  resolution: RollupResolution;
+  unit: 'minute' | 'hour' | 'day';
+  ms: number;
+  // Most source time rolled up per run, so a first backfill is spread over several runs
+  maxSpan: string;
+}
+
+// Finest first: each level is built from the previous one (raw -> 1m -> 1h -> 1d)
+export const ROLLUP_RESOLUTIONS: readonly ResolutionDefinition[] = [
+  { resolution: '1m', unit: 'minute', ms: 60 * 1000, maxSpan: '1 day' },
+  { resolution: '1h', unit: 'hour', ms: 60 * 60 * 1000, maxSpan: '60 days' },
+  { resolution: '1d', unit: 'day', ms: 24 * 60 * 60 * 1000, maxSpan: '3650 days' }
+];
+
+/**
+ * A raw time-series table to roll up: min / max / avg / last per analog column,
+ * true-sample counts per binary column
+ */
+export interface RollupSource {
+  table: string;
+  timeColumn: string;
+  analogColumns: string[];
+  binaryColumns: string[];
+}
+
+/**
+ * Rollup tables of a source and how far each one is complete (exclusive, as text in the
+ * source's time type); a null high-water mark means the level holds no data yet
+ */
+export interface RollupCoverage {
+  bucketType: string;
+  highWater: Partial<Record<RollupResolution, string | null>>;
+}
+
+export const rollupTableName = (table: string, resolution: RollupResolution): string =>
+  `${table}_rollup_${resolution}`;
+
+// Meter readings share the organization's SCADA database
+export const METER_ROLLUP_SOURCE: RollupSource = {
+  table: 'meter_readings',
+  timeColumn: 'created_at',
+  analogColumns: ['voltage', 'current', 'frequency', 'pf', 'energy', 'power'],
+  binaryColumns: []
+};
+
+/**
+ * Rollup source for an organization's SCADA table: every PV / SV column and binary field of its plan
+ */
+export const buildScadaRollupSource = (plan: AlarmEvaluationPlan): RollupSource => ({
+  table: plan.table,
+  timeColumn: 'created_timestamp',
+  analogColumns: plan.analog.flatMap(config => [config.pvField, config.svField]).filter(Boolean),
+  binaryColumns: plan.binary.map(config => config.field)
+});
+
+const sanitizeSource = (source: RollupSource): RollupSource => {
+  if (!isSafeIdentifier(source.table) || !isSafeIdentifier(source.timeColumn)) {
+    throw new Error(`Invalid rollup source: ${source.table}.${source.timeColumn}`);
+  }
+  const analogColumns = Array.from(new Set(source.analogColumns.filter(isSafeIdentifier))).sort();
+  const binaryColumns = Array.from(new Set(source.binaryColumns.filter(isSafeIdentifier)))
+    .filter(column => !analogColumns.includes(column))
+    .sort();
+  return { ...source, analogColumns, binaryColumns };
+};
+
+// Column layout of a source's rollups; a different layout rebuilds them
+const sourceSignature = (source: RollupSource): string =>
+  crypto.createHash('md5').update(JSON.stringify([source.timeColumn, source.analogColumns, source.binaryColumns])).digest('hex');
+
+/**
+ * Create the rollup tables of a source (and the state table) if needed, rebuilding them when the
+ * analog / binary column set changed. Returns the SQL type of the bucket column, or null when the
+ * source table does not exist in this database.
+ */
+export const ensureRollupTables = async (client: QueryClient, rawSource: RollupSource): Promise<string | null> => {
+  const source = sanitizeSource(rawSource);
+
+  const typeResult = await client.query(
+    `SELECT format_type(a.atttypid, a.atttypmod) AS type
+       FROM pg_attribute a
+      WHERE a.attrelid = to_regclass($1) AND a.attname = $2 AND NOT a.attisdropped`,
+    [source.table, source.timeColumn]
+  );
+  const bucketType: string | undefined = typeResult.rows[0]?.type;
+  if (!bucketType) return null;
+
+  await client.query(`
+    CREATE TABLE IF NOT EXISTS ${STATE_TABLE} (
+      source_table text NOT NULL,
+      resolution text NOT NULL,
+      signature text NOT NULL,
+      high_water text,
+      updated_at timestamptz NOT NULL DEFAULT now(),
+      PRIMARY KEY (source_table, resolution)
+    )
+  `);
+
+  const signature = sourceSignature(source);
+  const state = await client.query(
+    `SELECT resolution, signature FROM ${STATE_TABLE} WHERE source_table = $1`,
+    [source.table]
+  );
+  const signatures = new Map<string, string>(state.rows.map(row => [row.resolution, row.signature]));
+
+  const columns = [
+    ...source.analogColumns.flatMap(column => [
+      `${column}_min double precision`,
+      `${column}_max double precision`,
+      `${column}_avg double precision`,
+      `${column}_last double precision`
+    ]),
+    ...source.binaryColumns.map(column => `${column}_true integer`)
+  ];
+
+  for (const level of ROLLUP_RESOLUTIONS) {
+    const table = rollupTableName(source.table, level.resolution);
+    if (signatures.get(level.resolution) === signature) continue;
+
+    if (signatures.has(level.resolution)) {
+      console.log(`🔄 Rollup layout of ${source.table} changed, rebuilding ${table}`);
+    }
+
+    await client.query(`DROP TABLE IF EXISTS ${table}`);
+    await client.query(`
+      CREATE TABLE ${table} (
+        bucket ${bucketType} PRIMARY KEY,
+        samples integer NOT NULL${columns.length > 0 ? `,\n        ${columns.join(',\n        ')}` : ''}
+      )
+    `);
+    await client.query(
+      `INSERT INTO ${STATE_TABLE} (source_table, resolution, signature, high_water)
+       VALUES ($1, $2, $3, NULL)
+       ON CONFLICT (source_table, resolution)
+       DO UPDATE SET signature = EXCLUDED.signature, high_water = NULL, updated_at = now()`,
+      [source.table, level.resolution, signature]
+    );
+  }
+
+  return bucketType;
+};
+
+// Aggregates for one level: from raw samples (1m) or from the previous level
+const buildAggregates = (source: RollupSource, fromRaw: boolean): { name: string; expression: string }[] => {
+  const time = fromRaw ? source.timeColumn : 'bucket';
+
+  const analog = source.analogColumns.flatMap(column => fromRaw
+    ? [
+        { name: `${column}_min`, expression: `MIN(${column})` },
+        { name: `${column}_max`, expression: `MAX(${column})` },
+        { name: `${column}_avg`, expression: `AVG(${column})` },
+        { name: `${column}_last`, expression: `(ARRAY_AGG(${column} ORDER BY ${time} DESC) FILTER (WHERE ${column} IS NOT NULL))[1]` }
+      ]
+    : [
+        { name: `${column}_min`, expression: `MIN(${column}_min)` },
+        { name: `${column}_max`, expression: `MAX(${column}_max)` },
+        {
+          name: `${column}_avg`,
+          expression: `SUM(${column}_avg * samples) / NULLIF(SUM(samples) FILTER (WHERE ${column}_avg IS NOT NULL), 0)`
+        },
+        { name: `${column}_last`, expression: `(ARRAY_AGG(${column}_last ORDER BY ${time} DESC) FILTER (WHERE ${column}_last IS NOT NULL))[1]` }
+      ]);
+
+  const binary = source.binaryColumns.map(column => ({
+    name: `${column}_true`,
+    expression: fromRaw
+      ? `COUNT(*) FILTER (WHERE (${column})::int <> 0)`
+      : `SUM(${column}_true)`
+  }));
+
+  return [
+    { name: 'samples', expression: fromRaw ? 'COUNT(*)' : 'SUM(samples)' },
+    ...analog,
+    ...binary
+  ];
+};
+
+/**
+ * Roll complete buckets past each level's high-water mark into the 1m / 1h / 1d tables.
+ * Only buckets that can no longer receive samples are written (the bucket holding the newest
+ * sample, or the newest finer bucket, is left for the next run), so every row is final.
+ */
+export const runRollup = async (client: QueryClient, rawSource: RollupSource) => {
+  const source = sanitizeSource(rawSource);
+  const bucketType = await ensureRollupTables(client, source);
+  const summary: Partial<Record<RollupResolution, number>> = {};
+  if (!bucketType) return summary;
+
+  for (let index = 0; index < ROLLUP_RESOLUTIONS.length; index++) {
+    const level = ROLLUP_RESOLUTIONS[index];
+    const previous = index > 0 ? ROLLUP_RESOLUTIONS[index - 1] : null;
+    const table = rollupTableName(source.table, level.resolution);
+    const input = previous ? rollupTableName(source.table, previous.resolution) : source.table;
+    const time = previous ? 'bucket' : source.timeColumn;
+
+    await client.query('BEGIN');
+    try {
+      const state = await client.query(
+        `SELECT high_water FROM ${STATE_TABLE} WHERE source_table = $1 AND resolution = $2 FOR UPDATE`,
+        [source.table, level.resolution]
+      );
+      const highWater: string | null = state.rows[0]?.high_water ?? null;
+
+      // Upper bound: start of the newest (still open) bucket of the input
+      const upperSource = previous
+        ? `(SELECT high_water::${bucketType} FROM ${STATE_TABLE} WHERE source_table = $2::text AND resolution = '${previous.resolution}')`
+        : `(SELECT MAX(${time}) FROM ${input})`;
+
+      const bounds = await client.query(
+        `WITH bounds AS (
+           SELECT COALESCE($1::${bucketType}, date_trunc('${level.unit}', (SELECT MIN(${time}) FROM ${input}))) AS range_start,
+                  date_trunc('${level.unit}', ${upperSource}) AS input_end
+         )
+         SELECT range_start::text AS range_start,
+                LEAST(input_end, range_start + interval '${level.maxSpan}')::text AS range_end,
+                LEAST(input_end, range_start + interval '${level.maxSpan}') > range_start AS has_work
+           FROM bounds`,
+        previous ? [highWater, source.table] : [highWater]
+      );
+      const { range_start: rangeStart, range_end: rangeEnd, has_work: hasWork } = bounds.rows[0] || {};
+
+      if (!hasWork) {
+        await client.query('COMMIT');
+        summary[level.resolution] = 0;
+        continue;
+      }
+
+      const aggregates = buildAggregates(source, !previous);
+      const names = aggregates.map(aggregate => aggregate.name);
+      const inserted = await client.query(
+        `INSERT INTO ${table} (bucket, ${names.join(', ')})
+         SELECT date_trunc('${level.unit}', ${time}) AS bucket, ${aggregates.map(aggregate => aggregate.expression).join(', ')}
+           FROM ${input}
+          WHERE ${time} >= $1::${bucketType} AND ${time} < $2::${bucketType}
+          GROUP BY 1
+         ON CONFLICT (bucket) DO UPDATE SET ${names.map(name => `${name} = EXCLUDED.${name}`).join(', ')}
+         RETURNING bucket`,
+        [rangeStart, rangeEnd]
+      );
+
+      await client.query(
+        `UPDATE ${STATE_TABLE} SET high_water = $3, updated_at = now() WHERE source_table = $1 AND resolution = $2`,
+        [source.table, level.resolution, rangeEnd]
+      );
+      await client.query('COMMIT');
+
+      summary[level.resolution] = inserted.rows.length;
+      if (DEBUG) {
+        console.log(`🧮 Rolled up ${inserted.rows.length} ${level.resolution} bucket(s) of ${source.table}: ${rangeStart} -> ${rangeEnd}`);
+      }
+    } catch (error) {
+      await client.query('ROLLBACK');
+      throw error;
+    }
+  }
+
+  return summary;
+};
+
+/**
+ * High-water marks of a source's rollups, or null when they have not been created
+ */
+export const getRollupCoverage = async (client: QueryClient, rawSource: RollupSource): Promise<RollupCoverage | null> => {
+  const source = sanitizeSource(rawSource);
+  const result = await client.query(
+    `SELECT s.resolution, s.signature, s.high_water, format_type(a.atttypid, a.atttypmod) AS bucket_type
+       FROM ${STATE_TABLE} s
+       JOIN pg_attribute a ON a.attrelid = to_regclass(s.source_table || '_rollup_' || s.resolution) AND a.attname = 'bucket'
+      WHERE s.source_table = $1`,
+    [source.table]
+  ).catch(() => ({ rows: [] as any[] })); // No state table yet
+
+  const signature = sourceSignature(source);
+  const rows = result.rows.filter(row => row.signature === signature);
+  if (rows.length === 0) return null;
+
+  return {
+    bucketType: rows[0].bucket_type,
+    highWater: Object.fromEntries(rows.map(row => [row.resolution, row.high_water]))
+  };
+};
+
+/**
+ * Coarsest rollup whose buckets fit in one chart slot and that holds data; null means read raw rows
+ */
+export const pickRollupResolution = (slotMs: number, coverage: RollupCoverage | null): RollupResolution | null => {
+  if (!coverage) return null;
+  for (const level of [...ROLLUP_RESOLUTIONS].reverse()) {
+    if (level.ms <= slotMs && coverage.highWater[level.resolution]) {
+      return level.resolution;
+    }
+  }
+  return null;
+};
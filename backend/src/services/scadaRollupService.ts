@@ -0,0 +1,140 @@
+import { createHash } from 'crypto';
+import prisma from '../config/db';
+import { getClientWithRetry } from '../config/scadaDb';
+import { mapWithConcurrency } from '../utils/concurrency';
+import { getOrgAlarmPlan } from './scadaService';
+import { METER_ROLLUP_SOURCE, RollupSource, buildScadaRollupSource, runRollup } from './scadaRollup';
+
+const DEBUG = process.env.NODE_ENV === 'development';
+
+// How often rollups are advanced (default: 1 minute)
+const ROLLUP_INTERVAL = parseInt(process.env.SCADA_ROLLUP_INTERVAL || '60000');
+
+// Organizations rolled up in parallel
+const ROLLUP_CONCURRENCY = Math.max(1, parseInt(process.env.SCADA_ROLLUP_CONCURRENCY || '2'));
+
+// Opt-in: the job creates (and on layout changes drops) rollup tables in each organization's
+// SCADA database. While disabled, reads fall back to raw tables.
+const ROLLUP_ENABLED = process.env.SCADA_ROLLUP_ENABLED === 'true';
+
+// Postgres errors meaning the SCADA role may not create the rollup tables
+// (insufficient_privilege, read_only_sql_transaction)
+const NO_DDL_ERROR_CODES = new Set(['42501', '25006']);
+
+// Organizations whose SCADA role cannot create rollup tables, with the scadaDbConfig hash seen
+// at the time; they are skipped until their database config changes
+const disabledOrgs = new Map<string, string>();
+
+const hashConfig = (config: unknown) => createHash('sha1').update(JSON.stringify(config ?? null)).digest('hex');
+
+/**
+ * Background job that incrementally maintains the 1m / 1h / 1d rollups of every organization's
+ * SCADA table and meter readings (see scadaRollup)
+ */
+export class ScadaRollupService {
+  private static intervalId: NodeJS.Timeout | null = null;
+  private static isRunning = false;
+
+  /**
+   * Start periodic rollups
+   */
+  static start(): void {
+    if (this.intervalId) return;
+    if (!ROLLUP_ENABLED) {
+      console.log('ℹ️ SCADA rollups disabled (set SCADA_ROLLUP_ENABLED=true to enable)');
+      return;
+    }
+
+    const tick = async () => {
+      try {
+        await this.runOnce();
+      } catch (error) {
+        console.error('🔴 Error running SCADA rollups:', error);
+      }
+    };
+
+    this.intervalId = setInterval(tick, ROLLUP_INTERVAL);
+    void tick();
+
+    console.log(`✅ SCADA rollups started (interval: ${ROLLUP_INTERVAL}ms)`);
+  }
+
+  /**
+   * Stop periodic rollups
+   */
+  static stop(): void {
+    if (this.intervalId) {
+      clearInterval(this.intervalId);
+      this.intervalId = null;
+    }
+  }
+
+  /**
+   * Advance the rollups of one organization. Each source is independent, so a missing
+   * meter_readings table does not hold back the SCADA rollups. If the SCADA role lacks DDL
+   * privileges the organization is disabled until its scadaDbConfig (hashed as `configHash`) changes.
+   */
+  static async rollupOrganization(orgId: string, configHash = '') {
+    const plan = await getOrgAlarmPlan(orgId);
+    const sources: RollupSource[] = [buildScadaRollupSource(plan), METER_ROLLUP_SOURCE];
+    const client = await getClientWithRetry(orgId);
+
+    try {
+      const summary: Record<string, Awaited<ReturnType<typeof runRollup>>> = {};
+      for (const source of sources) {
+        try {
+          summary[source.table] = await runRollup(client, source);
+        } catch (error) {
+          if (NO_DDL_ERROR_CODES.has((error as { code?: string }).code || '')) {
+            // Retrying every interval would only repeat the same failure
+            disabledOrgs.set(orgId, configHash);
+            console.warn(`⚠️ SCADA role of org ${orgId} cannot create rollup tables (${(error as Error).message}); rollups disabled until its database config changes`);
+            break;
+          }
+          console.error(`🔴 Rollup of ${source.table} failed for org ${orgId}:`, error);
+        }
+      }
+      return summary;
+    } finally {
+      client.release();
+    }
+  }
+
+  /**
+   * One pass over all organizations with a SCADA database; skipped if the previous pass is still running
+   */
+  static async runOnce() {
+    if (this.isRunning) return;
+    this.isRunning = true;
+
+    try {
+      const organizations = await prisma.organization.findMany({
+        select: { id: true, name: true, scadaDbConfig: true }
+      });
+      const configured = organizations.filter(org => {
+        if (!org.scadaDbConfig || Object.keys(org.scadaDbConfig as object).length === 0) return false;
+
+        const disabledHash = disabledOrgs.get(org.id);
+        if (disabledHash === undefined) return true;
+        if (disabledHash === hashConfig(org.scadaDbConfig)) return false;
+        disabledOrgs.delete(org.id);
+        return true;
+      });
+
+      const results = await mapWithConcurrency(configured, ROLLUP_CONCURRENCY, org => this.rollupOrganization(org.id, hashConfig(org.scadaDbConfig)));
+
+      results.forEach((result, index) => {
+        const org = configured[index];
+        if (result.status === 'rejected') {
+          console.error(`🔴 Rollup failed for ${org.name || org.id}:`, result.reason);
+        } else if (DEBUG) {
+          console.log(`🧮 Rollups for ${org.name || org.id}:`, result.value);
+        }
+      });
+    } finally {
+      this.isRunning = false;
+    }
+  }
+}
+
+export default ScadaRollupService;
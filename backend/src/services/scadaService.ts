@@ -1,9 +1,59 @@
 import { getClientWithRetry } from '../config/scadaDb';
-import { NotificationService } from './notificationService';
-import prisma from '../config/db';
+import { CreateNotificationParams } from './notificationService';
+import { enqueueNotifications } from './notificationOutbox';
 import { format } from 'date-fns';
 import { AlarmStatus } from './../generated/prisma-client';
 import { isMaintenanceModeActive } from '../controllers/maintenanceController';
+import {
+    getScadaSnapshot,
+    isSnapshotFresh,
+    storeScadaSnapshot,
+    recordScadaFetchError,
+    invalidateScadaSnapshot,
+    getScadaSnapshotInfo,
+    getAllScadaSnapshotInfo
+} from './scadaSnapshotCache';
+import { getOrgAlarmState, saveOrgAlarmState, clearOrgAlarmState } from './alarmStateStore';
+import { publishAlarmSnapshot } from './alarmStream';
+import { createSnapshotVersion, recordAlarmSnapshot } from './alarmSnapshotHistory';
+import { getOrgContext, invalidateOrgContext, OrgSetpoint } from './orgContextCache';
+import {
+    AlarmSchemaConfig,
+    AlarmEvaluationPlan,
+    deriveAlarmConfigs,
+    getAlarmEvaluationPlan,
+    invalidateAlarmEvaluationPlan
+} from './alarmEvaluationPlan';
+import {
+    calculateAnalogSeverity,
+    calculateAnalogSeverityWithHysteresis,
+    calculateBinarySeverity,
+    getAlarmPointSeverity,
+    stepAlarmPoint,
+    pruneAlarmPoints,
+    clearAlarmPoints,
+    hasAlarmPoints,
+    seedAlarmPoints,
+    CRITICAL_OFFSET
+} from './alarmStateMachine';
+import {
+    AlarmTransitionEvent,
+    isMaterializedTransition,
+    recordAlarmTransitions,
+    loadOpenAlarmSeeds,
+    getAlarmStatusResolver,
+    AlarmStatusRecord
+} from './alarmEventStore';
+import { planAlarmHistoryQuery, isSafeIdentifier } from './alarmHistoryPlanner';
+import { CountMode, decodeCursor, encodeCursor, estimateRowCount } from '../utils/pagination';
+import {
+    DownsampleMode,
+    downsampleScadaWindow,
+    getTargetPoints,
+    parseAnalyticsWindow,
+    rowsToSlots
+} from './scadaDownsampling';
+import { buildScadaRollupSource, getRollupCoverage } from './scadaRollup';
 
 const DEBUG = process.env.NODE_ENV === 'development';
 
@@ -63,21 +113,11 @@ export const SCADA_POLLING_INTERVAL = parseInt(
   '30000'
 ); // Default 30 seconds
 
-// Cache for last fetch time to respect polling interval
-let lastFetchTime = 0;
-let cachedScadaData: any = null;
-
-// Keep track of consecutive errors for backoff strategy
-let consecutiveErrors = 0;
+// Consecutive errors (tracked per organization in the snapshot cache) before backoff is logged
 const MAX_CONSECUTIVE_ERRORS = 5;
 
-// Cache for processed alarms to prevent duplicate notifications
-let lastProcessedTimestamp: string | null = null;
-let cachedProcessedAlarms: any = null;
-
-// Add schema config cache for invalidation
-let lastSchemaConfigHash: string | null = null;
-let schemaConfigCache: any = null;
+// Processed alarms, last processed SCADA timestamp and schema hash are tracked per
+// organization in the alarm state store to prevent duplicate notifications
 
 // Helper function to create a hash of schema config for change detection
 const createSchemaConfigHash = (schemaConfig: OrganizationSchemaConfig): string => {
@@ -90,30 +130,43 @@ const createSchemaConfigHash = (schemaConfig: OrganizationSchemaConfig): string
 };
 
 // Function to clear schema config cache (useful for testing or manual invalidation)
-export const clearSchemaConfigCache = () => {
-    lastSchemaConfigHash = null;
-    schemaConfigCache = null;
-    cachedProcessedAlarms = null;
-    lastProcessedTimestamp = null;
-    if (DEBUG) console.log('🧹 Schema config cache cleared');
+export const clearSchemaConfigCache = (orgId?: string) => {
+    invalidateOrgContext(orgId);
+    invalidateAlarmEvaluationPlan(orgId);
+    clearOrgAlarmState(orgId);
+    clearAlarmPoints(orgId);
+    invalidateScadaSnapshot(orgId);
+    if (DEBUG) console.log(`🧹 Schema config cache cleared${orgId ? ` for org ${orgId}` : ''}`);
 };
 
 // Function to force refresh schema config for a specific organization
 export const forceRefreshSchemaConfig = async (orgId: string) => {
     try {
-        // Clear the cache for this organization
-        lastSchemaConfigHash = null;
-        schemaConfigCache = null;
-        cachedProcessedAlarms = null;
-        lastProcessedTimestamp = null;
+        const previousState = getOrgAlarmState(orgId);
+        invalidateOrgContext(orgId);
         
         // Fetch fresh schema config
         const freshConfig = await getOrganizationSchemaConfig(orgId);
         const newHash = createSchemaConfigHash(freshConfig);
         
-        // Update cache with fresh data
-        schemaConfigCache = freshConfig;
-        lastSchemaConfigHash = newHash;
+        // Saving an organization resends its schema config even when nothing changed;
+        // keep the compiled plan and cached alarms in that case
+        if (previousState?.schemaHash === newHash) {
+            if (DEBUG) console.log(`🔄 Schema config unchanged for org ${orgId} (hash ${newHash}), keeping caches`);
+            return freshConfig;
+        }
+        
+        // Drop this organization's cached alarms and schema hash, but keep the last processed
+        // timestamp so the same SCADA row is re-evaluated without re-sending notifications
+        invalidateAlarmEvaluationPlan(orgId);
+        invalidateScadaSnapshot(orgId);
+        saveOrgAlarmState(orgId, {
+            lastProcessedTimestamp: previousState?.lastProcessedTimestamp ?? null,
+            schemaHash: null,
+            schemaColumnCount: previousState?.schemaColumnCount ?? 0,
+            schemaColumnConfigCount: previousState?.schemaColumnConfigCount ?? 0,
+            result: null
+        });
         
         if (DEBUG) {
             console.log(`🔄 Forced schema config refresh for org ${orgId}`);
@@ -137,30 +190,15 @@ export interface ScadaData {
 }
 
 // Organization schema configuration interface
-interface OrganizationSchemaConfig {
-    columns: string[];
-    table?: string;
-    columnConfigs?: {
-        [columnName: string]: {
-            name: string;
-            type: string;
-            zone?: string;
-            unit?: string;
-            isAnalog?: boolean;
-            isBinary?: boolean;
-        };
-    };
-}
+type OrganizationSchemaConfig = AlarmSchemaConfig;
 
 // Get organization schema configuration
 export const getOrganizationSchemaConfig = async (orgId: string): Promise<OrganizationSchemaConfig> => {
   try {
-      console.log(`🔍 Fetching schema config for org: ${orgId}`);
+      if (DEBUG) console.log(`🔍 Fetching schema config for org: ${orgId}`);
       
-      const org = await prisma.organization.findUnique({
-          where: { id: orgId },
-          select: { schemaConfig: true, scadaDbConfig: true }
-      });
+      // Served from the org context cache; already parsed from JSON
+      const org = await getOrgContext(orgId);
 
       if (!org) {
           console.error(`❌ Organization not found: ${orgId}`);
@@ -172,15 +210,10 @@ export const getOrganizationSchemaConfig = async (orgId: string): Promise<Organi
         console.log(`📊 Raw SCADA DB config:`, org.scadaDbConfig);
       }
 
-      // Parse schema config
-      const schemaConfig = typeof org.schemaConfig === 'string' 
-          ? JSON.parse(org.schemaConfig) 
-          : org.schemaConfig;
+      const schemaConfig = org.schemaConfig;
 
-      // Parse SCADA DB config to get table name
-      const scadaDbConfig = typeof org.scadaDbConfig === 'string'
-          ? JSON.parse(org.scadaDbConfig)
-          : org.scadaDbConfig;
+      // SCADA DB config holds the table name
+      const scadaDbConfig = org.scadaDbConfig;
 
       if (DEBUG) {
       console.log(`📊 Parsed schema config:`, {
@@ -266,7 +299,7 @@ const buildDynamicHistoryQuery = (
   sortBy: string, 
   sortOrder: string,
   limit: number,
-  offset: number
+  offset?: number
 ): string => {
   if (!columns || columns.length === 0) {
       throw new Error('No columns defined in organization schema config');
@@ -276,14 +309,23 @@ const buildDynamicHistoryQuery = (
   const requiredColumns = ['id', 'created_timestamp'];
   const allColumns = [...new Set([...columns, ...requiredColumns])];
   
-  const columnList = allColumns.join(', ');
+  const direction = sortOrder === 'desc' ? 'DESC' : 'ASC';
+
+  // Timestamp order is keyset-paginated on (created_timestamp, id); the text form of the
+  // timestamp keeps full precision for the cursor
+  const columnList = sortBy === 'timestamp'
+    ? `${allColumns.join(', ')}, created_timestamp::text AS cursor_timestamp`
+    : allColumns.join(', ');
+  const orderBy = sortBy === 'timestamp'
+    ? `created_timestamp ${direction}, id ${direction}`
+    : `${sortBy} ${direction}`;
   
   return `
       SELECT ${columnList}
       FROM ${table}
       ${whereClause}
-      ORDER BY ${sortBy === 'timestamp' ? 'created_timestamp' : sortBy} ${sortOrder === 'desc' ? 'DESC' : 'ASC'}
-      LIMIT $${limit} OFFSET $${offset}
+      ORDER BY ${orderBy}
+      LIMIT $${limit}${offset !== undefined ? ` OFFSET $${offset}` : ''}
   `;
 };
 
@@ -293,27 +335,6 @@ const buildDynamicCountQuery = (table: string, whereClause: string): string => {
 };
 
 
-interface SetpointConfig {
-    id: string;
-    name: string;
-    type: string;
-    zone?: string | null;
-    scadaField: string;
-    lowDeviation: number;
-    highDeviation: number;
-}
-
-interface PrismaSetpoint {
-    id: string;
-    name: string;
-    type: string;
-    zone: string | null;
-    scadaField: string;
-    lowDeviation: number;
-    highDeviation: number;
-    createdAt: Date;
-    updatedAt: Date;
-}
 
 // Helper function to format alarm values
 const formatValue = (value: number | undefined | null, unit?: string): string => {
@@ -367,67 +388,42 @@ const formatTimestamp = (date: Date): string => {
     }
 };
 
-// Calculate severity for analog values
-const calculateAnalogSeverity = (value: number, setpoint: number, lowDeviation: number, highDeviation: number): 'critical' | 'warning' | 'info' => {
-  const lowLimit = setpoint + lowDeviation; // lowDeviation is already negative
-  const highLimit = setpoint + highDeviation;
-  const warningOffset = 10;
-
-  // Critical: Beyond deviation band by >10 units
-  if (value < lowLimit - warningOffset || value > highLimit + warningOffset) {
-      return 'critical';
-  }
-  
-  // Warning: Outside deviation band but within 10 units
-  // (setpoint + lowDeviation - 10) <= value < setpoint + lowDeviation
-  // OR
-  // setpoint + highDeviation < value <= (setpoint + highDeviation + 10)
-  if (value < lowLimit || value > highLimit) {
-      return 'warning';
-  }
-  
-  // Info: Within deviation band
-  return 'info';
-};
-
-// Calculate severity for binary values
-const calculateBinarySeverity = (isFailure: boolean): 'critical' | 'warning' | 'info' => {
-  return isFailure ? 'critical' : 'info';
-};
-
 // Get latest SCADA data with respect to polling interval
 export const getLatestScadaData = async (orgId: string, forceRefresh = false): Promise<ScadaData | null> => {
   const now = Date.now();
   
   // Check if organization is enabled
-  const org = await prisma.organization.findUnique({
-    where: { id: orgId },
-    select: { isEnabled: true }
-  });
+  const org = await getOrgContext(orgId);
   
   if (!org?.isEnabled && !forceRefresh) {
     if (DEBUG) console.log('🛑 Organization disabled - skipping SCADA data fetch');
     return null;
   }
   
+  // Each organization has its own cached snapshot
+  const snapshot = getScadaSnapshot(orgId);
+  
   // Check if maintenance mode is active
   const isMaintenanceActive = await isMaintenanceModeActive(orgId);
   if (isMaintenanceActive && !forceRefresh) {
       if (DEBUG) console.log('🔧 Maintenance mode active - returning cached SCADA data without fetching new data');
       
       // Return cached data if available, otherwise return null
-      if (cachedScadaData) {
-          return cachedScadaData;
+      if (snapshot?.data) {
+          return snapshot.data;
       } else {
-          console.log('⚠️ No cached SCADA data available during maintenance mode');
+          console.log(`⚠️ No cached SCADA data available during maintenance mode for org ${orgId}`);
           return null;
       }
   }
   
   // If not forced and within polling interval, return cached data
-  if (!forceRefresh && lastFetchTime > 0 && now - lastFetchTime < SCADA_POLLING_INTERVAL && cachedScadaData) {
-      if (DEBUG) console.log(`📊 Using cached SCADA data (${Math.round((now - lastFetchTime) / 1000)}s old, refresh in ${Math.round((SCADA_POLLING_INTERVAL - (now - lastFetchTime)) / 1000)}s)`);
-      return cachedScadaData;
+  if (!forceRefresh && isSnapshotFresh(snapshot, SCADA_POLLING_INTERVAL, now)) {
+      if (DEBUG) {
+          const age = now - snapshot!.fetchedAt;
+          console.log(`📊 Using cached SCADA data for org ${orgId} (${Math.round(age / 1000)}s old, refresh in ${Math.round((SCADA_POLLING_INTERVAL - age) / 1000)}s)`);
+      }
+      return snapshot!.data;
   }
   
   try {
@@ -452,73 +448,78 @@ export const getLatestScadaData = async (orgId: string, forceRefresh = false): P
 
           const result = await client.query(query);
           
-          // Reset consecutive errors counter on success
-          consecutiveErrors = 0;
+          // Store the fresh row (this also resets the org's consecutive error counter)
+          const latestRow = result.rows[0] || null;
+          storeScadaSnapshot(orgId, latestRow, now);
           
-          lastFetchTime = now;
-          cachedScadaData = result.rows[0] || null;
-          
-          if (!cachedScadaData) {
-              console.warn('⚠️ No SCADA data rows returned from query');
+          if (!latestRow) {
+              console.warn(`⚠️ No SCADA data rows returned from query for org ${orgId}`);
           } else if (DEBUG) {
-              console.log(`📊 Fresh SCADA data fetched at ${new Date().toISOString()}`);
-              console.log(`📊 Available fields: ${Object.keys(cachedScadaData).join(', ')}`);
+              console.log(`📊 Fresh SCADA data fetched for org ${orgId} at ${new Date().toISOString()}`);
+              console.log(`📊 Available fields: ${Object.keys(latestRow).join(', ')}`);
           }
           
-          return cachedScadaData;
+          return latestRow;
       } finally {
-          client.release(true); // Force release to prevent connection leaks
+          // Healthy connections go back to the pool; pg-pool discards broken ones itself
+          client.release();
       }
   } catch (error) {
-      // Increment consecutive errors for exponential backoff
-      consecutiveErrors++;
+      // Increment this organization's consecutive errors for exponential backoff
+      const consecutiveErrors = recordScadaFetchError(orgId, error);
       
       if (consecutiveErrors >= MAX_CONSECUTIVE_ERRORS) {
           // If we've had many consecutive errors, add increasing delay
           const backoffDelay = Math.min(1000 * Math.pow(2, consecutiveErrors - MAX_CONSECUTIVE_ERRORS), 30000);
-          console.error(`🔴 Multiple consecutive SCADA fetch errors (${consecutiveErrors}). Backing off for ${backoffDelay}ms before next attempt.`);
+          console.error(`🔴 Multiple consecutive SCADA fetch errors for org ${orgId} (${consecutiveErrors}). Backing off for ${backoffDelay}ms before next attempt.`);
           // We don't actually need to wait here, just logging the backoff strategy
       }
       
-      console.error('Error fetching latest SCADA data:', error);
+      console.error(`Error fetching latest SCADA data for org ${orgId}:`, error);
       
-      // If we have cached data, return it as fallback even if expired
-      if (cachedScadaData) {
-          console.log('⚠️ Using stale cached SCADA data due to fetch error');
-          return cachedScadaData;
+      // If we have cached data for this org, return it as fallback even if expired
+      const staleSnapshot = getScadaSnapshot(orgId);
+      if (staleSnapshot?.data) {
+          console.log(`⚠️ Using stale cached SCADA data for org ${orgId} (${Math.round((now - staleSnapshot.fetchedAt) / 1000)}s old) due to fetch error`);
+          return staleSnapshot.data;
       }
       
       return null;
   }
 };
 
-// Get setpoint configurations for a specific organization
-const getSetpointConfigs = async (orgId: string): Promise<SetpointConfig[]> => {
+// Get age/staleness information for an organization's cached SCADA snapshot
+export const getScadaDataFreshness = (orgId: string) => {
+  return getScadaSnapshotInfo(orgId, SCADA_POLLING_INTERVAL);
+};
+
+// Age/staleness of every cached SCADA snapshot (admin monitoring)
+export const getAllScadaDataFreshness = () => {
+  return getAllScadaSnapshotInfo(SCADA_POLLING_INTERVAL);
+};
+
+// Drop an organization's cached SCADA snapshot so the next read goes to the database
+export const invalidateScadaDataCache = (orgId?: string) => {
+  invalidateScadaSnapshot(orgId);
+};
+
+// Shared empty index so organizations without setpoints keep a stable plan cache key
+const NO_SETPOINTS: ReadonlyMap<string, OrgSetpoint> = new Map();
+
+// Get the setpoint index for a specific organization, keyed by normalized (name, type, zone)
+const getSetpointIndex = async (orgId: string): Promise<ReadonlyMap<string, OrgSetpoint>> => {
   try {
-      const setpoints = await prisma.$queryRaw<PrismaSetpoint[]>`
-    SELECT id, name, type, zone, "scadaField",
-    "lowDeviation", "highDeviation",
-    "createdAt", "updatedAt"
-    FROM "Setpoint"
-    WHERE "organizationId" = ${orgId}
-  `;
-      return setpoints.map(setpoint => ({
-          id: setpoint.id,
-          name: setpoint.name,
-          type: setpoint.type,
-          zone: setpoint.zone,
-          scadaField: setpoint.scadaField,
-          lowDeviation: setpoint.lowDeviation,
-          highDeviation: setpoint.highDeviation
-      }));
+      // Built once per org context load and invalidated by the /api/admin/setpoints routes
+      const org = await getOrgContext(orgId);
+      return org?.setpointIndex || NO_SETPOINTS;
   } catch (error) {
       console.error('Error fetching setpoint configs for organization:', orgId, error);
-      return [];
+      return NO_SETPOINTS;
   }
 };
 
-// Create notification with enhanced details
-const createEnhancedNotification = async (
+// Build an alarm notification with enhanced details (sent in bulk at the end of the cycle)
+const buildEnhancedNotification = (
     title: string,
     description: string,
     value: string,
@@ -527,8 +528,9 @@ const createEnhancedNotification = async (
     type: string,
     orgId: string,
     zone?: string,
-    scadaTimestamp?: Date
-) => {
+    scadaTimestamp?: Date,
+    label: string = severity.toUpperCase()
+): CreateNotificationParams => {
     try {
         // SUPER_ADMIN users are always excluded from notifications by NotificationService
         // No need to filter here; enforced centrally
@@ -561,8 +563,8 @@ const createEnhancedNotification = async (
             `Type: ${type}`,
         ].filter(Boolean).join('\n');
 
-        await NotificationService.createNotification({
-            title: `${title} - ${severity.toUpperCase()}`,
+        return {
+            title: `${title} - ${label}`,
             body: notificationBody,
             severity: severity === 'critical' ? 'CRITICAL' : severity === 'warning' ? 'WARNING' : 'INFO',
             type: 'ALARM',
@@ -574,14 +576,9 @@ const createEnhancedNotification = async (
                 zone
             },
             organizationId: orgId
-        });
-        
-        if (DEBUG) {
-            console.log(`✅ Notification created successfully with timestamp: ${formattedTime}`);
-        }
-        
+        };
     } catch (error) {
-        console.error('🔴 Error creating enhanced notification:', error);
+        console.error('🔴 Error building enhanced notification:', error);
         console.error('🔴 Input parameters:', {
             title,
             scadaTimestamp: scadaTimestamp?.toISOString(),
@@ -600,8 +597,8 @@ const createEnhancedNotification = async (
             `Type: ${type}`,
         ].filter(Boolean).join('\n');
 
-        await NotificationService.createNotification({
-            title: `${title} - ${severity.toUpperCase()}`,
+        return {
+            title: `${title} - ${label}`,
             body: fallbackBody,
             severity: severity === 'critical' ? 'CRITICAL' : severity === 'warning' ? 'WARNING' : 'INFO',
             type: 'ALARM',
@@ -614,247 +611,21 @@ const createEnhancedNotification = async (
                 error: 'Timestamp formatting error'
             },
             organizationId: orgId
-        });
+        };
     }
 };
 
 // Dynamic alarm configuration based on available columns
-export const getDynamicAlarmConfigs = (scadaData: ScadaData, schemaConfig: OrganizationSchemaConfig) => {
-  const availableColumns = schemaConfig.columns;
-  const analogConfigs = [];
-  const binaryConfigs = [];
-
-  console.log(`\n🔍 Processing alarm configs:`);
-  console.log(`📊 Available columns: ${availableColumns.length}`);
-  console.log(`📊 Has columnConfigs: ${!!schemaConfig.columnConfigs}`);
-  console.log(`📊 Available columns list: ${availableColumns.join(', ')}`);
-
-  // If columnConfigs are provided, use them for dynamic configuration
-  if (schemaConfig.columnConfigs) {
-      const totalColumns = Object.keys(schemaConfig.columnConfigs).length;
-      const binaryColumns = Object.entries(schemaConfig.columnConfigs)
-          .filter(([_, config]) => config.isBinary).length;
-      const analogColumns = Object.entries(schemaConfig.columnConfigs)
-          .filter(([_, config]) => config.isAnalog).length;
-
-      console.log(`\n📊 Column config summary:`);
-      console.log(`  Total columns: ${totalColumns}`);
-      console.log(`  Binary columns: ${binaryColumns}`);
-      console.log(`  Analog columns: ${analogColumns}`);
-      
-      for (const [columnName, config] of Object.entries(schemaConfig.columnConfigs)) {
-          console.log(`\n🔍 Processing column: ${columnName}`);
-          console.log(`  Type: ${config.isAnalog ? 'Analog' : config.isBinary ? 'Binary' : 'Unknown'}`);
-          console.log(`  Name: ${config.name}`);
-          
-          if (!availableColumns.includes(columnName)) {
-              console.log(`  ⚠️ Column not found in available columns, skipping`);
-              continue;
-          }
-
-          if (config.isAnalog) {
-              // For analog fields, we need to find the corresponding SV/PV pair
-              const isPV = columnName.endsWith('pv');
-              const isSV = columnName.endsWith('sv');
-              
-              if (isPV) {
-                  // Find corresponding SV field
-                  const svField = availableColumns.find(col => 
-                      col.endsWith('sv') && 
-                      col.replace('pv', 'sv') === columnName.replace('pv', 'sv')
-                  );
-                  
-                  analogConfigs.push({
-                      name: config.name,
-                      type: config.type,
-                      zone: config.zone,
-                      pvField: columnName,
-                      svField: svField || '', // Empty string if no SV field
-                      unit: config.unit
-                  });
-                  
-                  console.log(`  ✅ Added analog config (PV): ${config.name}`);
-                  console.log(`    PV: ${columnName}, SV: ${svField || 'none'}`);
-              } else if (isSV) {
-                  // Find corresponding PV field
-                  const pvField = availableColumns.find(col => 
-                      col.endsWith('pv') && 
-                      col.replace('sv', 'pv') === columnName.replace('sv', 'pv')
-                  );
-                  
-                  if (pvField) {
-                      analogConfigs.push({
-                          name: config.name,
-                          type: config.type,
-                          zone: config.zone,
-                          pvField,
-                          svField: columnName,
-                          unit: config.unit
-                      });
-                      
-                      console.log(`  ✅ Added analog config (SV): ${config.name}`);
-                      console.log(`    PV: ${pvField}, SV: ${columnName}`);
-                  } else {
-                      console.log(`  ⚠️ No PV field found for SV column ${columnName}`);
-                  }
-              } else {
-                  // Single field analog (like oilpv)
-                  analogConfigs.push({
-                      name: config.name,
-                      type: config.type,
-                      zone: config.zone,
-                      pvField: columnName,
-                      svField: '', // No SV field
-                      unit: config.unit
-                  });
-                  
-                  console.log(`  ✅ Added analog config (single): ${config.name}`);
-                  console.log(`    Field: ${columnName}`);
-              }
-          } else if (config.isBinary) {
-              // Check if field exists in SCADA data
-              if (columnName in scadaData) {
-                  binaryConfigs.push({
-                      field: columnName,
-                      name: config.name,
-                      type: config.type,
-                      zone: config.zone
-                  });
-                  
-                  console.log(`  ✅ Added binary config: ${config.name}`);
-                  console.log(`    Field: ${columnName}, Type: ${config.type}`);
-              } else {
-                  console.log(`  ⚠️ Binary field ${columnName} not found in SCADA data`);
-              }
-          } else {
-              console.log(`  ⚠️ Column is neither analog nor binary`);
-          }
-      }
-  } else {
-      console.log('\n⚠️ No columnConfigs found, using fallback patterns');
-      // Fallback to pattern-based configuration for backward compatibility
-      const analogPatterns = [
-          {
-              pattern: /^hz1(sv|pv)$/,
-              name: 'HARDENING ZONE 1 TEMPERATURE',
-              type: 'temperature',
-              zone: 'zone1',
-              unit: '°C'
-          },
-          {
-              pattern: /^hz2(sv|pv)$/,
-              name: 'HARDENING ZONE 2 TEMPERATURE',
-              type: 'temperature',
-              zone: 'zone2',
-              unit: '°C'
-          },
-          {
-              pattern: /^cp(sv|pv)$/,
-              name: 'CARBON POTENTIAL',
-              type: 'carbon',
-              unit: '%'
-          },
-          {
-              pattern: /^tz1(sv|pv)$/,
-              name: 'TEMPERING ZONE1 TEMPERATURE',
-              type: 'temperature',
-              zone: 'zone1',
-              unit: '°C'
-          },
-          {
-              pattern: /^tz2(sv|pv)$/,
-              name: 'TEMPERING ZONE2 TEMPERATURE',
-              type: 'temperature',
-              zone: 'zone2',
-              unit: '°C'
-          },
-          {
-              pattern: /^oilpv$/,
-              name: 'OIL TEMPERATURE',
-              type: 'temperature',
-              unit: '°C'
-          }
-      ];
-
-      // Find matching analog fields
-      for (const pattern of analogPatterns) {
-          const svField = availableColumns.find(col => pattern.pattern.test(col) && col.endsWith('sv'));
-          const pvField = availableColumns.find(col => pattern.pattern.test(col) && col.endsWith('pv'));
-          
-          // For oilpv, we only have PV field, no SV field
-          if (pattern.name === 'OIL TEMPERATURE') {
-              if (pvField) {
-                  analogConfigs.push({
-                      name: pattern.name,
-                      type: pattern.type,
-                      zone: pattern.zone,
-                      pvField,
-                      svField: '', // Empty string to indicate no SV field
-                      unit: pattern.unit
-                  });
-                  console.log(`  ✅ Added fallback analog (single): ${pattern.name}`);
-              }
-          } else if (svField && pvField) {
-              // For other fields, require both SV and PV
-              analogConfigs.push({
-                  name: pattern.name,
-                  type: pattern.type,
-                  zone: pattern.zone,
-                  pvField,
-                  svField,
-                  unit: pattern.unit
-              });
-              console.log(`  ✅ Added fallback analog: ${pattern.name}`);
-          }
-      }
-
-      // Define potential binary field patterns
-      const binaryPatterns = [
-          { pattern: 'oiltemphigh', name: 'OIL TEMPERATURE HIGH', type: 'temperature' },
-          { pattern: 'oillevelhigh', name: 'OIL LEVEL HIGH', type: 'level' },
-          { pattern: 'oillevellow', name: 'OIL LEVEL LOW', type: 'level' },
-          { pattern: 'hz1hfail', name: 'HARDENING ZONE 1 HEATER FAILURE', type: 'heater', zone: 'zone1' },
-          { pattern: 'hz2hfail', name: 'HARDENING ZONE 2 HEATER FAILURE', type: 'heater', zone: 'zone2' },
-          { pattern: 'hz1fanfail', name: 'HARDENING ZONE 1 FAN FAILURE', type: 'fan', zone: 'zone1' },
-          { pattern: 'hz2fanfail', name: 'HARDENING ZONE 2 FAN FAILURE', type: 'fan', zone: 'zone2' },
-          { pattern: 'tz1fanfail', name: 'TEMPERING ZONE 1 FAN FAILURE', type: 'fan', zone: 'zone1' },
-          { pattern: 'tz2fanfail', name: 'TEMPERING ZONE 2 FAN FAILURE', type: 'fan', zone: 'zone2' }
-      ];
-
-      // Find matching binary fields
-      for (const pattern of binaryPatterns) {
-          if (availableColumns.includes(pattern.pattern)) {
-              binaryConfigs.push({
-                  field: pattern.pattern,
-                  name: pattern.name,
-                  type: pattern.type,
-                  zone: pattern.zone
-              });
-              console.log(`  ✅ Added fallback binary: ${pattern.name}`);
-          }
-      }
-  }
-
-  console.log(`\n📊 Final config summary:`);
-  console.log(`  Analog alarms: ${analogConfigs.length}`);
-  console.log(`  Binary alarms: ${binaryConfigs.length}`);
-  
-  // Log all configured alarms for debugging
-  if (analogConfigs.length > 0) {
-      console.log(`  Analog alarms configured:`);
-      analogConfigs.forEach(config => {
-          console.log(`    - ${config.name} (${config.pvField}${config.svField ? '/' + config.svField : ''})`);
-      });
-  }
-  
-  if (binaryConfigs.length > 0) {
-      console.log(`  Binary alarms configured:`);
-      binaryConfigs.forEach(config => {
-          console.log(`    - ${config.name} (${config.field})`);
-      });
-  }
+export const getDynamicAlarmConfigs = (_scadaData: ScadaData, schemaConfig: OrganizationSchemaConfig) => {
+  return deriveAlarmConfigs(schemaConfig);
+};
 
-  return { analogConfigs, binaryConfigs };
+// Get the compiled alarm evaluation plan for an organization (recompiled only when
+// the schema config or setpoints change)
+export const getOrgAlarmPlan = async (orgId: string, schemaConfig?: OrganizationSchemaConfig): Promise<AlarmEvaluationPlan> => {
+  const config = schemaConfig || await getOrganizationSchemaConfig(orgId);
+  const setpointIndex = await getSetpointIndex(orgId);
+  return getAlarmEvaluationPlan(orgId, config, createSchemaConfigHash(config), setpointIndex);
 };
 
 /**
@@ -865,10 +636,7 @@ export const getDynamicAlarmConfigs = (scadaData: ScadaData, schemaConfig: Organ
 export const processAndFormatAlarms = async (orgId: string, forceRefresh = false) => {
   try {
       // Check if organization is enabled
-      const org = await prisma.organization.findUnique({
-        where: { id: orgId },
-        select: { isEnabled: true }
-      });
+      const org = await getOrgContext(orgId);
       
       if (!org?.isEnabled && !forceRefresh) {
         if (DEBUG) console.log('🛑 Organization disabled - skipping alarm processing');
@@ -881,16 +649,24 @@ export const processAndFormatAlarms = async (orgId: string, forceRefresh = false
       const scadaData = await getLatestScadaData(orgId, forceRefresh);
       if (DEBUG) console.log('📊 Latest SCADA Data:', scadaData);
 
+      // Previously processed state for this organization only
+      const alarmState = getOrgAlarmState(orgId);
+      const cachedProcessedAlarms = alarmState?.result ?? null;
+      const lastProcessedTimestamp = alarmState?.lastProcessedTimestamp ?? null;
+      const lastSchemaConfigHash = alarmState?.schemaHash ?? null;
+
       if (!scadaData) {
           // If no SCADA data and we have cached alarms, return them
           if (cachedProcessedAlarms) {
               if (DEBUG) console.log('📊 No SCADA data available, returning cached processed alarms');
-              return {
-                  ...cachedProcessedAlarms,
-                  lastUpdate: new Date(),
-                  fromCache: true,
-                  maintenanceMode: isMaintenanceActive
-              };
+              if (cachedProcessedAlarms.maintenanceMode === isMaintenanceActive) {
+                  return { ...cachedProcessedAlarms, fromCache: true };
+              }
+              // Maintenance mode changed since the snapshot was taken, so it is a new version
+              const snapshot = { ...cachedProcessedAlarms, maintenanceMode: isMaintenanceActive };
+              snapshot.version = createSnapshotVersion(snapshot.scadaRowId, lastSchemaConfigHash || '', snapshot);
+              recordAlarmSnapshot(orgId, snapshot);
+              return { ...snapshot, fromCache: true };
           }
           throw new Error('No SCADA data available');
       }
@@ -929,7 +705,6 @@ export const processAndFormatAlarms = async (orgId: string, forceRefresh = false
           if (cachedProcessedAlarms) {
               return {
                   ...cachedProcessedAlarms,
-                  lastUpdate: new Date(),
                   fromCache: true,
                   skipReason: 'Same timestamp and schema as previously processed'
               };
@@ -947,9 +722,9 @@ export const processAndFormatAlarms = async (orgId: string, forceRefresh = false
       if (schemaConfigChanged) {
           console.log(`🔄 Schema configuration changed for org ${orgId}, re-processing alarms`);
           if (DEBUG) {
-              console.log(`📊 Previous schema columns: ${schemaConfigCache?.columns?.length || 0}`);
+              console.log(`📊 Previous schema columns: ${alarmState?.schemaColumnCount || 0}`);
               console.log(`📊 New schema columns: ${schemaConfig.columns.length}`);
-              console.log(`📊 Previous columnConfigs: ${Object.keys(schemaConfigCache?.columnConfigs || {}).length}`);
+              console.log(`📊 Previous columnConfigs: ${alarmState?.schemaColumnConfigCount || 0}`);
               console.log(`📊 New columnConfigs: ${Object.keys(schemaConfig.columnConfigs || {}).length}`);
           }
       }
@@ -962,52 +737,35 @@ export const processAndFormatAlarms = async (orgId: string, forceRefresh = false
           }
       }
 
-      const setpointConfigs = await getSetpointConfigs(orgId);
-      if (DEBUG) {
-          console.log('\n🔍 Available Setpoint Configurations:');
-          setpointConfigs.forEach(sp => {
-              console.log(`${sp.name} (${sp.type}${sp.zone ? `, ${sp.zone}` : ''})`);
-              console.log(`  - Deviations: ${sp.lowDeviation} to +${sp.highDeviation}`);
-              console.log(`  - SCADA Field: ${sp.scadaField}`);
-          });
-          console.log('');
+      // Compiled once per (org, schema hash, setpoints) with setpoints already matched
+      const plan = await getOrgAlarmPlan(orgId, schemaConfig);
+
+      // After a restart, pick up excursions that are still open so they are not raised again
+      if (isNewTimestamp && !hasAlarmPoints(orgId)) {
+          try {
+              seedAlarmPoints(orgId, await loadOpenAlarmSeeds(orgId));
+          } catch (error) {
+              console.error('🔴 Error restoring open alarms:', error);
+          }
       }
-      
-      // Always use the current timestamp for alarm data to ensure clients see updates
-      // even when the underlying SCADA data hasn't changed
-      const alarmTimestamp = new Date();
-      
-      // Get dynamic alarm configurations based on available columns
-      const { analogConfigs, binaryConfigs } = getDynamicAlarmConfigs(scadaData, schemaConfig);
+
+      // Alarms carry the SCADA row's timestamp, so re-evaluating the same row yields an identical
+      // snapshot (same version / ETag); clients detect updates through the version instead
+      const alarmTimestamp = scadaTimestamp;
       
       const analogAlarms = [];
       const binaryAlarms = [];
+      // Notifications raised this cycle, fanned out in one batch once evaluation is done
+      const pendingNotifications: CreateNotificationParams[] = [];
+      // Transitions materialized into the Alarm / AlarmHistory tables
+      const alarmEvents: AlarmTransitionEvent[] = [];
 
       // Process Analog Alarms
-      for (const config of analogConfigs) {
-          const setpoint = setpointConfigs.find(sp => {
-              const nameMatch = sp.name.trim().toLowerCase() === config.name.trim().toLowerCase();
-              const typeMatch = sp.type.toLowerCase() === config.type.toLowerCase();
-              const zoneMatch = (!sp.zone && !config.zone) || (sp.zone === config.zone);
-              
-              if (DEBUG && nameMatch) {
-                  console.log(`Name match found for ${config.name}`);
-                  console.log(`Type match: ${typeMatch}, Zone match: ${zoneMatch}`);
-              }
-              
-              return nameMatch && typeMatch && zoneMatch;
-          });
-
+      for (const config of plan.analog) {
           if (DEBUG) {
               console.log(`\n📈 Processing Analog Alarm: ${config.name}`);
-              console.log(`Looking for setpoint with:`);
-              console.log(`  - Type: ${config.type}`);
-              console.log(`  - Zone: ${config.zone || 'none'}`);
-              console.log(`  - Name: ${config.name}`);
-              if (setpoint) {
-                  console.log('✅ Found matching setpoint configuration:');
-                  console.log(`  - ID: ${setpoint.id}`);
-                  console.log(`  - Deviations: ${setpoint.lowDeviation} to +${setpoint.highDeviation}`);
+              if (config.setpoint) {
+                  console.log(`✅ Using setpoint configuration ${config.setpoint.id}`);
               } else {
                   console.log('⚠️ No matching setpoint found, using defaults');
               }
@@ -1039,40 +797,26 @@ export const processAndFormatAlarms = async (orgId: string, forceRefresh = false
               setValue = currentValue; // Use current value as setpoint if SV is invalid
           }
 
-          // Update default deviations based on alarm type
-          const getDefaultDeviation = (type: string, isHigh: boolean = false) => {
-              switch (type.toLowerCase()) {
-                  case 'carbon':
-                      return isHigh ? 0.05 : -0.05;
-                  case 'temperature':
-                      if (config.name.toLowerCase().includes('oil')) {
-                          return isHigh ? 20 : 0; // Oil temperature specific defaults
-                      }
-                      return isHigh ? 10 : -10;
-                  default:
-                      return isHigh ? 10 : -10;
-              }
-          };
-
-          // Use setpoint config if available, otherwise use type-specific defaults
-          const lowDeviation = setpoint?.lowDeviation ?? getDefaultDeviation(config.type);
-          const highDeviation = setpoint?.highDeviation ?? getDefaultDeviation(config.type, true);
+          // Setpoint deviations (or type-specific defaults) resolved when the plan was compiled
+          const { lowDeviation, highDeviation } = config;
 
           if (DEBUG) {
               console.log(`Current Value: ${currentValue}${config.unit}`);
               console.log(`Set Value: ${setValue}${config.unit}`);
               console.log(`Deviations: Low=${lowDeviation}, High=${highDeviation}`);
-              if (!setpoint) {
-                  console.log(`Using type-specific defaults for ${config.type}`);
-              }
           }
 
-          const severity = calculateAnalogSeverity(
+          // Hysteresis is relative to the point's confirmed severity; the state machine
+          // debounces it and decides whether this sample is a transition worth notifying
+          const observedSeverity = calculateAnalogSeverityWithHysteresis(
+              getAlarmPointSeverity(orgId, config.pvField),
               currentValue,
               setValue,
               lowDeviation,
               highDeviation
           );
+          const step = isNewTimestamp ? stepAlarmPoint(orgId, config.pvField, observedSeverity) : null;
+          const severity = step ? step.severity : observedSeverity;
 
           const lowLimit = setValue + lowDeviation;
           const highLimit = setValue + highDeviation;
@@ -1090,15 +834,33 @@ export const processAndFormatAlarms = async (orgId: string, forceRefresh = false
               setPoint: formattedSetPoint,
               lowLimit: formatValue(lowLimit, config.unit),
               highLimit: formatValue(highLimit, config.unit),
-              timestamp: alarmTimestamp.toISOString(), // Use current timestamp
+              timestamp: alarmTimestamp.toISOString(),
               zone: config.zone,
               alarmType: 'analog'
           });
 
-          // Only send notifications if not in maintenance mode AND this is a new timestamp
+          if (isMaterializedTransition(step?.transition)) {
+              alarmEvents.push({
+                  pointKey: config.pvField,
+                  transition: step!.transition as AlarmTransitionEvent['transition'],
+                  severity,
+                  description: config.name,
+                  type: config.type,
+                  zone: config.zone,
+                  value: formattedValue,
+                  setPoint: formattedSetPoint,
+                  unit: config.unit,
+                  lowLimit,
+                  highLimit,
+                  scadaRowId: String(scadaData.id),
+                  timestamp: scadaTimestamp
+              });
+          }
+
+          // Only notify on transitions (raise, escalation, clear) of a new timestamp outside maintenance mode
           // IMPORTANT: forceRefresh does NOT affect notification logic - notifications only for new timestamps
-          if (severity !== 'info' && !isMaintenanceActive && isNewTimestamp) {
-              await createEnhancedNotification(
+          if (step?.notify && !isMaintenanceActive) {
+              pendingNotifications.push(buildEnhancedNotification(
                   config.name,
                   `${config.name} Alert`,
                   formattedValue,
@@ -1107,13 +869,14 @@ export const processAndFormatAlarms = async (orgId: string, forceRefresh = false
                   config.type,
                   orgId,
                   config.zone,
-                  parseISTTimestamp(scadaData.created_timestamp)
-              );
+                  scadaTimestamp,
+                  step.transition === 'cleared' ? 'CLEARED' : undefined
+              ));
           }
       }
 
       // Process Binary Alarms
-      for (const config of binaryConfigs) {
+      for (const config of plan.binary) {
           const value = scadaData[config.field] as boolean;
           
           // Validate binary value
@@ -1125,7 +888,9 @@ export const processAndFormatAlarms = async (orgId: string, forceRefresh = false
               continue; // Skip this alarm if we don't have valid data
           }
           
-          const severity = calculateBinarySeverity(value);
+          const observedSeverity = calculateBinarySeverity(value);
+          const step = isNewTimestamp ? stepAlarmPoint(orgId, config.field, observedSeverity) : null;
+          const severity = step ? step.severity : observedSeverity;
           const status = value ? 'FAILURE' : 'NORMAL';
 
           binaryAlarms.push({
@@ -1136,14 +901,29 @@ export const processAndFormatAlarms = async (orgId: string, forceRefresh = false
               type: config.type,
               value: status,
               setPoint: 'NORMAL',
-              timestamp: alarmTimestamp.toISOString(), // Use current timestamp
+              timestamp: alarmTimestamp.toISOString(),
               zone: config.zone
           });
 
-          // Only send notifications if binary alarm is active and not in maintenance mode AND this is a new timestamp
+          if (isMaterializedTransition(step?.transition)) {
+              alarmEvents.push({
+                  pointKey: config.field,
+                  transition: step!.transition as AlarmTransitionEvent['transition'],
+                  severity,
+                  description: config.name,
+                  type: config.type,
+                  zone: config.zone,
+                  value: status,
+                  setPoint: 'NORMAL',
+                  scadaRowId: String(scadaData.id),
+                  timestamp: scadaTimestamp
+              });
+          }
+
+          // Only notify when the failure is raised or cleared, on a new timestamp outside maintenance mode
           // IMPORTANT: forceRefresh does NOT affect notification logic - notifications only for new timestamps
-          if (value && !isMaintenanceActive && isNewTimestamp) {
-              await createEnhancedNotification(
+          if (step?.notify && !isMaintenanceActive) {
+              pendingNotifications.push(buildEnhancedNotification(
                   config.name,
                   `${config.name} Status Change`,
                   status,
@@ -1152,33 +932,72 @@ export const processAndFormatAlarms = async (orgId: string, forceRefresh = false
                   config.type,
                   orgId,
                   config.zone,
-                  parseISTTimestamp(scadaData.created_timestamp)
-              );
+                  scadaTimestamp,
+                  step.transition === 'cleared' ? 'CLEARED' : undefined
+              ));
           }
       }
 
-      const result = {
+      if (isNewTimestamp) {
+          pruneAlarmPoints(orgId, [
+              ...plan.analog.map(config => config.pvField),
+              ...plan.binary.map(config => config.field)
+          ]);
+      }
+
+      // Materialize transitions incrementally so history and status queries can use the alarm tables
+      if (alarmEvents.length > 0) {
+          try {
+              await recordAlarmTransitions(orgId, alarmEvents);
+          } catch (error) {
+              console.error('🔴 Error recording alarm transitions:', error);
+          }
+      }
+
+      // Queue for the outbox worker so slow pushes never stretch the monitoring cycle
+      if (pendingNotifications.length > 0) {
+          try {
+              await enqueueNotifications(pendingNotifications);
+          } catch (error) {
+              console.error('🔴 Error queueing alarm notifications:', error);
+          }
+      }
+
+      const snapshot = {
           analogAlarms,
           binaryAlarms,
-          timestamp: alarmTimestamp, // Use current timestamp
-          lastUpdate: new Date(),
-          maintenanceMode: isMaintenanceActive
+          timestamp: alarmTimestamp,
+          lastUpdate: alarmTimestamp,
+          maintenanceMode: isMaintenanceActive,
+          scadaRowId: String(scadaData.id)
       };
+      const result = {
+          version: createSnapshotVersion(scadaData.id, currentSchemaHash, snapshot),
+          ...snapshot
+      };
+      recordAlarmSnapshot(orgId, result);
+
+      // Cache the processed alarms, last processed timestamp and schema hash for this organization
+      saveOrgAlarmState(orgId, {
+          lastProcessedTimestamp: scadaTimestampString,
+          schemaHash: currentSchemaHash,
+          schemaColumnCount: schemaConfig.columns.length,
+          schemaColumnConfigCount: Object.keys(schemaConfig.columnConfigs || {}).length,
+          result
+      });
 
-      // Cache the processed alarms and update last processed timestamp
-      cachedProcessedAlarms = result;
-      lastProcessedTimestamp = scadaTimestampString;
-      
-      // Cache the schema config and hash for change detection
-      schemaConfigCache = schemaConfig;
-      lastSchemaConfigHash = currentSchemaHash;
+      // Push the fresh evaluation to every connected dashboard of this organization
+      // (re-evaluating an unchanged row produces the same version, which clients already have)
+      if (result.version !== cachedProcessedAlarms?.version) {
+          publishAlarmSnapshot(orgId, result);
+      }
 
       if (DEBUG) {
           console.log('📊 Processed Alarms Summary:');
           console.log(`Analog Alarms: ${analogAlarms.length}`);
           console.log(`Binary Alarms: ${binaryAlarms.length}`);
-          console.log(`Cached timestamp: ${lastProcessedTimestamp}`);
-          console.log(`Cached schema hash: ${lastSchemaConfigHash}`);
+          console.log(`Cached timestamp: ${scadaTimestampString}`);
+          console.log(`Cached schema hash: ${currentSchemaHash}`);
           console.log(`Maintenance Mode: ${isMaintenanceActive}`);
           console.log(`Notifications sent: ${isNewTimestamp && !isMaintenanceActive}`);
       }
@@ -1203,10 +1022,12 @@ export const getScadaAlarmHistory = async (
   alarmType?: string,  // Filter by specific alarm type (temperature, carbon, etc.)
   alarmId?: string,    // Filter for a specific alarm ID to get its history
   startTime?: string,  // Optional start time for custom date filtering
-  endTime?: string     // Optional end time for custom date filtering
+  endTime?: string,    // Optional end time for custom date filtering
+  zone?: string,       // Filter by zone (zone1, zone2)
+  cursor?: string,     // Keyset cursor from the previous page (timestamp sort only)
+  countMode: CountMode = 'exact'
 ) => {
   try {
-    const offset = (page - 1) * limit;
     
     // Build WHERE clause based on filters
     let whereClause = "";
@@ -1244,73 +1065,102 @@ export const getScadaAlarmHistory = async (
       }
     }
     
-    // Add search query if specified
-    if (searchQuery) {
-      const searchPattern = `%${searchQuery.toLowerCase()}%`;
-      const exactSearchValue = searchQuery.toLowerCase();
-      whereClause += whereClause ? " AND " : " WHERE ";
-      
-      // Get organization schema configuration for dynamic search
-      const schemaConfig = await getOrganizationSchemaConfig(orgId);
-      
-      // Build dynamic search query based on available columns
-      const searchConditions = schemaConfig.columns
-        .filter(col => col !== 'id' && col !== 'created_timestamp')
-        .map(col => `LOWER(${col}::text) = $${params.length + 1} OR ${col}::text LIKE $${params.length + 2}`)
-        .join(' OR ');
-      
-      whereClause += `(${searchConditions})`;
-      
-      // Add both exact match and pattern match parameters
-      params.push(exactSearchValue);
-      params.push(searchPattern);
-    }
-    
     // Get organization schema configuration
     const schemaConfig = await getOrganizationSchemaConfig(orgId);
+    const plan = await getOrgAlarmPlan(orgId, schemaConfig);
+
+    // Push type / zone / alarm / search / status filters down into SQL so every returned row has
+    // at least one matching alarm and pages are exact
+    const queryPlan = await planAlarmHistoryQuery(orgId, plan, {
+      status: statusFilter,
+      alarmType,
+      zone,
+      alarmId,
+      search: searchQuery,
+      from: startTime ? new Date(startTime) : timeFilter ? new Date(Date.now() - timeFilter * 60 * 60 * 1000) : undefined,
+      to: endTime ? new Date(endTime) : undefined
+    }, params.length + 1);
+
+    if (queryPlan.isEmpty) {
+      return {
+        alarms: [],
+        pagination: { total: 0, filteredTotal: 0, page, limit, pages: 0, hasMore: false, nextCursor: null }
+      };
+    }
+
+    for (const condition of queryPlan.conditions) {
+      whereClause += whereClause ? " AND " : " WHERE ";
+      whereClause += condition;
+    }
+    params.push(...queryPlan.params);
+
+    // Only known columns may be used for sorting (the value is interpolated into SQL)
+    const sortColumn = sortBy !== 'timestamp' && isSafeIdentifier(sortBy) && schemaConfig.columns.includes(sortBy)
+      ? sortBy
+      : 'timestamp';
+    const table = schemaConfig.table || 'jk2';
+
+    // Keyset pagination: continue after the cursor row instead of scanning past an OFFSET.
+    // Other sort columns (and page numbers without a cursor) fall back to OFFSET.
+    const position = sortColumn === 'timestamp' ? decodeCursor(cursor) : null;
+    let pageWhereClause = whereClause;
+    const pageParams = [...params];
+    if (position) {
+      pageWhereClause += pageWhereClause ? " AND " : " WHERE ";
+      pageWhereClause += `(created_timestamp, id) ${sortOrder === 'desc' ? '<' : '>'} ($${pageParams.length + 1}, $${pageParams.length + 2})`;
+      pageParams.push(position.t, position.id);
+    }
     
-    // Count total records for pagination
     const client = await getClientWithRetry(orgId);
     
     try {
-      // Count total records for pagination
-      const countQuery = buildDynamicCountQuery(schemaConfig.table || 'jk2', whereClause);
-      const countResult = await client.query(countQuery, params);
-      const total = parseInt(countResult.rows[0].count);
+      // Count total records for pagination (skipped or estimated on request)
+      let total: number | null = null;
+      if (countMode === 'exact') {
+        const countResult = await client.query(buildDynamicCountQuery(table, whereClause), params);
+        total = parseInt(countResult.rows[0].count);
+      } else if (countMode === 'approximate') {
+        total = await estimateRowCount(client, `SELECT 1 FROM ${table} ${whereClause}`, params);
+      }
       
-      // Get data with pagination, filtering, and sorting
+      // Get data with pagination, filtering, and sorting; one extra row tells whether more pages exist
       const query = buildDynamicHistoryQuery(
         schemaConfig.columns,
-        schemaConfig.table || 'jk2',
-        whereClause,
-        sortBy,
+        table,
+        pageWhereClause,
+        sortColumn,
         sortOrder,
-        params.length + 1,
-        params.length + 2
+        pageParams.length + 1,
+        position ? undefined : pageParams.length + 2
       );
       
-      // Add limit and offset to params
-      params.push(limit, offset);
+      pageParams.push(limit + 1);
+      if (!position) {
+        pageParams.push((page - 1) * limit);
+      }
       
       // Execute query
-      const result = await client.query(query, params);
+      const result = await client.query(query, pageParams);
+      const hasMore = result.rows.length > limit;
+      const rows = result.rows.slice(0, limit);
+      const lastRow = rows[rows.length - 1];
+      const nextCursor = hasMore && sortColumn === 'timestamp' && lastRow
+        ? encodeCursor(lastRow.cursor_timestamp, lastRow.id)
+        : null;
       
       if (DEBUG) {
-        console.log(`📊 Raw SCADA data rows returned: ${result.rows.length}`);
-        if (result.rows.length > 0) {
+        console.log(`📊 Raw SCADA data rows returned: ${rows.length}`);
+        if (rows.length > 0) {
           console.log(`📊 Sample SCADA data:`, {
-            id: result.rows[0].id,
-            timestamp: result.rows[0].created_timestamp,
-            sampleFields: Object.keys(result.rows[0]).slice(0, 5)
+            id: rows[0].id,
+            timestamp: rows[0].created_timestamp,
+            sampleFields: Object.keys(rows[0]).slice(0, 5)
           });
         }
       }
       
-      // Process each row into alarm formats
-      const alarms = await Promise.all(result.rows.map(async (scadaData) => {
-        const processed = await processScadaDataRow(orgId, scadaData);
-        return processed;
-      }));
+      // Process each row into alarm formats against a single prebuilt evaluation plan
+      const alarms = rows.map(scadaData => processScadaDataRow(plan, scadaData));
       
       if (DEBUG) {
         console.log(`📊 Processed alarm sets: ${alarms.length}`);
@@ -1324,24 +1174,28 @@ export const getScadaAlarmHistory = async (
       // Get all alarm IDs before filtering
       const alarmIds = alarms.flatMap(alarm => [...alarm.analogAlarms, ...alarm.binaryAlarms]).map(a => a.id);
       
-      // Get acknowledgment and resolution data for these alarms
-      const alarmStatuses = await prisma.alarm.findMany({
-        where: {
-          id: { in: alarmIds }
-        },
-        include: {
-          acknowledgedBy: {
-            select: { id: true, name: true, email: true }
-          },
-          resolvedBy: {
-            select: { id: true, name: true, email: true }
+      // Resolve acknowledgment and resolution data from the materialized excursion covering
+      // each row (one indexed query over the page's time range)
+      const rowTimes = rows.map(row => parseISTTimestamp(row.created_timestamp));
+      const statusMap = new Map<string, AlarmStatusRecord>();
+      if (rowTimes.length > 0) {
+        const pageStart = new Date(Math.min(...rowTimes.map(time => time.getTime())));
+        const pageEnd = new Date(Math.max(...rowTimes.map(time => time.getTime())));
+        const resolveStatus = await getAlarmStatusResolver(orgId, alarmIds, pageStart, pageEnd);
+
+        alarms.forEach((alarmSet, index) => {
+          const rowSuffix = `-${rows[index].id}`;
+          for (const alarm of [...alarmSet.analogAlarms, ...alarmSet.binaryAlarms]) {
+            const pointKey = alarm.id.slice(0, alarm.id.length - rowSuffix.length);
+            const record = resolveStatus(alarm.id, pointKey, rowTimes[index]);
+            if (record) statusMap.set(alarm.id, record);
           }
-        }
-      });
-      
-      const statusMap = new Map(alarmStatuses.map(status => [status.id, status]));
+        });
+      }
       
-      // Check if schema config has changed
+      // Check if schema config has changed since this organization's alarms were last processed
+      const alarmState = getOrgAlarmState(orgId);
+      const lastSchemaConfigHash = alarmState?.schemaHash ?? null;
       const currentSchemaHash = createSchemaConfigHash(schemaConfig);
       const schemaConfigChanged = lastSchemaConfigHash !== currentSchemaHash;
 
@@ -1356,62 +1210,29 @@ export const getScadaAlarmHistory = async (
       if (schemaConfigChanged) {
           console.log(`🔄 Schema configuration changed for org ${orgId}, re-processing alarms for history`);
           if (DEBUG) {
-              console.log(`📊 Previous schema columns: ${schemaConfigCache?.columns?.length || 0}`);
+              console.log(`📊 Previous schema columns: ${alarmState?.schemaColumnCount || 0}`);
               console.log(`📊 New schema columns: ${schemaConfig.columns.length}`);
-              console.log(`📊 Previous columnConfigs: ${Object.keys(schemaConfigCache?.columnConfigs || {}).length}`);
+              console.log(`📊 Previous columnConfigs: ${alarmState?.schemaColumnConfigCount || 0}`);
               console.log(`📊 New columnConfigs: ${Object.keys(schemaConfig.columnConfigs || {}).length}`);
           }
       }
 
-      // Filter by alarm type if specified
-      let filteredAlarms = alarms;
-      if (alarmType) {
-        filteredAlarms = alarms.map(alarmSet => ({
-          ...alarmSet,
-          analogAlarms: alarmSet.analogAlarms.filter(alarm => alarm.type === alarmType),
-          binaryAlarms: alarmSet.binaryAlarms.filter(alarm => alarm.type === alarmType),
-        }));
-      }
-      
-      // Filter by specific alarm ID if specified
-      if (alarmId) {
-        if (DEBUG) {
-          console.log(`🔍 Debug: Filtering by alarmId: ${alarmId}`);
-          console.log(`🔍 Debug: Before filtering - Total alarm sets: ${alarms.length}`);
-          const totalBefore = alarms.reduce((sum, set) => sum + set.analogAlarms.length + set.binaryAlarms.length, 0);
-          console.log(`🔍 Debug: Before filtering - Total alarms: ${totalBefore}`);
-        }
-        
-        filteredAlarms = alarms.map(alarmSet => ({
-          ...alarmSet,
-          analogAlarms: alarmSet.analogAlarms.filter(alarm => alarm.id.includes(alarmId)),
-          binaryAlarms: alarmSet.binaryAlarms.filter(alarm => alarm.id.includes(alarmId)),
-        }));
-        
-        if (DEBUG) {
-          console.log(`🔍 Debug: After filtering - Total alarm sets: ${filteredAlarms.length}`);
-          const totalAfter = filteredAlarms.reduce((sum, set) => sum + set.analogAlarms.length + set.binaryAlarms.length, 0);
-          console.log(`🔍 Debug: After filtering - Total alarms: ${totalAfter}`);
-        }
-      }
-      
-      // Filter by status if specified - MOVED AFTER data processing
-      if (statusFilter && statusFilter !== 'all') {
-        // Convert frontend status to backend enum
-        const statusEnum = statusFilter.toUpperCase() as AlarmStatus;
-        
-        filteredAlarms = filteredAlarms.map(alarmSet => ({
+      // Keep the alarms the SQL planner selected: its points and, with a status filter, the status
+      // the resolver reports (the planner applies the same precedence). Every returned row keeps at
+      // least one alarm, so pages hold exactly `limit` rows.
+      const plannedPoints = new Set(queryPlan.pointKeys);
+      const statusEnum = statusFilter && statusFilter !== 'all' ? statusFilter.toUpperCase() as AlarmStatus : null;
+      const filteredAlarms = alarms.map((alarmSet, index) => {
+        const rowSuffix = `-${rows[index].id}`;
+        const isSelected = (alarm: { id: string }) =>
+          plannedPoints.has(alarm.id.slice(0, alarm.id.length - rowSuffix.length)) &&
+          (!statusEnum || (statusMap.get(alarm.id)?.status || 'ACTIVE') === statusEnum);
+        return {
           ...alarmSet,
-          analogAlarms: alarmSet.analogAlarms.filter(alarm => {
-            const status = statusMap.get(alarm.id)?.status || 'ACTIVE';
-            return status === statusEnum;
-          }),
-          binaryAlarms: alarmSet.binaryAlarms.filter(alarm => {
-            const status = statusMap.get(alarm.id)?.status || 'ACTIVE';
-            return status === statusEnum;
-          }),
-        }));
-      }
+          analogAlarms: alarmSet.analogAlarms.filter(isSelected),
+          binaryAlarms: alarmSet.binaryAlarms.filter(isSelected)
+        };
+      });
       
       // Merge status information into alarm data
       const enrichedAlarms = filteredAlarms.map(alarmSet => ({
@@ -1463,7 +1284,9 @@ export const getScadaAlarmHistory = async (
           filteredTotal,
           page,
           limit,
-          pages: Math.ceil(total / limit)
+          pages: total !== null ? Math.ceil(total / limit) : null,
+          hasMore,
+          nextCursor
         }
       };
     } finally {
@@ -1476,18 +1299,12 @@ export const getScadaAlarmHistory = async (
 };
 
 // Helper function to process a single SCADA data row into alarm format
-async function processScadaDataRow(orgId: string, scadaData: ScadaData) {
+function processScadaDataRow(plan: AlarmEvaluationPlan, scadaData: ScadaData) {
   const analogAlarms = [];
   const binaryAlarms = [];
   
-  // Get organization schema configuration for dynamic alarm processing
-  const schemaConfig = await getOrganizationSchemaConfig(orgId);
-  
-  // Get dynamic alarm configurations based on available columns
-  const { analogConfigs, binaryConfigs } = getDynamicAlarmConfigs(scadaData, schemaConfig);
-  
   // Process analog alarms
-  for (const config of analogConfigs) {
+  for (const config of plan.analog) {
     const currentValue = scadaData[config.pvField] as number;
     
     // Handle case where there's no SV field (like oilpv)
@@ -1514,23 +1331,8 @@ async function processScadaDataRow(orgId: string, scadaData: ScadaData) {
         setValue = currentValue; // Use current value as setpoint if SV is invalid
     }
 
-    // Use the same deviation logic as in original function
-    const getDefaultDeviation = (type: string, isHigh: boolean = false) => {
-      switch (type.toLowerCase()) {
-        case 'carbon':
-          return isHigh ? 0.05 : -0.05;
-        case 'temperature':
-          if (config.name.toLowerCase().includes('oil')) {
-            return isHigh ? 20 : 0; // Oil temperature specific defaults
-          }
-          return isHigh ? 10 : -10;
-        default:
-          return isHigh ? 10 : -10;
-      }
-    };
-    
-    const lowDeviation = getDefaultDeviation(config.type);
-    const highDeviation = getDefaultDeviation(config.type, true);
+    // Same deviations as live processing: configured setpoint or type-specific defaults
+    const { lowDeviation, highDeviation } = config;
     
     const severity = calculateAnalogSeverity(
       currentValue,
@@ -1562,7 +1364,7 @@ async function processScadaDataRow(orgId: string, scadaData: ScadaData) {
   }
   
   // Process binary alarms
-  for (const config of binaryConfigs) {
+  for (const config of plan.binary) {
     const value = scadaData[config.field] as boolean;
     
     // Validate binary value
@@ -1598,29 +1400,22 @@ async function processScadaDataRow(orgId: string, scadaData: ScadaData) {
   };
 }
 
-// Get SCADA analytics data for charts
-export const getScadaAnalyticsData = async (orgId: string, timeFilter: string) => {
+// Get SCADA analytics data for charts, downsampled in SQL (see scadaDownsampling)
+export const getScadaAnalyticsData = async (
+  orgId: string,
+  timeFilter: string,
+  options: { mode?: DownsampleMode; points?: number } = {}
+) => {
   try {
     if (DEBUG) console.log('📈 Fetching SCADA analytics data for timeFilter:', timeFilter);
     
-    // Parse time filter and calculate duration in milliseconds
-    let durationMs = 20000; // Default 20 seconds
-    
-    if (timeFilter.endsWith('s')) {
-      const seconds = parseInt(timeFilter.slice(0, -1));
-      if (isNaN(seconds) || seconds <= 0) {
-        throw new Error(`Invalid seconds value: ${timeFilter}`);
-      }
-      durationMs = seconds * 1000;
-    } else if (timeFilter.endsWith('m')) {
-      const minutes = parseInt(timeFilter.slice(0, -1));
-      if (isNaN(minutes) || minutes <= 0) {
-        throw new Error(`Invalid minutes value: ${timeFilter}`);
-      }
-      durationMs = minutes * 60 * 1000;
-    } else {
-      console.warn(`⚠️ Unknown time filter format: ${timeFilter}, using default 20s`);
+    // Parse time filter (10s, 2m, 24h, 7d, ...) and calculate duration in milliseconds
+    const durationMs = parseAnalyticsWindow(timeFilter);
+    if (durationMs === null) {
+      throw new Error(`Invalid time filter: ${timeFilter}`);
     }
+    const mode: DownsampleMode = options.mode === 'lttb' ? 'lttb' : 'bucket';
+    const targetDataPoints = options.points || getTargetPoints(timeFilter, durationMs);
     
     // Calculate start time
     const endTime = new Date();
@@ -1628,44 +1423,48 @@ export const getScadaAnalyticsData = async (orgId: string, timeFilter: string) =
     
     if (DEBUG) {
       console.log(`Time range: ${startTime.toISOString()} to ${endTime.toISOString()}`);
-      console.log(`Duration: ${durationMs}ms (${timeFilter})`);
+      console.log(`Duration: ${durationMs}ms (${timeFilter}), ${targetDataPoints} points, mode ${mode}`);
     }
     
-    // Get organization schema configuration
+    // Get organization schema configuration and compiled alarm configurations
     const schemaConfig = await getOrganizationSchemaConfig(orgId);
+    const plan = await getOrgAlarmPlan(orgId, schemaConfig);
+    const table = schemaConfig.table || 'jk2';
+    
+    // Only the charted columns are aggregated (the same set the rollups maintain)
+    const rollupSource = buildScadaRollupSource(plan);
+    const { analogColumns, binaryColumns } = rollupSource;
     
     const client = await getClientWithRetry(orgId);
     
     try {
-      // Build dynamic query for historical data
-      const columnList = schemaConfig.columns.join(', ');
-      const query = `
-        SELECT ${columnList}
-        FROM ${schemaConfig.table || 'jk2'}
-        WHERE created_timestamp >= $1 AND created_timestamp <= $2
-        ORDER BY created_timestamp ASC
-      `;
+      // Hour / day windows read the maintained rollups; short windows always read raw rows
+      const rollups = durationMs / targetDataPoints >= 60 * 1000
+        ? await getRollupCoverage(client, rollupSource)
+        : null;
       
-      const result = await client.query(query, [startTime, endTime]);
-      
-      if (DEBUG) {
-        console.log(`📊 Found ${result.rows.length} data points for analytics`);
-      }
+      let slots = await downsampleScadaWindow(client, {
+        table,
+        analogColumns,
+        binaryColumns,
+        start: startTime,
+        end: endTime,
+        targetPoints: targetDataPoints,
+        mode,
+        rollups
+      });
       
       // If no data found in the time range, try to get the latest available data
-      if (result.rows.length === 0) {
+      if (slots.length === 0) {
         if (DEBUG) console.log('📊 No data in time range, trying to get latest available data...');
         
-        // Build dynamic query for latest data
-        const columnList = schemaConfig.columns.join(', ');
-        const latestQuery = `
+        const columnList = Array.from(new Set([...analogColumns, ...binaryColumns, 'created_timestamp'])).join(', ');
+        const latestResult = await client.query(`
           SELECT ${columnList}
-          FROM ${schemaConfig.table || 'jk2'}
+          FROM ${table}
           ORDER BY created_timestamp DESC
           LIMIT 10
-        `;
-        
-        const latestResult = await client.query(latestQuery);
+        `);
         
         if (latestResult.rows.length === 0) {
           console.warn('⚠️ No SCADA data found in database at all');
@@ -1677,46 +1476,32 @@ export const getScadaAnalyticsData = async (orgId: string, timeFilter: string) =
           };
         }
         
-        // Use the latest available data and duplicate it to show a flat line
+        // Use the latest available data to show a flat line
         if (DEBUG) console.log(`📊 Using latest ${latestResult.rows.length} data points as fallback`);
-        result.rows = latestResult.rows.reverse(); // Reverse to show chronological order
-      }
-      
-      // Determine optimal number of data points based on time filter
-      let targetDataPoints = 10;
-      if (timeFilter === '10s') targetDataPoints = 10;
-      else if (timeFilter === '15s') targetDataPoints = 15;
-      else if (timeFilter === '20s') targetDataPoints = 20;
-      else if (timeFilter === '1m') targetDataPoints = 20;
-      else if (timeFilter === '2m') targetDataPoints = 24;
-      
-      // Sample data points evenly if we have more data than target
-      let sampledData = result.rows;
-      if (result.rows.length > targetDataPoints) {
-        const step = Math.floor(result.rows.length / targetDataPoints);
-        sampledData = result.rows.filter((_, index) => index % step === 0).slice(0, targetDataPoints);
+        slots = rowsToSlots(latestResult.rows.reverse(), analogColumns, binaryColumns);
       }
       
       if (DEBUG) {
-        console.log(`📊 Using ${sampledData.length} sampled data points from ${result.rows.length} total`);
+        const totalSamples = slots.reduce((sum, slot) => sum + slot.samples, 0);
+        console.log(`📊 Using ${slots.length} downsampled data points from ${totalSamples} samples`);
       }
       
       // Generate time labels
-      const timeLabels = sampledData.map(row => {
-        const timestamp = new Date(row.created_timestamp);
+      const timeLabels = slots.map(slot => {
         // Format based on time range
         if (durationMs <= 60000) { // Less than 1 minute - show seconds
-          return format(timestamp, 'HH:mm:ss');
-        } else { // More than 1 minute - show minutes
-          return format(timestamp, 'HH:mm');
+          return format(slot.time, 'HH:mm:ss');
+        } else if (durationMs <= 24 * 60 * 60 * 1000) { // Up to a day - show minutes
+          return format(slot.time, 'HH:mm');
+        } else { // Longer ranges - show the day as well
+          return format(slot.time, 'dd MMM HH:mm');
         }
       });
       
-      // Get dynamic alarm configurations for analytics
-      const { analogConfigs, binaryConfigs } = getDynamicAlarmConfigs(result.rows[0] || {}, schemaConfig);
+      const round = (value: number | null) => value === null ? null : parseFloat(value.toFixed(2));
       
       // Prepare analog data series with highly distinct colors
-      const analogDataConfigs = analogConfigs.map((config, index) => {
+      const analogDataConfigs = plan.analog.map((config, index) => {
         const colors = ['#FF1744', '#FF9800', '#9C27B0', '#795548', '#00E676', '#2196F3'];
         return {
           name: config.name,
@@ -1725,116 +1510,60 @@ export const getScadaAnalyticsData = async (orgId: string, timeFilter: string) =
           svField: config.svField,
           unit: config.unit,
           type: config.type,
-          zone: config.zone
+          zone: config.zone,
+          // Resolved when the plan was compiled: the org's setpoint or the defaults live alarms use
+          lowDeviation: config.lowDeviation,
+          highDeviation: config.highDeviation
         };
       });
 
-      // Fetch setpoint configurations from Prisma
-      const setpointConfigs = await prisma.setpoint.findMany();
-
       // Process analog data with dynamic thresholds
-      const analogData = await Promise.all(analogDataConfigs.map(async config => {
-        // Find matching setpoint configuration
-        const setpoint = setpointConfigs.find(sp => {
-          const nameMatch = sp.name.trim().toLowerCase() === config.name.trim().toLowerCase();
-          const typeMatch = sp.type.toLowerCase() === config.type.toLowerCase();
-          const zoneMatch = (!sp.zone && !config.zone) || (sp.zone === config.zone);
-          return nameMatch && typeMatch && zoneMatch;
-        });
-
-        // Get default deviations based on type
-        const getDefaultDeviation = (type: string, isHigh: boolean = false) => {
-          switch (type.toLowerCase()) {
-            case 'carbon':
-              return isHigh ? 0.05 : -0.05;
-            case 'hardening_temperature':
-              return isHigh ? 10 : -10;
-            case 'tempering_temperature':
-              return isHigh ? 10 : -10;
-            case 'oil_temperature':
-              return isHigh ? 20 : -10;
-            default:
-              return isHigh ? 10 : -10;
+      const analogData = analogDataConfigs.map(config => {
+        const { lowDeviation, highDeviation } = config;
+
+        const pv = slots.map(slot => slot.analog[config.pvField]);
+        const data = pv.map(aggregate => {
+          const value = round(aggregate?.value ?? null);
+          if (value === null) {
+            if (DEBUG) console.warn(`⚠️ No value for ${config.pvField} in bucket`);
+            return 0;
           }
-        };
-
-        // Use setpoint config if available, otherwise use defaults
-        const lowDeviation = setpoint?.lowDeviation ?? getDefaultDeviation(config.type);
-        const highDeviation = setpoint?.highDeviation ?? getDefaultDeviation(config.type, true);
+          return value;
+        });
+        
+        // Handle case where there's no SV field (like oilpv): thresholds follow the PV
+        const setpointSeries = config.svField === ''
+          ? data
+          : slots.map(slot => slot.analog[config.svField]?.last ?? 0);
 
         return {
           name: config.name,
           color: config.color,
-          data: sampledData.map(row => {
-            const value = row[config.pvField] as number;
-            if (value === null || value === undefined || isNaN(value)) {
-              console.warn(`⚠️ Invalid value for ${config.pvField}:`, value);
-              return 0;
-            }
-            return parseFloat(value.toFixed(2));
-          }),
-          setpoint: sampledData.map(row => {
-            // Handle case where there's no SV field (like oilpv)
-            if (config.svField === '') {
-              const pvValue = row[config.pvField] as number;
-              return pvValue || 0;
-            } else {
-              const value = row[config.svField] as number;
-              return value || 0;
-            }
-          }),
+          data,
+          // Bucket extremes so excursions between chart points stay visible
+          min: pv.map(aggregate => round(aggregate?.min ?? null)),
+          max: pv.map(aggregate => round(aggregate?.max ?? null)),
+          avg: pv.map(aggregate => round(aggregate?.avg ?? null)),
+          last: pv.map(aggregate => round(aggregate?.last ?? null)),
+          setpoint: setpointSeries,
           thresholds: {
-            critical: { 
-              low: sampledData.map(row => {
-                // Handle case where there's no SV field (like oilpv)
-                if (config.svField === '') {
-                  const pvValue = row[config.pvField] as number;
-                  return pvValue + lowDeviation;
-                } else {
-                  const sv = row[config.svField] as number;
-                  return sv + lowDeviation;
-                }
-              }),
-              high: sampledData.map(row => {
-                // Handle case where there's no SV field (like oilpv)
-                if (config.svField === '') {
-                  const pvValue = row[config.pvField] as number;
-                  return pvValue + highDeviation;
-                } else {
-                  const sv = row[config.svField] as number;
-                  return sv + highDeviation;
-                }
-              })
+            // Same bands as calculateAnalogSeverity: warning outside the deviation band,
+            // critical more than CRITICAL_OFFSET beyond it
+            critical: {
+              low: setpointSeries.map(sv => sv + lowDeviation - CRITICAL_OFFSET),
+              high: setpointSeries.map(sv => sv + highDeviation + CRITICAL_OFFSET)
             },
             warning: {
-              low: sampledData.map(row => {
-                // Handle case where there's no SV field (like oilpv)
-                if (config.svField === '') {
-                  const pvValue = row[config.pvField] as number;
-                  return pvValue + (lowDeviation * 0.8); // 80% of critical deviation for warning
-                } else {
-                  const sv = row[config.svField] as number;
-                  return sv + (lowDeviation * 0.8); // 80% of critical deviation for warning
-                }
-              }),
-              high: sampledData.map(row => {
-                // Handle case where there's no SV field (like oilpv)
-                if (config.svField === '') {
-                  const pvValue = row[config.pvField] as number;
-                  return pvValue + (highDeviation * 0.8); // 80% of critical deviation for warning
-                } else {
-                  const sv = row[config.svField] as number;
-                  return sv + (highDeviation * 0.8); // 80% of critical deviation for warning
-                }
-              })
+              low: setpointSeries.map(sv => sv + lowDeviation),
+              high: setpointSeries.map(sv => sv + highDeviation)
             }
           },
           unit: config.unit
         };
-      }));
+      });
       
       // Prepare binary data series with distinct colors
-      const binaryDataConfigs = binaryConfigs.map((config, index) => {
+      const binaryDataConfigs = plan.binary.map((config, index) => {
         const colors = ['#FF6384', '#FF8C94', '#36A2EB', '#4BC0C0', '#9966FF', '#FF9F40', '#4CAF50', '#2196F3', '#00BCD4'];
         return {
           field: config.field,
@@ -1843,19 +1572,12 @@ export const getScadaAnalyticsData = async (orgId: string, timeFilter: string) =
         };
       });
       
-              const binaryData = binaryDataConfigs.map(config => ({
-          name: config.name,
-          color: config.color,
-          data: sampledData.map(row => {
-            const value = row[config.field] as boolean;
-            // Handle null/undefined values by returning 0 (no failure)
-            if (value === null || value === undefined) {
-              console.warn(`⚠️ Invalid boolean value for ${config.field}:`, value);
-              return 0;
-            }
-            return value ? 1 : 0;
-          })
-        }));
+      // A bucket shows a failure if the field was set at any sample in it
+      const binaryData = binaryDataConfigs.map(config => ({
+        name: config.name,
+        color: config.color,
+        data: slots.map(slot => slot.binary[config.field] ?? 0)
+      }));
       
       if (DEBUG) {
         console.log('📊 Analytics data prepared successfully');
@@ -1878,7 +1600,8 @@ export const getScadaAnalyticsData = async (orgId: string, timeFilter: string) =
         binaryData,
         timeLabels,
         timestamp: new Date(),
-        duration: durationMs
+        duration: durationMs,
+        mode
       };
       
     } finally {
@@ -0,0 +1,122 @@
+const DEBUG = process.env.NODE_ENV === 'development';
+
+/**
+ * Latest SCADA row cached for a single organization
+ */
+export interface ScadaSnapshot {
+  orgId: string;
+  data: any | null;
+  fetchedAt: number;
+  consecutiveErrors: number;
+  lastError?: string;
+  lastErrorAt?: number;
+}
+
+/**
+ * Staleness information exposed to callers that need to know how old a snapshot is
+ */
+export interface ScadaSnapshotInfo {
+  orgId: string;
+  hasData: boolean;
+  fetchedAt: Date | null;
+  ageMs: number | null;
+  isStale: boolean;
+  consecutiveErrors: number;
+  lastError?: string;
+}
+
+// Snapshots keyed by organization ID so tenants never share a cached row
+const snapshots = new Map<string, ScadaSnapshot>();
+
+/**
+ * Get the cached snapshot for an organization (fresh or stale)
+ */
+export const getScadaSnapshot = (orgId: string): ScadaSnapshot | undefined => {
+  return snapshots.get(orgId);
+};
+
+/**
+ * Check whether a snapshot is still within its time-to-live
+ */
+export const isSnapshotFresh = (snapshot: ScadaSnapshot | undefined, ttlMs: number, now = Date.now()): boolean => {
+  return !!snapshot && snapshot.data !== null && snapshot.fetchedAt > 0 && now - snapshot.fetchedAt < ttlMs;
+};
+
+/**
+ * Store a freshly fetched SCADA row for an organization and reset its error counter
+ */
+export const storeScadaSnapshot = (orgId: string, data: any | null, fetchedAt = Date.now()): ScadaSnapshot => {
+  const snapshot: ScadaSnapshot = {
+    orgId,
+    data,
+    fetchedAt,
+    consecutiveErrors: 0
+  };
+  snapshots.set(orgId, snapshot);
+  return snapshot;
+};
+
+/**
+ * Record a failed fetch for an organization, keeping any previously cached row as a fallback.
+ * Returns the number of consecutive errors for that organization.
+ */
+export const recordScadaFetchError = (orgId: string, error: unknown): number => {
+  const existing = snapshots.get(orgId);
+  const message = error instanceof Error ? error.message : String(error);
+
+  if (existing) {
+    existing.consecutiveErrors++;
+    existing.lastError = message;
+    existing.lastErrorAt = Date.now();
+    return existing.consecutiveErrors;
+  }
+
+  snapshots.set(orgId, {
+    orgId,
+    data: null,
+    fetchedAt: 0,
+    consecutiveErrors: 1,
+    lastError: message,
+    lastErrorAt: Date.now()
+  });
+  return 1;
+};
+
+/**
+ * Drop the cached snapshot for one organization, or for all organizations when no ID is given
+ */
+export const invalidateScadaSnapshot = (orgId?: string): void => {
+  if (orgId) {
+    snapshots.delete(orgId);
+    if (DEBUG) console.log(`🧹 SCADA snapshot invalidated for org ${orgId}`);
+  } else {
+    snapshots.clear();
+    if (DEBUG) console.log('🧹 All SCADA snapshots invalidated');
+  }
+};
+
+/**
+ * Describe the age and health of an organization's snapshot
+ */
+export const getScadaSnapshotInfo = (orgId: string, ttlMs: number, now = Date.now()): ScadaSnapshotInfo => {
+  const snapshot = snapshots.get(orgId);
+  const hasData = !!snapshot && snapshot.data !== null;
+
+  return {
+    orgId,
+    hasData,
+    fetchedAt: hasData ? new Date(snapshot!.fetchedAt) : null,
+    ageMs: hasData ? now - snapshot!.fetchedAt : null,
+    isStale: !isSnapshotFresh(snapshot, ttlMs, now),
+    consecutiveErrors: snapshot?.consecutiveErrors || 0,
+    lastError: snapshot?.lastError
+  };
+};
+
+/**
+ * Describe all cached snapshots (used for monitoring/diagnostics)
+ */
+export const getAllScadaSnapshotInfo = (ttlMs: number): ScadaSnapshotInfo[] => {
+  const now = Date.now();
+  return Array.from(snapshots.keys()).map(orgId => getScadaSnapshotInfo(orgId, ttlMs, now));
+};
@@ -0,0 +1,106 @@
+import { Request, Response } from 'express';
+import { Readable } from 'stream';
+import { pipeline } from 'stream/promises';
+import { ByteRange, getBlobStore } from '../services/blobStore';
+
+export interface ReportFile {
+  fileName: string;
+  blobKey: string | null;
+  // Only set on rows that have not been moved to the blob store yet
+  fileContent?: Uint8Array | null;
+}
+
+/**
+ * Parse a single-range `Range: bytes=...` header. Returns undefined when there is no usable
+ * range (send the whole file) and null when the range cannot be satisfied. Multi-range
+ * requests are answered with the whole file, which RFC 9110 allows.
+ */
+export function parseRangeHeader(header: string | undefined, size: number): ByteRange | null | undefined {
+  if (!header) return undefined;
+
+  const match = /^bytes=(\d*)-(\d*)$/.exec(header.trim());
+  if (!match || (!match[1] && !match[2])) return undefined;
+
+  let start: number;
+  let end: number;
+  if (!match[1]) {
+    // Suffix range: the last N bytes
+    const suffix = parseInt(match[2]);
+    if (suffix === 0) return null;
+    start = Math.max(0, size - suffix);
+    end = size - 1;
+  } else {
+    start = parseInt(match[1]);
+    end = match[2] ? Math.min(parseInt(match[2]), size - 1) : size - 1;
+  }
+
+  if (start >= size || start > end) return null;
+  return { start, end };
+}
+
+/**
+ * Send a stored report file, streaming it from the blob store with Range support.
+ * Rows still holding bytea content are served from memory as before.
+ * Resolves false (nothing sent) when the file content cannot be found.
+ */
+export async function sendReportFile(req: Request, res: Response, file: ReportFile, contentType: string): Promise<boolean> {
+  let size: number;
+  let open: (range?: ByteRange) => Readable;
+
+  if (file.blobKey) {
+    const store = getBlobStore();
+    const stat = await store.stat(file.blobKey);
+    if (!stat) {
+      console.error(`❌ Blob ${file.blobKey} for ${file.fileName} is missing from storage`);
+      return false;
+    }
+    size = stat.size;
+    open = range => store.createReadStream(file.blobKey as string, range);
+  } else if (file.fileContent) {
+    const content = Buffer.from(file.fileContent);
+    size = content.byteLength;
+    open = range => Readable.from([range ? content.subarray(range.start, range.end + 1) : content]);
+  } else {
+    return false;
+  }
+
+  // Content-addressed blobs never change, so the key is a strong validator
+  const etag = file.blobKey ? `"${file.blobKey}"` : undefined;
+  if (etag) {
+    res.setHeader('ETag', etag);
+    if (req.headers['if-none-match'] === etag) {
+      res.status(304).end();
+      return true;
+    }
+  }
+
+  res.setHeader('Content-Type', contentType);
+  res.setHeader('Content-Disposition', `attachment; filename="${file.fileName}"`);
+  res.setHeader('Accept-Ranges', 'bytes');
+
+  // A stale If-Range validator means the client must get the whole file again
+  const ifRange = req.headers['if-range'];
+  const range = ifRange && ifRange !== etag ? undefined : parseRangeHeader(req.headers.range, size);
+
+  if (range === null) {
+    res.setHeader('Content-Range', `bytes */${size}`);
+    res.status(416).end();
+    return true;
+  }
+
+  if (range) {
+    res.status(206);
+    res.setHeader('Content-Range', `bytes ${range.start}-${range.end}/${size}`);
+    res.setHeader('Content-Length', range.end - range.start + 1);
+  } else {
+    res.setHeader('Content-Length', size);
+  }
+
+  if (req.method === 'HEAD') {
+    res.end();
+    return true;
+  }
+
+  await pipeline(open(range), res);
+  return true;
+}
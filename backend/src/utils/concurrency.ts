@@ -0,0 +1,45 @@
+// Concurrency helpers for fan-out work (push chunks, per-organization jobs)
+
+/**
+ * Run an async task for every item with at most `limit` tasks in flight.
+ * Results are returned in input order as settled results, so one failure never stops the rest.
+ * @param items Items to process
+ * @param limit Maximum number of concurrent tasks
+ * @param task Async task to run for each item
+ */
+export async function mapWithConcurrency<T, R>(
+  items: T[],
+  limit: number,
+  task: (item: T, index: number) => Promise<R>
+): Promise<PromiseSettledResult<R>[]> {
+  const results: PromiseSettledResult<R>[] = new Array(items.length);
+  let nextIndex = 0;
+
+  const worker = async () => {
+    while (nextIndex < items.length) {
+      const index = nextIndex++;
+      try {
+        results[index] = { status: 'fulfilled', value: await task(items[index], index) };
+      } catch (reason) {
+        results[index] = { status: 'rejected', reason };
+      }
+    }
+  };
+
+  const workerCount = Math.max(1, Math.min(limit, items.length));
+  await Promise.all(Array.from({ length: workerCount }, () => worker()));
+  return results;
+}
+
+/**
+ * Split an array into consecutive chunks of at most `size` items
+ * @param items Items to split
+ * @param size Maximum chunk size
+ */
+export function chunkArray<T>(items: T[], size: number): T[][] {
+  const chunks: T[][] = [];
+  for (let i = 0; i < items.length; i += size) {
+    chunks.push(items.slice(i, i + size));
+  }
+  return chunks;
+}
@@ -0,0 +1,63 @@
+// Keyset (cursor) pagination helpers shared by the history and notification endpoints
+
+/**
+ * Position after the last row of a page: the row's timestamp (as text, to keep full precision) and id
+ */
+export interface KeysetCursor {
+  t: string;
+  id: string | number;
+}
+
+/**
+ * How the total is computed: exact COUNT(*), planner estimate, or not at all
+ */
+export type CountMode = 'exact' | 'approximate' | 'none';
+
+/**
+ * Encode a cursor as an opaque URL-safe string
+ */
+export const encodeCursor = (timestamp: string | Date, id: string | number): string => {
+  const t = timestamp instanceof Date ? timestamp.toISOString() : timestamp;
+  return Buffer.from(JSON.stringify({ t, id })).toString('base64url');
+};
+
+/**
+ * Decode a cursor; returns null when absent or malformed
+ */
+export const decodeCursor = (cursor?: string | null): KeysetCursor | null => {
+  if (!cursor) return null;
+  try {
+    const decoded = JSON.parse(Buffer.from(cursor, 'base64url').toString('utf8'));
+    if (typeof decoded?.t === 'string' && (typeof decoded.id === 'string' || typeof decoded.id === 'number')) {
+      return decoded;
+    }
+  } catch {
+    // Fall through to null
+  }
+  return null;
+};
+
+/**
+ * Parse the `count` query parameter. Follow-up pages (with a cursor) skip the count by default
+ * since the client already has it from the first page.
+ */
+export const parseCountMode = (value: unknown, hasCursor: boolean): CountMode => {
+  if (value === 'exact' || value === 'approximate' || value === 'none') {
+    return value;
+  }
+  return hasCursor ? 'none' : 'exact';
+};
+
+/**
+ * Row estimate from the query planner (EXPLAIN, not executed); O(1) regardless of table size
+ */
+export const estimateRowCount = async (
+  client: { query: (sql: string, params?: any[]) => Promise<{ rows: any[] }> },
+  selectSql: string,
+  params: any[] = []
+): Promise<number> => {
+  const result = await client.query(`EXPLAIN (FORMAT JSON) ${selectSql}`, params);
+  const plan = result.rows[0]?.['QUERY PLAN'];
+  const parsed = typeof plan === 'string' ? JSON.parse(plan) : plan;
+  return Math.round(parsed?.[0]?.Plan?.['Plan Rows'] ?? 0);
+};
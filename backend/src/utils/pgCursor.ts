@@ -0,0 +1,41 @@
+import { randomUUID } from 'crypto';
+import { PoolClient } from 'pg';
+
+/**
+ * Read a query in batches through a server-side cursor (DECLARE / FETCH inside a read-only
+ * transaction), so only `batchSize` rows are held in memory at a time. Yields to the event loop
+ * between batches. Returns the number of rows read.
+ */
+export async function forEachCursorBatch(
+  client: PoolClient,
+  sql: string,
+  params: any[],
+  batchSize: number,
+  onBatch: (rows: any[]) => void | Promise<void>
+): Promise<number> {
+  const cursorName = `cursor_${randomUUID().replace(/-/g, '')}`;
+  let rowCount = 0;
+
+  await client.query('BEGIN READ ONLY');
+  try {
+    await client.query(`DECLARE ${cursorName} NO SCROLL CURSOR FOR ${sql}`, params);
+
+    for (;;) {
+      const batch = await client.query(`FETCH ${batchSize} FROM ${cursorName}`);
+      if (batch.rows.length === 0) break;
+
+      await onBatch(batch.rows);
+      rowCount += batch.rows.length;
+
+      // Let other requests run between batches
+      await new Promise(resolve => setImmediate(resolve));
+    }
+
+    await client.query(`CLOSE ${cursorName}`);
+    await client.query('COMMIT');
+    return rowCount;
+  } catch (error) {
+    await client.query('ROLLBACK').catch(() => undefined);
+    throw error;
+  }
+}